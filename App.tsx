@@ -60,10 +60,11 @@ import {
 import {
   getOrCreateConversation,
   getTotalUnreadMessagesCount,
-  getUnreadMessagesForMyOffers,
-  getUnreadMessagesForMyRequests,
   subscribeToUnreadCount,
 } from "./services/messagesService.ts";
+import { subscribeToUnreadCounters } from "./services/unreadCountersService.ts";
+import { invalidateProfile } from "./services/profileCacheService.ts";
+import { startMessageOutbox } from "./services/messageOutboxService.ts";
 
 // Services
 import {
@@ -1831,37 +1832,26 @@ const App: React.FC = () => {
       return;
     }
 
-    const calculateUnreadMessages = async () => {
-      try {
-        // Get request IDs
-        const requestIds = myRequests.map((r) => r.id);
-        const requestsCount = requestIds.length > 0
-          ? await getUnreadMessagesForMyRequests(requestIds)
-          : 0;
-        setUnreadMessagesForMyRequests(requestsCount);
-
-        // Get offer IDs
-        const offerIds = myOffers.map((o) => o.id);
-        const offersCount = offerIds.length > 0
-          ? await getUnreadMessagesForMyOffers(offerIds)
-          : 0;
-        setUnreadMessagesForMyOffers(offersCount);
-      } catch (error) {
-        console.error("Error calculating unread messages:", error);
-      }
-    };
-
-    calculateUnreadMessages();
-
-    // Recalculate when myRequests or myOffers change
-    const intervalId = setInterval(calculateUnreadMessages, 5000);
+    // رسائل بقيت في صندوق الإرسال من جلسة سابقة (بدون اتصال) تُرسل الآن
+    startMessageOutbox();
+
+    // العدادات تُحدَّث في قاعدة البيانات عبر triggers وتصل هنا عبر Realtime
+    // (بدلاً من إعادة حسابها بـ COUNT كل 5 ثوانٍ)
+    const unsubscribeCounters = subscribeToUnreadCounters(
+      user.id,
+      (counters) => {
+        setUnreadMessagesForMyRequests(counters.messagesForMyRequests);
+        setUnreadMessagesForMyOffers(counters.messagesForMyOffers);
+        setUnreadInterestsCount(counters.interests);
+      },
+    );
 
     return () => {
-      clearInterval(intervalId);
+      unsubscribeCounters();
       setUnreadMessagesForMyRequests(0);
       setUnreadMessagesForMyOffers(0);
     };
-  }, [appView, user?.id, myRequests, myOffers]);
+  }, [appView, user?.id]);
 
   // ==========================================
   // Auto-mark notifications as read when viewing My Requests page with received offers
@@ -2164,8 +2154,8 @@ const App: React.FC = () => {
           return [newRequest, ...prev];
         });
 
-        // Increase unread count
-        setUnreadInterestsCount((prev) => prev + 1);
+        // unreadInterestsCount يصل من user_unread_counters عبر Realtime
+        // (الـ trigger يضيف الطلب للمستخدمين المطابقين) - لا نزيده محلياً لتجنب العد المزدوج
 
         // Mark as new for animation
         setNewRequestIds((prev) => new Set([...prev, newRequest.id]));
@@ -2956,6 +2946,7 @@ const App: React.FC = () => {
             display_name: preferences.name,
           })
           .eq("id", user.id);
+        invalidateProfile(user.id);
 
         // محاولة تحديث has_onboarded (تجاهل الخطأ إذا العمود غير موجود)
         try {
@@ -3227,11 +3218,13 @@ const App: React.FC = () => {
                     }
                   } else {
                     // إنشاء طلب جديد
+                    const { imageVariants, ...requestFields } = request;
                     const createdRequest = await createRequestFromChat(
                       currentUserId,
                       draftData,
                       {
-                        ...request, // Pass all fields (images, seriousness, etc.)
+                        ...requestFields, // Pass all fields (images, seriousness, etc.)
+                        image_variants: imageVariants, // thumbnails + blurhash
                         id: request.id, // Explicitly pass id if present
                       } as RequestInsert,
                     );
@@ -43,7 +43,10 @@ import {
 import { UnifiedHeader } from "./ui/UnifiedHeader";
 import { Request } from "../types";
 import Anthropic from "@anthropic-ai/sdk";
-import { generateDraftWithCta } from "../services/aiService";
+import {
+  generateDraftWithCta,
+  streamDraftWithCta,
+} from "../services/aiService";
 import { VoiceProcessingStatus } from "./GlobalFloatingOrb";
 import { CityAutocomplete } from "./ui/CityAutocomplete";
 import { CityResult } from "../services/placesService";
@@ -70,6 +73,7 @@ interface SubmitButtonWithShakeProps {
   onSubmit: () => Promise<void>;
   onGoToRequest?: (requestId?: string) => void;
   isUploadingFiles?: boolean;
+  uploadPercent?: number;
 }
 
 const SubmitButtonWithShake: React.FC<SubmitButtonWithShakeProps> = ({
@@ -83,6 +87,7 @@ const SubmitButtonWithShake: React.FC<SubmitButtonWithShakeProps> = ({
   onSubmit,
   onGoToRequest,
   isUploadingFiles = false,
+  uploadPercent = 0,
 }) => {
   const [isShaking, setIsShaking] = useState(false);
 
@@ -141,7 +146,7 @@ const SubmitButtonWithShake: React.FC<SubmitButtonWithShakeProps> = ({
         ? (
           <>
             <Loader2 size={20} className="animate-spin" />
-            <span>جاري رفع الصور...</span>
+            <span>جاري رفع الصور... {uploadPercent}%</span>
           </>
         )
         : isSubmitting
@@ -1114,6 +1119,7 @@ export const CreateRequestV2: React.FC<CreateRequestV2Props> = ({
   const descriptionResizeStartHeight = useRef(0);
   const [attachedFiles, setAttachedFiles] = useState<File[]>([]);
   const [isUploadingFiles, setIsUploadingFiles] = useState(false);
+  const [uploadPercent, setUploadPercent] = useState(0);
   const fileInputRef = useRef<HTMLInputElement>(null);
 
   // Attachment preview state
@@ -2247,13 +2253,32 @@ export const CreateRequestV2: React.FC<CreateRequestV2Props> = ({
     setAiInput("");
     setIsAiLoading(true);
 
+    // رد المساعد يظهر أثناء توليده (بث)، في رسالة واحدة تُحدَّث
+    const streamMessageId = `stream-${Date.now()}`;
+    let streamedText = "";
+    const showStreamedText = (text: string) => {
+      setAiMessages((prev) =>
+        prev.some((m) => m.id === streamMessageId)
+          ? prev.map((m) => m.id === streamMessageId ? { ...m, text } : m)
+          : [...prev, { id: streamMessageId, text, timestamp: new Date() }]
+      );
+    };
+
     try {
       // استخدام AI لاستخراج العنوان والتصنيفات
-      const draft = await generateDraftWithCta(
-        userMessage || "طلب صوتي",
-        undefined, // لا دعم للصور هنا
-        audioBlob || undefined,
-      );
+      // (الصوت لا يمر عبر البث - يحتاج مسار الإرسال المباشر)
+      const draft = audioBlob
+        ? await generateDraftWithCta(
+          userMessage || "طلب صوتي",
+          undefined, // لا دعم للصور هنا
+          audioBlob,
+        )
+        : await streamDraftWithCta(userMessage, {
+          onDelta: (chunk) => {
+            streamedText += chunk;
+            showStreamedText(streamedText);
+          },
+        });
 
       if (!draft) {
         throw new Error("فشل معالجة الطلب");
@@ -2265,16 +2290,13 @@ export const CreateRequestV2: React.FC<CreateRequestV2Props> = ({
         setClarificationPages([]);
         setCurrentClarificationPage(0);
         setShowFinalReview(false);
-        // إضافة رسالة للمستخدم
-        setAiMessages((prev) => [
-          ...prev,
-          {
-            id: Date.now().toString(),
-            text: draft.aiResponse || "يرجى توضيح طلبك أكثر",
-            timestamp: new Date(),
-          },
-        ]);
+        // إضافة رسالة للمستخدم (أو استبدال النص المبثوث بالنص النهائي)
+        showStreamedText(draft.aiResponse || "يرجى توضيح طلبك أكثر");
       } else {
+        // النص المبثوث قد يكون من محاولة فشلت ثم أعيدت بدون بث
+        if (streamedText && draft.aiResponse) {
+          showStreamedText(draft.aiResponse);
+        }
         // No clarification needed - show final review screen
         setFinalReview({
           title: draft.title || "",
@@ -2322,8 +2344,9 @@ export const CreateRequestV2: React.FC<CreateRequestV2Props> = ({
       }
     } catch (error) {
       logger.error("Error processing message:", error, "service");
+      // رد مبثوث جزئياً قبل الفشل لا يبقى بجانب رسالة الخطأ
       setAiMessages((prev) => [
-        ...prev,
+        ...prev.filter((m) => m.id !== streamMessageId),
         {
           id: Date.now().toString(),
           text: "عذراً، حدث خطأ. حاول مرة أخرى 🔄",
@@ -2506,18 +2529,23 @@ export const CreateRequestV2: React.FC<CreateRequestV2Props> = ({
 
     // --- Image Upload Logic ---
     let uploadedImageUrls: string[] = [];
+    let uploadedImageVariants: Request["imageVariants"] = {};
     const isEditing = !!editingRequestId;
     // Generate a fixed ID if it's a new request, so we can use it for storage prefix
     const requestId = editingRequestId || crypto.randomUUID();
 
     if (attachedFiles.length > 0) {
       try {
+        setUploadPercent(0);
         setIsUploadingFiles(true);
         logger.log("Uploading attachments for request:", requestId);
-        uploadedImageUrls = await uploadRequestAttachments(
+        const uploaded = await uploadRequestAttachments(
           attachedFiles,
           requestId,
+          (progress) => setUploadPercent(progress.percent),
         );
+        uploadedImageUrls = uploaded.urls;
+        uploadedImageVariants = uploaded.variants;
         logger.log("Uploaded successfully:", uploadedImageUrls);
       } catch (uploadError) {
         logger.error("Failed to upload attachments:", uploadError);
@@ -2585,6 +2613,9 @@ export const CreateRequestV2: React.FC<CreateRequestV2Props> = ({
       deliveryTimeFrom: finalDeliveryTime || undefined,
       seriousness: seriousness,
       images: uploadedImageUrls.length > 0 ? uploadedImageUrls : undefined,
+      imageVariants: uploadedImageUrls.length > 0
+        ? uploadedImageVariants
+        : undefined,
     };
 
     logger.log(
@@ -3038,7 +3069,7 @@ export const CreateRequestV2: React.FC<CreateRequestV2Props> = ({
                     : <Check size={18} />}
                   <span>
                     {isUploadingFiles
-                      ? "جاري الرفع..."
+                      ? `جاري الرفع... ${uploadPercent}%`
                       : isSubmitting
                       ? "جاري الإرسال..."
                       : "تأكيد وإرسال"}
@@ -4035,6 +4066,7 @@ export const CreateRequestV2: React.FC<CreateRequestV2Props> = ({
             }}
             onGoToRequest={onGoToRequest}
             isUploadingFiles={isUploadingFiles}
+            uploadPercent={uploadPercent}
           />
         </motion.div>
       )}
@@ -4670,7 +4702,7 @@ export const CreateRequestV2: React.FC<CreateRequestV2Props> = ({
                       : <Check size={20} />}
                     <span>
                       {isUploadingFiles
-                        ? "جاري الرفع..."
+                        ? `جاري الرفع... ${uploadPercent}%`
                         : isSubmitting
                         ? "جاري الإرسال..."
                         : "موافق وإنشاء الطلب"}
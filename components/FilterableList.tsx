@@ -1,7 +1,8 @@
-import React, { useRef, useEffect, useState } from 'react';
+import React, { useRef, useEffect, useState, useCallback } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Search, X, ChevronDown, CheckCircle } from 'lucide-react';
 import { UnifiedFilterIsland } from './ui/UnifiedFilterIsland';
+import { useVirtualList } from '../hooks/useVirtualList';
 
 interface FilterConfig {
   id: string;
@@ -23,8 +24,14 @@ interface FilterableListProps<T> {
   renderItem: (item: T, index: number) => React.ReactNode;
   emptyState?: React.ReactNode;
   isActive?: boolean;
+  // Stable key per item (used to recycle measured heights); defaults to item.id
+  getItemKey?: (item: T) => string;
+  estimateItemHeight?: number;
 }
 
+const defaultGetItemKey = (item: unknown): string =>
+  String((item as { id?: string | number })?.id ?? '');
+
 export function FilterableList<T>({
   items,
   filterConfigs,
@@ -35,12 +42,23 @@ export function FilterableList<T>({
   renderItem,
   emptyState,
   isActive = true,
+  getItemKey = defaultGetItemKey,
+  estimateItemHeight = 180,
 }: FilterableListProps<T>) {
   const searchInputRef = useRef<HTMLInputElement>(null);
   const [openFilterDropdownId, setOpenFilterDropdownId] = useState<string | null>(null);
   const filterDropdownRefs = useRef<Map<string, HTMLDivElement>>(new Map());
   const scrollContainerRef = useRef<HTMLDivElement>(null);
 
+  // Windowed rendering داخل scrollContainerRef
+  const getKey = useCallback((item: T) => getItemKey(item), [getItemKey]);
+  const listWindow = useVirtualList({
+    items,
+    getKey,
+    estimateItemHeight,
+    enabled: isActive,
+  });
+
   useEffect(() => {
     const handleClickOutside = (event: MouseEvent) => {
       if (openFilterDropdownId) {
@@ -301,7 +319,7 @@ export function FilterableList<T>({
       </div>
 
       <div className="px-4 pb-24">
-        <div className="grid grid-cols-1 gap-6 min-h-[100px] pt-2">
+        <div ref={listWindow.listRef} className="grid grid-cols-1 gap-6 min-h-[100px] pt-2">
           {items.length === 0 ? (
             emptyState || (
               <div className="flex flex-col items-center justify-center py-20 text-center min-h-[50vh]">
@@ -309,7 +327,23 @@ export function FilterableList<T>({
               </div>
             )
           ) : (
-            items.map((item, index) => renderItem(item, index))
+            <>
+              {listWindow.topSpacer > 0 && (
+                <div aria-hidden style={{ gridColumn: '1 / -1', height: listWindow.topSpacer }} />
+              )}
+              {listWindow.visibleItems.map((item, visibleIndex) => {
+                const index = listWindow.startIndex + visibleIndex;
+                const key = getKey(item) || String(index);
+                return (
+                  <div key={key} ref={listWindow.measureItem(key)}>
+                    {renderItem(item, index)}
+                  </div>
+                );
+              })}
+              {listWindow.bottomSpacer > 0 && (
+                <div aria-hidden style={{ gridColumn: '1 / -1', height: listWindow.bottomSpacer }} />
+              )}
+            </>
           )}
         </div>
       </div>
@@ -62,14 +62,17 @@ import {
 } from "lucide-react";
 import { Button } from "./ui/Button";
 import { Badge } from "./ui/Badge";
+import { ResponsiveImage } from "./ui/ResponsiveImage";
 import { AnimatePresence, motion } from "framer-motion";
 import { CardsGridSkeleton } from "./ui/LoadingSkeleton";
 import { UnifiedFilterIsland } from "./ui/UnifiedFilterIsland";
 import CompactListView from "./ui/CompactListView";
+import { useVirtualList } from "../hooks/useVirtualList";
 import { CityAutocomplete } from "./ui/CityAutocomplete";
 import {
   CityResult,
   DEFAULT_SAUDI_CITIES,
+  isSearchCancelled,
   searchCities as searchCitiesAPI,
 } from "../services/placesService";
 import { calculateSeriousness } from "../services/requestsService";
@@ -316,9 +319,29 @@ export const Marketplace: React.FC<MarketplaceProps> = ({
     // Use setTimeout to ensure cards are rendered
     const timeoutId = setTimeout(observeCards, 300);
 
+    // القوائم مُنمذجة (virtualized): الكروت تُركّب أثناء التمرير، فنراقب الجديد منها أيضاً
+    const mutationObserver = new MutationObserver((mutations) => {
+      mutations.forEach((mutation) => {
+        mutation.addedNodes.forEach((node) => {
+          if (!(node instanceof HTMLElement)) return;
+          if (node.hasAttribute("data-request-id")) observer.observe(node);
+          node.querySelectorAll("[data-request-id]").forEach((card) =>
+            observer.observe(card)
+          );
+        });
+      });
+    });
+    if (marketplaceScrollRef.current) {
+      mutationObserver.observe(marketplaceScrollRef.current, {
+        childList: true,
+        subtree: true,
+      });
+    }
+
     return () => {
       clearTimeout(timeoutId);
       observer.disconnect();
+      mutationObserver.disconnect();
     };
   }, [
     viewMode,
@@ -563,16 +586,26 @@ export const Marketplace: React.FC<MarketplaceProps> = ({
     DEFAULT_SAUDI_CITIES,
   );
   const [isSearchingCities, setIsSearchingCities] = useState(false);
+  // البحث الجاري عن المدن - يُلغى عند كتابة نص جديد
+  const citySearchAbortRef = useRef<AbortController | null>(null);
 
   // البحث عن المدن عند الكتابة
   const handleCitySearch = async (query: string) => {
+    citySearchAbortRef.current?.abort();
+    citySearchAbortRef.current = null;
+
     if (!query || query.length < 2) {
       setCitySearchResults(DEFAULT_SAUDI_CITIES);
+      setIsSearchingCities(false);
       return;
     }
+    const controller = new AbortController();
+    citySearchAbortRef.current = controller;
     setIsSearchingCities(true);
     try {
-      const results = await searchCitiesAPI(query);
+      const results = await searchCitiesAPI(query, "sa", {
+        signal: controller.signal,
+      });
       if (results.length > 0) {
         setCitySearchResults(results.map((r) => r.name));
       } else {
@@ -583,14 +616,19 @@ export const Marketplace: React.FC<MarketplaceProps> = ({
           ),
         );
       }
-    } catch {
+    } catch (error) {
+      // بحث أحدث حلّ محله
+      if (isSearchCancelled(error)) return;
       setCitySearchResults(
         DEFAULT_SAUDI_CITIES.filter((c) =>
           c.toLowerCase().includes(query.toLowerCase())
         ),
       );
     } finally {
-      setIsSearchingCities(false);
+      if (citySearchAbortRef.current === controller) {
+        citySearchAbortRef.current = null;
+        setIsSearchingCities(false);
+      }
     }
   };
 
@@ -1269,6 +1307,15 @@ export const Marketplace: React.FC<MarketplaceProps> = ({
     searchBudgetMax,
   ]);
 
+  // Windowed grid: only the rows around the viewport are mounted
+  const getRequestKey = useCallback((req: Request) => req.id, []);
+  const gridWindow = useVirtualList({
+    items: filteredRequests,
+    getKey: getRequestKey,
+    estimateItemHeight: 320,
+    enabled: displayMode === "grid",
+  });
+
   // Infinite scroll: when user reaches the end (10th item for first page), load next page
   useEffect(() => {
     if (!onLoadMore) return;
@@ -3382,9 +3429,20 @@ export const Marketplace: React.FC<MarketplaceProps> = ({
                         initial={{ opacity: 0 }}
                         animate={{ opacity: 1 }}
                         transition={{ duration: 0.2 }}
+                        ref={gridWindow.listRef}
                         className="grid grid-cols-1 md:grid-cols-1 lg:grid-cols-2 xl:grid-cols-3 gap-4 md:gap-3 px-4 md:px-3 lg:px-4 pt-6"
                       >
-                        {filteredRequests.map((req, index) => {
+                        {gridWindow.topSpacer > 0 && (
+                          <div
+                            aria-hidden
+                            style={{
+                              gridColumn: "1 / -1",
+                              height: gridWindow.topSpacer,
+                            }}
+                          />
+                        )}
+                        {gridWindow.visibleItems.map((req, visibleIndex) => {
+                          const index = gridWindow.startIndex + visibleIndex;
                           const myOffer = getMyOffer(req.id);
                           const requestAuthorId = (req as any).authorId ||
                             (req as any).author_id || req.author;
@@ -3400,6 +3458,7 @@ export const Marketplace: React.FC<MarketplaceProps> = ({
                           return (
                             <div
                               key={req.id}
+                              ref={gridWindow.measureItem(req.id)}
                               className="flex items-stretch"
                             >
                               {/* Card Container - الاكتفاء بأيقونة العين للدلالة على القراءة */}
@@ -3408,6 +3467,9 @@ export const Marketplace: React.FC<MarketplaceProps> = ({
                                   // Store ref in cardRefs map for touch detection
                                   if (el) {
                                     cardRefs.current.set(req.id, el);
+                                  } else {
+                                    // الكارت خرج من النافذة المعروضة
+                                    cardRefs.current.delete(req.id);
                                   }
                                   // Also handle ninthItemRef
                                   if (isNinthItem && el) {
@@ -3523,8 +3585,9 @@ export const Marketplace: React.FC<MarketplaceProps> = ({
                                 {req.images && req.images.length > 0
                                   ? (
                                     <motion.div className="h-40 w-full bg-secondary overflow-hidden relative">
-                                      <motion.img
+                                      <ResponsiveImage
                                         src={req.images[0]}
+                                        variants={req.imageVariants?.[req.images[0]]}
                                         alt={req.title}
                                         className="w-full h-full object-cover"
                                         whileHover={{ scale: 1.1 }}
@@ -4083,6 +4146,15 @@ export const Marketplace: React.FC<MarketplaceProps> = ({
                             </div>
                           );
                         })}
+                        {gridWindow.bottomSpacer > 0 && (
+                          <div
+                            aria-hidden
+                            style={{
+                              gridColumn: "1 / -1",
+                              height: gridWindow.bottomSpacer,
+                            }}
+                          />
+                        )}
                       </motion.div>
                     </div>
                   </motion.div>
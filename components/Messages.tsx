@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useRef } from 'react';
+import React, { useEffect, useLayoutEffect, useMemo, useState, useRef } from 'react';
 import { logger } from '../utils/logger';
 import { motion, AnimatePresence } from 'framer-motion';
 import { 
@@ -16,22 +16,34 @@ import {
   FileText,
   Play,
   Pause,
-  Trash2
+  Trash2,
+  Clock,
+  AlertCircle
 } from 'lucide-react';
 import { 
-  getConversations, 
-  getMessages, 
-  sendMessage,
+  getConversationsPage, 
+  getConversation,
+  getCachedMessages,
+  syncConversationMessages,
+  loadOlderMessages,
+  upsertCachedMessage,
   markMessagesAsRead,
   getOrCreateConversation,
   subscribeToMessages,
   subscribeToConversations,
+  subscribeToConversationUnreadCounts,
   uploadMessageAttachments,
   uploadVoiceMessage,
   Conversation,
+  ConversationsCursor,
   Message,
   MessageAttachment
 } from '../services/messagesService';
+import {
+  queueMessage,
+  retryOutboxMessage,
+  subscribeToOutbox,
+} from '../services/messageOutboxService';
 import { getCurrentUser } from '../services/authService';
 import { ListItemSkeleton, ChatMessageSkeleton } from './ui/LoadingSkeleton';
 import { UnifiedHeader } from './ui/UnifiedHeader';
@@ -236,12 +248,24 @@ export const Messages: React.FC<MessagesProps> = ({
     loadUser();
   }, []);
   const [conversations, setConversations] = useState<Conversation[]>([]);
+  const [conversationsCursor, setConversationsCursor] = useState<ConversationsCursor | null>(null);
+  const [isLoadingMoreConversations, setIsLoadingMoreConversations] = useState(false);
   const [selectedConversation, setSelectedConversation] = useState<Conversation | null>(null);
   const [messages, setMessages] = useState<Message[]>([]);
+  // Optimistic messages still waiting in the outbox (pending / failed)
+  const [outboxMessages, setOutboxMessages] = useState<Message[]>([]);
   const [newMessage, setNewMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [isSending, setIsSending] = useState(false);
+  // Attachment upload progress (0-100) while isSending
+  const [uploadPercent, setUploadPercent] = useState<number | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const messagesContainerRef = useRef<HTMLDivElement>(null);
+  const [hasOlderMessages, setHasOlderMessages] = useState(false);
+  const [isLoadingOlderMessages, setIsLoadingOlderMessages] = useState(false);
+  // Scroll height before prepending older messages (to keep the viewport still)
+  const prependScrollHeightRef = useRef<number | null>(null);
+  const activeConversationIdRef = useRef<string | null>(null);
   
   // Attachments state
   const [attachedFiles, setAttachedFiles] = useState<File[]>([]);
@@ -265,12 +289,15 @@ export const Messages: React.FC<MessagesProps> = ({
     const loadConversations = async () => {
       setIsLoading(true);
       try {
-        const convs = await getConversations();
-        setConversations(convs);
+        const page = await getConversationsPage();
+        setConversations(page.conversations);
+        setConversationsCursor(page.nextCursor);
         
         // If initial conversation ID provided, select it
         if (initialConversationId) {
-          const conv = convs.find(c => c.id === initialConversationId);
+          const conv = page.conversations.find(c => c.id === initialConversationId) ||
+            // Not in the first page - fetch it directly
+            await getConversation(initialConversationId);
           if (conv) {
             setSelectedConversation(conv);
           }
@@ -290,7 +317,8 @@ export const Messages: React.FC<MessagesProps> = ({
         const index = prev.findIndex(c => c.id === updatedConv.id);
         if (index >= 0) {
           const updated = [...prev];
-          updated[index] = updatedConv;
+          // payload.new has no joined other_user/unread_count - keep the ones we have
+          updated[index] = { ...prev[index], ...updatedConv };
           return updated.sort((a, b) => {
             const aTime = a.last_message_at ? new Date(a.last_message_at).getTime() : 0;
             const bTime = b.last_message_at ? new Date(b.last_message_at).getTime() : 0;
@@ -302,73 +330,181 @@ export const Messages: React.FC<MessagesProps> = ({
       });
     });
 
+    // Live unread badges per conversation (scoped to this user's counter rows)
+    const unsubscribeUnread = subscribeToConversationUnreadCounts(
+      user.id,
+      (conversationId, unreadCount) => {
+        setConversations((prev) =>
+          prev.map((c) =>
+            c.id === conversationId && c.unread_count !== unreadCount
+              ? { ...c, unread_count: unreadCount }
+              : c
+          )
+        );
+      },
+    );
+
     return () => {
       unsubscribe();
+      unsubscribeUnread();
     };
   }, [user?.id, initialConversationId]);
 
+  // Next page of conversations (cursor on last_message_at, id)
+  const loadMoreConversations = async () => {
+    if (!conversationsCursor || isLoadingMoreConversations) return;
+    setIsLoadingMoreConversations(true);
+    try {
+      const page = await getConversationsPage({ cursor: conversationsCursor });
+      setConversations((prev) => {
+        const seen = new Set(prev.map(c => c.id));
+        return [...prev, ...page.conversations.filter(c => !seen.has(c.id))];
+      });
+      setConversationsCursor(page.nextCursor);
+    } catch (error) {
+      logger.error('Error loading more conversations:', error, 'service');
+    } finally {
+      setIsLoadingMoreConversations(false);
+    }
+  };
+
+  // Add or replace a message (realtime + own sends), keeping order and no duplicates
+  const applyMessage = (conversationId: string, msg: Message) => {
+    const cached = upsertCachedMessage(conversationId, msg);
+    setMessages((prev) => {
+      if (cached) return cached.messages;
+      const exists = prev.some((m) => m.id === msg.id);
+      return exists ? prev.map((m) => (m.id === msg.id ? msg : m)) : [...prev, msg];
+    });
+  };
+
   // Load messages when conversation is selected
   useEffect(() => {
     if (!selectedConversation) {
+      activeConversationIdRef.current = null;
       setMessages([]);
+      setHasOlderMessages(false);
       return;
     }
 
+    const conversationId = selectedConversation.id;
+    activeConversationIdRef.current = conversationId;
+    let isCurrent = true;
+
     const loadMessages = async () => {
-      setIsLoading(true);
+      // Render instantly from the per-conversation cache, then sync only what's new
+      const cached = getCachedMessages(conversationId);
+      if (cached) {
+        setMessages(cached.messages);
+        setHasOlderMessages(cached.hasMoreBefore);
+      } else {
+        setMessages([]);
+        setIsLoading(true);
+      }
+
       try {
-        const msgs = await getMessages(selectedConversation.id);
-        setMessages(msgs);
+        const synced = await syncConversationMessages(conversationId);
+        if (!isCurrent) return;
+        setMessages(synced.messages);
+        setHasOlderMessages(synced.hasMoreBefore);
         
         // Mark messages as read
-        await markMessagesAsRead(selectedConversation.id);
+        await markMessagesAsRead(conversationId);
         
         // Update conversation unread count
         setConversations((prev) =>
           prev.map((c) =>
-            c.id === selectedConversation.id ? { ...c, unread_count: 0 } : c
+            c.id === conversationId ? { ...c, unread_count: 0 } : c
           )
         );
       } catch (error) {
         logger.error('Error loading messages:', error, 'service');
       } finally {
-        setIsLoading(false);
+        if (isCurrent) setIsLoading(false);
       }
     };
 
     loadMessages();
 
+    // Queued sends: render optimistically, swap in the server row on delivery
+    const unsubscribeOutbox = subscribeToOutbox(conversationId, {
+      onChange: (queued) => {
+        if (isCurrent) setOutboxMessages(queued);
+      },
+      onDelivered: (sent) => {
+        if (isCurrent) applyMessage(conversationId, sent);
+      },
+    });
+
     // Subscribe to new messages
-    const unsubscribe = subscribeToMessages(selectedConversation.id, (newMsg, eventType) => {
-      if (eventType === 'INSERT') {
-        setMessages((prev) => [...prev, newMsg]);
-        
+    const unsubscribe = subscribeToMessages(conversationId, (newMsg, eventType) => {
+      if (!isCurrent) return;
+      applyMessage(conversationId, newMsg);
+
+      if (eventType === 'INSERT' && newMsg.sender_id !== user?.id) {
         // Mark as read if it's not from current user
-        if (newMsg.sender_id !== user?.id) {
-          markMessagesAsRead(selectedConversation.id);
-        }
-        
-        // Scroll to bottom
-        setTimeout(() => {
-          messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
-        }, 100);
-      } else if (eventType === 'UPDATE') {
-        setMessages((prev) => 
-          prev.map((m) => (m.id === newMsg.id ? newMsg : m))
-        );
+        markMessagesAsRead(conversationId);
       }
     });
 
     return () => {
+      isCurrent = false;
       unsubscribe();
+      unsubscribeOutbox();
+      setOutboxMessages([]);
     };
   }, [selectedConversation?.id, user?.id]);
 
-  // Scroll to bottom when messages change
-  useEffect(() => {
-    messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
+  // Scroll older history in when the user reaches the top
+  const handleMessagesScroll = async () => {
+    const container = messagesContainerRef.current;
+    if (!container || !selectedConversation) return;
+    if (container.scrollTop > 200 || !hasOlderMessages || isLoadingOlderMessages) return;
+
+    const conversationId = selectedConversation.id;
+    setIsLoadingOlderMessages(true);
+    try {
+      prependScrollHeightRef.current = container.scrollHeight;
+      const result = await loadOlderMessages(conversationId);
+      if (activeConversationIdRef.current !== conversationId) {
+        prependScrollHeightRef.current = null;
+        return;
+      }
+      setMessages(result.messages);
+      setHasOlderMessages(result.hasMoreBefore);
+    } catch (error) {
+      prependScrollHeightRef.current = null;
+      logger.error('Error loading older messages:', error, 'service');
+    } finally {
+      setIsLoadingOlderMessages(false);
+    }
+  };
+
+  // Server window + queued messages that have not been echoed back yet
+  const displayedMessages = useMemo(() => {
+    if (outboxMessages.length === 0) return messages;
+    const seen = new Set(messages.map((m) => m.id));
+    return [...messages, ...outboxMessages.filter((m) => !seen.has(m.id))];
+  }, [messages, outboxMessages]);
+
+  // Keep position after prepending; scroll to bottom only when the newest message changes
+  const lastMessageId = displayedMessages.length > 0
+    ? displayedMessages[displayedMessages.length - 1].id
+    : null;
+  useLayoutEffect(() => {
+    const container = messagesContainerRef.current;
+    if (container && prependScrollHeightRef.current !== null) {
+      container.scrollTop += container.scrollHeight - prependScrollHeightRef.current;
+      prependScrollHeightRef.current = null;
+    }
   }, [messages]);
 
+  useEffect(() => {
+    if (lastMessageId) {
+      messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
+    }
+  }, [lastMessageId]);
+
   // Recording timer
   useEffect(() => {
     let interval: NodeJS.Timeout | null = null;
@@ -482,7 +618,17 @@ export const Messages: React.FC<MessagesProps> = ({
 
   const handleSendMessage = async () => {
     const hasContent = newMessage.trim() || attachedFiles.length > 0 || recordedAudioBlob;
-    if (!hasContent || !selectedConversation || isSending) return;
+    if (!hasContent || !selectedConversation || !user?.id || isSending) return;
+
+    const conversationId = selectedConversation.id;
+    const text = newMessage;
+
+    // Text-only: queue and return - the outbox renders it and delivers it
+    if (attachedFiles.length === 0 && !recordedAudioBlob) {
+      setNewMessage('');
+      queueMessage(conversationId, user.id, text);
+      return;
+    }
 
     setIsSending(true);
     try {
@@ -492,34 +638,34 @@ export const Messages: React.FC<MessagesProps> = ({
 
       // Upload attachments if any
       if (attachedFiles.length > 0) {
-        uploadedAttachments = await uploadMessageAttachments(attachedFiles, selectedConversation.id);
+        uploadedAttachments = await uploadMessageAttachments(
+          attachedFiles,
+          conversationId,
+          (progress) => setUploadPercent(progress.percent),
+        );
       }
 
       // Upload voice message if any
       if (recordedAudioBlob) {
-        const voiceResult = await uploadVoiceMessage(recordedAudioBlob, selectedConversation.id, recordingTime);
+        const voiceResult = await uploadVoiceMessage(recordedAudioBlob, conversationId, recordingTime);
         if (voiceResult) {
           audioUrl = voiceResult.url;
           audioDuration = voiceResult.duration;
         }
       }
 
-      const sentMsg = await sendMessage(selectedConversation.id, newMessage, {
+      queueMessage(conversationId, user.id, text, {
         attachments: uploadedAttachments.length > 0 ? uploadedAttachments : undefined,
         audioUrl,
         audioDuration,
       });
-
-      if (sentMsg) {
-        setMessages((prev) => [...prev, sentMsg]);
-        setNewMessage('');
-        clearPendingMedia();
-        messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
-      }
+      setNewMessage('');
+      clearPendingMedia();
     } catch (error) {
       logger.error('Error sending message:', error, 'service');
     } finally {
       setIsSending(false);
+      setUploadPercent(null);
     }
   };
 
@@ -567,7 +713,15 @@ export const Messages: React.FC<MessagesProps> = ({
         />
 
         {/* Conversations List */}
-        <div className="flex-1 overflow-y-auto p-4 space-y-3">
+        <div
+          className="flex-1 overflow-y-auto p-4 space-y-3"
+          onScroll={(e) => {
+            const el = e.currentTarget;
+            if (el.scrollHeight - el.scrollTop - el.clientHeight < 300) {
+              loadMoreConversations();
+            }
+          }}
+        >
           {isLoading ? (
             <>
               <ListItemSkeleton />
@@ -628,6 +782,7 @@ export const Messages: React.FC<MessagesProps> = ({
                   <ChevronLeft size={18} className="text-muted-foreground shrink-0" />
                 </motion.button>
               ))}
+              {isLoadingMoreConversations && <ListItemSkeleton />}
             </div>
           )}
         </div>
@@ -665,21 +820,26 @@ export const Messages: React.FC<MessagesProps> = ({
       </div>
 
       {/* Messages */}
-      <div className="flex-1 overflow-y-auto px-4 py-4 space-y-4">
+      <div
+        ref={messagesContainerRef}
+        onScroll={handleMessagesScroll}
+        className="flex-1 overflow-y-auto px-4 py-4 space-y-4"
+      >
         {isLoading ? (
           <div className="space-y-6">
             <ChatMessageSkeleton />
             <ChatMessageSkeleton isUser />
             <ChatMessageSkeleton />
           </div>
-        ) : messages.length === 0 ? (
+        ) : displayedMessages.length === 0 ? (
           <div className="flex flex-col items-center justify-center h-full text-center">
             <MessageCircle size={48} className="text-muted-foreground mb-4" />
             <p className="text-muted-foreground">لا توجد رسائل بعد</p>
           </div>
         ) : (
           <>
-            {messages.map((msg) => {
+            {isLoadingOlderMessages && <ChatMessageSkeleton />}
+            {displayedMessages.map((msg) => {
               const isOwn = msg.sender_id === user?.id;
               const hasAttachments = msg.attachments && msg.attachments.length > 0;
               const hasAudio = msg.audio_url;
@@ -728,7 +888,19 @@ export const Messages: React.FC<MessagesProps> = ({
                         {formatTime(msg.created_at)}
                       </p>
                       {isOwn && (
-                        msg.is_read ? (
+                        msg.client_status === 'failed' ? (
+                          <button
+                            type="button"
+                            onClick={() => retryOutboxMessage(msg.id)}
+                            className="flex items-center gap-0.5 text-[10px] text-primary-foreground/90"
+                            aria-label="إعادة الإرسال"
+                          >
+                            <AlertCircle size={12} />
+                            إعادة الإرسال
+                          </button>
+                        ) : msg.client_status === 'pending' ? (
+                          <Clock size={12} className="text-primary-foreground/40" />
+                        ) : msg.is_read ? (
                           <CheckCheck size={12} className="text-primary-foreground/60" />
                         ) : (
                           <CheckCheck size={12} className="text-primary-foreground/40" />
@@ -883,7 +1055,11 @@ export const Messages: React.FC<MessagesProps> = ({
             className="w-12 h-12 rounded-xl bg-primary text-white flex items-center justify-center disabled:opacity-50 disabled:cursor-not-allowed hover:bg-primary/90 transition-colors"
           >
             {isSending ? (
-              <Loader2 size={20} className="animate-spin" />
+              uploadPercent !== null && uploadPercent < 100 ? (
+                <span className="text-xs font-bold tabular-nums">{uploadPercent}%</span>
+              ) : (
+                <Loader2 size={20} className="animate-spin" />
+              )
             ) : (
               <Send size={20} />
             )}
@@ -3,6 +3,7 @@ import { logger } from "../utils/logger.ts";
 import { AppMode, Message as LocalMessage, Offer, Request } from "../types.ts";
 import { Button } from "./ui/Button.tsx";
 import { Badge } from "./ui/Badge.tsx";
+import { ResponsiveImage } from "./ui/ResponsiveImage.tsx";
 import {
   AlertCircle,
   AlertTriangle,
@@ -57,6 +58,7 @@ import {
   getCurrentUser,
   verifyGuestPhone,
 } from "../services/authService.ts";
+import { getSessionUserId } from "../services/sessionService.ts";
 import {
   incrementRequestViews,
   markRequestAsRead,
@@ -79,13 +81,19 @@ import {
   closeConversationsForRequest,
   Conversation,
   getConversations,
-  getMessages,
+  getCachedMessages,
+  syncConversationMessages,
   getOrCreateConversation,
   markMessagesAsRead,
   Message as ChatMessage,
-  sendMessage,
   subscribeToMessages,
+  upsertCachedMessage,
 } from "../services/messagesService.ts";
+import {
+  queueMessage,
+  retryOutboxMessage,
+  subscribeToOutbox,
+} from "../services/messageOutboxService.ts";
 import {
   acceptOffer,
   createOffer,
@@ -515,7 +523,6 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
     Conversation | null
   >(null);
   const [isChatLoading, setIsChatLoading] = useState(false);
-  const [isSendingMessage, setIsSendingMessage] = useState(false);
   const [isConversationClosed, setIsConversationClosed] = useState(false);
   const [conversationClosedReason, setConversationClosedReason] = useState<
     string | null
@@ -720,8 +727,11 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
             setConversationClosedReason(null);
           }
 
-          const msgs = await getMessages(conversation.id);
-          setChatMessages(msgs);
+          // Instant render from the message cache, then fetch only what's new
+          const cached = getCachedMessages(conversation.id);
+          if (cached) setChatMessages(cached.messages);
+          const synced = await syncConversationMessages(conversation.id);
+          setChatMessages(synced.messages);
           await markMessagesAsRead(conversation.id);
         }
       } catch (error) {
@@ -738,15 +748,27 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
   useEffect(() => {
     if (!currentConversation?.id || !user?.id) return;
 
+    // إضافة أو استبدال رسالة بنفس المعرف (الرسالة المتفائلة تُستبدل بصف الخادم)
+    const upsertChatMessage = (msg: ChatMessage) =>
+      setChatMessages((prev) =>
+        prev.some((m) => m.id === msg.id)
+          ? prev.map((m) => (m.id === msg.id ? msg : m))
+          : [...prev, msg]
+      );
+
+    // رسائل صندوق الإرسال (معلقة/فشلت) تظهر فوراً
+    const unsubscribeOutbox = subscribeToOutbox(currentConversation.id, {
+      onChange: (queued) => queued.forEach(upsertChatMessage),
+      onDelivered: upsertChatMessage,
+    });
+
     const unsubscribe = subscribeToMessages(
       currentConversation.id,
       (newMsg, eventType) => {
+        // Keep the message cache in step (read receipts arrive as UPDATEs)
+        upsertCachedMessage(currentConversation.id, newMsg);
         if (eventType === "INSERT") {
-          setChatMessages((prev) => {
-            // تجنب التكرار
-            if (prev.some((m) => m.id === newMsg.id)) return prev;
-            return [...prev, newMsg];
-          });
+          upsertChatMessage(newMsg);
           // وضع علامة مقروء إذا لم تكن من المستخدم الحالي
           if (newMsg.sender_id !== user?.id) {
             markMessagesAsRead(currentConversation.id);
@@ -761,6 +783,7 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
 
     return () => {
       unsubscribe();
+      unsubscribeOutbox();
     };
   }, [currentConversation?.id, user?.id]);
 
@@ -769,21 +792,12 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [chatMessages]);
 
-  const handleSendChat = async () => {
-    if (!chatMessage.trim() || !currentConversation || isSendingMessage) return;
+  const handleSendChat = () => {
+    if (!chatMessage.trim() || !currentConversation || !user?.id) return;
 
-    setIsSendingMessage(true);
-    try {
-      const sentMsg = await sendMessage(currentConversation.id, chatMessage);
-      if (sentMsg) {
-        setChatMessages((prev) => [...prev, sentMsg]);
-      }
-      setChatMessage("");
-    } catch (error) {
-      logger.error("خطأ في إرسال الرسالة:", error, "service");
-    } finally {
-      setIsSendingMessage(false);
-    }
+    // تظهر فوراً عبر subscribeToOutbox وتُرسل في الخلفية (مع إعادة المحاولة)
+    queueMessage(currentConversation.id, user.id, chatMessage);
+    setChatMessage("");
   };
 
   const handleShare = async () => {
@@ -1149,8 +1163,8 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
     if (isGuest) {
       setGuestOfferVerificationStep("phone");
     } else {
-      const { data: userData } = await supabase.auth.getUser();
-      if (!userData?.user?.id) {
+      const currentUserId = await getSessionUserId();
+      if (!currentUserId) {
         alert("يرجى تسجيل الدخول أولاً");
         return;
       }
@@ -1158,7 +1172,7 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
       // التحقق من أن المستخدم لا يقدم عرض على طلبه الخاص
       const requestAuthorId = (request as any).authorId ||
         (request as any).author_id || request.author;
-      if (requestAuthorId && userData.user.id === requestAuthorId) {
+      if (requestAuthorId && currentUserId === requestAuthorId) {
         alert("لا يمكنك تقديم عرض على طلبك الخاص");
         return;
       }
@@ -1169,7 +1183,7 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
         let uploadedImageUrls: string[] = [];
         if (offerAttachments.length > 0) {
           setIsUploadingAttachments(true);
-          const tempId = `${userData.user.id}-${Date.now()}`;
+          const tempId = `${currentUserId}-${Date.now()}`;
           uploadedImageUrls = await uploadOfferAttachments(
             offerAttachments,
             tempId,
@@ -1179,7 +1193,7 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
 
         const result = await createOffer({
           requestId: request.id,
-          providerId: userData.user.id,
+          providerId: currentUserId,
           title: offerTitle.trim(),
           description: offerDescription.trim() || undefined,
           price: offerPrice.trim(),
@@ -1569,8 +1583,14 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
                   onTouchStart={handleImgTouchStart}
                   onTouchEnd={handleImgTouchEnd}
                 >
-                  <img
+                  <ResponsiveImage
+                    key={currentImageIndex}
                     src={request.images[currentImageIndex]}
+                    variants={request.imageVariants?.[
+                      request.images[currentImageIndex]
+                    ]}
+                    sizes="100vw"
+                    loading="eager"
                     alt={`Image`}
                     className="w-full h-full object-cover pointer-events-none select-none"
                   />
@@ -4208,9 +4228,22 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
                                         {msg.content}
                                       </div>
                                       <span className="text-[10px] text-muted-foreground mt-1.5 px-2">
-                                        {format(new Date(msg.created_at), "p", {
-                                          locale: ar,
-                                        })}
+                                        {msg.client_status === "failed"
+                                          ? (
+                                            <button
+                                              type="button"
+                                              onClick={() =>
+                                                retryOutboxMessage(msg.id)}
+                                              className="text-red-500"
+                                            >
+                                              لم تُرسل - إعادة المحاولة
+                                            </button>
+                                          )
+                                          : msg.client_status === "pending"
+                                          ? "جارٍ الإرسال..."
+                                          : format(new Date(msg.created_at), "p", {
+                                            locale: ar,
+                                          })}
                                       </span>
                                     </>
                                   )}
@@ -4269,18 +4302,14 @@ export const RequestDetail: React.FC<RequestDetailProps> = (
                           )}
                           <button
                             onClick={handleSendChat}
-                            disabled={!chatMessage.trim() || isSendingMessage ||
-                              !currentConversation}
+                            disabled={!chatMessage.trim() || !currentConversation}
                             className={`w-10 h-10 rounded-full flex items-center justify-center transition-all ${
-                              chatMessage.trim() && !isSendingMessage &&
-                                currentConversation
+                              chatMessage.trim() && currentConversation
                                 ? "bg-primary text-primary-foreground shadow-md hover:bg-primary/90"
                                 : "bg-muted text-muted-foreground"
                             }`}
                           >
-                            {isSendingMessage
-                              ? <Loader2 size={18} className="animate-spin" />
-                              : <Send size={18} className="-rotate-90" />}
+                            <Send size={18} className="-rotate-90" />
                           </button>
                         </div>
                       </div>
@@ -13,6 +13,7 @@ import {
   DollarSign,
 } from "lucide-react";
 import { motion } from "framer-motion";
+import { ResponsiveImage } from "./ui/ResponsiveImage";
 
 interface ServiceCardProps {
   req: Request;
@@ -123,8 +124,9 @@ export const ServiceCard: React.FC<ServiceCardProps> = ({
           layoutId={`image-${req.id}`}
           className="h-40 w-full bg-secondary overflow-hidden relative"
         >
-          <motion.img
+          <ResponsiveImage
             src={req.images[0]}
+            variants={req.imageVariants?.[req.images[0]]}
             alt={req.title}
             className="w-full h-full object-cover"
             whileHover={{ scale: 1.1 }}
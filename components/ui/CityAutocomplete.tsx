@@ -13,6 +13,7 @@ import {
   CityResult, 
   getCurrentLocation,
   reverseGeocode,
+  isSearchCancelled,
 } from '../../services/placesService';
 import { useGoogleMapsLoader } from '../../hooks/useGoogleMapsLoader';
 
@@ -81,6 +82,8 @@ export const CityAutocomplete: React.FC<CityAutocompleteProps> = ({
   const containerRef = useRef<HTMLDivElement>(null);
   const dropdownRef = useRef<HTMLDivElement>(null);
   const debounceRef = useRef<NodeJS.Timeout | null>(null);
+  // البحث الجاري - يُلغى عند كتابة نص جديد
+  const searchAbortRef = useRef<AbortController | null>(null);
 
   // حساب موقع القائمة المنسدلة
   const updateDropdownPosition = useCallback(() => {
@@ -160,36 +163,43 @@ export const CityAutocomplete: React.FC<CityAutocompleteProps> = ({
 
   // البحث مع debounce
   const handleSearch = useCallback(async (query: string) => {
+    searchAbortRef.current?.abort();
+    searchAbortRef.current = null;
+
     if (!query || query.trim().length < 1) {
       // إذا لم يكتب المستخدم شيء، نعرض قائمة فارغة
       setResults([]);
+      setIsLoading(false);
       return;
     }
 
+    const controller = new AbortController();
+    searchAbortRef.current = controller;
     setIsLoading(true);
     try {
-      // انتظار تحميل Google Places API - دائماً نتحقق قبل البحث
-      // حتى لو كان isGoogleReady = true، قد لا يكون Places API جاهزاً بعد
-      const { waitForGooglePlaces } = await import('../../services/placesService');
-      const isPlacesReady = await waitForGooglePlaces();
-      
-      if (!isPlacesReady) {
-        console.warn('Google Places API not available, search may use fallback');
-      }
-
+      // placesService ينتظر Google Places بنفسه عند الحاجة فقط - بادئات المدن
+      // المعروفة تُجاب محلياً بدون انتظار تحميل الـ API
       // استخدام searchPlaces للبحث العام أو searchCities للمدن فقط
       const searchFn = searchMode === 'places' ? searchPlaces : searchCities;
-      const searchResults = await searchFn(query);
+      const searchResults = await searchFn(query, 'sa', { signal: controller.signal });
       // نعرض نتائج البحث فقط بدون fallback
       setResults(searchResults);
     } catch (error) {
+      // بحث أحدث حلّ محله ويملك حالة التحميل
+      if (isSearchCancelled(error)) return;
       console.error('Search error:', error);
       setResults([]);
     } finally {
-      setIsLoading(false);
+      if (searchAbortRef.current === controller) {
+        searchAbortRef.current = null;
+        setIsLoading(false);
+      }
     }
   }, [searchMode]);
 
+  // إلغاء البحث الجاري عند الـ unmount
+  useEffect(() => () => searchAbortRef.current?.abort(), []);
+
   // جلب الموقع الحالي بـ GPS
   const handleGetCurrentLocation = useCallback(async () => {
     if (isGettingLocation) return;
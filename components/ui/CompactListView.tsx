@@ -17,6 +17,7 @@ import { AVAILABLE_CATEGORIES } from "../../data";
 import { getCategories, getCurrentLocale } from "../../services/categoriesService";
 import { getKnownCategoryColor } from "../../utils/categoryColors";
 import { CategoryIcon } from "./CategoryIcon";
+import { useVirtualList } from "../../hooks/useVirtualList";
 
 interface CompactListViewProps {
   requests: Request[];
@@ -280,6 +281,14 @@ export const CompactListView: React.FC<CompactListViewProps> = ({
     }
   }, [onLoadMore, isLoadingMore, hasMore]);
 
+  // Windowed rendering: التمرير في العنصر الأب، ونركّب فقط الصفوف القريبة من الشاشة
+  const getRequestKey = useCallback((request: Request) => request.id, []);
+  const listWindow = useVirtualList({
+    items: requests,
+    getKey: getRequestKey,
+    estimateItemHeight: 132,
+  });
+
   // Empty state
   if (requests.length === 0) {
     return null;
@@ -291,14 +300,26 @@ export const CompactListView: React.FC<CompactListViewProps> = ({
       className="relative w-full"
     >
       {/* List Content - بدون سكرول داخلي */}
-      <div className="px-4 pt-4 pb-[1px] relative z-[1] w-full">
-        {requests.map((request, index) => {
+      <div
+        ref={listWindow.listRef}
+        className="px-4 pt-4 pb-[1px] relative z-[1] w-full"
+      >
+        {listWindow.topSpacer > 0 && (
+          <div aria-hidden style={{ height: listWindow.topSpacer }} />
+        )}
+        {listWindow.visibleItems.map((request, visibleIndex) => {
+          const index = listWindow.startIndex + visibleIndex;
           const isViewed = isLoadingViewedRequests ||
             viewedRequestIds.has(request.id);
           const isUnread = !isLoadingViewedRequests &&
             !viewedRequestIds.has(request.id);
           return (
-            <div key={request.id} className="relative w-full">
+            <div
+              key={request.id}
+              ref={listWindow.measureItem(request.id)}
+              data-request-id={request.id}
+              className="relative w-full flow-root"
+            >
               {/* نقطة غير مقروء - خارج الكرت على اليمين - فقط للجوالات */}
               {isUnread && (
                 <motion.div
@@ -324,6 +345,9 @@ export const CompactListView: React.FC<CompactListViewProps> = ({
             </div>
           );
         })}
+        {listWindow.bottomSpacer > 0 && (
+          <div aria-hidden style={{ height: listWindow.bottomSpacer }} />
+        )}
       </div>
 
       {/* Load More */}
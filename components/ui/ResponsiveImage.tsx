@@ -0,0 +1,60 @@
+import React, { useState } from 'react';
+import { HTMLMotionProps, motion } from 'framer-motion';
+import { ImageVariants } from '../../types';
+import { blurhashToDataURL } from '../../utils/blurhash';
+
+interface ResponsiveImageProps extends Omit<HTMLMotionProps<'img'>, 'src' | 'srcSet'> {
+  src: string;
+  /** Thumbnails + blurhash from requests.image_variants (optional - old requests have none) */
+  variants?: ImageVariants;
+  /** Rendered width hint for the browser's srcset choice */
+  sizes?: string;
+}
+
+// Marketplace grid: 1 column on phones, 2 on tablets, 3 on desktop
+const DEFAULT_SIZES = '(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw';
+
+/**
+ * صورة بـ srcset (النسخ المصغرة) + تحميل كسول + blurhash كخلفية حتى تصل الصورة
+ * بدون variants تتصرف كـ <img> عادي مع loading="lazy"
+ */
+export const ResponsiveImage: React.FC<ResponsiveImageProps> = ({
+  src,
+  variants,
+  sizes = DEFAULT_SIZES,
+  loading = 'lazy',
+  style,
+  onLoad,
+  ...rest
+}) => {
+  const [loaded, setLoaded] = useState(false);
+
+  const candidates = variants?.srcset?.length
+    ? [
+      ...variants.srcset.map((v) => `${v.url} ${v.width}w`),
+      // The full image is the largest candidate (width is known when variants exist)
+      ...(variants.width ? [`${src} ${variants.width}w`] : []),
+    ]
+    : [];
+  const placeholder = loaded ? null : blurhashToDataURL(variants?.blurhash);
+
+  return (
+    <motion.img
+      src={src}
+      srcSet={candidates.length > 0 ? candidates.join(', ') : undefined}
+      sizes={candidates.length > 0 ? sizes : undefined}
+      loading={loading}
+      decoding="async"
+      width={variants?.width}
+      height={variants?.height}
+      style={placeholder
+        ? { ...style, backgroundImage: `url(${placeholder})`, backgroundSize: 'cover' }
+        : style}
+      onLoad={(e) => {
+        setLoaded(true);
+        onLoad?.(e);
+      }}
+      {...rest}
+    />
+  );
+};
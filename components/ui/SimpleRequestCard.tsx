@@ -18,6 +18,7 @@ import { formatTimeAgo } from "../../utils/timeFormat";
 import { AVAILABLE_CATEGORIES } from "../../data";
 import { getKnownCategoryColor } from "../../utils/categoryColors";
 import { CategoryIcon } from "./CategoryIcon";
+import { ResponsiveImage } from "./ResponsiveImage";
 
 interface SimpleRequestCardProps {
   request: Request;
@@ -231,8 +232,9 @@ export const SimpleRequestCard: React.FC<SimpleRequestCardProps> = ({
       <div className="relative h-32 w-full bg-gradient-to-br from-secondary to-muted/50 overflow-hidden">
         {request.images && request.images.length > 0 ? (
           <>
-            <img
+            <ResponsiveImage
               src={request.images[0]}
+              variants={request.imageVariants?.[request.images[0]]}
               alt=""
               className="w-full h-full object-cover"
             />
@@ -0,0 +1,315 @@
+import { useCallback, useEffect, useLayoutEffect, useMemo, useRef, useState } from 'react';
+
+/**
+ * Windowed rendering for long lists and CSS grids
+ * يركّب فقط العناصر الظاهرة في منطقة التمرير (+ هامش overscan) ويعوّض الباقي بفراغات علوية/سفلية
+ *
+ * - لا يحتاج ارتفاعاً ثابتاً: ارتفاع كل عنصر يُقاس بـ ResizeObserver ويُحفظ حسب المفتاح،
+ *   فإعادة تركيب نفس العنصر (أو تغيير الفلتر) تستعمل الارتفاع المقاس بدل التقدير
+ * - يعمل مع grid: عدد الأعمدة والـ row-gap يُقرأ من getComputedStyle للقائمة نفسها،
+ *   وارتفاع الصف = أطول عنصر فيه
+ * - عنصر التمرير هو أقرب أب قابل للتمرير (مثل #marketplace-container)
+ *
+ * Spacers are rendered as elements spanning the whole row (gridColumn 1 / -1),
+ * so the list keeps its normal flow and existing layout classes.
+ */
+
+export interface UseVirtualListOptions<T> {
+  items: T[];
+  getKey: (item: T) => string;
+  /** Initial guess for an unmeasured item (px) */
+  estimateItemHeight: number;
+  /** Extra pixels mounted above and below the viewport */
+  overscanPx?: number;
+  /** Lists shorter than this render normally (keeps entry animations for small lists) */
+  minItems?: number;
+  enabled?: boolean;
+}
+
+export interface VirtualListResult<T> {
+  /** Attach to the list element (the grid / flex container that holds the items) */
+  listRef: (el: HTMLElement | null) => void;
+  isVirtual: boolean;
+  startIndex: number;
+  visibleItems: T[];
+  /** Heights for the spacer elements (already corrected for row-gap) */
+  topSpacer: number;
+  bottomSpacer: number;
+  /** Attach to each rendered item so its height is measured */
+  measureItem: (key: string) => (el: HTMLElement | null) => void;
+}
+
+interface ViewportState {
+  scrollTop: number;
+  viewportHeight: number;
+  listTop: number;
+  columns: number;
+  rowGap: number;
+}
+
+const findScrollParent = (el: HTMLElement): HTMLElement | null => {
+  let node = el.parentElement;
+  while (node) {
+    const overflowY = getComputedStyle(node).overflowY;
+    if (overflowY === 'auto' || overflowY === 'scroll') return node;
+    node = node.parentElement;
+  }
+  return null;
+};
+
+const readGridLayout = (el: HTMLElement): { columns: number; rowGap: number } => {
+  const style = getComputedStyle(el);
+  const template = style.gridTemplateColumns;
+  const columns = style.display.includes('grid') && template && template !== 'none'
+    ? template.split(' ').filter(Boolean).length
+    : 1;
+  const rowGap = parseFloat(style.rowGap) || 0;
+  return { columns: Math.max(1, columns), rowGap };
+};
+
+export function useVirtualList<T>({
+  items,
+  getKey,
+  estimateItemHeight,
+  overscanPx = 800,
+  minItems = 30,
+  enabled = true,
+}: UseVirtualListOptions<T>): VirtualListResult<T> {
+  const isVirtual = enabled && items.length >= minItems;
+
+  const [listEl, setListEl] = useState<HTMLElement | null>(null);
+  const scrollElRef = useRef<HTMLElement | null>(null);
+  const [viewport, setViewport] = useState<ViewportState>({
+    scrollTop: 0,
+    viewportHeight: typeof window !== 'undefined' ? window.innerHeight : 800,
+    listTop: 0,
+    columns: 1,
+    rowGap: 0,
+  });
+
+  // Measured heights survive unmount/remount and filter changes (keyed by item key)
+  const heightsRef = useRef<Map<string, number>>(new Map());
+  const [measureVersion, setMeasureVersion] = useState(0);
+  const pendingMeasureRef = useRef<number | null>(null);
+
+  const listRef = useCallback((el: HTMLElement | null) => {
+    setListEl(el);
+  }, []);
+
+  // ==========================================
+  // Viewport tracking (rAF-throttled)
+  // ==========================================
+  const frameRef = useRef<number | null>(null);
+
+  const readViewport = useCallback(() => {
+    frameRef.current = null;
+    const scrollEl = scrollElRef.current;
+    if (!listEl || !scrollEl) return;
+
+    const listRect = listEl.getBoundingClientRect();
+    const scrollRect = scrollEl.getBoundingClientRect();
+    const { columns, rowGap } = readGridLayout(listEl);
+    const next: ViewportState = {
+      scrollTop: scrollEl.scrollTop,
+      viewportHeight: scrollEl.clientHeight,
+      listTop: listRect.top - scrollRect.top + scrollEl.scrollTop,
+      columns,
+      rowGap,
+    };
+
+    setViewport((prev) =>
+      prev.scrollTop === next.scrollTop &&
+      prev.viewportHeight === next.viewportHeight &&
+      Math.abs(prev.listTop - next.listTop) < 1 &&
+      prev.columns === next.columns &&
+      prev.rowGap === next.rowGap
+        ? prev
+        : next
+    );
+  }, [listEl]);
+
+  const scheduleRead = useCallback(() => {
+    if (frameRef.current !== null) return;
+    frameRef.current = requestAnimationFrame(readViewport);
+  }, [readViewport]);
+
+  useLayoutEffect(() => {
+    if (!isVirtual || !listEl) return;
+
+    const scrollEl = findScrollParent(listEl);
+    scrollElRef.current = scrollEl;
+    if (!scrollEl) return;
+
+    readViewport();
+    scrollEl.addEventListener('scroll', scheduleRead, { passive: true });
+    window.addEventListener('resize', scheduleRead);
+
+    const resizeObserver = typeof ResizeObserver !== 'undefined'
+      ? new ResizeObserver(scheduleRead)
+      : null;
+    resizeObserver?.observe(scrollEl);
+
+    return () => {
+      scrollEl.removeEventListener('scroll', scheduleRead);
+      window.removeEventListener('resize', scheduleRead);
+      resizeObserver?.disconnect();
+      if (frameRef.current !== null) {
+        cancelAnimationFrame(frameRef.current);
+        frameRef.current = null;
+      }
+    };
+  }, [isVirtual, listEl, readViewport, scheduleRead]);
+
+  // ==========================================
+  // Item measurement
+  // ==========================================
+  const elementKeysRef = useRef<WeakMap<Element, string>>(new WeakMap());
+  const itemObserverRef = useRef<ResizeObserver | null>(null);
+
+  const flushMeasurements = useCallback(() => {
+    if (pendingMeasureRef.current !== null) return;
+    pendingMeasureRef.current = requestAnimationFrame(() => {
+      pendingMeasureRef.current = null;
+      setMeasureVersion((v) => v + 1);
+    });
+  }, []);
+
+  const recordHeight = useCallback((el: Element) => {
+    const key = elementKeysRef.current.get(el);
+    if (!key) return;
+    const height = (el as HTMLElement).offsetHeight;
+    if (!height) return; // detached / display:none
+    const prev = heightsRef.current.get(key);
+    if (prev === undefined || Math.abs(prev - height) >= 1) {
+      heightsRef.current.set(key, height);
+      flushMeasurements();
+    }
+  }, [flushMeasurements]);
+
+  useEffect(() => {
+    if (typeof ResizeObserver === 'undefined') return;
+    const observer = new ResizeObserver((entries) => {
+      entries.forEach((entry) => recordHeight(entry.target));
+    });
+    itemObserverRef.current = observer;
+    return () => {
+      observer.disconnect();
+      itemObserverRef.current = null;
+      if (pendingMeasureRef.current !== null) {
+        cancelAnimationFrame(pendingMeasureRef.current);
+        pendingMeasureRef.current = null;
+      }
+    };
+  }, [recordHeight]);
+
+  // Stable ref callbacks per key so React doesn't detach/re-attach on every render
+  const measureCallbacksRef = useRef<Map<string, (el: HTMLElement | null) => void>>(new Map());
+  const mountedElementsRef = useRef<Map<string, HTMLElement>>(new Map());
+
+  const measureItem = useCallback((key: string) => {
+    let callback = measureCallbacksRef.current.get(key);
+    if (!callback) {
+      callback = (el: HTMLElement | null) => {
+        const observer = itemObserverRef.current;
+        const previous = mountedElementsRef.current.get(key);
+        if (previous && previous !== el) {
+          observer?.unobserve(previous);
+          mountedElementsRef.current.delete(key);
+        }
+        if (el) {
+          elementKeysRef.current.set(el, key);
+          mountedElementsRef.current.set(key, el);
+          observer?.observe(el);
+          recordHeight(el);
+        }
+      };
+      measureCallbacksRef.current.set(key, callback);
+    }
+    return callback;
+  }, [recordHeight]);
+
+  // Drop callbacks for keys that left the list (heights are kept for recycling)
+  useEffect(() => {
+    if (measureCallbacksRef.current.size <= items.length * 2) return;
+    const live = new Set(items.map(getKey));
+    measureCallbacksRef.current.forEach((_, key) => {
+      if (!live.has(key)) measureCallbacksRef.current.delete(key);
+    });
+  }, [items, getKey]);
+
+  // ==========================================
+  // Row offsets + visible range
+  // ==========================================
+  const { columns, rowGap } = viewport;
+
+  const rowOffsets = useMemo(() => {
+    if (!isVirtual) return null;
+    const rowCount = Math.ceil(items.length / columns);
+    // offsets[r] = top of row r, offsets[rowCount] = total height (+ trailing gap)
+    const offsets = new Float64Array(rowCount + 1);
+    for (let row = 0; row < rowCount; row++) {
+      let rowHeight = 0;
+      const end = Math.min(items.length, (row + 1) * columns);
+      for (let i = row * columns; i < end; i++) {
+        const h = heightsRef.current.get(getKey(items[i])) ?? estimateItemHeight;
+        if (h > rowHeight) rowHeight = h;
+      }
+      offsets[row + 1] = offsets[row] + rowHeight + rowGap;
+    }
+    return offsets;
+    // measureVersion: heightsRef is mutated in place
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [isVirtual, items, getKey, columns, rowGap, estimateItemHeight, measureVersion]);
+
+  return useMemo(() => {
+    if (!isVirtual || !rowOffsets) {
+      return {
+        listRef,
+        isVirtual: false,
+        startIndex: 0,
+        visibleItems: items,
+        topSpacer: 0,
+        bottomSpacer: 0,
+        measureItem,
+      };
+    }
+
+    const rowCount = rowOffsets.length - 1;
+    const windowTop = viewport.scrollTop - viewport.listTop - overscanPx;
+    const windowBottom = viewport.scrollTop - viewport.listTop + viewport.viewportHeight + overscanPx;
+
+    // Binary search: first row whose bottom edge is below windowTop
+    let lo = 0;
+    let hi = rowCount - 1;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (rowOffsets[mid + 1] <= windowTop) lo = mid + 1;
+      else hi = mid;
+    }
+    const firstRow = Math.max(0, lo);
+
+    let lastRow = firstRow;
+    while (lastRow < rowCount - 1 && rowOffsets[lastRow + 1] < windowBottom) {
+      lastRow++;
+    }
+
+    const startIndex = firstRow * columns;
+    const endIndex = Math.min(items.length, (lastRow + 1) * columns);
+
+    // The spacer itself occupies a grid row, so the gap after (top) / before (bottom) it is subtracted
+    const topSpacer = firstRow > 0 ? Math.max(0, rowOffsets[firstRow] - rowGap) : 0;
+    const bottomSpacer = lastRow < rowCount - 1
+      ? Math.max(0, rowOffsets[rowCount] - rowOffsets[lastRow + 1] - rowGap)
+      : 0;
+
+    return {
+      listRef,
+      isVirtual: true,
+      startIndex,
+      visibleItems: items.slice(startIndex, endIndex),
+      topSpacer,
+      bottomSpacer,
+      measureItem,
+    };
+  }, [isVirtual, rowOffsets, viewport, overscanPx, columns, rowGap, items, listRef, measureItem]);
+}
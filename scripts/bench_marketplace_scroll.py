@@ -0,0 +1,318 @@
+"""
+Marketplace scroll / frame-time benchmark
+قياس أداء التمرير في السوق عند تحميل 100 / 1,000 / 10,000 طلب
+
+Serves N synthetic requests (from seed_marketplace.generate) to the running dev
+server by intercepting the PostgREST calls, opens the app in guest mode, keeps
+scrolling #marketplace-container until N cards are loaded through the normal
+infinite-scroll path, then runs a fixed-speed scroll pass and reports:
+
+  - frame times sampled with requestAnimationFrame (p50/p95/p99, dropped frames)
+  - long tasks (>50 ms) from Chromium's longtask PerformanceObserver
+  - JS heap, DOM node count and layout count from CDP Performance.getMetrics
+
+Usage (dev server on :3005, `npm run dev`):
+  pip install playwright && playwright install chromium
+  python scripts/bench_marketplace_scroll.py --sizes 100,1000,10000
+  python scripts/bench_marketplace_scroll.py --sizes 1000 --view list --json bench_output.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from seed_marketplace import SeedConfig, generate, load_categories, load_cities  # noqa: E402
+
+FRAME_BUDGET_MS = 1000 / 60
+
+# Installed before any app script runs
+INIT_SCRIPT = """
+(() => {
+  localStorage.setItem("abeely_guest_mode", "true");
+  window.__bench = { frames: [], longTasks: [], sampling: false, last: 0 };
+  const tick = (t) => {
+    const b = window.__bench;
+    if (b.sampling && b.last) b.frames.push(t - b.last);
+    b.last = t;
+    requestAnimationFrame(tick);
+  };
+  requestAnimationFrame(tick);
+  try {
+    new PerformanceObserver((list) => {
+      for (const entry of list.getEntries()) {
+        if (window.__bench.sampling) window.__bench.longTasks.push(entry.duration);
+      }
+    }).observe({ type: "longtask", buffered: false });
+  } catch (_) {}
+})();
+"""
+
+# Scrolls the container top -> bottom at a constant speed, driven by rAF
+SCROLL_PASS_SCRIPT = """
+async ({ pxPerSecond, maxMs }) => {
+  const el = document.getElementById("marketplace-container");
+  if (!el) return { error: "marketplace-container not found" };
+  el.scrollTop = 0;
+  await new Promise((r) => requestAnimationFrame(() => requestAnimationFrame(r)));
+  const b = window.__bench;
+  b.frames = []; b.longTasks = []; b.last = 0; b.sampling = true;
+  const start = performance.now();
+  await new Promise((resolve) => {
+    const step = (t) => {
+      const elapsed = t - start;
+      el.scrollTop = (elapsed / 1000) * pxPerSecond;
+      const atEnd = el.scrollTop + el.clientHeight >= el.scrollHeight - 2;
+      if (atEnd || elapsed > maxMs) return resolve();
+      requestAnimationFrame(step);
+    };
+    requestAnimationFrame(step);
+  });
+  b.sampling = false;
+  return {
+    frames: b.frames.slice(),
+    longTasks: b.longTasks.slice(),
+    durationMs: performance.now() - start,
+    scrollHeight: el.scrollHeight,
+  };
+}
+"""
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def build_rows(size: int, seed: int) -> List[Dict[str, Any]]:
+    """PostgREST-shaped rows for fetchRequestsPaginated (requests + embedded categories)."""
+    categories = load_categories()
+    cities = load_cities()
+    labels = {c.id: c.label for c in categories}
+    data = generate(
+        SeedConfig(seed=seed, users=max(50, size // 20), requests=size,
+                   offers_per_request=0, conversation_rate=0),
+        categories,
+        cities,
+    )
+    links = {link["request_id"]: link["category_id"] for link in data.request_categories}
+    rows = []
+    for row in sorted(data.requests, key=lambda r: r["created_at"], reverse=True):
+        category_id = links[row["id"]]
+        rows.append({
+            **row,
+            # Every seeded request is served as an active public one
+            "status": "active",
+            "is_public": True,
+            "request_categories": [{
+                "category_id": category_id,
+                "categories": {"id": category_id, "label": labels[category_id]},
+            }],
+        })
+    return rows
+
+
+async def install_mock_backend(context: Any, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    stats = {"pages_served": 0, "rows_served": 0}
+
+    async def handle_rest(route: Any) -> None:
+        request = route.request
+        url = urlparse(request.url)
+        params = parse_qs(url.query)
+        table = url.path.rsplit("/", 1)[-1]
+        body: Any = []
+        headers = {"Content-Type": "application/json", "Access-Control-Allow-Origin": "*"}
+
+        if request.method == "OPTIONS":
+            await route.fulfill(status=204, headers={
+                **headers,
+                "Access-Control-Allow-Headers": "*",
+                "Access-Control-Allow-Methods": "*",
+            })
+            return
+
+        if table == "requests" and request.method in ("GET", "HEAD"):
+            id_filter = params.get("id", [""])[0]
+            if id_filter.startswith("eq."):
+                body = [r for r in rows if r["id"] == id_filter[3:]]
+            else:
+                offset = int(params.get("offset", ["0"])[0])
+                limit = int(params.get("limit", [str(len(rows))])[0])
+                body = rows[offset:offset + limit]
+                stats["pages_served"] += 1
+                stats["rows_served"] += len(body)
+            headers["Content-Range"] = f"0-{max(0, len(body) - 1)}/{len(rows)}"
+            # .single() asks for an object instead of an array
+            if "vnd.pgrst.object" in (request.headers.get("accept") or "") and body:
+                body = body[0]
+
+        await route.fulfill(status=200, headers=headers, body=json.dumps(body, ensure_ascii=False))
+
+    await context.route("**/rest/v1/**", handle_rest)
+    return stats
+
+
+async def load_items(page: Any, target: int, served: Dict[str, int], timeout_s: float) -> int:
+    """Scroll to the bottom until `target` rows went through infinite scroll (or loading stalls).
+
+    Progress is read from the mock backend rather than the DOM so the count
+    stays meaningful when the list only mounts visible rows.
+    """
+    deadline = time.monotonic() + timeout_s
+    loaded = 0
+    stalled_since = time.monotonic()
+    while time.monotonic() < deadline:
+        await page.evaluate(
+            """() => {
+              const el = document.getElementById("marketplace-container");
+              if (el) el.scrollTop = el.scrollHeight;
+            }"""
+        )
+        count = served["rows_served"]
+        if count >= target:
+            return count
+        if count > loaded:
+            loaded, stalled_since = count, time.monotonic()
+        elif time.monotonic() - stalled_since > 15:
+            break
+        await page.wait_for_timeout(50)
+    return loaded
+
+
+async def cdp_metrics(cdp: Any) -> Dict[str, float]:
+    result = await cdp.send("Performance.getMetrics")
+    return {m["name"]: m["value"] for m in result.get("metrics", [])}
+
+
+async def run_scenario(browser: Any, args: argparse.Namespace, size: int) -> Dict[str, Any]:
+    rows = build_rows(size, args.seed)
+    # Marketplace picks its display mode from the width: grid from 768px, list below
+    viewport = {"width": args.width, "height": args.height} if args.view == "grid" \
+        else {"width": 390, "height": 844}
+    context = await browser.new_context(viewport=viewport)
+    await context.add_init_script(INIT_SCRIPT)
+    served = await install_mock_backend(context, rows)
+    page = await context.new_page()
+    cdp = await context.new_cdp_session(page)
+    await cdp.send("Performance.enable")
+
+    try:
+        await page.goto(args.url, wait_until="domcontentloaded", timeout=60000)
+        await page.wait_for_selector("#marketplace-container [data-request-id]", timeout=60000)
+
+        load_started = time.perf_counter()
+        loaded = await load_items(page, size, served, args.load_timeout)
+        load_seconds = time.perf_counter() - load_started
+        await page.wait_for_timeout(500)
+        mounted = await page.evaluate("document.querySelectorAll('[data-request-id]').length")
+        before = await cdp_metrics(cdp)
+
+        result = await page.evaluate(
+            SCROLL_PASS_SCRIPT, {"pxPerSecond": args.scroll_speed, "maxMs": args.max_pass_ms}
+        )
+        after = await cdp_metrics(cdp)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+        frames: List[float] = result["frames"]
+        long_tasks: List[float] = result["longTasks"]
+        dropped = sum(max(0, round(f / FRAME_BUDGET_MS) - 1) for f in frames)
+        return {
+            "size": size,
+            "view": args.view,
+            "loaded_items": loaded,
+            "mounted_cards": mounted,
+            "pages_served": served["pages_served"],
+            "load_seconds": round(load_seconds, 2),
+            "frames": len(frames),
+            "frame_p50_ms": round(_percentile(frames, 50), 2),
+            "frame_p95_ms": round(_percentile(frames, 95), 2),
+            "frame_p99_ms": round(_percentile(frames, 99), 2),
+            "frame_mean_ms": round(statistics.fmean(frames), 2) if frames else 0,
+            "dropped_frames": dropped,
+            "dropped_pct": round(100 * dropped / max(1, dropped + len(frames)), 1),
+            "long_tasks": len(long_tasks),
+            "long_task_total_ms": round(sum(long_tasks), 1),
+            "long_task_max_ms": round(max(long_tasks), 1) if long_tasks else 0,
+            "js_heap_mb": round(after.get("JSHeapUsedSize", 0) / 1_048_576, 1),
+            "dom_nodes": int(after.get("Nodes", 0)),
+            "layouts_during_pass": int(after.get("LayoutCount", 0) - before.get("LayoutCount", 0)),
+            "scroll_height_px": result["scrollHeight"],
+        }
+    finally:
+        await context.close()
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    columns = [
+        ("size", "items"), ("loaded_items", "loaded"), ("mounted_cards", "mounted"), ("frame_p50_ms", "p50 ms"),
+        ("frame_p95_ms", "p95 ms"), ("frame_p99_ms", "p99 ms"), ("dropped_pct", "dropped %"),
+        ("long_tasks", "long tasks"), ("long_task_total_ms", "long ms"),
+        ("js_heap_mb", "heap MB"), ("dom_nodes", "DOM nodes"), ("load_seconds", "load s"),
+    ]
+    widths = [max(len(title), *(len(str(r[key])) for r in results)) for key, title in columns]
+    print("\n📊 Marketplace scroll benchmark")
+    print("  ".join(title.rjust(w) for (_, title), w in zip(columns, widths)))
+    for r in results:
+        print("  ".join(str(r[key]).rjust(w) for (key, _), w in zip(columns, widths)))
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError:
+        print("playwright is required: pip install playwright && playwright install chromium")
+        return 2
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = []
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(
+            headless=not args.headed,
+            args=["--disable-dev-shm-usage", "--enable-precise-memory-info"],
+        )
+        try:
+            for size in sizes:
+                print(f"▶ {size:,} items ({args.view})...")
+                results.append(await run_scenario(browser, args, size))
+        finally:
+            await browser.close()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved {args.json}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Marketplace scroll and frame-time benchmark")
+    parser.add_argument("--url", default="http://localhost:3005")
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--view", choices=["grid", "list"], default="grid")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--width", type=int, default=1280, help="grid view viewport width")
+    parser.add_argument("--height", type=int, default=720, help="grid view viewport height")
+    parser.add_argument("--scroll-speed", type=int, default=3000, help="px per second in the measured pass")
+    parser.add_argument("--max-pass-ms", type=int, default=60000)
+    parser.add_argument("--load-timeout", type=float, default=900, help="seconds to reach each size")
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--json", help="write raw results to this file")
+    return asyncio.run(main_async(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
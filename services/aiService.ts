@@ -392,6 +392,115 @@ ${audioBlob ? `
   }
 }
 
+// ==========================================
+// Streaming draft (SSE من ai-chat)
+// ==========================================
+// generateDraftWithCta ينتظر JSON كاملاً (حتى 30 ثانية) قبل أن يظهر أي شيء.
+// هنا نطلب stream: true فيصل نص الرد (aiResponse) جزءاً جزءاً عبر onDelta
+// خلال مئات الملي ثانية، والحقول المنظمة (title, categories) في حدث draft أخير.
+
+type DraftResult = AIDraft & { isClarification?: boolean; aiResponse: string };
+
+export type DraftStreamHandlers = {
+  /** Next piece of the assistant's reply text, in order */
+  onDelta?: (text: string) => void;
+};
+
+// Until the response headers arrive, and between two stream events
+const STREAM_CONNECT_TIMEOUT_MS = 15000;
+const STREAM_IDLE_TIMEOUT_MS = 30000;
+
+async function readDraftStream(
+  body: ReadableStream<Uint8Array>,
+  handlers: DraftStreamHandlers,
+): Promise<DraftResult> {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  try {
+    for (;;) {
+      let timer: ReturnType<typeof setTimeout> | undefined;
+      const idle = new Promise<never>((_, reject) => {
+        timer = setTimeout(
+          () => reject(new Error(`Stream idle for ${STREAM_IDLE_TIMEOUT_MS}ms`)),
+          STREAM_IDLE_TIMEOUT_MS
+        );
+      });
+      const { value, done } = await Promise.race([reader.read(), idle]).finally(
+        () => clearTimeout(timer)
+      );
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true }).replace(/\r\n/g, "\n");
+      let boundary: number;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let event = "message";
+        let data = "";
+        for (const line of block.split("\n")) {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) data += line.slice(5).trim();
+        }
+        if (!data) continue;
+
+        const payload = JSON.parse(data);
+        if (event === "delta" && payload.text) {
+          handlers.onDelta?.(payload.text);
+        } else if (event === "draft") {
+          return payload;
+        } else if (event === "error") {
+          throw new Error(payload.error || "ai-chat stream error");
+        }
+      }
+    }
+  } finally {
+    reader.cancel().catch(() => {});
+  }
+
+  throw new Error("ai-chat stream ended without a draft");
+}
+
+/**
+ * Same result as generateDraftWithCta, with the reply text streamed to
+ * handlers.onDelta while the draft is generated. Falls back to the
+ * non-streaming path (and its direct-API fallback) if streaming fails.
+ */
+export async function streamDraftWithCta(
+  text: string,
+  handlers: DraftStreamHandlers = {},
+  chatHistory?: ChatHistoryMessage[],
+): Promise<DraftResult> {
+  try {
+    logger.log("🔄 Calling Supabase Edge Function 'ai-chat' (draft stream)...");
+    const { data, error } = await invokeWithTimeout(
+      () => supabase.functions.invoke("ai-chat", {
+        body: {
+          prompt: text,
+          mode: "draft",
+          chatHistory: chatHistory || [],
+          stream: true,
+        },
+      }),
+      STREAM_CONNECT_TIMEOUT_MS
+    );
+    if (error) throw error;
+
+    // functions-js hands text/event-stream back as the raw Response
+    if (data instanceof Response && data.body) {
+      return await readDraftStream(data.body, handlers);
+    }
+    // A deployment without streaming answers with the plain JSON draft
+    if (data) return data as DraftResult;
+    throw new Error("Empty ai-chat response");
+  } catch (err) {
+    logger.warn("⚠️ ai-chat stream failed, falling back to JSON draft:", err);
+    return generateDraftWithCta(text, undefined, undefined, chatHistory);
+  }
+}
+
 // Alias for backward compatibility
 export const classifyAndDraft = generateDraftWithCta;
 
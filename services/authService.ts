@@ -1,5 +1,6 @@
 import { supabase } from "./supabaseClient";
 import { logger } from "../utils/logger";
+import { primeProfiles } from "./profileCacheService";
 
 // ======================================
 // 🔧 Test Phones - أرقام الاختبار (Development Only)
@@ -440,6 +441,7 @@ export async function updateProfile(
     }
 
     logger.log("✅ Profile updated:", data);
+    primeProfiles([data]);
     return { success: true, data: data as UserProfile };
   } catch (err: unknown) {
     const error = err as Error;
@@ -2,6 +2,12 @@ import { supabase } from './supabaseClient';
 import { Category, SupportedLocale, getCategoryLabel } from '../types';
 import { AVAILABLE_CATEGORIES } from '../data';
 import { logger } from '../utils/logger';
+import { subscribeToTable } from './realtimeService';
+import { capacitorStorage } from './capacitorStorage';
+import {
+  buildCategoryIndex,
+  CategoryIndex,
+} from '../supabase/functions/_shared/categoryIndex';
 
 /**
  * خدمة إدارة التصنيفات
@@ -34,12 +40,221 @@ export interface PendingCategory {
 }
 
 // Cache للتصنيفات
+// - في الذاكرة لمدة CACHE_DURATION
+// - نسخة محفوظة في capacitorStorage مع version (أكبر updated_at من السيرفر):
+//   تُعرض فوراً عند التشغيل بلا طلب شبكة، ثم تُحدَّث في الخلفية بالفروقات فقط
+//   عبر get_categories_delta (CATEGORIES_SYNC.sql)
 let categoriesCache: Category[] | null = null;
 let cacheTimestamp: number = 0;
 const CACHE_DURATION = 5 * 60 * 1000; // 5 دقائق
 
+const STORAGE_KEY = 'categories_cache_v1';
+
+interface CategoryRow extends Category {
+  sort_order: number;
+}
+
+interface PersistedCategories {
+  version: string | null;
+  rows: CategoryRow[];
+}
+
+interface CategoriesDelta {
+  version: string | null;
+  full: boolean;
+  changed: (CategoryRow & { is_active: boolean })[];
+  deleted: string[];
+}
+
+// الصفوف المعروفة (مرتبة حسب sort_order) + إصدارها
+let syncedRows: CategoryRow[] | null = null;
+let syncedVersion: string | null = null;
+let hydration: Promise<void> | null = null;
+let inFlightSync: Promise<Category[] | null> | null = null;
+// أحد المنتظرين للمزامنة الجارية يريد إبلاغ المشتركين
+let notifyPending = false;
+const updateListeners = new Set<(categories: Category[]) => void>();
+
+// فهرس البحث يُبنى مرة لكل قائمة تصنيفات (نفس الفهرس المستخدم في ai-chat)
+let categoryIndexCache: { source: Category[]; index: CategoryIndex<Category> } | null = null;
+
+function indexFor(categories: Category[]): CategoryIndex<Category> {
+  if (categoryIndexCache?.source !== categories) {
+    categoryIndexCache = { source: categories, index: buildCategoryIndex(categories) };
+  }
+  return categoryIndexCache.index;
+}
+
+/**
+ * فهرس التصنيفات الحالية (تطابق دقيق لكل لغة + بحث جزئي بالـ trigrams/trie)
+ */
+export async function getCategoryIndex(): Promise<CategoryIndex<Category>> {
+  return indexFor(await getCategories());
+}
+
+const toCategory = (row: any): Category => ({
+  id: row.id,
+  label: row.label,
+  label_en: row.label_en,
+  label_ur: row.label_ur,
+  icon: row.icon,
+  emoji: row.emoji || '📦',
+  description: row.description,
+});
+
+const toRow = (row: any): CategoryRow => ({
+  ...toCategory(row),
+  sort_order: row.sort_order ?? 0,
+});
+
+const byOrder = (a: CategoryRow, b: CategoryRow) =>
+  a.sort_order - b.sort_order || (a.id < b.id ? -1 : a.id > b.id ? 1 : 0);
+
+/**
+ * تثبيت الصفوف كنسخة حالية (ذاكرة + فهرس) وإبلاغ المشتركين
+ */
+function publishRows(rows: CategoryRow[], version: string | null, notify: boolean): Category[] {
+  syncedRows = rows;
+  syncedVersion = version;
+  categoriesCache = rows.map(toCategory);
+  cacheTimestamp = Date.now();
+  if (notify) {
+    const categories = categoriesCache;
+    updateListeners.forEach((listener) => {
+      try {
+        listener(categories);
+      } catch (error) {
+        logger.warn('Categories listener failed:', error);
+      }
+    });
+  }
+  return categoriesCache;
+}
+
+function persistRows(): void {
+  if (!syncedRows) return;
+  const payload: PersistedCategories = { version: syncedVersion, rows: syncedRows };
+  capacitorStorage.setItem(STORAGE_KEY, JSON.stringify(payload)).catch(
+    (error) => logger.warn('Failed to persist categories:', error),
+  );
+}
+
+/**
+ * تحميل النسخة المحفوظة مرة واحدة (بدون شبكة)
+ */
+function ensureHydrated(): Promise<void> {
+  if (!hydration) {
+    hydration = (async () => {
+      try {
+        const raw = await capacitorStorage.getItem(STORAGE_KEY);
+        if (!raw || syncedRows) return;
+        const persisted = JSON.parse(raw) as PersistedCategories;
+        if (!Array.isArray(persisted?.rows) || persisted.rows.length === 0) return;
+        publishRows(persisted.rows, persisted.version ?? null, false);
+        // النسخة المحفوظة تُعرض لكنها تحتاج تأكيداً من السيرفر
+        cacheTimestamp = 0;
+      } catch (error) {
+        logger.warn('Failed to load persisted categories:', error);
+      }
+    })();
+  }
+  return hydration;
+}
+
+/**
+ * تطبيق delta على الصفوف المعروفة
+ */
+function applyDelta(delta: CategoriesDelta): CategoryRow[] {
+  const rows = new Map<string, CategoryRow>();
+  if (!delta.full) {
+    (syncedRows || []).forEach((row) => rows.set(row.id, row));
+  }
+  for (const row of delta.changed || []) {
+    if (row.is_active === false) rows.delete(row.id);
+    else rows.set(row.id, toRow(row));
+  }
+  for (const id of delta.deleted || []) rows.delete(id);
+  return Array.from(rows.values()).sort(byOrder);
+}
+
+/**
+ * جلب التصنيفات كاملة (قبل تطبيق CATEGORIES_SYNC.sql)
+ */
+async function fetchAllRows(): Promise<CategoryRow[] | null> {
+  const { data, error } = await supabase
+    .from('categories')
+    .select('id, label, label_en, label_ur, icon, emoji, description, sort_order')
+    .eq('is_active', true)
+    .order('sort_order');
+
+  if (error) {
+    console.warn('Error fetching categories from backend, using local fallback:', error.message);
+    return null;
+  }
+  return (data || []).map(toRow);
+}
+
+/**
+ * مزامنة مع السيرفر: الفروقات منذ syncedVersion فقط (أو كل الجدول أول مرة).
+ * ترجع null عند الفشل. الطلبات المتزامنة تُدمج في طلب واحد.
+ */
+function syncCategories(notify: boolean): Promise<Category[] | null> {
+  notifyPending = notifyPending || notify;
+  if (inFlightSync) return inFlightSync;
+  inFlightSync = (async () => {
+    try {
+      const since = syncedRows && syncedRows.length > 0 ? syncedVersion : null;
+      const { data, error } = await supabase.rpc('get_categories_delta', {
+        p_since: since,
+      });
+
+      let rows: CategoryRow[] | null;
+      let version: string | null = null;
+      if (error) {
+        // CATEGORIES_SYNC.sql not applied yet - full fetch, no version
+        logger.warn('get_categories_delta failed, fetching all categories:', error.message);
+        rows = await fetchAllRows();
+      } else {
+        const delta = data as CategoriesDelta;
+        rows = applyDelta(delta);
+        version = delta.version ?? syncedVersion;
+        if (!delta.full && (delta.changed?.length || 0) + (delta.deleted?.length || 0) === 0) {
+          // لا تغييرات: نفس الصفوف، فقط تأكيد الصلاحية
+          if (!categoriesCache && syncedRows) {
+            return publishRows(syncedRows, version, false);
+          }
+          cacheTimestamp = Date.now();
+          syncedVersion = version;
+          return categoriesCache;
+        }
+      }
+
+      if (!rows) return null;
+      if (rows.length === 0) {
+        console.warn('No categories found in backend, using local fallback');
+        return null;
+      }
+
+      const categories = publishRows(rows, version, notifyPending);
+      persistRows();
+      return categories;
+    } catch (err) {
+      console.error('Error syncing categories:', err);
+      return null;
+    } finally {
+      inFlightSync = null;
+      notifyPending = false;
+    }
+  })();
+  return inFlightSync;
+}
+
 /**
  * جلب التصنيفات من الباك إند
+ * - cache صالح في الذاكرة: يُرجع مباشرة
+ * - نسخة محفوظة من تشغيل سابق: تُرجع فوراً وتُزامن في الخلفية (المشتركون
+ *   في subscribeToCategoriesUpdates يستلمون النتيجة إن تغيّرت)
+ * - غير ذلك: مزامنة (أو LOCAL_CATEGORIES عند الفشل)
  */
 export async function getCategories(forceRefresh = false): Promise<Category[]> {
   // استخدام الـ cache إذا كان متوفراً وصالحاً
@@ -47,40 +262,22 @@ export async function getCategories(forceRefresh = false): Promise<Category[]> {
     return categoriesCache;
   }
 
-  try {
-    const { data, error } = await supabase
-      .from('categories')
-      .select('id, label, label_en, label_ur, icon, emoji, description')
-      .eq('is_active', true)
-      .order('sort_order');
-
-    if (error) {
-      console.warn('Error fetching categories from backend, using local fallback:', error.message);
-      return LOCAL_CATEGORIES;
-    }
+  await ensureHydrated();
 
-    if (!data || data.length === 0) {
-      console.warn('No categories found in backend, using local fallback');
-      return LOCAL_CATEGORIES;
+  if (!forceRefresh && categoriesCache) {
+    // stale-while-revalidate
+    if (Date.now() - cacheTimestamp >= CACHE_DURATION) {
+      void syncCategories(true);
     }
-
-    // تحديث الـ cache
-    categoriesCache = data.map(cat => ({
-      id: cat.id,
-      label: cat.label,
-      label_en: cat.label_en,
-      label_ur: cat.label_ur,
-      icon: cat.icon,
-      emoji: cat.emoji || '📦',
-      description: cat.description,
-    }));
-    cacheTimestamp = Date.now();
-
     return categoriesCache;
-  } catch (err) {
-    console.error('Error in getCategories:', err);
-    return LOCAL_CATEGORIES;
   }
+
+  return (
+    (await syncCategories(false)) ||
+    categoriesCache ||
+    syncedRows?.map(toCategory) ||
+    LOCAL_CATEGORIES
+  );
 }
 
 /**
@@ -103,15 +300,7 @@ export async function getCategoriesByIds(categoryIds: string[]): Promise<Categor
  * البحث في التصنيفات (يبحث في جميع اللغات)
  */
 export async function searchCategories(query: string): Promise<Category[]> {
-  const categories = await getCategories();
-  const lowerQuery = query.toLowerCase();
-  
-  return categories.filter(cat => 
-    cat.label.toLowerCase().includes(lowerQuery) ||
-    cat.id.toLowerCase().includes(lowerQuery) ||
-    cat.label_en?.toLowerCase().includes(lowerQuery) ||
-    cat.label_ur?.toLowerCase().includes(lowerQuery)
-  );
+  return (await getCategoryIndex()).search(query);
 }
 
 /**
@@ -184,8 +373,10 @@ export async function getRequestCategories(requestId: string): Promise<Category[
  * مسح الـ cache (للاستخدام عند تحديث التصنيفات)
  */
 export function clearCategoriesCache(): void {
+  // الصفوف المحفوظة وإصدارها تبقى أساساً للـ delta التالي
   categoriesCache = null;
   cacheTimestamp = 0;
+  categoryIndexCache = null;
 }
 
 /**
@@ -336,36 +527,18 @@ export async function mergePendingCategory(
  * التحقق من وجود تصنيف بالاسم (يبحث في جميع اللغات)
  */
 export async function findCategoryByLabel(label: string): Promise<Category | null> {
-  const categories = await getCategories();
-  const lowerLabel = label.toLowerCase();
-  
-  return categories.find(cat => 
-    cat.label.toLowerCase() === lowerLabel ||
-    cat.label.toLowerCase().includes(lowerLabel) ||
-    lowerLabel.includes(cat.label.toLowerCase()) ||
-    cat.label_en?.toLowerCase() === lowerLabel ||
-    cat.label_en?.toLowerCase().includes(lowerLabel)
-  ) || null;
+  return (await getCategoryIndex()).resolve(label);
 }
 
 /**
  * تحويل أسماء التصنيفات إلى IDs (يدعم جميع اللغات)
  */
 export async function getCategoryIdsByLabels(labels: string[]): Promise<string[]> {
-  const categories = await getCategories();
+  const index = await getCategoryIndex();
   const ids: string[] = [];
   
   for (const label of labels) {
-    const lowerLabel = label.toLowerCase();
-    const matched = categories.find(cat => 
-      cat.label.toLowerCase() === lowerLabel ||
-      cat.label.toLowerCase().includes(lowerLabel) ||
-      lowerLabel.includes(cat.label.toLowerCase()) ||
-      cat.label_en?.toLowerCase() === lowerLabel ||
-      cat.label_en?.toLowerCase().includes(lowerLabel) ||
-      cat.id.toLowerCase() === lowerLabel
-    );
-    
+    const matched = index.resolve(label);
     if (matched) {
       ids.push(matched.id);
     }
@@ -383,85 +556,15 @@ export async function getCategoryIdsByLabels(labels: string[]): Promise<string[]
  * الاشتراك بتحديثات التصنيفات (Realtime)
  */
 export function subscribeToCategoriesUpdates(callback: (categories: Category[]) => void): () => void {
-  let channel: ReturnType<typeof supabase.channel> | null = null;
-  let isSubscribed = false;
-  let retryCount = 0;
-  const MAX_RETRIES = 3;
-
-  const subscribe = () => {
-    // إزالة الـ channel السابق إذا كان موجوداً
-    if (channel) {
-      try {
-        supabase.removeChannel(channel);
-      } catch (e) {
-        // Ignore errors when removing channel
-      }
-    }
-
-    channel = supabase
-      .channel('categories-changes', {
-        config: {
-          broadcast: { self: false },
-          presence: { key: '' }
-        }
-      })
-      .on(
-        'postgres_changes',
-        {
-          event: '*',
-          schema: 'public',
-          table: 'categories',
-        },
-        async () => {
-          // مسح الـ cache وإعادة جلب التصنيفات
-          clearCategoriesCache();
-          const categories = await getCategories(true);
-          callback(categories);
-        }
-      )
-      .subscribe((status) => {
-        if (status === 'SUBSCRIBED') {
-          isSubscribed = true;
-          retryCount = 0;
-          logger.log('✅ Subscribed to categories updates');
-        } else if (status === 'CHANNEL_ERROR') {
-          logger.warn('⚠️ WebSocket channel error - categories updates may not work');
-          // إعادة المحاولة إذا لم نتجاوز الحد الأقصى
-          if (retryCount < MAX_RETRIES && !isSubscribed) {
-            retryCount++;
-            setTimeout(() => {
-              if (channel) subscribe();
-            }, 2000 * retryCount); // Exponential backoff
-          }
-        } else if (status === 'TIMED_OUT') {
-          logger.warn('⚠️ WebSocket connection timed out - categories updates may not work');
-          // إعادة المحاولة إذا لم نتجاوز الحد الأقصى
-          if (retryCount < MAX_RETRIES && !isSubscribed) {
-            retryCount++;
-            setTimeout(() => {
-              if (channel) subscribe();
-            }, 2000 * retryCount);
-          }
-        } else if (status === 'CLOSED') {
-          isSubscribed = false;
-          logger.warn('⚠️ WebSocket connection closed');
-        }
-      });
-  };
-
-  // بدء الاشتراك
-  subscribe();
-
+  updateListeners.add(callback);
+  // إعادة المحاولة عند انقطاع الاتصال تتم في realtimeService؛
+  // أي تغيير = جلب الفروقات فقط، والنتيجة تصل لكل المشتركين عبر updateListeners
+  const unsubscribe = subscribeToTable({ table: 'categories' }, () => {
+    void syncCategories(true);
+  });
   return () => {
-    if (channel) {
-      try {
-        supabase.removeChannel(channel);
-        channel = null;
-        isSubscribed = false;
-      } catch (e) {
-        // Ignore errors when removing channel
-      }
-    }
+    updateListeners.delete(callback);
+    unsubscribe();
   };
 }
 
@@ -482,32 +585,6 @@ export function getCurrentLocale(): SupportedLocale {
  * البحث المتقدم في التصنيفات بناءً على كلمات مفتاحية
  */
 export async function findCategoriesByKeywords(keywords: string[]): Promise<Category[]> {
-  const categories = await getCategories();
-  const results: { category: Category; score: number }[] = [];
-  
-  for (const category of categories) {
-    let score = 0;
-    const searchableText = [
-      category.label,
-      category.label_en || '',
-      category.label_ur || '',
-      category.description || '',
-      category.id,
-    ].join(' ').toLowerCase();
-    
-    for (const keyword of keywords) {
-      if (searchableText.includes(keyword.toLowerCase())) {
-        score++;
-      }
-    }
-    
-    if (score > 0) {
-      results.push({ category, score });
-    }
-  }
-  
   // ترتيب حسب الأعلى تطابقاً
-  return results
-    .sort((a, b) => b.score - a.score)
-    .map(r => r.category);
+  return (await getCategoryIndex()).searchByKeywords(keywords);
 }
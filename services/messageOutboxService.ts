@@ -0,0 +1,375 @@
+import { capacitorStorage } from "./capacitorStorage";
+import { getCachedProfile } from "./profileCacheService";
+import { getSessionUserId, onSessionChange } from "./sessionService";
+import { logger } from "../utils/logger";
+import {
+  afterMessagesSent,
+  generateMessageId,
+  insertMessageBatch,
+  Message,
+  MessageAttachment,
+  OutgoingMessage,
+} from "./messagesService";
+
+// ==========================================
+// Message Outbox (إرسال متفائل + دعم انقطاع الشبكة)
+// ==========================================
+// queueMessage() يعيد رسالة فورية بمعرف من العميل (UUID) ويحفظها في
+// capacitorStorage، ثم:
+// - تُرسل الرسائل المعلقة على دفعات (insert واحد لعدة رسائل)
+// - عند فشل الشبكة: إعادة المحاولة مع backoff، وعند عودة الاتصال (online) فوراً
+// - الأخطاء الدائمة (RLS، محادثة محذوفة...) تُعلَّم failed ويمكن إعادة المحاولة يدوياً
+// - نفس المعرف يُرسل للخادم، فالصدى القادم من subscribeToMessages يطابق
+//   الرسالة المتفائلة (dedupe بالـ id) وإعادة الإرسال لا تنشئ نسخة ثانية
+
+export type OutboxStatus = "pending" | "sending" | "failed";
+
+interface OutboxEntry extends OutgoingMessage {
+  senderId: string;
+  createdAt: string;
+  attempts: number;
+  nextAttemptAt: number;
+  status: OutboxStatus;
+  lastError?: string;
+}
+
+export interface OutboxListener {
+  /** Pending + failed messages for the conversation, oldest first */
+  onChange?: (messages: Message[]) => void;
+  /** Server row for a delivered message (same id as the optimistic one) */
+  onDelivered?: (message: Message) => void;
+}
+
+const STORAGE_KEY = "message_outbox_v1";
+const BATCH_SIZE = 20;
+const RETRY_BASE_DELAY_MS = 2000;
+const RETRY_MAX_DELAY_MS = 60000;
+const MAX_ATTEMPTS = 8;
+
+let entries: OutboxEntry[] = [];
+let hydration: Promise<void> | null = null;
+let flushTimer: ReturnType<typeof setTimeout> | null = null;
+let isFlushing = false;
+let flushAgain = false;
+const listeners = new Map<string, Set<OutboxListener>>();
+
+// ==========================================
+// Helpers
+// ==========================================
+
+const toMessage = (entry: OutboxEntry): Message => ({
+  id: entry.id,
+  conversation_id: entry.conversation_id,
+  sender_id: entry.senderId,
+  content: entry.content.trim(),
+  is_read: false,
+  read_at: null,
+  created_at: entry.createdAt,
+  updated_at: entry.createdAt,
+  attachments: entry.attachments || [],
+  audio_url: entry.audioUrl || null,
+  audio_duration: entry.audioDuration || null,
+  client_status: entry.status === "failed" ? "failed" : "pending",
+  sender: getCachedProfile(entry.senderId) || undefined,
+});
+
+const retryDelay = (attempts: number) =>
+  Math.min(RETRY_BASE_DELAY_MS * 2 ** (attempts - 1), RETRY_MAX_DELAY_MS) *
+  (0.75 + Math.random() * 0.5);
+
+// PostgREST / Postgres errors that will fail again no matter how often we retry
+// (22xxx data, 23xxx constraint, 42xxx RLS/permission, PGRSTxxx request errors).
+// PGRST30x are JWT errors (expired/invalid token): the next attempt goes out
+// with the refreshed session, so they stay transient like network failures.
+// Anything else (fetch failed, timeouts, 5xx) is treated as transient.
+const isPermanentError = (error: any) => {
+  const code = typeof error?.code === "string" ? error.code : "";
+  if (/^PGRST30\d$/.test(code)) return false;
+  return /^(22|23|42|PGRST)/.test(code);
+};
+
+const persist = () => {
+  const stored = entries.map((e) =>
+    e.status === "sending" ? { ...e, status: "pending" as const } : e
+  );
+  capacitorStorage.setItem(STORAGE_KEY, JSON.stringify(stored)).catch(
+    (error) => logger.warn("Failed to persist message outbox:", error),
+  );
+};
+
+const notifyChange = (conversationIds: Iterable<string>) => {
+  new Set(conversationIds).forEach((conversationId) => {
+    const set = listeners.get(conversationId);
+    if (!set || set.size === 0) return;
+    const messages = getOutboxMessages(conversationId);
+    set.forEach((l) => l.onChange?.(messages));
+  });
+};
+
+const notifyDelivered = (message: Message) => {
+  listeners.get(message.conversation_id)?.forEach((l) =>
+    l.onDelivered?.(message)
+  );
+};
+
+const ensureHydrated = (): Promise<void> => {
+  if (!hydration) {
+    hydration = (async () => {
+      try {
+        const raw = await capacitorStorage.getItem(STORAGE_KEY);
+        if (!raw) return;
+        const stored = JSON.parse(raw) as OutboxEntry[];
+        const known = new Set(entries.map((e) => e.id));
+        entries = [
+          ...stored
+            .filter((e) => e?.id && !known.has(e.id))
+            .map((e) => ({
+              ...e,
+              status: e.status === "failed" ? "failed" : "pending",
+            }) as OutboxEntry),
+          ...entries,
+        ];
+        notifyChange(entries.map((e) => e.conversation_id));
+      } catch (error) {
+        logger.warn("Failed to load message outbox:", error);
+      }
+    })();
+  }
+  return hydration;
+};
+
+// ==========================================
+// Flushing
+// ==========================================
+
+const scheduleFlush = (delayMs = 0) => {
+  if (flushTimer !== null) {
+    if (delayMs > 0) return;
+    clearTimeout(flushTimer);
+  }
+  flushTimer = setTimeout(() => {
+    flushTimer = null;
+    flushOutbox();
+  }, delayMs);
+};
+
+// Only the signed-in sender's entries: the others can't be sent until their
+// owner signs in again (startMessageOutbox flushes on sign-in)
+const scheduleNextRetry = (userId: string | null) => {
+  if (!userId) return;
+  const next = entries
+    .filter((e) => e.status === "pending" && e.senderId === userId)
+    .reduce((min, e) => Math.min(min, e.nextAttemptAt), Infinity);
+  if (next !== Infinity) scheduleFlush(Math.max(0, next - Date.now()));
+};
+
+const markFailed = (batch: OutboxEntry[], error: any) => {
+  batch.forEach((entry) => {
+    entry.attempts++;
+    entry.lastError = error?.message || String(error);
+    if (isPermanentError(error) || entry.attempts >= MAX_ATTEMPTS) {
+      entry.status = "failed";
+    } else {
+      entry.status = "pending";
+      entry.nextAttemptAt = Date.now() + retryDelay(entry.attempts);
+    }
+  });
+};
+
+const sendBatch = async (senderId: string, batch: OutboxEntry[]) => {
+  try {
+    const inserted = await insertMessageBatch(senderId, batch);
+
+    const sentIds = new Set(batch.map((e) => e.id));
+    entries = entries.filter((e) => !sentIds.has(e.id));
+    const insertedById = new Map(inserted.map((m) => [m.id, m]));
+    // Entries missing from `inserted` were already on the server from an
+    // earlier attempt whose response was lost - still delivered
+    const delivered = batch.map((e) =>
+      insertedById.get(e.id) || { ...toMessage(e), client_status: undefined }
+    );
+    delivered.forEach(notifyDelivered);
+
+    // One preview update / notification per conversation per batch
+    // (including batches that were entirely on the server already)
+    const lastByConversation = new Map<string, Message>();
+    delivered.forEach((m) => lastByConversation.set(m.conversation_id, m));
+    lastByConversation.forEach((message, conversationId) => {
+      afterMessagesSent(senderId, conversationId, message).catch((error) =>
+        logger.warn("Post-send updates failed:", error)
+      );
+    });
+  } catch (error) {
+    if (isPermanentError(error) && batch.length > 1) {
+      // One bad row rejects the whole insert - isolate it
+      for (const entry of batch) {
+        await sendBatch(senderId, [entry]);
+      }
+      return;
+    }
+    logger.warn("Outbox send failed:", error);
+    markFailed(batch, error);
+  }
+};
+
+/**
+ * Send every due pending message (batched per sender).
+ * Safe to call at any time; concurrent calls are folded into one run.
+ */
+export async function flushOutbox(): Promise<void> {
+  await ensureHydrated();
+  if (isFlushing) {
+    flushAgain = true;
+    return;
+  }
+  if (typeof navigator !== "undefined" && navigator.onLine === false) return;
+
+  isFlushing = true;
+  let userId: string | null = null;
+  try {
+    do {
+      flushAgain = false;
+
+      // Local session read - no network round trip
+      userId = await getSessionUserId();
+      if (!userId) return;
+
+      const now = Date.now();
+      const due = entries.filter((e) =>
+        e.status === "pending" && e.senderId === userId && e.nextAttemptAt <= now
+      );
+      if (due.length === 0) continue;
+
+      const touched = due.map((e) => e.conversation_id);
+      for (let i = 0; i < due.length; i += BATCH_SIZE) {
+        const batch = due.slice(i, i + BATCH_SIZE);
+        batch.forEach((e) => (e.status = "sending"));
+        await sendBatch(userId, batch);
+      }
+      persist();
+      notifyChange(touched);
+    } while (flushAgain);
+  } finally {
+    isFlushing = false;
+    scheduleNextRetry(userId);
+  }
+}
+
+// ==========================================
+// Public API
+// ==========================================
+
+/**
+ * Queue a message and return its optimistic version immediately.
+ */
+export function queueMessage(
+  conversationId: string,
+  senderId: string,
+  content: string,
+  options?: {
+    attachments?: MessageAttachment[];
+    audioUrl?: string;
+    audioDuration?: number;
+  },
+): Message {
+  const entry: OutboxEntry = {
+    id: generateMessageId(),
+    conversation_id: conversationId,
+    senderId,
+    content,
+    attachments: options?.attachments,
+    audioUrl: options?.audioUrl,
+    audioDuration: options?.audioDuration,
+    createdAt: new Date().toISOString(),
+    attempts: 0,
+    nextAttemptAt: 0,
+    status: "pending",
+  };
+  entries.push(entry);
+  persist();
+  notifyChange([conversationId]);
+  scheduleFlush();
+  return toMessage(entry);
+}
+
+/**
+ * Pending and failed messages for a conversation (oldest first)
+ */
+export function getOutboxMessages(conversationId: string): Message[] {
+  return entries
+    .filter((e) => e.conversation_id === conversationId)
+    .map(toMessage);
+}
+
+/**
+ * Re-queue a failed message
+ */
+export function retryOutboxMessage(messageId: string): void {
+  const entry = entries.find((e) => e.id === messageId);
+  if (!entry || entry.status !== "failed") return;
+  entry.status = "pending";
+  entry.attempts = 0;
+  entry.nextAttemptAt = 0;
+  persist();
+  notifyChange([entry.conversation_id]);
+  scheduleFlush();
+}
+
+/**
+ * Drop a pending/failed message without sending it
+ */
+export function discardOutboxMessage(messageId: string): void {
+  const entry = entries.find((e) => e.id === messageId);
+  if (!entry || entry.status === "sending") return;
+  entries = entries.filter((e) => e !== entry);
+  persist();
+  notifyChange([entry.conversation_id]);
+}
+
+/**
+ * Listen to the outbox of one conversation.
+ * Fires onChange once with the current queue (after loading storage).
+ */
+export function subscribeToOutbox(
+  conversationId: string,
+  listener: OutboxListener,
+): () => void {
+  let set = listeners.get(conversationId);
+  if (!set) {
+    set = new Set();
+    listeners.set(conversationId, set);
+  }
+  set.add(listener);
+
+  let isActive = true;
+  ensureHydrated().then(() => {
+    if (isActive) listener.onChange?.(getOutboxMessages(conversationId));
+  });
+
+  return () => {
+    isActive = false;
+    set!.delete(listener);
+    if (set!.size === 0) listeners.delete(conversationId);
+  };
+}
+
+let started = false;
+
+/**
+ * Load the persisted queue and keep flushing it when connectivity returns.
+ * Call once after sign-in; queued messages from a previous run go out
+ * even if the chat screen is never opened.
+ */
+export function startMessageOutbox(): void {
+  if (!started) {
+    started = true;
+    if (typeof window !== "undefined") {
+      window.addEventListener("online", () => scheduleFlush());
+    }
+    // Queued messages of a user who signs back in go out right away
+    onSessionChange((identity) => {
+      if (identity) scheduleFlush();
+    });
+  }
+  scheduleFlush();
+}
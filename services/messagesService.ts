@@ -1,5 +1,13 @@
 import { supabase } from "./supabaseClient";
 import { logger } from "../utils/logger";
+import {
+  getUnreadCounters,
+  subscribeToUnreadCounters,
+} from "./unreadCountersService";
+import { getProfile, getProfiles, primeProfiles } from "./profileCacheService";
+import { subscribeToTable } from "./realtimeService";
+import { UploadedFile, UploadProgress, uploadFiles } from "./uploadService";
+import { getSessionUserId } from "./sessionService";
 
 // ==========================================
 // Constants
@@ -56,6 +64,8 @@ export interface Message {
   audio_url?: string | null;
   audio_duration?: number | null;
   message_type?: "text" | "audio" | "image" | "file" | "mixed";
+  // Local only: set on optimistic messages still in the outbox
+  client_status?: "pending" | "failed";
   // Joined data
   sender?: {
     id: string;
@@ -68,113 +78,94 @@ export interface Message {
 // Conversations
 // ==========================================
 
-/**
- * Get all conversations for current user
- */
-export async function getConversations(): Promise<Conversation[]> {
-  try {
-    const { data: { user }, error: authError } = await supabase.auth.getUser();
-    if (authError) {
-      logger.error("Auth error in getConversations:", authError, "service");
-      return [];
-    }
-    if (!user) return [];
+export interface ConversationsCursor {
+  lastMessageAt: string | null;
+  id: string;
+}
 
-    // First fetch conversations without joins to avoid foreign key issues
-    const { data: convData, error: convError } = await supabase
-      .from("conversations")
-      .select("*")
-      .or(`participant1_id.eq.${user.id},participant2_id.eq.${user.id}`)
-      .order("last_message_at", { ascending: false, nullsFirst: false });
+export interface ConversationsPage {
+  conversations: Conversation[];
+  // null when there are no more pages
+  nextCursor: ConversationsCursor | null;
+}
 
-    if (convError) {
-      logger.error("Supabase error in getConversations:", convError, "service");
-      if (convError.code === "42P01" || convError.code === "PGRST116") {
-        return [];
-      }
-      throw convError;
-    }
+const CONVERSATIONS_PAGE_SIZE = 50;
 
-    // Fetch profiles separately to avoid foreign key relationship issues
-    const participantIds = new Set<string>();
-    (convData || []).forEach((conv) => {
-      participantIds.add(conv.participant1_id);
-      participantIds.add(conv.participant2_id);
+/**
+ * Get one page of conversations for current user
+ * Single RPC: conversation + other participant + unread_count + last message preview
+ * (supabase/CONVERSATIONS_PAGE_RPC.sql)
+ */
+export async function getConversationsPage(
+  options: { limit?: number; cursor?: ConversationsCursor | null } = {},
+): Promise<ConversationsPage> {
+  const limit = options.limit || CONVERSATIONS_PAGE_SIZE;
+  try {
+    const { data, error } = await supabase.rpc("get_conversations_page", {
+      p_limit: limit,
+      p_before_last_message_at: options.cursor?.lastMessageAt ?? null,
+      p_before_id: options.cursor?.id ?? null,
     });
 
-    let profilesMap: Record<string, any> = {};
-    if (participantIds.size > 0) {
-      const { data: profiles } = await supabase
-        .from("profiles")
-        .select("id, display_name, avatar_url")
-        .in("id", Array.from(participantIds));
-
-      (profiles || []).forEach((p) => {
-        profilesMap[p.id] = p;
-      });
+    if (error) {
+      logger.error("Supabase error in getConversationsPage:", error, "service");
+      if (error.code === "42P01" || error.code === "PGRST116") {
+        return { conversations: [], nextCursor: null };
+      }
+      throw error;
     }
 
-    const data = (convData || []).map((conv) => ({
-      ...conv,
-      participant1: profilesMap[conv.participant1_id] || null,
-      participant2: profilesMap[conv.participant2_id] || null,
-    }));
-
-    const error = null;
-
-    // Error already handled above
-
-    // Transform data to include other_user and unread_count
-    const conversations = await Promise.all(
-      (data || []).map(async (conv) => {
-        const otherUserId = conv.participant1_id === user.id
-          ? conv.participant2_id
-          : conv.participant1_id;
-
-        const otherUser = conv.participant1_id === user.id
-          ? conv.participant2
-          : conv.participant1;
-
-        // Get unread count - with error handling
-        let unreadCount = 0;
-        try {
-          const { count, error: countError } = await supabase
-            .from("messages")
-            .select("*", { count: "exact", head: true })
-            .eq("conversation_id", conv.id)
-            .eq("is_read", false)
-            .neq("sender_id", user.id);
-
-          if (countError) {
-            logger.warn(
-              "Error getting unread count for conversation:",
-              conv.id,
-              countError,
-            );
-            unreadCount = 0;
-          } else {
-            unreadCount = count || 0;
-          }
-        } catch (countErr) {
-          logger.warn("Exception getting unread count:", countErr);
-          unreadCount = 0;
+    const conversations: Conversation[] = (data || []).map((row: any) => ({
+      id: row.id,
+      participant1_id: row.participant1_id,
+      participant2_id: row.participant2_id,
+      request_id: row.request_id,
+      offer_id: row.offer_id,
+      last_message_at: row.last_message_at,
+      last_message_preview: row.last_message_preview,
+      created_at: row.created_at,
+      updated_at: row.updated_at,
+      is_closed: row.is_closed,
+      closed_reason: row.closed_reason,
+      other_user: row.other_user_id
+        ? {
+          id: row.other_user_id,
+          display_name: row.other_display_name,
+          avatar_url: row.other_avatar_url,
         }
+        : undefined,
+      unread_count: row.unread_count || 0,
+    }));
+    primeProfiles(conversations.map((c) => c.other_user));
 
-        return {
-          ...conv,
-          other_user: otherUser,
-          unread_count: unreadCount,
-        };
-      }),
-    );
-
-    return conversations;
+    const last = conversations[conversations.length - 1];
+    return {
+      conversations,
+      nextCursor: conversations.length === limit && last
+        ? { lastMessageAt: last.last_message_at, id: last.id }
+        : null,
+    };
   } catch (error) {
-    logger.error("Error fetching conversations:", error, "service");
-    return [];
+    logger.error("Error fetching conversations page:", error, "service");
+    return { conversations: [], nextCursor: null };
   }
 }
 
+/**
+ * Get all conversations for current user
+ * Walks the pages of getConversationsPage (one round trip per 50 conversations)
+ */
+export async function getConversations(): Promise<Conversation[]> {
+  const all: Conversation[] = [];
+  let cursor: ConversationsCursor | null = null;
+  do {
+    const page = await getConversationsPage({ cursor });
+    all.push(...page.conversations);
+    cursor = page.nextCursor;
+  } while (cursor);
+  return all;
+}
+
 /**
  * Get or create conversation between two users
  */
@@ -184,15 +175,15 @@ export async function getOrCreateConversation(
   offerId?: string,
 ): Promise<Conversation | null> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return null;
+    const userId = await getSessionUserId();
+    if (!userId) return null;
 
     // Try to find existing conversation
     const { data: existing } = await supabase
       .from("conversations")
       .select("*")
       .or(
-        `and(participant1_id.eq.${user.id},participant2_id.eq.${otherUserId}),and(participant1_id.eq.${otherUserId},participant2_id.eq.${user.id})`,
+        `and(participant1_id.eq.${userId},participant2_id.eq.${otherUserId}),and(participant1_id.eq.${otherUserId},participant2_id.eq.${userId})`,
       )
       .is("request_id", requestId ?? null)
       .is("offer_id", offerId ?? null)
@@ -206,7 +197,7 @@ export async function getOrCreateConversation(
     const { data: newConv, error } = await supabase
       .from("conversations")
       .insert({
-        participant1_id: user.id,
+        participant1_id: userId,
         participant2_id: otherUserId,
         request_id: requestId || null,
         offer_id: offerId || null,
@@ -230,42 +221,36 @@ export async function getConversation(
   conversationId: string,
 ): Promise<Conversation | null> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return null;
+    const userId = await getSessionUserId();
+    if (!userId) return null;
 
     // Fetch conversation without explicit foreign key joins
     const { data: convData, error: convError } = await supabase
       .from("conversations")
       .select("*")
       .eq("id", conversationId)
-      .or(`participant1_id.eq.${user.id},participant2_id.eq.${user.id}`)
+      .or(`participant1_id.eq.${userId},participant2_id.eq.${userId}`)
       .single();
 
     if (convError) throw convError;
 
-    // Fetch profiles separately
-    const participantIds = [convData.participant1_id, convData.participant2_id];
-    const { data: profiles } = await supabase
-      .from("profiles")
-      .select("id, display_name, avatar_url")
-      .in("id", participantIds);
-
-    const profilesMap: Record<string, any> = {};
-    (profiles || []).forEach((p) => {
-      profilesMap[p.id] = p;
-    });
+    // Participant profiles come from the shared profile cache
+    const profiles = await getProfiles([
+      convData.participant1_id,
+      convData.participant2_id,
+    ]);
 
     const data = {
       ...convData,
-      participant1: profilesMap[convData.participant1_id] || null,
-      participant2: profilesMap[convData.participant2_id] || null,
+      participant1: profiles.get(convData.participant1_id) || null,
+      participant2: profiles.get(convData.participant2_id) || null,
     };
 
-    const otherUserId = data.participant1_id === user.id
+    const otherUserId = data.participant1_id === userId
       ? data.participant2_id
       : data.participant1_id;
 
-    const otherUser = data.participant1_id === user.id
+    const otherUser = data.participant1_id === userId
       ? data.participant2
       : data.participant1;
 
@@ -283,66 +268,451 @@ export async function getConversation(
 // Messages
 // ==========================================
 
+export interface MessageCursor {
+  createdAt: string;
+  id: string;
+}
+
+const MESSAGES_PAGE_SIZE = 50;
+
+const mapWindowRow = (row: any): Message => ({
+  id: row.id,
+  conversation_id: row.conversation_id,
+  sender_id: row.sender_id,
+  content: row.content,
+  is_read: row.is_read,
+  read_at: row.read_at,
+  created_at: row.created_at,
+  updated_at: row.updated_at,
+  attachments: row.attachments || [],
+  audio_url: row.audio_url,
+  audio_duration: row.audio_duration,
+  message_type: row.message_type,
+  sender: {
+    id: row.sender_id,
+    display_name: row.sender_display_name ?? null,
+    avatar_url: row.sender_avatar_url ?? null,
+  },
+});
+
+/**
+ * Get a window of messages (oldest first) in one round trip
+ * - no cursor: latest `limit` messages
+ * - before: messages older than the cursor (scrolling up)
+ * - after: messages newer than the cursor (incremental sync)
+ * (supabase/MESSAGES_WINDOW_SCHEMA.sql)
+ */
+export async function getMessagesWindow(
+  conversationId: string,
+  options: {
+    limit?: number;
+    before?: MessageCursor | null;
+    after?: MessageCursor | null;
+  } = {},
+): Promise<Message[]> {
+  const { data, error } = await supabase.rpc("get_messages_window", {
+    p_conversation_id: conversationId,
+    p_limit: options.limit || MESSAGES_PAGE_SIZE,
+    p_before_created_at: options.before?.createdAt ?? null,
+    p_before_id: options.before?.id ?? null,
+    p_after_created_at: options.after?.createdAt ?? null,
+    p_after_id: options.after?.id ?? null,
+  });
+
+  if (error) throw error;
+  const messages: Message[] = (data || []).map(mapWindowRow);
+  primeProfiles(messages.map((m) => m.sender));
+  return messages;
+}
+
 /**
  * Get messages for a conversation
+ * Latest window, oldest first
  */
 export async function getMessages(
   conversationId: string,
-  limit = 50,
+  limit = MESSAGES_PAGE_SIZE,
 ): Promise<Message[]> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return [];
+    return await getMessagesWindow(conversationId, { limit });
+  } catch (error) {
+    logger.error("Error fetching messages:", error, "service");
+    return [];
+  }
+}
 
-    // Verify user has access to this conversation
-    const { data: conv } = await supabase
-      .from("conversations")
-      .select("id")
-      .eq("id", conversationId)
-      .or(`participant1_id.eq.${user.id},participant2_id.eq.${user.id}`)
-      .single();
+// ==========================================
+// Message Window Cache
+// ==========================================
+// كاش لكل محادثة في الذاكرة: فتح المحادثة مرة ثانية يعرض فوراً من الكاش
+// ثم يجلب الجديد فقط (after cursor) بدل إعادة تحميل كل شيء
 
-    if (!conv) return [];
+export interface CachedConversationMessages {
+  messages: Message[];
+  hasMoreBefore: boolean;
+}
+
+const MAX_CACHED_CONVERSATIONS = 30;
+const MAX_CACHED_MESSAGES_PER_CONVERSATION = 500;
+
+// Map keeps insertion order -> used as LRU (oldest entry first)
+const messageWindowCache = new Map<string, CachedConversationMessages>();
+
+const compareMessages = (a: Message, b: Message) =>
+  a.created_at === b.created_at
+    ? a.id.localeCompare(b.id)
+    : a.created_at < b.created_at
+    ? -1
+    : 1;
+
+const toCursor = (message: Message | undefined): MessageCursor | null =>
+  message ? { createdAt: message.created_at, id: message.id } : null;
 
-    // Fetch messages without explicit foreign key joins
-    const { data: messagesData, error: messagesError } = await supabase
+function mergeMessages(existing: Message[], incoming: Message[]): Message[] {
+  if (incoming.length === 0) return existing;
+  const byId = new Map(existing.map((m) => [m.id, m]));
+  incoming.forEach((m) => byId.set(m.id, m));
+  return Array.from(byId.values()).sort(compareMessages);
+}
+
+function storeCachedMessages(
+  conversationId: string,
+  entry: CachedConversationMessages,
+): CachedConversationMessages {
+  let { messages, hasMoreBefore } = entry;
+  if (messages.length > MAX_CACHED_MESSAGES_PER_CONVERSATION) {
+    // Keep the newest messages; the dropped ones can be paged in again
+    messages = messages.slice(-MAX_CACHED_MESSAGES_PER_CONVERSATION);
+    hasMoreBefore = true;
+  }
+  const stored = { messages, hasMoreBefore };
+  messageWindowCache.delete(conversationId);
+  messageWindowCache.set(conversationId, stored);
+  while (messageWindowCache.size > MAX_CACHED_CONVERSATIONS) {
+    const oldest = messageWindowCache.keys().next().value;
+    if (oldest === undefined) break;
+    messageWindowCache.delete(oldest);
+  }
+  return stored;
+}
+
+/**
+ * Cached window for a conversation (render instantly), or null
+ */
+export function getCachedMessages(
+  conversationId: string,
+): CachedConversationMessages | null {
+  return messageWindowCache.get(conversationId) || null;
+}
+
+/**
+ * Read receipts for cached messages that were still unread when cached:
+ * id -> read_at, for those read since. Only the range from the oldest unread
+ * cached message is fetched, and only two columns.
+ */
+async function fetchCachedReadState(
+  conversationId: string,
+  cached: Message[],
+): Promise<Map<string, string | null>> {
+  const unread = cached.filter((m) => !m.is_read);
+  if (unread.length === 0) return new Map();
+  try {
+    const { data, error } = await supabase
       .from("messages")
-      .select("*")
+      .select("id, read_at")
       .eq("conversation_id", conversationId)
-      .order("created_at", { ascending: false })
-      .limit(limit);
-
-    if (messagesError) throw messagesError;
-
-    // Fetch sender profiles separately
-    const senderIds = [
-      ...new Set((messagesData || []).map((m) => m.sender_id)),
-    ];
-    let sendersMap: Record<string, any> = {};
-    if (senderIds.length > 0) {
-      const { data: senders } = await supabase
-        .from("profiles")
-        .select("id, display_name, avatar_url")
-        .in("id", senderIds);
-      (senders || []).forEach((s) => {
-        sendersMap[s.id] = s;
+      .eq("is_read", true)
+      .gte("created_at", unread[0].created_at)
+      .lte("created_at", unread[unread.length - 1].created_at);
+    if (error) throw error;
+    return new Map((data || []).map((row: any) => [row.id, row.read_at]));
+  } catch (error) {
+    // Stale ticks are cosmetic - the new messages still sync
+    logger.warn("Failed to refresh read receipts:", error);
+    return new Map();
+  }
+}
+
+const applyReadState = (
+  messages: Message[],
+  readState: Map<string, string | null>,
+): Message[] =>
+  readState.size === 0 ? messages : messages.map((m) =>
+    !m.is_read && readState.has(m.id)
+      ? { ...m, is_read: true, read_at: readState.get(m.id) ?? m.read_at }
+      : m
+  );
+
+/**
+ * Bring the cached window up to date
+ * - cold: latest page
+ * - warm: only messages after the newest cached one ("since last seen"),
+ *   plus read receipts for cached messages that were still unread
+ */
+export async function syncConversationMessages(
+  conversationId: string,
+  pageSize = MESSAGES_PAGE_SIZE,
+): Promise<CachedConversationMessages> {
+  const cached = messageWindowCache.get(conversationId);
+
+  if (!cached || cached.messages.length === 0) {
+    const latest = await getMessagesWindow(conversationId, { limit: pageSize });
+    return storeCachedMessages(conversationId, {
+      messages: latest,
+      hasMoreBefore: latest.length === pageSize,
+    });
+  }
+
+  // In parallel with the catch-up below
+  const readState = fetchCachedReadState(conversationId, cached.messages);
+  let messages = cached.messages;
+  let after = toCursor(messages[messages.length - 1]);
+  // Catch up page by page; a long gap resets to the latest window
+  for (let pages = 0; after && pages < 5; pages++) {
+    const newer = await getMessagesWindow(conversationId, {
+      limit: pageSize,
+      after,
+    });
+    messages = mergeMessages(messages, newer);
+    if (newer.length < pageSize) {
+      return storeCachedMessages(conversationId, {
+        messages: applyReadState(messages, await readState),
+        hasMoreBefore: cached.hasMoreBefore,
       });
     }
+    after = toCursor(newer[newer.length - 1]);
+  }
 
-    const data = (messagesData || []).map((m) => ({
-      ...m,
-      sender: sendersMap[m.sender_id] || null,
-    }));
+  const latest = await getMessagesWindow(conversationId, { limit: pageSize });
+  return storeCachedMessages(conversationId, {
+    messages: latest,
+    hasMoreBefore: latest.length === pageSize,
+  });
+}
 
-    return data.reverse() as Message[]; // Reverse to show oldest first
-  } catch (error) {
-    logger.error("Error fetching messages:", error, "service");
-    return [];
+/**
+ * Page older history into the cached window (scrolling up)
+ */
+export async function loadOlderMessages(
+  conversationId: string,
+  pageSize = MESSAGES_PAGE_SIZE,
+): Promise<CachedConversationMessages> {
+  const cached = messageWindowCache.get(conversationId);
+  if (!cached || cached.messages.length === 0) {
+    return syncConversationMessages(conversationId, pageSize);
+  }
+  if (!cached.hasMoreBefore) return cached;
+
+  const older = await getMessagesWindow(conversationId, {
+    limit: pageSize,
+    before: toCursor(cached.messages[0]),
+  });
+  const merged = mergeMessages(cached.messages, older);
+  // Trimming would drop the page we just loaded, so don't cap on the way up
+  messageWindowCache.delete(conversationId);
+  const entry = { messages: merged, hasMoreBefore: older.length === pageSize };
+  messageWindowCache.set(conversationId, entry);
+  return entry;
+}
+
+/**
+ * Apply a realtime insert/update to the cached window
+ */
+export function upsertCachedMessage(
+  conversationId: string,
+  message: Message,
+): CachedConversationMessages | null {
+  const cached = messageWindowCache.get(conversationId);
+  if (!cached) return null;
+  return storeCachedMessages(conversationId, {
+    messages: mergeMessages(cached.messages, [message]),
+    hasMoreBefore: cached.hasMoreBefore,
+  });
+}
+
+export interface OutgoingMessage {
+  /** Client-generated UUID: makes retries idempotent and matches the realtime echo */
+  id: string;
+  conversation_id: string;
+  content: string;
+  attachments?: MessageAttachment[];
+  audioUrl?: string;
+  audioDuration?: number;
+}
+
+export const generateMessageId = (): string => {
+  if (typeof crypto !== "undefined" && typeof crypto.randomUUID === "function") {
+    return crypto.randomUUID();
+  }
+  // RFC 4122 v4 fallback for older WebViews
+  return "xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx".replace(/[xy]/g, (c) => {
+    const r = (Math.random() * 16) | 0;
+    return (c === "x" ? r : (r & 0x3) | 0x8).toString(16);
+  });
+};
+
+const getMessageType = (
+  content: string,
+  attachments?: MessageAttachment[],
+  audioUrl?: string,
+): Message["message_type"] => {
+  if (audioUrl) return "audio";
+  if (!attachments || attachments.length === 0) return "text";
+  const hasImages = attachments.some((a) => a.file_type === "image");
+  const hasOther = attachments.some((a) => a.file_type !== "image");
+  if (content.trim() || (hasImages && hasOther)) return "mixed";
+  return hasImages ? "image" : "file";
+};
+
+const getMessagePreview = (message: {
+  content: string;
+  attachments?: MessageAttachment[] | null;
+  audio_url?: string | null;
+}) =>
+  message.content.trim() ||
+  (message.audio_url
+    ? "رسالة صوتية"
+    : message.attachments && message.attachments.length > 0
+    ? "مرفق"
+    : "رسالة");
+
+/**
+ * Insert several outgoing messages in one request.
+ * Rows whose id already exists (a retry after a lost response) are skipped,
+ * so only newly inserted rows are returned.
+ * RLS on messages already enforces sender_id = auth.uid() and participation.
+ */
+export async function insertMessageBatch(
+  senderId: string,
+  batch: OutgoingMessage[],
+): Promise<Message[]> {
+  if (batch.length === 0) return [];
+
+  const rows = batch.map((m) => ({
+    id: m.id,
+    conversation_id: m.conversation_id,
+    sender_id: senderId,
+    content: m.content.trim(),
+    attachments: m.attachments || [],
+    audio_url: m.audioUrl || null,
+    audio_duration: m.audioDuration || null,
+    message_type: getMessageType(m.content, m.attachments, m.audioUrl),
+  }));
+
+  const { data, error } = await supabase
+    .from("messages")
+    .upsert(rows, { onConflict: "id", ignoreDuplicates: true })
+    .select("*");
+
+  if (error) throw error;
+
+  const sender = await getProfile(senderId);
+  return (data || []).map((row) => ({ ...row, sender: sender || null }) as Message);
+}
+
+/**
+ * Conversation preview + recipient notifications after a send.
+ * Called once per conversation per batch with its newest message, so a burst
+ * of queued messages produces one update and one push instead of N.
+ */
+export async function afterMessagesSent(
+  senderId: string,
+  conversationId: string,
+  lastMessage: Message,
+): Promise<void> {
+  // Update conversation's last_message_at and last_message_preview
+  // (This is also done by trigger, but we do it here as backup)
+  // and read the participants in the same round trip
+  const { data: conversation } = await supabase
+    .from("conversations")
+    .update({
+      last_message_at: lastMessage.created_at,
+      last_message_preview: getMessagePreview(lastMessage).substring(0, 100),
+      updated_at: new Date().toISOString(),
+    })
+    .eq("id", conversationId)
+    .select("participant1_id, participant2_id, request_id, offer_id")
+    .single();
+
+  // Send notification to recipient (backup if trigger doesn't work)
+  if (!conversation) return;
+  const recipientId = conversation.participant1_id === senderId
+    ? conversation.participant2_id
+    : conversation.participant1_id;
+  if (!recipientId) return;
+
+  const senderProfile = await getProfile(senderId);
+  const senderName = senderProfile?.display_name || "مستخدم";
+  const content = lastMessage.content || "";
+
+  // 1. In-app notification (handled by trigger, but this is a backup/companion)
+  try {
+    const notificationMessage = content.trim()
+      ? content.substring(0, 50) + (content.length > 50 ? "..." : "")
+      : lastMessage.audio_url
+      ? "رسالة صوتية"
+      : lastMessage.attachments && lastMessage.attachments.length > 0
+      ? "مرفق"
+      : "رسالة جديدة";
+
+    const { error: notifError } = await supabase
+      .from("notifications")
+      .insert({
+        user_id: recipientId,
+        type: "message",
+        title: "رسالة جديدة",
+        message: `${senderName}: ${notificationMessage}`,
+        link_to: `/messages/${conversationId}`,
+        related_message_id: lastMessage.id,
+        related_request_id: conversation.request_id || null,
+        related_offer_id: conversation.offer_id || null,
+      });
+
+    if (notifError) {
+      logger.warn(
+        "Failed to create notification (trigger should handle it):",
+        notifError,
+      );
+    }
+  } catch (notifError) {
+    logger.warn(
+      "Exception creating notification (trigger should handle it):",
+      notifError,
+    );
+  }
+
+  // 2. Push Notification (AI-powered)
+  try {
+    // جلب عنوان الطلب إذا كان متاحاً للسياق
+    let requestTitle = "محادثة عامة";
+    if (conversation.request_id) {
+      const { data: request } = await supabase
+        .from("requests")
+        .select("title")
+        .eq("id", conversation.request_id)
+        .single();
+      if (request) requestTitle = request.title;
+    }
+
+    await sendPushNotificationForNewMessage({
+      conversationId,
+      messageContent: content.trim() ||
+        (lastMessage.audio_url ? "رسالة صوتية" : "مرفق"),
+      recipientId,
+      senderName,
+      requestTitle,
+      authorId: senderId,
+    });
+  } catch (pushErr) {
+    logger.warn("Failed to send push notification for message:", pushErr);
   }
 }
 
 /**
  * Send a message with optional attachments and audio
+ * Resolves once the row is stored; conversation preview and notifications
+ * continue in the background. For optimistic/offline sending use
+ * queueMessage() from messageOutboxService.
  */
 export async function sendMessage(
   conversationId: string,
@@ -354,165 +724,24 @@ export async function sendMessage(
   },
 ): Promise<Message | null> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return null;
-
-    // Verify user is a participant in the conversation
-    const { data: conv } = await supabase
-      .from("conversations")
-      .select("participant1_id, participant2_id")
-      .eq("id", conversationId)
-      .single();
-    if (
-      !conv ||
-      (conv.participant1_id !== user.id && conv.participant2_id !== user.id)
-    ) {
-      logger.warn("User not allowed to send in this conversation");
-      return null;
-    }
-
-    // Determine message type
-    let messageType: Message["message_type"] = "text";
-    if (options?.audioUrl) {
-      messageType = "audio";
-    } else if (options?.attachments && options.attachments.length > 0) {
-      const hasImages = options.attachments.some((a) =>
-        a.file_type === "image"
-      );
-      const hasOther = options.attachments.some((a) => a.file_type !== "image");
-      if (content.trim() || (hasImages && hasOther)) {
-        messageType = "mixed";
-      } else if (hasImages) {
-        messageType = "image";
-      } else {
-        messageType = "file";
-      }
-    }
-
-    // Insert message
-    const { data: insertedMsg, error: insertError } = await supabase
-      .from("messages")
-      .insert({
-        conversation_id: conversationId,
-        sender_id: user.id,
-        content: content.trim(),
-        attachments: options?.attachments || [],
-        audio_url: options?.audioUrl || null,
-        audio_duration: options?.audioDuration || null,
-        message_type: messageType,
-      })
-      .select("*")
-      .single();
-
-    if (insertError) throw insertError;
-
-    // Update conversation's last_message_at and last_message_preview
-    // (This is also done by trigger, but we do it here as backup)
-    const messagePreview = content.trim() ||
-      (options?.audioUrl
-        ? "رسالة صوتية"
-        : options?.attachments && options.attachments.length > 0
-        ? "مرفق"
-        : "رسالة");
-    await supabase
-      .from("conversations")
-      .update({
-        last_message_at: insertedMsg.created_at,
-        last_message_preview: messagePreview.substring(0, 100),
-        updated_at: new Date().toISOString(),
-      })
-      .eq("id", conversationId);
-
-    // Fetch sender profile separately
-    const { data: senderProfile } = await supabase
-      .from("profiles")
-      .select("id, display_name, avatar_url")
-      .eq("id", user.id)
-      .single();
-
-    // Get conversation to find recipient
-    const { data: conversation } = await supabase
-      .from("conversations")
-      .select("participant1_id, participant2_id, request_id, offer_id")
-      .eq("id", conversationId)
-      .single();
-
-    // Send notification to recipient (backup if trigger doesn't work)
-    if (conversation) {
-      const recipientId = conversation.participant1_id === user.id
-        ? conversation.participant2_id
-        : conversation.participant1_id;
-
-      if (recipientId) {
-        // 1. In-app notification (handled by trigger, but this is a backup/companion)
-        try {
-          const senderName = senderProfile?.display_name || "مستخدم";
-          const notificationMessage = content.trim()
-            ? content.substring(0, 50) + (content.length > 50 ? "..." : "")
-            : options?.audioUrl
-            ? "رسالة صوتية"
-            : options?.attachments && options.attachments.length > 0
-            ? "مرفق"
-            : "رسالة جديدة";
-
-          const { error: notifError } = await supabase
-            .from("notifications")
-            .insert({
-              user_id: recipientId,
-              type: "message",
-              title: "رسالة جديدة",
-              message: `${senderName}: ${notificationMessage}`,
-              link_to: `/messages/${conversationId}`,
-              related_message_id: insertedMsg.id,
-              related_request_id: conversation.request_id || null,
-              related_offer_id: conversation.offer_id || null,
-            });
-
-          if (notifError) {
-            logger.warn(
-              "Failed to create notification (trigger should handle it):",
-              notifError,
-            );
-          }
-        } catch (notifError) {
-          logger.warn(
-            "Exception creating notification (trigger should handle it):",
-            notifError,
-          );
-        }
-
-        // 2. Push Notification (AI-powered)
-        try {
-          // جلب عنوان الطلب إذا كان متاحاً للسياق
-          let requestTitle = "محادثة عامة";
-          if (conversation.request_id) {
-            const { data: request } = await supabase
-              .from("requests")
-              .select("title")
-              .eq("id", conversation.request_id)
-              .single();
-            if (request) requestTitle = request.title;
-          }
-
-          await sendPushNotificationForNewMessage({
-            conversationId,
-            messageContent: content.trim() ||
-              (options?.audioUrl ? "رسالة صوتية" : "مرفق"),
-            recipientId,
-            senderName: senderProfile?.display_name || "مستخدم",
-            requestTitle,
-            authorId: user.id,
-          });
-        } catch (pushErr) {
-          logger.warn("Failed to send push notification for message:", pushErr);
-        }
-      }
-    }
+    const userId = await getSessionUserId();
+    if (!userId) return null;
+
+    const [insertedMsg] = await insertMessageBatch(userId, [{
+      id: generateMessageId(),
+      conversation_id: conversationId,
+      content,
+      attachments: options?.attachments,
+      audioUrl: options?.audioUrl,
+      audioDuration: options?.audioDuration,
+    }]);
+    if (!insertedMsg) return null;
+
+    afterMessagesSent(userId, conversationId, insertedMsg).catch((error) =>
+      logger.warn("Post-send updates failed:", error)
+    );
 
-    return {
-      ...insertedMsg,
-      sender: senderProfile || null,
-    } as Message;
+    return insertedMsg;
   } catch (error) {
     logger.error("Error sending message:", error, "service");
     return null;
@@ -526,8 +755,8 @@ export async function markMessagesAsRead(
   conversationId: string,
 ): Promise<boolean> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return false;
+    const userId = await getSessionUserId();
+    if (!userId) return false;
 
     // Verify user belongs to conversation
     const { data: conv } = await supabase
@@ -537,7 +766,7 @@ export async function markMessagesAsRead(
       .single();
     if (
       !conv ||
-      (conv.participant1_id !== user.id && conv.participant2_id !== user.id)
+      (conv.participant1_id !== userId && conv.participant2_id !== userId)
     ) {
       logger.warn("User not allowed to mark messages in this conversation");
       return false;
@@ -550,7 +779,7 @@ export async function markMessagesAsRead(
         read_at: new Date().toISOString(),
       })
       .eq("conversation_id", conversationId)
-      .neq("sender_id", user.id)
+      .neq("sender_id", userId)
       .eq("is_read", false);
 
     if (error) throw error;
@@ -579,44 +808,29 @@ export function subscribeToMessages(
   conversationId: string,
   callback: (message: Message, eventType: "INSERT" | "UPDATE") => void,
 ) {
-  const channel = supabase
-    .channel(`messages:${conversationId}`)
-    .on(
-      "postgres_changes",
-      {
-        event: "*", // Listen for all changes (INSERT, UPDATE)
-        schema: "public",
-        table: "messages",
-        filter: `conversation_id=eq.${conversationId}`,
-      },
-      async (payload) => {
-        if (payload.eventType === "INSERT" || payload.eventType === "UPDATE") {
-          // Fetch full message
-          const { data: msgData } = await supabase
-            .from("messages")
-            .select("*")
-            .eq("id", payload.new.id)
-            .single();
-
-          if (msgData) {
-            // Fetch sender profile separately
-            const { data: senderProfile } = await supabase
-              .from("profiles")
-              .select("id, display_name, avatar_url")
-              .eq("id", msgData.sender_id)
-              .single();
-
-            const data = { ...msgData, sender: senderProfile || null };
-            callback(data as Message, payload.eventType as "INSERT" | "UPDATE");
-          }
+  return subscribeToTable(
+    {
+      table: "messages",
+      filter: `conversation_id=eq.${conversationId}`,
+    },
+    async (payload) => {
+      if (payload.eventType === "INSERT" || payload.eventType === "UPDATE") {
+        // Fetch full message
+        const { data: msgData } = await supabase
+          .from("messages")
+          .select("*")
+          .eq("id", payload.new.id)
+          .single();
+
+        if (msgData) {
+          const senderProfile = await getProfile(msgData.sender_id);
+
+          const data = { ...msgData, sender: senderProfile || null };
+          callback(data as Message, payload.eventType as "INSERT" | "UPDATE");
         }
-      },
-    )
-    .subscribe();
-
-  return () => {
-    supabase.removeChannel(channel);
-  };
+      }
+    },
+  );
 }
 
 /**
@@ -626,36 +840,22 @@ export function subscribeToConversations(
   userId: string,
   callback: (conversation: Conversation) => void,
 ) {
-  const channel = supabase
-    .channel(`conversations:${userId}`)
-    .on(
-      "postgres_changes",
-      {
-        event: "*",
-        schema: "public",
-        table: "conversations",
-        filter: `participant1_id=eq.${userId}`,
-      },
-      (payload) => {
-        callback(payload.new as Conversation);
-      },
-    )
-    .on(
-      "postgres_changes",
-      {
-        event: "*",
-        schema: "public",
-        table: "conversations",
-        filter: `participant2_id=eq.${userId}`,
-      },
-      (payload) => {
-        callback(payload.new as Conversation);
-      },
-    )
-    .subscribe();
+  const handler = (payload: { new: unknown }) => {
+    callback(payload.new as Conversation);
+  };
+  const unsubscribers = [
+    subscribeToTable(
+      { table: "conversations", filter: `participant1_id=eq.${userId}` },
+      handler,
+    ),
+    subscribeToTable(
+      { table: "conversations", filter: `participant2_id=eq.${userId}` },
+      handler,
+    ),
+  ];
 
   return () => {
-    supabase.removeChannel(channel);
+    unsubscribers.forEach((unsubscribe) => unsubscribe());
   };
 }
 
@@ -673,8 +873,8 @@ export async function closeConversationsForRequest(
   closedReason: string = "تم قبول عرض آخر على هذا الطلب",
 ): Promise<{ closedCount: number; systemMessagesSent: number }> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return { closedCount: 0, systemMessagesSent: 0 };
+    const userId = await getSessionUserId();
+    if (!userId) return { closedCount: 0, systemMessagesSent: 0 };
 
     // جلب جميع المحادثات المرتبطة بالطلب
     const { data: conversations, error } = await supabase
@@ -734,15 +934,15 @@ export async function sendSystemMessage(
   content: string,
 ): Promise<Message | null> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return null;
+    const userId = await getSessionUserId();
+    if (!userId) return null;
 
     // إرسال الرسالة باسم النظام (نستخدم معرف المستخدم الحالي مع علامة خاصة في المحتوى)
     const { data, error } = await supabase
       .from("messages")
       .insert({
         conversation_id: conversationId,
-        sender_id: user.id,
+        sender_id: userId,
         content: content,
         is_read: false,
       })
@@ -814,15 +1014,12 @@ export async function getConversationClosedReason(
 // File Upload Functions
 // ==========================================
 
-/**
- * Generate unique file name
- */
-function generateFileName(originalName: string, prefix: string): string {
-  const timestamp = Date.now();
-  const randomString = Math.random().toString(36).substring(2, 8);
-  const extension = originalName.split(".").pop() || "file";
-  return `${prefix}/${timestamp}-${randomString}.${extension}`;
-}
+const getAttachmentType = (mimeType: string): MessageAttachment["file_type"] => {
+  if (mimeType.startsWith("image/")) return "image";
+  if (mimeType.startsWith("video/")) return "video";
+  if (mimeType.startsWith("audio/")) return "audio";
+  return "document";
+};
 
 /**
  * Upload a file attachment for messages
@@ -831,71 +1028,36 @@ export async function uploadMessageAttachment(
   file: File,
   conversationId: string,
 ): Promise<MessageAttachment | null> {
-  try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return null;
-
-    const filePath = generateFileName(
-      file.name,
-      `${conversationId}/${user.id}`,
-    );
-
-    const { data, error } = await supabase.storage
-      .from(MESSAGE_ATTACHMENTS_BUCKET)
-      .upload(filePath, file, {
-        cacheControl: "3600",
-        upsert: false,
-      });
-
-    if (error) {
-      logger.error("Upload error:", error, "service");
-      return null;
-    }
-
-    // Get public URL
-    const { data: urlData } = supabase.storage
-      .from(MESSAGE_ATTACHMENTS_BUCKET)
-      .getPublicUrl(data.path);
-
-    // Determine file type
-    let fileType: MessageAttachment["file_type"] = "document";
-    if (file.type.startsWith("image/")) {
-      fileType = "image";
-    } else if (file.type.startsWith("video/")) {
-      fileType = "video";
-    } else if (file.type.startsWith("audio/")) {
-      fileType = "audio";
-    }
-
-    return {
-      file_url: urlData.publicUrl,
-      file_name: file.name,
-      file_type: fileType,
-      file_size: file.size,
-    };
-  } catch (error) {
-    logger.error("Error uploading attachment:", error, "service");
-    return null;
-  }
+  const [attachment] = await uploadMessageAttachments([file], conversationId);
+  return attachment || null;
 }
 
 /**
  * Upload multiple file attachments
+ * Images are compressed in a worker and files go up in parallel (uploadService)
  */
 export async function uploadMessageAttachments(
   files: File[],
   conversationId: string,
+  onProgress?: (progress: UploadProgress) => void,
 ): Promise<MessageAttachment[]> {
-  const attachments: MessageAttachment[] = [];
-
-  for (const file of files) {
-    const attachment = await uploadMessageAttachment(file, conversationId);
-    if (attachment) {
-      attachments.push(attachment);
-    }
-  }
-
-  return attachments;
+  const userId = await getSessionUserId();
+  if (!userId) return [];
+
+  const results = await uploadFiles(files, {
+    bucket: MESSAGE_ATTACHMENTS_BUCKET,
+    prefix: `${conversationId}/${userId}`,
+    onProgress,
+  });
+
+  return results
+    .filter((r): r is UploadedFile => r !== null)
+    .map((r) => ({
+      file_url: r.url,
+      file_name: r.name,
+      file_type: getAttachmentType(r.type),
+      file_size: r.size,
+    }));
 }
 
 /**
@@ -907,11 +1069,11 @@ export async function uploadVoiceMessage(
   duration: number,
 ): Promise<{ url: string; duration: number } | null> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return null;
+    const userId = await getSessionUserId();
+    if (!userId) return null;
 
     const timestamp = Date.now();
-    const filePath = `${conversationId}/${user.id}/${timestamp}.webm`;
+    const filePath = `${conversationId}/${userId}/${timestamp}.webm`;
 
     const { data, error } = await supabase.storage
       .from(VOICE_MESSAGES_BUCKET)
@@ -947,111 +1109,72 @@ export async function uploadVoiceMessage(
 
 /**
  * Get total unread messages count for current user
+ * Reads the trigger-maintained counter row (see unreadCountersService)
  */
 export async function getTotalUnreadMessagesCount(): Promise<number> {
-  try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return 0;
-
-    // Get all conversations for the user
-    const { data: conversations, error: convError } = await supabase
-      .from("conversations")
-      .select("id")
-      .or(`participant1_id.eq.${user.id},participant2_id.eq.${user.id}`);
-
-    if (convError || !conversations || conversations.length === 0) return 0;
-
-    const conversationIds = conversations.map((c) => c.id);
-
-    // Count unread messages across all conversations
-    const { count, error: countError } = await supabase
-      .from("messages")
-      .select("*", { count: "exact", head: true })
-      .in("conversation_id", conversationIds)
-      .eq("is_read", false)
-      .neq("sender_id", user.id);
-
-    if (countError) return 0;
-    return count || 0;
-  } catch (error) {
-    logger.error("Error getting unread count:", error, "service");
-    return 0;
-  }
+  const counters = await getUnreadCounters();
+  return counters.messages;
 }
 
 /**
  * Subscribe to unread messages count changes
+ * Listens only to the user's own counter row (filtered by user_id), which the
+ * triggers update for conversations the user participates in; the new count
+ * arrives in the payload, so no recount round trips.
  */
 export function subscribeToUnreadCount(
   userId: string,
   callback: (count: number) => void,
 ) {
-  // Initial count
-  getTotalUnreadMessagesCount().then(callback);
-
-  // Subscribe to message changes
-  const channel = supabase
-    .channel(`unread-messages:${userId}`)
-    .on(
-      "postgres_changes",
-      {
-        event: "*",
-        schema: "public",
-        table: "messages",
-      },
-      async () => {
-        // Recalculate count on any message change
-        const count = await getTotalUnreadMessagesCount();
-        callback(count);
-      },
-    )
-    .subscribe();
+  let lastCount: number | null = null;
+
+  // The row also carries notification/interest counters: only emit message changes
+  return subscribeToUnreadCounters(userId, (counters) => {
+    if (counters.messages === lastCount) return;
+    lastCount = counters.messages;
+    callback(counters.messages);
+  });
+}
 
-  return () => {
-    supabase.removeChannel(channel);
-  };
+/**
+ * Subscribe to per-conversation unread counts for a user
+ * (conversation_unread_counters rows filtered by user_id)
+ */
+export function subscribeToConversationUnreadCounts(
+  userId: string,
+  callback: (conversationId: string, unreadCount: number) => void,
+) {
+  return subscribeToTable(
+    {
+      table: "conversation_unread_counters",
+      filter: `user_id=eq.${userId}`,
+    },
+    (payload) => {
+      if (payload.eventType === "DELETE") {
+        const old = payload.old as { conversation_id?: string };
+        if (old?.conversation_id) callback(old.conversation_id, 0);
+        return;
+      }
+      const row = payload.new as {
+        conversation_id: string;
+        unread_count: number | null;
+      };
+      callback(row.conversation_id, row.unread_count || 0);
+    },
+  );
 }
 
 /**
  * Get unread messages count for user's requests
  * Counts messages in conversations linked to user's requests
+ * (counter row is maintained by triggers; the ids only short-circuit the no-requests case)
  */
 export async function getUnreadMessagesForMyRequests(
   userRequestIds: string[],
 ): Promise<number> {
-  try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user || !userRequestIds || userRequestIds.length === 0) return 0;
-
-    // Get conversations linked to user's requests
-    const { data: conversations, error: convError } = await supabase
-      .from("conversations")
-      .select("id")
-      .in("request_id", userRequestIds)
-      .or(`participant1_id.eq.${user.id},participant2_id.eq.${user.id}`);
-
-    if (convError || !conversations || conversations.length === 0) return 0;
-
-    const conversationIds = conversations.map((c) => c.id);
-
-    // Count unread messages in these conversations
-    const { count, error: countError } = await supabase
-      .from("messages")
-      .select("*", { count: "exact", head: true })
-      .in("conversation_id", conversationIds)
-      .eq("is_read", false)
-      .neq("sender_id", user.id);
-
-    if (countError) return 0;
-    return count || 0;
-  } catch (error) {
-    logger.error(
-      "Error getting unread messages for my requests:",
-      error,
-      "service",
-    );
-    return 0;
-  }
+  if (!userRequestIds || userRequestIds.length === 0) return 0;
+  const counters = await getUnreadCounters();
+  return counters.messagesForMyRequests;
 }
 
 /**
@@ -1061,39 +1184,37 @@ export async function getUnreadMessagesForMyRequests(
 export async function getUnreadMessagesForMyOffers(
   userOfferIds: string[],
 ): Promise<number> {
-  try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user || !userOfferIds || userOfferIds.length === 0) return 0;
-
-    // Get conversations linked to user's offers
-    const { data: conversations, error: convError } = await supabase
-      .from("conversations")
-      .select("id")
-      .in("offer_id", userOfferIds)
-      .or(`participant1_id.eq.${user.id},participant2_id.eq.${user.id}`);
-
-    if (convError || !conversations || conversations.length === 0) return 0;
-
-    const conversationIds = conversations.map((c) => c.id);
-
-    // Count unread messages in these conversations
-    const { count, error: countError } = await supabase
-      .from("messages")
-      .select("*", { count: "exact", head: true })
-      .in("conversation_id", conversationIds)
-      .eq("is_read", false)
-      .neq("sender_id", user.id);
+  if (!userOfferIds || userOfferIds.length === 0) return 0;
+  const counters = await getUnreadCounters();
+  return counters.messagesForMyOffers;
+}
 
-    if (countError) return 0;
-    return count || 0;
-  } catch (error) {
-    logger.error(
-      "Error getting unread messages for my offers:",
-      error,
-      "service",
-    );
-    return 0;
-  }
+/**
+ * Sum per-conversation unread counters by request_id / offer_id
+ */
+async function getUnreadCountsGroupedBy(
+  column: "request_id" | "offer_id",
+  ids: string[],
+): Promise<Map<string, number>> {
+  const userId = await getSessionUserId();
+  if (!userId || !ids || ids.length === 0) return new Map();
+
+  const { data, error } = await supabase
+    .from("conversation_unread_counters")
+    .select(`${column}, unread_count`)
+    .eq("user_id", userId)
+    .in(column, ids)
+    .gt("unread_count", 0);
+
+  if (error) throw error;
+
+  const result = new Map<string, number>();
+  (data || []).forEach((row: Record<string, any>) => {
+    const key = row[column] as string | null;
+    if (!key) return;
+    result.set(key, (result.get(key) || 0) + (row.unread_count || 0));
+  });
+  return result;
 }
 
 /**
@@ -1104,54 +1225,7 @@ export async function getUnreadMessagesPerRequest(
   userRequestIds: string[],
 ): Promise<Map<string, number>> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user || !userRequestIds || userRequestIds.length === 0) {
-      return new Map();
-    }
-
-    // Get conversations linked to user's requests with request_id
-    const { data: conversations, error: convError } = await supabase
-      .from("conversations")
-      .select("id, request_id")
-      .in("request_id", userRequestIds)
-      .or(`participant1_id.eq.${user.id},participant2_id.eq.${user.id}`);
-
-    if (convError || !conversations || conversations.length === 0) {
-      return new Map();
-    }
-
-    const conversationIds = conversations.map((c) => c.id);
-    const requestIdToConvIds = new Map<string, string[]>();
-    conversations.forEach((conv) => {
-      if (conv.request_id) {
-        const existing = requestIdToConvIds.get(conv.request_id) || [];
-        existing.push(conv.id);
-        requestIdToConvIds.set(conv.request_id, existing);
-      }
-    });
-
-    // Get unread messages per conversation
-    const { data: messages, error: messagesError } = await supabase
-      .from("messages")
-      .select("conversation_id")
-      .in("conversation_id", conversationIds)
-      .eq("is_read", false)
-      .neq("sender_id", user.id);
-
-    if (messagesError) return new Map();
-
-    // Count messages per request
-    const result = new Map<string, number>();
-    requestIdToConvIds.forEach((convIds, requestId) => {
-      const count = (messages || []).filter((m) =>
-        convIds.includes(m.conversation_id)
-      ).length;
-      if (count > 0) {
-        result.set(requestId, count);
-      }
-    });
-
-    return result;
+    return await getUnreadCountsGroupedBy("request_id", userRequestIds);
   } catch (error) {
     logger.error(
       "Error getting unread messages per request:",
@@ -1170,52 +1244,7 @@ export async function getUnreadMessagesPerOffer(
   userOfferIds: string[],
 ): Promise<Map<string, number>> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user || !userOfferIds || userOfferIds.length === 0) return new Map();
-
-    // Get conversations linked to user's offers with offer_id
-    const { data: conversations, error: convError } = await supabase
-      .from("conversations")
-      .select("id, offer_id")
-      .in("offer_id", userOfferIds)
-      .or(`participant1_id.eq.${user.id},participant2_id.eq.${user.id}`);
-
-    if (convError || !conversations || conversations.length === 0) {
-      return new Map();
-    }
-
-    const conversationIds = conversations.map((c) => c.id);
-    const offerIdToConvIds = new Map<string, string[]>();
-    conversations.forEach((conv) => {
-      if (conv.offer_id) {
-        const existing = offerIdToConvIds.get(conv.offer_id) || [];
-        existing.push(conv.id);
-        offerIdToConvIds.set(conv.offer_id, existing);
-      }
-    });
-
-    // Get unread messages per conversation
-    const { data: messages, error: messagesError } = await supabase
-      .from("messages")
-      .select("conversation_id")
-      .in("conversation_id", conversationIds)
-      .eq("is_read", false)
-      .neq("sender_id", user.id);
-
-    if (messagesError) return new Map();
-
-    // Count messages per offer
-    const result = new Map<string, number>();
-    offerIdToConvIds.forEach((convIds, offerId) => {
-      const count = (messages || []).filter((m) =>
-        convIds.includes(m.conversation_id)
-      ).length;
-      if (count > 0) {
-        result.set(offerId, count);
-      }
-    });
-
-    return result;
+    return await getUnreadCountsGroupedBy("offer_id", userOfferIds);
   } catch (error) {
     logger.error("Error getting unread messages per offer:", error, "service");
     return new Map();
@@ -1,126 +1,154 @@
 import { supabase } from './supabaseClient';
 import { Notification } from '../types';
+import { getUnreadCounters } from './unreadCountersService';
+import { createBatchLoader } from '../utils/batchLoader';
+import { getProfiles } from './profileCacheService';
+import { subscribeToTable } from './realtimeService';
+import { getSessionUserId } from './sessionService';
 
 // ==========================================
 // Notifications
 // ==========================================
 
+// ==========================================
+// Notification display data
+// ==========================================
+// notifications.payload يُكتب عند الإدراج (supabase/NOTIFICATION_PAYLOAD.sql):
+// { request: {id,title,authorName}, offer: {id,title,providerName,status},
+//   message: {id,senderName,preview} }
+// الصفوف القديمة بدون payload تُكمَّل عبر loaders مجمّعة (استعلام .in() واحد لكل جدول)
+// والأسماء من كاش البروفايلات المشترك (profileCacheService)
+
+interface NotificationPayload {
+  request?: { id: string; title: string; authorName?: string };
+  offer?: { id: string; title: string; providerName: string; status?: string };
+  message?: { id: string; senderName?: string; preview: string };
+}
+
+interface NotificationRow {
+  id: string;
+  type: string;
+  title: string;
+  message: string;
+  created_at: string;
+  is_read: boolean;
+  link_to: string | null;
+  related_request_id: string | null;
+  related_offer_id: string | null;
+  related_message_id: string | null;
+  payload?: NotificationPayload | null;
+}
+
+const makePreview = (content: string | null | undefined) => {
+  const text = content || '';
+  return text.substring(0, 50) + (text.length > 50 ? '...' : '');
+};
+
+const requestLoader = createBatchLoader<string, NonNullable<NotificationPayload['request']>>(async (ids) => {
+  const { data } = await supabase.from('requests').select('id, title, author_id').in('id', ids);
+  const rows = data || [];
+  const authors = await getProfiles(rows.map((r) => r.author_id));
+  return new Map(rows.map((r) => [r.id, {
+    id: r.id,
+    title: r.title,
+    authorName: authors.get(r.author_id)?.display_name || undefined,
+  }]));
+});
+
+const offerLoader = createBatchLoader<string, NonNullable<NotificationPayload['offer']>>(async (ids) => {
+  const { data } = await supabase.from('offers').select('id, title, provider_name, status').in('id', ids);
+  return new Map((data || []).map((o) => [o.id, {
+    id: o.id,
+    title: o.title,
+    providerName: o.provider_name,
+    status: o.status,
+  }]));
+});
+
+const messageLoader = createBatchLoader<string, NonNullable<NotificationPayload['message']>>(async (ids) => {
+  const { data } = await supabase.from('messages').select('id, content, sender_id').in('id', ids);
+  const rows = data || [];
+  const senders = await getProfiles(rows.map((m) => m.sender_id));
+  return new Map(rows.map((m) => [m.id, {
+    id: m.id,
+    senderName: senders.get(m.sender_id)?.display_name || undefined,
+    preview: makePreview(m.content),
+  }]));
+});
+
+/**
+ * Resolve display data for a notification row
+ * Uses the stored payload; only rows written before it existed hit the loaders.
+ * offerExists = false when the related offer was deleted; offerArchived when archived.
+ */
+async function resolveNotification(
+  row: NotificationRow,
+): Promise<{ notification: Notification; offerExists: boolean; offerArchived: boolean }> {
+  const payload = row.payload || null;
+
+  const [request, offer, message] = await Promise.all([
+    row.related_request_id
+      ? payload ? payload.request : requestLoader.load(row.related_request_id)
+      : undefined,
+    row.related_offer_id
+      ? payload ? payload.offer : offerLoader.load(row.related_offer_id)
+      : undefined,
+    row.related_message_id
+      ? payload ? payload.message : messageLoader.load(row.related_message_id)
+      : undefined,
+  ]);
+
+  const offerArchived = offer?.status === 'archived';
+
+  return {
+    offerExists: !row.related_offer_id || !!offer,
+    offerArchived,
+    notification: {
+      id: row.id,
+      type: row.type as Notification['type'],
+      title: row.title,
+      message: row.message,
+      timestamp: new Date(row.created_at),
+      isRead: row.is_read,
+      linkTo: row.link_to || undefined,
+      relatedRequest: request
+        ? { id: request.id, title: request.title, authorName: request.authorName || undefined }
+        : undefined,
+      relatedOffer: offer && !offerArchived
+        ? { id: offer.id, title: offer.title, providerName: offer.providerName }
+        : undefined,
+      relatedMessage: message
+        ? { id: message.id, senderName: message.senderName || 'مستخدم', preview: message.preview }
+        : undefined,
+    },
+  };
+}
+
 /**
  * Get all notifications for current user
  */
 export async function getNotifications(limit = 50): Promise<Notification[]> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return [];
+    const userId = await getSessionUserId();
+    if (!userId) return [];
 
-    // Fetch notifications without explicit foreign key joins to avoid PGRST200 errors
     const { data: notificationsData, error: notificationsError } = await supabase
       .from('notifications')
       .select('*')
-      .eq('user_id', user.id)
+      .eq('user_id', userId)
       .order('created_at', { ascending: false })
       .limit(limit);
 
     if (notificationsError) throw notificationsError;
 
-    // Collect related IDs
-    const requestIds = [...new Set((notificationsData || []).map(n => n.related_request_id).filter(Boolean))];
-    const offerIds = [...new Set((notificationsData || []).map(n => n.related_offer_id).filter(Boolean))];
-    const messageIds = [...new Set((notificationsData || []).map(n => n.related_message_id).filter(Boolean))];
-
-    // Fetch related data separately
-    let requestsMap: Record<string, any> = {};
-    let offersMap: Record<string, any> = {};
-    let messagesMap: Record<string, any> = {};
-    let profilesMap: Record<string, any> = {};
-
-    if (requestIds.length > 0) {
-      const { data: requests } = await supabase
-        .from('requests')
-        .select('id, title, author_id')
-        .in('id', requestIds);
-      (requests || []).forEach(r => { requestsMap[r.id] = r; });
-      
-      // Fetch author profiles
-      const authorIds = [...new Set((requests || []).map(r => r.author_id).filter(Boolean))];
-      if (authorIds.length > 0) {
-        const { data: authors } = await supabase.from('profiles').select('id, display_name').in('id', authorIds);
-        (authors || []).forEach(p => { profilesMap[p.id] = p; });
-      }
-    }
-
-    if (offerIds.length > 0) {
-      const { data: offers } = await supabase
-        .from('offers')
-        .select('id, title, provider_name, status')
-        .in('id', offerIds);
-      (offers || []).forEach(o => { offersMap[o.id] = o; });
-    }
-
-    if (messageIds.length > 0) {
-      const { data: messages } = await supabase
-        .from('messages')
-        .select('id, content, sender_id')
-        .in('id', messageIds);
-      (messages || []).forEach(m => { messagesMap[m.id] = m; });
-      
-      // Fetch sender profiles
-      const senderIds = [...new Set((messages || []).map(m => m.sender_id).filter(Boolean))];
-      if (senderIds.length > 0) {
-        const { data: senders } = await supabase.from('profiles').select('id, display_name').in('id', senderIds);
-        (senders || []).forEach(p => { profilesMap[p.id] = p; });
-      }
-    }
+    const resolved = await Promise.all(
+      (notificationsData || []).map((n) => resolveNotification(n as NotificationRow))
+    );
 
-    // Transform data and filter out notifications with archived/deleted offers
-    const data = (notificationsData || []).map(n => {
-      const request = requestsMap[n.related_request_id];
-      const offer = offersMap[n.related_offer_id];
-      const message = messagesMap[n.related_message_id];
-      
-      // استثناء الإشعارات المرتبطة بعروض مؤرشفة أو محذوفة
-      if (n.related_offer_id && !offer) {
-        return null; // العرض مؤرشف أو محذوف
-      }
-      
-      return {
-        ...n,
-        related_request: request ? {
-          ...request,
-          author: profilesMap[request.author_id] || null
-        } : null,
-        related_offer: offer || null,
-        related_message: message ? {
-          ...message,
-          sender: profilesMap[message.sender_id] || null
-        } : null,
-      };
-    }).filter(Boolean); // إزالة القيم null
-
-    return (data || []).map((n: any) => ({
-      id: n.id,
-      type: n.type as Notification['type'],
-      title: n.title,
-      message: n.message,
-      timestamp: new Date(n.created_at),
-      isRead: n.is_read,
-      linkTo: n.link_to || undefined,
-      relatedRequest: n.related_request ? {
-        id: n.related_request.id,
-        title: n.related_request.title,
-        authorName: n.related_request.author?.display_name || undefined,
-      } : undefined,
-      relatedOffer: n.related_offer ? {
-        id: n.related_offer.id,
-        title: n.related_offer.title,
-        providerName: n.related_offer.provider_name,
-      } : undefined,
-      relatedMessage: n.related_message ? {
-        id: n.related_message.id,
-        senderName: n.related_message.sender?.display_name || 'مستخدم',
-        preview: n.related_message.content.substring(0, 50) + (n.related_message.content.length > 50 ? '...' : ''),
-      } : undefined,
-    }));
+    // استثناء الإشعارات المرتبطة بعروض محذوفة
+    return resolved
+      .filter((r) => r.offerExists)
+      .map((r) => r.notification);
   } catch (error) {
     console.error('Error fetching notifications:', error);
     return [];
@@ -129,25 +157,11 @@ export async function getNotifications(limit = 50): Promise<Notification[]> {
 
 /**
  * Get unread notifications count
+ * Reads the trigger-maintained counter row instead of COUNT(*)
  */
 export async function getUnreadNotificationsCount(): Promise<number> {
-  try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return 0;
-
-    const { count, error } = await supabase
-      .from('notifications')
-      .select('*', { count: 'exact', head: true })
-      .eq('user_id', user.id)
-      .eq('is_read', false);
-
-    if (error) throw error;
-
-    return count || 0;
-  } catch (error) {
-    console.error('Error getting unread count:', error);
-    return 0;
-  }
+  const counters = await getUnreadCounters();
+  return counters.notifications;
 }
 
 /**
@@ -155,8 +169,8 @@ export async function getUnreadNotificationsCount(): Promise<number> {
  */
 export async function markNotificationAsRead(notificationId: string): Promise<boolean> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return false;
+    const userId = await getSessionUserId();
+    if (!userId) return false;
 
     const { error } = await supabase
       .from('notifications')
@@ -165,7 +179,7 @@ export async function markNotificationAsRead(notificationId: string): Promise<bo
         read_at: new Date().toISOString(),
       })
       .eq('id', notificationId)
-      .eq('user_id', user.id);
+      .eq('user_id', userId);
 
     if (error) throw error;
 
@@ -181,8 +195,8 @@ export async function markNotificationAsRead(notificationId: string): Promise<bo
  */
 export async function markAllNotificationsAsRead(): Promise<boolean> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return false;
+    const userId = await getSessionUserId();
+    if (!userId) return false;
 
     const { error } = await supabase
       .from('notifications')
@@ -190,7 +204,7 @@ export async function markAllNotificationsAsRead(): Promise<boolean> {
         is_read: true,
         read_at: new Date().toISOString(),
       })
-      .eq('user_id', user.id)
+      .eq('user_id', userId)
       .eq('is_read', false);
 
     if (error) throw error;
@@ -207,14 +221,14 @@ export async function markAllNotificationsAsRead(): Promise<boolean> {
  */
 export async function deleteNotification(notificationId: string): Promise<boolean> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return false;
+    const userId = await getSessionUserId();
+    if (!userId) return false;
 
     const { error } = await supabase
       .from('notifications')
       .delete()
       .eq('id', notificationId)
-      .eq('user_id', user.id);
+      .eq('user_id', userId);
 
     if (error) throw error;
 
@@ -230,13 +244,13 @@ export async function deleteNotification(notificationId: string): Promise<boolea
  */
 export async function clearAllNotifications(): Promise<boolean> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return false;
+    const userId = await getSessionUserId();
+    if (!userId) return false;
 
     const { error } = await supabase
       .from('notifications')
       .delete()
-      .eq('user_id', user.id);
+      .eq('user_id', userId);
 
     if (error) throw error;
 
@@ -293,182 +307,41 @@ export function subscribeToNotifications(
   callback: (notification: Notification) => void,
   onUpdate?: (notification: Notification) => void
 ) {
-  const channel = supabase
-    .channel(`notifications:${userId}`)
-    .on(
-      'postgres_changes',
-      {
-        event: 'INSERT',
-        schema: 'public',
-        table: 'notifications',
-        filter: `user_id=eq.${userId}`,
-      },
-      async (payload) => {
-        const n = payload.new as any;
-        
-        // Fetch notification data without foreign key joins
-        const { data: notif } = await supabase
-          .from('notifications')
-          .select('*')
-          .eq('id', n.id)
-          .single();
-
-        if (!notif) return;
-
-        // Fetch related data if needed
-        let relatedRequest: any = undefined;
-        let relatedOffer: any = undefined;
-        let relatedMessage: any = undefined;
-
-        if (notif.related_request_id) {
-          const { data: req } = await supabase.from('requests').select('id, title, author_id').eq('id', notif.related_request_id).single();
-          if (req) {
-            let authorName: string | undefined;
-            if (req.author_id) {
-              const { data: author } = await supabase.from('profiles').select('display_name').eq('id', req.author_id).single();
-              authorName = author?.display_name || undefined;
-            }
-            relatedRequest = { id: req.id, title: req.title, authorName };
-          }
-        }
-
-        if (notif.related_offer_id) {
-          const { data: offer } = await supabase
-            .from('offers')
-            .select('id, title, provider_name, status')
-            .eq('id', notif.related_offer_id)
-            .neq('status', 'archived') // استثناء العروض المؤرشفة
-            .single();
-          if (offer) {
-            relatedOffer = { id: offer.id, title: offer.title, providerName: offer.provider_name };
-          } else {
-            // العرض مؤرشف أو محذوف، لا نرسل الإشعار
-            return;
-          }
-        }
-
-        if (notif.related_message_id) {
-          const { data: msg } = await supabase.from('messages').select('id, content, sender_id').eq('id', notif.related_message_id).single();
-          if (msg) {
-            let senderName = 'مستخدم';
-            if (msg.sender_id) {
-              const { data: sender } = await supabase.from('profiles').select('display_name').eq('id', msg.sender_id).single();
-              senderName = sender?.display_name || 'مستخدم';
-            }
-            relatedMessage = {
-              id: msg.id,
-              senderName,
-              preview: msg.content.substring(0, 50) + (msg.content.length > 50 ? '...' : ''),
-            };
-          }
-        }
-
-        callback({
-          id: notif.id,
-          type: notif.type as Notification['type'],
-          title: notif.title,
-          message: notif.message,
-          timestamp: new Date(notif.created_at),
-          isRead: notif.is_read,
-          linkTo: notif.link_to || undefined,
-          relatedRequest,
-          relatedOffer,
-          relatedMessage,
-        });
-      }
-    )
-    .on(
-      'postgres_changes',
-      {
-        event: 'UPDATE',
-        schema: 'public',
-        table: 'notifications',
-        filter: `user_id=eq.${userId}`,
-      },
-      async (payload) => {
-        const n = payload.new as any;
-        
-        // Fetch notification data without foreign key joins
-        const { data: notif } = await supabase
-          .from('notifications')
-          .select('*')
-          .eq('id', n.id)
-          .single();
-
-        if (!notif) return;
-
-        // Fetch related data if needed
-        let relatedRequest: any = undefined;
-        let relatedOffer: any = undefined;
-        let relatedMessage: any = undefined;
-
-        if (notif.related_request_id) {
-          const { data: req } = await supabase.from('requests').select('id, title, author_id').eq('id', notif.related_request_id).single();
-          if (req) {
-            let authorName: string | undefined;
-            if (req.author_id) {
-              const { data: author } = await supabase.from('profiles').select('display_name').eq('id', req.author_id).single();
-              authorName = author?.display_name || undefined;
-            }
-            relatedRequest = { id: req.id, title: req.title, authorName };
-          }
-        }
-
-        if (notif.related_offer_id) {
-          const { data: offer } = await supabase
-            .from('offers')
-            .select('id, title, provider_name, status')
-            .eq('id', notif.related_offer_id)
-            .neq('status', 'archived')
-            .single();
-          if (offer) {
-            relatedOffer = { id: offer.id, title: offer.title, providerName: offer.provider_name };
-          }
-        }
-
-        if (notif.related_message_id) {
-          const { data: msg } = await supabase.from('messages').select('id, content, sender_id').eq('id', notif.related_message_id).single();
-          if (msg) {
-            let senderName = 'مستخدم';
-            if (msg.sender_id) {
-              const { data: sender } = await supabase.from('profiles').select('display_name').eq('id', msg.sender_id).single();
-              senderName = sender?.display_name || 'مستخدم';
-            }
-            relatedMessage = {
-              id: msg.id,
-              senderName,
-              preview: msg.content.substring(0, 50) + (msg.content.length > 50 ? '...' : ''),
-            };
-          }
-        }
-
-        // إرسال الإشعار المحدث (خاصة عند تغيير is_read)
-        const updatedNotification: Notification = {
-          id: notif.id,
-          type: notif.type as Notification['type'],
-          title: notif.title,
-          message: notif.message,
-          timestamp: new Date(notif.created_at),
-          isRead: notif.is_read,
-          linkTo: notif.link_to || undefined,
-          relatedRequest,
-          relatedOffer,
-          relatedMessage,
-        };
-        
-        // استدعاء callback التحديث إذا كان موجوداً
-        if (onUpdate) {
-          onUpdate(updatedNotification);
-        } else {
-          // إذا لم يكن هناك callback منفصل، استخدم نفس callback
-          callback(updatedNotification);
-        }
+  // payload.new is the full row (including the denormalized payload),
+  // so there is no need to re-read the notification itself
+  const filter = `user_id=eq.${userId}`;
+  const unsubscribeInserts = subscribeToTable(
+    { table: 'notifications', event: 'INSERT', filter },
+    async (payload) => {
+      const { notification, offerExists, offerArchived } =
+        await resolveNotification(payload.new as NotificationRow);
+
+      // العرض مؤرشف أو محذوف، لا نرسل الإشعار
+      if (!offerExists || offerArchived) return;
+
+      callback(notification);
+    }
+  );
+
+  const unsubscribeUpdates = subscribeToTable(
+    { table: 'notifications', event: 'UPDATE', filter },
+    async (payload) => {
+      // إرسال الإشعار المحدث (خاصة عند تغيير is_read)
+      const { notification } = await resolveNotification(payload.new as NotificationRow);
+
+      // استدعاء callback التحديث إذا كان موجوداً
+      if (onUpdate) {
+        onUpdate(notification);
+      } else {
+        // إذا لم يكن هناك callback منفصل، استخدم نفس callback
+        callback(notification);
       }
-    )
-    .subscribe();
+    }
+  );
 
   return () => {
-    supabase.removeChannel(channel);
+    unsubscribeInserts();
+    unsubscribeUpdates();
   };
 }
 
@@ -3,6 +3,10 @@
  * خدمة البحث عن المدن والمواقع باستخدام Google Places API
  */
 
+import { normalizeArabic, normalizeCityKey } from '../utils/arabicNormalize';
+import { capacitorStorage } from './capacitorStorage';
+import { logger } from '../utils/logger';
+
 // Type definitions for Google Places
 export interface PlacePrediction {
   place_id: string;
@@ -44,6 +48,31 @@ export interface CityResult {
   placeTypeArabic?: string; // نوع المكان بالعربي
 }
 
+export interface PlacesSearchOptions {
+  /** Abort when the query changes - the promise rejects with an AbortError */
+  signal?: AbortSignal;
+}
+
+export interface PlacesLatencyStats {
+  count: number;
+  p50: number;
+  p95: number;
+}
+
+export interface PlacesSearchStats {
+  localHits: number;
+  cacheHits: number;
+  remoteCalls: number;
+  remoteErrors: number;
+  cancelled: number;
+  cacheSize: number;
+  latencyMs: {
+    local: PlacesLatencyStats;
+    cache: PlacesLatencyStats;
+    remote: PlacesLatencyStats;
+  };
+}
+
 /**
  * تحويل أنواع Google Places إلى أسماء عربية
  */
@@ -212,19 +241,315 @@ const getPlaceTypeArabic = (types: string[]): { type: string; arabicType: string
   return { type: types[0] || 'unknown', arabicType: '' };
 };
 
-// مدن سعودية افتراضية للـ fallback
-export const DEFAULT_SAUDI_CITIES = [
-  "الرياض", "جدة", "مكة المكرمة", "المدينة المنورة", "الدمام", 
-  "الخبر", "الظهران", "الأحساء", "الطائف", "تبوك",
-  "بريدة", "خميس مشيط", "أبها", "حائل", "نجران",
-  "جازان", "ينبع", "الجبيل", "القطيف", "الخرج",
-  "عنيزة", "الباحة", "سكاكا", "عرعر", "القريات",
-  "حفر الباطن", "رابغ", "المجمعة", "القنفذة", "بيشة"
+export interface SaudiCity {
+  id: string;
+  nameAr: string;
+  nameEn: string;
+  aliases: string[];
+  lat: number;
+  lng: number;
+}
+
+// جدول المدن الموحّد - مطابق لبيانات جدول cities في supabase/CITIES_SCHEMA.sql
+export const SAUDI_CITY_CATALOG: SaudiCity[] = [
+  { id: "riyadh", nameAr: "الرياض", nameEn: "Riyadh", aliases: [], lat: 24.7136, lng: 46.6753 },
+  { id: "jeddah", nameAr: "جدة", nameEn: "Jeddah", aliases: ["Jiddah"], lat: 21.4858, lng: 39.1925 },
+  { id: "makkah", nameAr: "مكة المكرمة", nameEn: "Makkah", aliases: ["مكة", "Mecca"], lat: 21.3891, lng: 39.8579 },
+  { id: "madinah", nameAr: "المدينة المنورة", nameEn: "Madinah", aliases: ["المدينة", "Medina"], lat: 24.5247, lng: 39.5692 },
+  { id: "dammam", nameAr: "الدمام", nameEn: "Dammam", aliases: [], lat: 26.4207, lng: 50.0888 },
+  { id: "khobar", nameAr: "الخبر", nameEn: "Khobar", aliases: ["Al Khobar"], lat: 26.2172, lng: 50.1971 },
+  { id: "dhahran", nameAr: "الظهران", nameEn: "Dhahran", aliases: [], lat: 26.2361, lng: 50.0393 },
+  { id: "al-ahsa", nameAr: "الأحساء", nameEn: "Al Ahsa", aliases: ["الهفوف", "Hofuf"], lat: 25.3838, lng: 49.5870 },
+  { id: "taif", nameAr: "الطائف", nameEn: "Taif", aliases: [], lat: 21.2703, lng: 40.4158 },
+  { id: "tabuk", nameAr: "تبوك", nameEn: "Tabuk", aliases: [], lat: 28.3835, lng: 36.5662 },
+  { id: "buraydah", nameAr: "بريدة", nameEn: "Buraydah", aliases: ["Buraidah"], lat: 26.3260, lng: 43.9750 },
+  { id: "khamis-mushait", nameAr: "خميس مشيط", nameEn: "Khamis Mushait", aliases: [], lat: 18.3060, lng: 42.7297 },
+  { id: "abha", nameAr: "أبها", nameEn: "Abha", aliases: [], lat: 18.2164, lng: 42.5053 },
+  { id: "hail", nameAr: "حائل", nameEn: "Hail", aliases: ["Ha'il"], lat: 27.5114, lng: 41.7208 },
+  { id: "najran", nameAr: "نجران", nameEn: "Najran", aliases: [], lat: 17.5656, lng: 44.2289 },
+  { id: "jazan", nameAr: "جازان", nameEn: "Jazan", aliases: ["جيزان", "Jizan"], lat: 16.8892, lng: 42.5511 },
+  { id: "yanbu", nameAr: "ينبع", nameEn: "Yanbu", aliases: [], lat: 24.0895, lng: 38.0618 },
+  { id: "jubail", nameAr: "الجبيل", nameEn: "Jubail", aliases: [], lat: 27.0046, lng: 49.6460 },
+  { id: "qatif", nameAr: "القطيف", nameEn: "Qatif", aliases: [], lat: 26.5654, lng: 49.9964 },
+  { id: "al-kharj", nameAr: "الخرج", nameEn: "Al Kharj", aliases: [], lat: 24.1556, lng: 47.3120 },
+  { id: "unaizah", nameAr: "عنيزة", nameEn: "Unaizah", aliases: [], lat: 26.0843, lng: 43.9930 },
+  { id: "al-baha", nameAr: "الباحة", nameEn: "Al Baha", aliases: [], lat: 20.0129, lng: 41.4677 },
+  { id: "sakaka", nameAr: "سكاكا", nameEn: "Sakaka", aliases: [], lat: 29.9697, lng: 40.2064 },
+  { id: "arar", nameAr: "عرعر", nameEn: "Arar", aliases: [], lat: 30.9753, lng: 41.0381 },
+  { id: "qurayyat", nameAr: "القريات", nameEn: "Qurayyat", aliases: [], lat: 31.3318, lng: 37.3428 },
+  { id: "hafar-al-batin", nameAr: "حفر الباطن", nameEn: "Hafar Al Batin", aliases: [], lat: 28.4328, lng: 45.9708 },
+  { id: "rabigh", nameAr: "رابغ", nameEn: "Rabigh", aliases: [], lat: 22.7986, lng: 39.0349 },
+  { id: "majmaah", nameAr: "المجمعة", nameEn: "Majmaah", aliases: [], lat: 25.9039, lng: 45.3456 },
+  { id: "qunfudhah", nameAr: "القنفذة", nameEn: "Al Qunfudhah", aliases: [], lat: 19.1264, lng: 41.0789 },
+  { id: "bisha", nameAr: "بيشة", nameEn: "Bisha", aliases: [], lat: 20.0005, lng: 42.6052 },
 ];
 
-// تخزين مؤقت للنتائج
+// مدن سعودية افتراضية للـ fallback
+export const DEFAULT_SAUDI_CITIES = SAUDI_CITY_CATALOG.map((city) => city.nameAr);
+
+// فهرس: مفتاح موحّد (عربي/إنجليزي/اسم بديل) -> id المدينة
+const cityIdByKey = new Map<string, string>();
+for (const city of SAUDI_CITY_CATALOG) {
+  for (const name of [city.nameAr, city.nameEn, ...city.aliases]) {
+    const key = normalizeCityKey(name);
+    if (key && !cityIdByKey.has(key)) cityIdByKey.set(key, city.id);
+  }
+}
+
+/**
+ * تحويل اسم مدينة أو عنوان كامل إلى id المدينة في جدول cities
+ * "حي النرجس، الرياض" -> "riyadh" ، "Mecca" -> "makkah"
+ * @returns null إذا لم تكن المدينة ضمن الجدول
+ */
+export const resolveCityId = (city: string | null | undefined): string | null => {
+  const key = normalizeCityKey(city);
+  return key ? cityIdByKey.get(key) || null : null;
+};
+
+// ==========================================
+// Local city index (trie)
+// ==========================================
+// معظم عمليات البحث تستهدف مدناً معروفة: trie على أسماء SAUDI_CITY_CATALOG
+// (عربي/إنجليزي/أسماء بديلة، بعد normalizeArabic) يجيب عن البادئات فوراً
+// بدون Google Places. كل كلمة في الاسم بداية صالحة ("مشيط" -> خميس مشيط)،
+// وكذلك الاسم بدون "ال" / "al " ("رياض" -> الرياض).
+
+const SAUDI_COUNTRY_NAME = 'المملكة العربية السعودية';
+const MAX_LOCAL_RESULTS = 8;
+
+interface CityTrieNode {
+  children: Map<string, CityTrieNode>;
+  /** Catalog indexes of every city reachable below this node */
+  cities: number[];
+}
+
+const newCityTrieNode = (): CityTrieNode => ({ children: new Map(), cities: [] });
+const cityTrie = newCityTrieNode();
+
+const stripArticle = (text: string): string =>
+  text.replace(/^(ال|al[ -])/, '');
+
+const cityIndexKeys = (name: string): string[] => {
+  const normalized = normalizeArabic(name);
+  const words = normalized.split(' ');
+  const keys = new Set<string>();
+  words.forEach((_, i) => {
+    const tail = words.slice(i).join(' ');
+    keys.add(tail);
+    keys.add(stripArticle(tail));
+  });
+  keys.delete('');
+  return Array.from(keys);
+};
+
+SAUDI_CITY_CATALOG.forEach((city, index) => {
+  for (const name of [city.nameAr, city.nameEn, ...city.aliases]) {
+    for (const key of cityIndexKeys(name)) {
+      let node = cityTrie;
+      for (const ch of key) {
+        let next = node.children.get(ch);
+        if (!next) {
+          next = newCityTrieNode();
+          node.children.set(ch, next);
+        }
+        node = next;
+        // Catalog order is insertion order - keep each list sorted and unique
+        if (node.cities[node.cities.length - 1] !== index) node.cities.push(index);
+      }
+    }
+  }
+});
+
+const toLocalCityResult = (city: SaudiCity): CityResult => ({
+  placeId: `local_${city.id}`,
+  name: city.nameAr,
+  fullAddress: `${city.nameAr}، ${SAUDI_COUNTRY_NAME}`,
+  city: city.nameAr,
+  country: SAUDI_COUNTRY_NAME,
+  lat: city.lat,
+  lng: city.lng,
+  placeType: 'locality',
+  placeTypeArabic: PLACE_TYPE_ARABIC_MAP.locality,
+});
+
+/**
+ * مدن الجدول التي تبدأ بالنص (أو إحدى كلماتها)، بترتيب الجدول
+ * "جد" -> جدة ، "mec" -> مكة المكرمة ، "مَشيط" -> خميس مشيط
+ */
+export const matchLocalCities = (query: string): CityResult[] => {
+  const key = normalizeArabic(query);
+  if (!key) return [];
+
+  let node: CityTrieNode | undefined = cityTrie;
+  for (const ch of key) {
+    node = node.children.get(ch);
+    if (!node) return [];
+  }
+  return node.cities
+    .slice(0, MAX_LOCAL_RESULTS)
+    .map((index) => toLocalCityResult(SAUDI_CITY_CATALOG[index]));
+};
+
+// ==========================================
+// Remote results cache (LRU, persisted)
+// ==========================================
+// - LRU محدود (MAX_CACHE_ENTRIES) - الـ Map تحفظ ترتيب الإدراج، فأول مفتاح = الأقدم
+// - يُحفظ في capacitorStorage ويُحمَّل عند أول بحث، فنتائج الجلسات السابقة
+//   لا تعيد طلب Google Places خلال CACHE_DURATION
+
+const CACHE_STORAGE_KEY = 'places_cache_v1';
+const MAX_CACHE_ENTRIES = 200;
+const CACHE_DURATION = 24 * 60 * 60 * 1000; // 24 ساعة
+const PERSIST_DELAY_MS = 2000;
+const LATENCY_WINDOW = 100;
+
+type PersistedPlacesEntry = [string, CityResult[], number];
+
 const cache = new Map<string, { results: CityResult[]; timestamp: number }>();
-const CACHE_DURATION = 5 * 60 * 1000; // 5 دقائق
+let cacheHydration: Promise<void> | null = null;
+let cachePersistTimer: ReturnType<typeof setTimeout> | null = null;
+
+const schedulePersist = () => {
+  if (cachePersistTimer !== null) return;
+  cachePersistTimer = setTimeout(() => {
+    cachePersistTimer = null;
+    const entries: PersistedPlacesEntry[] = Array.from(cache.entries()).map(
+      ([key, entry]) => [key, entry.results, entry.timestamp],
+    );
+    capacitorStorage.setItem(CACHE_STORAGE_KEY, JSON.stringify(entries)).catch(
+      (error) => logger.warn('Failed to persist places cache:', error),
+    );
+  }, PERSIST_DELAY_MS);
+};
+
+const ensureCacheHydrated = (): Promise<void> => {
+  if (!cacheHydration) {
+    cacheHydration = (async () => {
+      try {
+        const raw = await capacitorStorage.getItem(CACHE_STORAGE_KEY);
+        if (!raw) return;
+        const entries = JSON.parse(raw) as PersistedPlacesEntry[];
+        const cutoff = Date.now() - CACHE_DURATION;
+        // Anything cached while we were reading storage is newer - keep it on top
+        const live = Array.from(cache.entries());
+        cache.clear();
+        entries.forEach(([key, results, timestamp]) => {
+          if (key && Array.isArray(results) && timestamp >= cutoff) {
+            cache.set(key, { results, timestamp });
+          }
+        });
+        live.forEach(([key, entry]) => {
+          cache.delete(key);
+          cache.set(key, entry);
+        });
+        while (cache.size > MAX_CACHE_ENTRIES) {
+          const oldest = cache.keys().next().value;
+          if (oldest === undefined) break;
+          cache.delete(oldest);
+        }
+      } catch (error) {
+        logger.warn('Failed to load places cache:', error);
+      }
+    })();
+  }
+  return cacheHydration;
+};
+
+const getCached = (key: string): CityResult[] | null => {
+  const entry = cache.get(key);
+  if (!entry) return null;
+  cache.delete(key);
+  if (Date.now() - entry.timestamp >= CACHE_DURATION) {
+    schedulePersist();
+    return null;
+  }
+  cache.set(key, entry);
+  return entry.results;
+};
+
+const setCached = (key: string, results: CityResult[]) => {
+  cache.delete(key);
+  cache.set(key, { results, timestamp: Date.now() });
+  while (cache.size > MAX_CACHE_ENTRIES) {
+    const oldest = cache.keys().next().value;
+    if (oldest === undefined) break;
+    cache.delete(oldest);
+  }
+  schedulePersist();
+};
+
+// ==========================================
+// Metrics
+// ==========================================
+
+type SearchSource = 'local' | 'cache' | 'remote';
+
+const stats = { localHits: 0, cacheHits: 0, remoteCalls: 0, remoteErrors: 0, cancelled: 0 };
+const latencies: Record<SearchSource, number[]> = { local: [], cache: [], remote: [] };
+
+const recordSearch = (source: SearchSource, startedAt: number) => {
+  if (source === 'local') stats.localHits++;
+  else if (source === 'cache') stats.cacheHits++;
+  const samples = latencies[source];
+  samples.push(performance.now() - startedAt);
+  if (samples.length > LATENCY_WINDOW) samples.shift();
+};
+
+const summarizeLatency = (samples: number[]): PlacesLatencyStats => {
+  if (samples.length === 0) return { count: 0, p50: 0, p95: 0 };
+  const sorted = [...samples].sort((a, b) => a - b);
+  const at = (pct: number) =>
+    Math.round(sorted[Math.min(sorted.length - 1, Math.floor(pct * sorted.length))] * 10) / 10;
+  return { count: samples.length, p50: at(0.5), p95: at(0.95) };
+};
+
+/**
+ * إحصائيات البحث: مصدر النتائج، عدد طلبات Google، وزمن الاستجابة
+ * (آخر LATENCY_WINDOW عملية لكل مصدر)
+ */
+export const getPlacesSearchStats = (): PlacesSearchStats => ({
+  ...stats,
+  cacheSize: cache.size,
+  latencyMs: {
+    local: summarizeLatency(latencies.local),
+    cache: summarizeLatency(latencies.cache),
+    remote: summarizeLatency(latencies.remote),
+  },
+});
+
+// ==========================================
+// Cancellation
+// ==========================================
+
+const abortError = (): Error => {
+  const error = new Error('Places search cancelled');
+  error.name = 'AbortError';
+  return error;
+};
+
+/**
+ * هل الخطأ إلغاء بحث (استعلام أحدث حلّ محله)؟ المستدعي يتجاهله
+ */
+export const isSearchCancelled = (error: unknown): boolean =>
+  error instanceof Error && error.name === 'AbortError';
+
+const throwIfAborted = (signal?: AbortSignal) => {
+  if (signal?.aborted) throw abortError();
+};
+
+/**
+ * Reject as soon as the signal aborts. The Places callback API cannot be
+ * cancelled, so the underlying request still finishes and fills the cache.
+ */
+const abortable = <T>(promise: Promise<T>, signal?: AbortSignal): Promise<T> => {
+  if (!signal) return promise;
+  if (signal.aborted) return Promise.reject(abortError());
+  return new Promise<T>((resolve, reject) => {
+    const onAbort = () => reject(abortError());
+    signal.addEventListener('abort', onAbort, { once: true });
+    promise.then(resolve, reject).finally(() => signal.removeEventListener('abort', onAbort));
+  });
+};
 
 // التحقق من وجود Google Places API
 const isGooglePlacesAvailable = (): boolean => {
@@ -283,95 +608,137 @@ const getPlacesService = (): google.maps.places.PlacesService | null => {
   return placesService;
 };
 
+const predictionToResult = (
+  prediction: google.maps.places.AutocompletePrediction,
+): CityResult => {
+  const mainText = prediction.structured_formatting.main_text;
+  const secondaryText = prediction.structured_formatting.secondary_text || '';
+
+  // استخراج اسم المنطقة والدولة
+  const parts = secondaryText.split('،').map(p => p.trim());
+  const region = parts.length > 1 ? parts[0] : undefined;
+  const country = parts.length > 0 ? parts[parts.length - 1] : SAUDI_COUNTRY_NAME;
+
+  // استخراج نوع المكان بالعربي
+  const { type: placeType, arabicType: placeTypeArabic } = getPlaceTypeArabic(prediction.types || []);
+
+  return {
+    placeId: prediction.place_id,
+    name: mainText,
+    fullAddress: prediction.description,
+    city: mainText,
+    region,
+    country,
+    placeType,
+    placeTypeArabic,
+  };
+};
+
 /**
- * البحث عن المدن باستخدام Google Places Autocomplete
- * @param query نص البحث
- * @param countryCode كود الدولة (افتراضي: السعودية)
- * @returns قائمة المدن المطابقة
+ * Cache (LRU) ثم Google Places Autocomplete.
+ * النتيجة المتأخرة لبحث مُلغى تُخزَّن في الكاش رغم ذلك - الطلب دُفع ثمنه.
  */
-export const searchCities = async (
+const searchRemote = async (
+  cacheKey: string,
   query: string,
-  countryCode: string = 'sa'
+  countryCode: string,
+  startedAt: number,
+  signal?: AbortSignal,
 ): Promise<CityResult[]> => {
-  if (!query || query.trim().length < 2) {
-    return [];
-  }
-
-  const trimmedQuery = query.trim();
-  const cacheKey = `${trimmedQuery.toLowerCase()}_${countryCode}`;
+  await ensureCacheHydrated();
+  throwIfAborted(signal);
 
   // التحقق من الكاش
-  const cached = cache.get(cacheKey);
-  if (cached && Date.now() - cached.timestamp < CACHE_DURATION) {
-    return cached.results;
+  const cached = getCached(cacheKey);
+  if (cached) {
+    recordSearch('cache', startedAt);
+    return cached;
   }
 
   // انتظار تحميل Google Places API إذا لم يكن محمّلاً بعد
   if (!isGooglePlacesAvailable()) {
-    const loaded = await waitForGooglePlaces();
+    const loaded = await abortable(waitForGooglePlaces(), signal);
     if (!loaded) {
       console.log('Google Places not available, using fallback');
-      return searchCitiesFallback(trimmedQuery);
+      return searchCitiesFallback(query);
     }
   }
 
   const service = getAutocompleteService();
   if (!service) {
-    return searchCitiesFallback(trimmedQuery);
+    return searchCitiesFallback(query);
   }
 
-  try {
-    const predictions = await new Promise<google.maps.places.AutocompletePrediction[]>(
-      (resolve, reject) => {
-        service.getPlacePredictions(
-          {
-            input: trimmedQuery,
-            // البحث عن أي مكان (مدن، أحياء، شوارع...)
-            componentRestrictions: { country: countryCode },
-            language: 'ar', // اللغة العربية
-          },
-          (results, status) => {
-            if (status === google.maps.places.PlacesServiceStatus.OK && results) {
-              resolve(results);
-            } else if (status === google.maps.places.PlacesServiceStatus.ZERO_RESULTS) {
-              resolve([]);
-            } else {
-              reject(new Error(`Places API error: ${status}`));
-            }
+  stats.remoteCalls++;
+  const request = new Promise<google.maps.places.AutocompletePrediction[]>(
+    (resolve, reject) => {
+      service.getPlacePredictions(
+        {
+          input: query,
+          // البحث عن أي مكان (مدن، أحياء، شوارع...) - بدون قيد types
+          componentRestrictions: { country: countryCode },
+          language: 'ar', // اللغة العربية
+        },
+        (results, status) => {
+          if (status === google.maps.places.PlacesServiceStatus.OK && results) {
+            resolve(results);
+          } else if (status === google.maps.places.PlacesServiceStatus.ZERO_RESULTS) {
+            resolve([]);
+          } else {
+            reject(new Error(`Places API error: ${status}`));
           }
-        );
-      }
-    );
+        }
+      );
+    }
+  ).then((predictions) => {
+    const results = predictions.map(predictionToResult);
+    // تخزين في الكاش
+    setCached(cacheKey, results);
+    recordSearch('remote', startedAt);
+    return results;
+  });
 
-    const cityResults: CityResult[] = predictions.map((prediction) => {
-      const mainText = prediction.structured_formatting.main_text;
-      const secondaryText = prediction.structured_formatting.secondary_text || '';
-      
-      // استخراج اسم المنطقة والدولة
-      const parts = secondaryText.split('،').map(p => p.trim());
-      const region = parts.length > 1 ? parts[0] : undefined;
-      const country = parts.length > 0 ? parts[parts.length - 1] : 'المملكة العربية السعودية';
-
-      // استخراج نوع المكان بالعربي
-      const { type: placeType, arabicType: placeTypeArabic } = getPlaceTypeArabic(prediction.types || []);
-
-      return {
-        placeId: prediction.place_id,
-        name: mainText,
-        fullAddress: prediction.description,
-        city: mainText,
-        region,
-        country,
-        placeType,
-        placeTypeArabic,
-      };
-    });
+  return abortable(request, signal);
+};
 
-    // تخزين في الكاش
-    cache.set(cacheKey, { results: cityResults, timestamp: Date.now() });
+/**
+ * البحث عن المدن: المدن المعروفة من الفهرس المحلي فوراً،
+ * وغيرها عبر Google Places Autocomplete
+ * @param query نص البحث
+ * @param countryCode كود الدولة (افتراضي: السعودية)
+ * @param options.signal لإلغاء البحث عند تغيّر النص (يرفض بـ AbortError)
+ * @returns قائمة المدن المطابقة
+ */
+export const searchCities = async (
+  query: string,
+  countryCode: string = 'sa',
+  options: PlacesSearchOptions = {}
+): Promise<CityResult[]> => {
+  if (!query || query.trim().length < 2) {
+    return [];
+  }
+
+  const startedAt = performance.now();
+  const trimmedQuery = query.trim();
+
+  // بادئة مدينة معروفة: بدون أي طلب شبكة
+  if (countryCode === 'sa') {
+    const local = matchLocalCities(trimmedQuery);
+    if (local.length > 0) {
+      recordSearch('local', startedAt);
+      return local;
+    }
+  }
 
-    return cityResults;
+  const cacheKey = `${normalizeArabic(trimmedQuery)}_${countryCode}`;
+  try {
+    return await searchRemote(cacheKey, trimmedQuery, countryCode, startedAt, options.signal);
   } catch (error) {
+    if (isSearchCancelled(error)) {
+      stats.cancelled++;
+      throw error;
+    }
+    stats.remoteErrors++;
     console.error('Error searching cities:', error);
     return searchCitiesFallback(trimmedQuery);
   }
@@ -381,23 +748,18 @@ export const searchCities = async (
  * البحث البديل في حالة عدم توفر Google Places
  */
 const searchCitiesFallback = (query: string): CityResult[] => {
-  const normalizedQuery = query.toLowerCase();
-  
-  return DEFAULT_SAUDI_CITIES
-    .filter(city => city.toLowerCase().includes(normalizedQuery))
-    .map(city => ({
-      placeId: `fallback_${city}`,
-      name: city,
-      fullAddress: `${city}، المملكة العربية السعودية`,
-      city,
-      country: 'المملكة العربية السعودية',
-    }));
+  return matchLocalCities(query);
 };
 
 /**
  * الحصول على تفاصيل المكان
  */
 export const getPlaceDetails = async (placeId: string): Promise<CityResult | null> => {
+  if (placeId.startsWith('local_')) {
+    const city = SAUDI_CITY_CATALOG.find((c) => c.id === placeId.slice('local_'.length));
+    return city ? toLocalCityResult(city) : null;
+  }
+
   if (placeId.startsWith('fallback_')) {
     const cityName = placeId.replace('fallback_', '');
     return {
@@ -473,89 +835,29 @@ export const getPlaceDetails = async (placeId: string): Promise<CityResult | nul
 
 /**
  * البحث العام عن أي مكان (عناوين، أحياء، شوارع، مباني...)
+ * @param options.signal لإلغاء البحث عند تغيّر النص (يرفض بـ AbortError)
  */
 export const searchPlaces = async (
   query: string,
-  countryCode: string = 'sa'
+  countryCode: string = 'sa',
+  options: PlacesSearchOptions = {}
 ): Promise<CityResult[]> => {
   if (!query || query.trim().length < 2) {
     return [];
   }
 
+  const startedAt = performance.now();
   const trimmedQuery = query.trim();
-  const cacheKey = `place_${trimmedQuery.toLowerCase()}_${countryCode}`;
-
-  // التحقق من الكاش
-  const cached = cache.get(cacheKey);
-  if (cached && Date.now() - cached.timestamp < CACHE_DURATION) {
-    return cached.results;
-  }
-
-  // انتظار تحميل Google Places API إذا لم يكن محمّلاً بعد
-  if (!isGooglePlacesAvailable()) {
-    const loaded = await waitForGooglePlaces();
-    if (!loaded) {
-      console.log('Google Places not available, using fallback');
-      return searchCitiesFallback(trimmedQuery);
-    }
-  }
-
-  const service = getAutocompleteService();
-  if (!service) {
-    return searchCitiesFallback(trimmedQuery);
-  }
+  const cacheKey = `place_${normalizeArabic(trimmedQuery)}_${countryCode}`;
 
   try {
-    const predictions = await new Promise<google.maps.places.AutocompletePrediction[]>(
-      (resolve, reject) => {
-        service.getPlacePredictions(
-          {
-            input: trimmedQuery,
-            // بدون قيد types للبحث عن أي شيء
-            componentRestrictions: { country: countryCode },
-            language: 'ar',
-          },
-          (results, status) => {
-            if (status === google.maps.places.PlacesServiceStatus.OK && results) {
-              resolve(results);
-            } else if (status === google.maps.places.PlacesServiceStatus.ZERO_RESULTS) {
-              resolve([]);
-            } else {
-              reject(new Error(`Places API error: ${status}`));
-            }
-          }
-        );
-      }
-    );
-
-    const placeResults: CityResult[] = predictions.map((prediction) => {
-      const mainText = prediction.structured_formatting.main_text;
-      const secondaryText = prediction.structured_formatting.secondary_text || '';
-      
-      const parts = secondaryText.split('،').map(p => p.trim());
-      const region = parts.length > 1 ? parts[0] : undefined;
-      const country = parts.length > 0 ? parts[parts.length - 1] : 'المملكة العربية السعودية';
-
-      // استخراج نوع المكان بالعربي
-      const { type: placeType, arabicType: placeTypeArabic } = getPlaceTypeArabic(prediction.types || []);
-
-      return {
-        placeId: prediction.place_id,
-        name: mainText,
-        fullAddress: prediction.description,
-        city: mainText,
-        region,
-        country,
-        placeType,
-        placeTypeArabic,
-      };
-    });
-
-    // تخزين في الكاش
-    cache.set(cacheKey, { results: placeResults, timestamp: Date.now() });
-
-    return placeResults;
+    return await searchRemote(cacheKey, trimmedQuery, countryCode, startedAt, options.signal);
   } catch (error) {
+    if (isSearchCancelled(error)) {
+      stats.cancelled++;
+      throw error;
+    }
+    stats.remoteErrors++;
     console.error('Error searching places:', error);
     return searchCitiesFallback(trimmedQuery);
   }
@@ -683,6 +985,7 @@ export const reverseGeocode = async (
  */
 export const clearPlacesCache = (): void => {
   cache.clear();
+  schedulePersist();
 };
 
 /**
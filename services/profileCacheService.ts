@@ -0,0 +1,308 @@
+import { supabase } from "./supabaseClient";
+import { capacitorStorage } from "./capacitorStorage";
+import { createBatchLoader } from "../utils/batchLoader";
+import { logger } from "../utils/logger";
+import { subscribeToTable } from "./realtimeService";
+
+// ==========================================
+// Profile Cache (display name + avatar)
+// ==========================================
+// مخزن مشترك لكل الخدمات بدل أن تجلب كل خدمة profiles بنفسها:
+// - LRU محدود (MAX_ENTRIES) - الـ Map تحفظ ترتيب الإدراج، فأول مفتاح = الأقدم استخداماً
+// - الطلبات المتزامنة لنفس المعرفات تُدمج في استعلام .in() واحد (createBatchLoader)
+// - يُحفظ في capacitorStorage ويُحمَّل عند أول استخدام؛ ما يُقرأ من التخزين يُعرض
+//   فوراً ويُحدَّث مرة واحدة في الخلفية (stale-while-revalidate)
+// - تحديثات profiles تصل عبر Realtime لمعرفات الكاش فقط (PROFILES_REALTIME.sql)
+//
+// النتيجة: تكرار نفس البروفايل خلال الجلسة = صفر طلبات شبكة
+
+export interface CachedProfile {
+  id: string;
+  display_name: string | null;
+  avatar_url: string | null;
+}
+
+export interface ProfileCacheStats {
+  size: number;
+  hits: number;
+  misses: number;
+  networkCalls: number;
+}
+
+const STORAGE_KEY = "profile_cache_v1";
+const MAX_ENTRIES = 500;
+const PERSIST_DELAY_MS = 2000;
+// Persisted entries older than this are dropped on load instead of revalidated
+const PERSIST_MAX_AGE_MS = 7 * 24 * 60 * 60 * 1000;
+// postgres_changes `in` filters are capped at 100 values
+const REALTIME_MAX_IDS = 100;
+const REALTIME_RESUBSCRIBE_DELAY_MS = 1000;
+
+interface CacheEntry {
+  profile: CachedProfile;
+  fetchedAt: number;
+  /** false = loaded from storage, not yet confirmed this session */
+  fresh: boolean;
+}
+
+type PersistedEntry = [string, string | null, string | null, number];
+
+const cache = new Map<string, CacheEntry>();
+const stats = { hits: 0, misses: 0, networkCalls: 0 };
+const revalidating = new Set<string>();
+
+let hydration: Promise<void> | null = null;
+let persistTimer: ReturnType<typeof setTimeout> | null = null;
+let realtimeTimer: ReturnType<typeof setTimeout> | null = null;
+let realtimeUnsubscribe: (() => void) | null = null;
+let realtimeKey = "";
+
+const toProfile = (row: any, id: string): CachedProfile => ({
+  id,
+  display_name: row?.display_name ?? null,
+  avatar_url: row?.avatar_url ?? null,
+});
+
+// ==========================================
+// LRU bookkeeping
+// ==========================================
+
+const touch = (id: string): CacheEntry | undefined => {
+  const entry = cache.get(id);
+  if (entry) {
+    cache.delete(id);
+    cache.set(id, entry);
+  }
+  return entry;
+};
+
+const setEntry = (
+  profile: CachedProfile,
+  fresh = true,
+  fetchedAt = Date.now(),
+) => {
+  cache.delete(profile.id);
+  cache.set(profile.id, { profile, fetchedAt, fresh });
+  while (cache.size > MAX_ENTRIES) {
+    const oldest = cache.keys().next().value;
+    if (oldest === undefined) break;
+    cache.delete(oldest);
+  }
+  schedulePersist();
+  scheduleRealtimeSync();
+};
+
+// ==========================================
+// Persistence
+// ==========================================
+
+const schedulePersist = () => {
+  if (persistTimer !== null) return;
+  persistTimer = setTimeout(() => {
+    persistTimer = null;
+    const entries: PersistedEntry[] = Array.from(cache.values()).map((e) => [
+      e.profile.id,
+      e.profile.display_name,
+      e.profile.avatar_url,
+      e.fetchedAt,
+    ]);
+    capacitorStorage.setItem(STORAGE_KEY, JSON.stringify(entries)).catch(
+      (error) => logger.warn("Failed to persist profile cache:", error),
+    );
+  }, PERSIST_DELAY_MS);
+};
+
+const ensureHydrated = (): Promise<void> => {
+  if (!hydration) {
+    hydration = (async () => {
+      try {
+        const raw = await capacitorStorage.getItem(STORAGE_KEY);
+        if (!raw) return;
+        const entries = JSON.parse(raw) as PersistedEntry[];
+        const cutoff = Date.now() - PERSIST_MAX_AGE_MS;
+        const restored = new Map<string, CacheEntry>();
+        entries.forEach(([id, displayName, avatarUrl, fetchedAt]) => {
+          if (!id || fetchedAt < cutoff) return;
+          restored.set(id, {
+            profile: { id, display_name: displayName, avatar_url: avatarUrl },
+            fetchedAt,
+            fresh: false,
+          });
+        });
+        // Anything fetched while we were reading storage is newer - keep it on top
+        const live = Array.from(cache.entries());
+        cache.clear();
+        restored.forEach((entry, id) => cache.set(id, entry));
+        live.forEach(([id, entry]) => {
+          cache.delete(id);
+          cache.set(id, entry);
+        });
+        while (cache.size > MAX_ENTRIES) {
+          const oldest = cache.keys().next().value;
+          if (oldest === undefined) break;
+          cache.delete(oldest);
+        }
+        scheduleRealtimeSync();
+      } catch (error) {
+        logger.warn("Failed to load profile cache:", error);
+      }
+    })();
+  }
+  return hydration;
+};
+
+// ==========================================
+// Network (coalesced)
+// ==========================================
+
+const profileLoader = createBatchLoader<string, CachedProfile>(async (ids) => {
+  stats.networkCalls++;
+  const { data, error } = await supabase
+    .from("profiles")
+    .select("id, display_name, avatar_url")
+    .in("id", ids);
+  if (error) throw error;
+
+  const result = new Map<string, CachedProfile>();
+  (data || []).forEach((row) => result.set(row.id, toProfile(row, row.id)));
+  // Missing rows are cached too, so unknown/deleted users are not re-queried
+  ids.forEach((id) => {
+    const profile = result.get(id) || toProfile(null, id);
+    result.set(id, profile);
+    setEntry(profile);
+  });
+  return result;
+});
+
+const revalidate = (id: string) => {
+  if (revalidating.has(id)) return;
+  revalidating.add(id);
+  profileLoader.load(id).finally(() => revalidating.delete(id));
+};
+
+// ==========================================
+// Realtime invalidation
+// ==========================================
+
+const scheduleRealtimeSync = () => {
+  if (realtimeTimer !== null) return;
+  realtimeTimer = setTimeout(() => {
+    realtimeTimer = null;
+    syncRealtime();
+  }, REALTIME_RESUBSCRIBE_DELAY_MS);
+};
+
+const syncRealtime = () => {
+  // Watch the most recently used profiles (end of the LRU order)
+  const ids = Array.from(cache.keys()).slice(-REALTIME_MAX_IDS).sort();
+  const key = ids.join(",");
+  if (key === realtimeKey) return;
+  realtimeKey = key;
+
+  const previous = realtimeUnsubscribe;
+  realtimeUnsubscribe = ids.length === 0 ? null : subscribeToTable(
+    { table: "profiles", event: "UPDATE", filter: `id=in.(${key})` },
+    (payload) => {
+      const row = payload.new as { id?: string };
+      if (!row?.id || !cache.has(row.id)) return;
+      const current = cache.get(row.id)!;
+      const next = toProfile(row, row.id);
+      if (
+        current.fresh &&
+        current.profile.display_name === next.display_name &&
+        current.profile.avatar_url === next.avatar_url
+      ) {
+        return;
+      }
+      // Keep LRU position; an update is not a "use"
+      cache.set(row.id, { profile: next, fetchedAt: Date.now(), fresh: true });
+      schedulePersist();
+    },
+  );
+  previous?.();
+};
+
+// ==========================================
+// Public API
+// ==========================================
+
+/**
+ * Get profiles by id. Cached ids cost no network call; misses are batched
+ * with any other concurrent lookups into a single query.
+ */
+export async function getProfiles(
+  ids: Array<string | null | undefined>,
+): Promise<Map<string, CachedProfile>> {
+  const result = new Map<string, CachedProfile>();
+  const uniqueIds = Array.from(new Set(ids.filter(Boolean) as string[]));
+  if (uniqueIds.length === 0) return result;
+
+  await ensureHydrated();
+
+  const missing: string[] = [];
+  uniqueIds.forEach((id) => {
+    const entry = touch(id);
+    if (!entry) {
+      missing.push(id);
+      return;
+    }
+    stats.hits++;
+    result.set(id, entry.profile);
+    if (!entry.fresh) revalidate(id);
+  });
+
+  if (missing.length > 0) {
+    stats.misses += missing.length;
+    try {
+      const loaded = await profileLoader.loadMany(missing);
+      loaded.forEach((profile) => {
+        if (profile) result.set(profile.id, profile);
+      });
+    } catch (error) {
+      logger.error("Error loading profiles:", error, "service");
+    }
+  }
+
+  return result;
+}
+
+/**
+ * Get a single profile (see getProfiles)
+ */
+export async function getProfile(
+  id: string | null | undefined,
+): Promise<CachedProfile | null> {
+  if (!id) return null;
+  const profiles = await getProfiles([id]);
+  return profiles.get(id) || null;
+}
+
+/**
+ * Synchronous cache peek - never hits the network
+ */
+export function getCachedProfile(id: string): CachedProfile | null {
+  return cache.get(id)?.profile || null;
+}
+
+/**
+ * Seed the cache from rows that already carry profile data
+ * (RPC joins, embedded selects, the user's own profile after an update)
+ */
+export function primeProfiles(
+  profiles: Array<Partial<CachedProfile> & { id?: string | null } | null | undefined>,
+): void {
+  profiles.forEach((p) => {
+    if (p?.id) setEntry(toProfile(p, p.id));
+  });
+}
+
+/**
+ * Drop a profile so the next lookup refetches it
+ */
+export function invalidateProfile(id: string): void {
+  if (cache.delete(id)) schedulePersist();
+}
+
+export function getProfileCacheStats(): ProfileCacheStats {
+  return { size: cache.size, ...stats };
+}
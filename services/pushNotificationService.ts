@@ -1,6 +1,7 @@
 import { PushNotifications } from "@capacitor/push-notifications";
 import { Capacitor } from "@capacitor/core";
 import { supabase } from "./supabaseClient";
+import { getSessionUserId } from "./sessionService";
 
 /**
  * Push Notifications Service
@@ -97,9 +98,9 @@ export async function initPushNotifications(): Promise<void> {
  */
 async function saveTokenToSupabase(token: string): Promise<void> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
+    const userId = await getSessionUserId();
 
-    if (!user) {
+    if (!userId) {
       console.log("📱 No user logged in, token not saved");
       return;
     }
@@ -110,7 +111,7 @@ async function saveTokenToSupabase(token: string): Promise<void> {
     const { error } = await supabase
       .from("fcm_tokens")
       .upsert({
-        user_id: user.id,
+        user_id: userId,
         token: token,
         device_type: platform,
         updated_at: new Date().toISOString(),
@@ -145,13 +146,13 @@ export async function removePushToken(): Promise<void> {
   if (!currentToken) return;
 
   try {
-    const { data: { user } } = await supabase.auth.getUser();
+    const userId = await getSessionUserId();
 
-    if (user) {
+    if (userId) {
       await supabase
         .from("fcm_tokens")
         .delete()
-        .eq("user_id", user.id)
+        .eq("user_id", userId)
         .eq("token", currentToken);
 
       console.log("📱 FCM token removed");
@@ -0,0 +1,304 @@
+import type {
+  RealtimeChannel,
+  RealtimePostgresChangesPayload,
+} from "@supabase/supabase-js";
+import { supabase } from "./supabaseClient";
+import { logger } from "../utils/logger";
+
+// ==========================================
+// Realtime Channel Manager
+// ==========================================
+// بدل أن تفتح كل خدمة/مكوّن channel خاصاً بها، كل الاشتراكات تمر من هنا:
+// - channel واحد لكل (schema, table, filter): المستمعون على نفس الجدول ونفس
+//   الفلتر يتشاركون نفس الاشتراك مهما اختلف نوع الحدث
+// - عدّ مراجع: الـ channel يُغلق بعد خروج آخر مستمع (مع مهلة قصيرة حتى لا
+//   يُعاد فتحه عند unmount/mount سريع)
+// - التوزيع داخل العميل حسب eventType، وخطأ مستمع لا يؤثر على البقية
+// - إعادة المحاولة عند CHANNEL_ERROR / TIMED_OUT مركزية هنا
+// - getRealtimeMetrics(): عدد القنوات المفتوحة والمستمعين والأحداث/ثانية
+
+export type RealtimeEventType = "INSERT" | "UPDATE" | "DELETE";
+
+export interface TableSubscription {
+  table: string;
+  schema?: string;
+  event?: RealtimeEventType | "*";
+  /** postgres_changes filter, e.g. `user_id=eq.${id}` */
+  filter?: string;
+}
+
+export type RealtimePayload = RealtimePostgresChangesPayload<
+  Record<string, any>
+>;
+
+export type RealtimeHandler = (
+  payload: RealtimePayload,
+) => void | Promise<void>;
+
+export interface RealtimeChannelMetrics {
+  key: string;
+  event: RealtimeEventType | "*" | null;
+  listeners: number;
+  events: number;
+  status: string;
+}
+
+export interface RealtimeMetrics {
+  openChannels: number;
+  listeners: number;
+  totalEvents: number;
+  eventsPerSecond: number;
+  channels: RealtimeChannelMetrics[];
+}
+
+interface Listener {
+  event: RealtimeEventType | "*";
+  handler: RealtimeHandler;
+}
+
+interface ManagedChannel {
+  key: string;
+  schema: string;
+  table: string;
+  filter?: string;
+  listeners: Map<number, Listener>;
+  channel: RealtimeChannel | null;
+  /** Event currently bound on the server side */
+  boundEvent: RealtimeEventType | "*" | null;
+  status: string;
+  events: number;
+  retryCount: number;
+  retryTimer: ReturnType<typeof setTimeout> | null;
+  releaseTimer: ReturnType<typeof setTimeout> | null;
+  rebuildQueued: boolean;
+}
+
+const MAX_RETRIES = 5;
+const RETRY_BASE_DELAY_MS = 2000;
+// Grace period before closing an unused channel (StrictMode / quick remounts)
+const RELEASE_DELAY_MS = 1000;
+const RATE_WINDOW_MS = 10000;
+
+const channels = new Map<string, ManagedChannel>();
+const eventTimes: number[] = [];
+let totalEvents = 0;
+let nextListenerId = 1;
+let generation = 0;
+
+const channelKey = (schema: string, table: string, filter?: string) =>
+  `${schema}:${table}:${filter || "*"}`;
+
+// One binding covers every listener: a single event type if they all agree,
+// otherwise "*" and the dispatcher filters locally
+const requiredEvent = (
+  managed: ManagedChannel,
+): RealtimeEventType | "*" | null => {
+  const events = new Set<RealtimeEventType | "*">();
+  managed.listeners.forEach((l) => events.add(l.event));
+  if (events.size === 0) return null;
+  if (events.size === 1) return events.values().next().value!;
+  return "*";
+};
+
+const covers = (
+  bound: RealtimeEventType | "*" | null,
+  needed: RealtimeEventType | "*" | null,
+) => needed === null || bound === "*" || bound === needed;
+
+const recordEvent = (managed: ManagedChannel) => {
+  const now = Date.now();
+  managed.events++;
+  totalEvents++;
+  eventTimes.push(now);
+  while (eventTimes.length > 0 && eventTimes[0] < now - RATE_WINDOW_MS) {
+    eventTimes.shift();
+  }
+};
+
+const dispatch = (managed: ManagedChannel, payload: RealtimePayload) => {
+  recordEvent(managed);
+  managed.listeners.forEach((listener) => {
+    if (listener.event !== "*" && listener.event !== payload.eventType) return;
+    try {
+      const result = listener.handler(payload);
+      if (result && typeof (result as Promise<void>).catch === "function") {
+        (result as Promise<void>).catch((error) =>
+          logger.error(`Realtime handler error (${managed.key}):`, error, "realtime")
+        );
+      }
+    } catch (error) {
+      logger.error(`Realtime handler error (${managed.key}):`, error, "realtime");
+    }
+  });
+};
+
+const closeChannel = (managed: ManagedChannel) => {
+  if (managed.retryTimer) {
+    clearTimeout(managed.retryTimer);
+    managed.retryTimer = null;
+  }
+  if (managed.channel) {
+    const channel = managed.channel;
+    managed.channel = null;
+    supabase.removeChannel(channel).catch(() => {
+      // Ignore errors when removing channel
+    });
+  }
+  managed.boundEvent = null;
+  managed.status = "CLOSED";
+};
+
+const openChannel = (managed: ManagedChannel) => {
+  closeChannel(managed);
+  const event = requiredEvent(managed);
+  if (!event) return;
+
+  // Unique topic per (re)build, so a rebuild never collides with the
+  // channel that is still leaving
+  generation++;
+  const channel = supabase
+    .channel(`rt:${managed.key}#${generation}`)
+    .on(
+      "postgres_changes" as any,
+      {
+        event,
+        schema: managed.schema,
+        table: managed.table,
+        ...(managed.filter ? { filter: managed.filter } : {}),
+      },
+      (payload: RealtimePayload) => dispatch(managed, payload),
+    );
+
+  managed.channel = channel;
+  managed.boundEvent = event;
+  managed.status = "JOINING";
+
+  channel.subscribe((status) => {
+    if (managed.channel !== channel) return;
+    managed.status = status;
+    if (status === "SUBSCRIBED") {
+      managed.retryCount = 0;
+    } else if (status === "CHANNEL_ERROR" || status === "TIMED_OUT") {
+      if (managed.retryCount >= MAX_RETRIES || managed.retryTimer) return;
+      managed.retryCount++;
+      logger.warn(
+        `⚠️ Realtime ${status} on ${managed.key}, retry ${managed.retryCount}/${MAX_RETRIES}`,
+      );
+      managed.retryTimer = setTimeout(() => {
+        managed.retryTimer = null;
+        if (managed.listeners.size > 0) openChannel(managed);
+      }, RETRY_BASE_DELAY_MS * managed.retryCount);
+    }
+  });
+};
+
+// Several subscribe() calls in the same tick cause a single (re)join
+const scheduleRebuild = (managed: ManagedChannel) => {
+  if (managed.rebuildQueued) return;
+  managed.rebuildQueued = true;
+  queueMicrotask(() => {
+    managed.rebuildQueued = false;
+    if (managed.listeners.size === 0) return;
+    if (managed.channel && covers(managed.boundEvent, requiredEvent(managed))) {
+      return;
+    }
+    openChannel(managed);
+  });
+};
+
+/**
+ * Listen to postgres changes on a table.
+ * Listeners with the same table + filter share one channel.
+ * Returns an unsubscribe function (safe to call more than once).
+ */
+export function subscribeToTable(
+  subscription: TableSubscription,
+  handler: RealtimeHandler,
+): () => void {
+  const schema = subscription.schema || "public";
+  const key = channelKey(schema, subscription.table, subscription.filter);
+
+  let managed = channels.get(key);
+  if (!managed) {
+    managed = {
+      key,
+      schema,
+      table: subscription.table,
+      filter: subscription.filter,
+      listeners: new Map(),
+      channel: null,
+      boundEvent: null,
+      status: "CLOSED",
+      events: 0,
+      retryCount: 0,
+      retryTimer: null,
+      releaseTimer: null,
+      rebuildQueued: false,
+    };
+    channels.set(key, managed);
+  }
+
+  if (managed.releaseTimer) {
+    clearTimeout(managed.releaseTimer);
+    managed.releaseTimer = null;
+  }
+
+  const listenerId = nextListenerId++;
+  managed.listeners.set(listenerId, {
+    event: subscription.event || "*",
+    handler,
+  });
+
+  if (!managed.channel || !covers(managed.boundEvent, requiredEvent(managed))) {
+    scheduleRebuild(managed);
+  }
+
+  const target = managed;
+  let active = true;
+  return () => {
+    if (!active) return;
+    active = false;
+    target.listeners.delete(listenerId);
+    if (target.listeners.size > 0 || target.releaseTimer) return;
+
+    target.releaseTimer = setTimeout(() => {
+      target.releaseTimer = null;
+      if (target.listeners.size > 0) return;
+      closeChannel(target);
+      channels.delete(target.key);
+    }, RELEASE_DELAY_MS);
+  };
+}
+
+/**
+ * Snapshot of the channel manager (debug panel / logging)
+ */
+export function getRealtimeMetrics(): RealtimeMetrics {
+  const now = Date.now();
+  while (eventTimes.length > 0 && eventTimes[0] < now - RATE_WINDOW_MS) {
+    eventTimes.shift();
+  }
+
+  let listeners = 0;
+  let openChannels = 0;
+  const channelMetrics: RealtimeChannelMetrics[] = [];
+  channels.forEach((managed) => {
+    listeners += managed.listeners.size;
+    if (managed.channel) openChannels++;
+    channelMetrics.push({
+      key: managed.key,
+      event: managed.boundEvent,
+      listeners: managed.listeners.size,
+      events: managed.events,
+      status: managed.status,
+    });
+  });
+
+  return {
+    openChannels,
+    listeners,
+    totalEvents,
+    eventsPerSecond: eventTimes.length / (RATE_WINDOW_MS / 1000),
+    channels: channelMetrics,
+  };
+}
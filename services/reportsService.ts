@@ -1,4 +1,5 @@
 import { supabase } from './supabaseClient';
+import { getSessionUserId } from './sessionService';
 
 export type ReportType = 'request' | 'offer' | 'user';
 export type ReportReason = 
@@ -56,9 +57,9 @@ export const REPORT_REASONS: { value: ReportReason; label: string }[] = [
  */
 export const createReport = async (input: CreateReportInput): Promise<{ success: boolean; error?: string }> => {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
+    const userId = await getSessionUserId();
     
-    if (!user) {
+    if (!userId) {
       return { success: false, error: 'يجب تسجيل الدخول للإبلاغ' };
     }
 
@@ -66,7 +67,7 @@ export const createReport = async (input: CreateReportInput): Promise<{ success:
     const { data: existingReport } = await supabase
       .from('reports')
       .select('id')
-      .eq('reporter_id', user.id)
+      .eq('reporter_id', userId)
       .eq('target_id', input.target_id)
       .eq('report_type', input.report_type)
       .single();
@@ -78,7 +79,7 @@ export const createReport = async (input: CreateReportInput): Promise<{ success:
     const { error } = await supabase
       .from('reports')
       .insert({
-        reporter_id: user.id,
+        reporter_id: userId,
         report_type: input.report_type,
         target_id: input.target_id,
         reason: input.reason,
@@ -103,14 +104,14 @@ export const createReport = async (input: CreateReportInput): Promise<{ success:
  */
 export const hasUserReported = async (targetId: string, reportType: ReportType): Promise<boolean> => {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
+    const userId = await getSessionUserId();
     
-    if (!user) return false;
+    if (!userId) return false;
 
     const { data } = await supabase
       .from('reports')
       .select('id')
-      .eq('reporter_id', user.id)
+      .eq('reporter_id', userId)
       .eq('target_id', targetId)
       .eq('report_type', reportType)
       .single();
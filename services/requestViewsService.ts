@@ -1,4 +1,6 @@
 import { supabase } from './supabaseClient.ts';
+import { subscribeToTable } from './realtimeService.ts';
+import { getSessionUserId } from './sessionService.ts';
 
 // ==========================================
 // Request Views Service
@@ -59,13 +61,13 @@ export async function getUnreadInterestsCount(): Promise<number> {
  */
 export async function isRequestRead(requestId: string): Promise<boolean> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return false;
+    const userId = await getSessionUserId();
+    if (!userId) return false;
 
     const { data, error } = await supabase
       .from('request_views')
       .select('is_read')
-      .eq('user_id', user.id)
+      .eq('user_id', userId)
       .eq('request_id', requestId)
       .single();
 
@@ -82,13 +84,13 @@ export async function isRequestRead(requestId: string): Promise<boolean> {
  */
 export async function getUnreadRequestIds(): Promise<string[]> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return [];
+    const userId = await getSessionUserId();
+    if (!userId) return [];
 
     const { data, error } = await supabase
       .from('request_views')
       .select('request_id')
-      .eq('user_id', user.id)
+      .eq('user_id', userId)
       .eq('is_read', false);
 
     if (error) throw error;
@@ -106,13 +108,13 @@ export async function getUnreadRequestIds(): Promise<string[]> {
  */
 export async function getViewedRequestIds(): Promise<Set<string>> {
   try {
-    const { data: { user } } = await supabase.auth.getUser();
-    if (!user) return new Set();
+    const userId = await getSessionUserId();
+    if (!userId) return new Set();
 
     const { data, error } = await supabase
       .from('request_views')
       .select('request_id')
-      .eq('user_id', user.id)
+      .eq('user_id', userId)
       .eq('is_read', true); // Only requests that were actually opened (read)
 
     if (error) throw error;
@@ -130,27 +132,14 @@ export function subscribeToViewedRequests(
   userId: string,
   onUpdate: (viewedIds: Set<string>) => void
 ) {
-  const channel = supabase
-    .channel(`request_views_${userId}`)
-    .on(
-      'postgres_changes',
-      {
-        event: '*',
-        schema: 'public',
-        table: 'request_views',
-        filter: `user_id=eq.${userId}`,
-      },
-      async () => {
-        // Refetch all viewed requests on any change
-        const viewedIds = await getViewedRequestIds();
-        onUpdate(viewedIds);
-      }
-    )
-    .subscribe();
-
-  return () => {
-    supabase.removeChannel(channel);
-  };
+  return subscribeToTable(
+    { table: 'request_views', filter: `user_id=eq.${userId}` },
+    async () => {
+      // Refetch all viewed requests on any change
+      const viewedIds = await getViewedRequestIds();
+      onUpdate(viewedIds);
+    }
+  );
 }
 
 // ==========================================
@@ -1,41 +1,14 @@
 import { supabase } from "./supabaseClient";
 import { AIDraft, classifyAndDraft } from "./aiService";
-import { Offer, Request } from "../types";
+import { ImageVariants, Offer, Request } from "../types";
 import { getCategoryIdsByLabels } from "./categoriesService";
 import { logger } from "../utils/logger";
+import { normalizeCityKey } from "../utils/arabicNormalize";
+import { resolveCityId } from "./placesService";
 import { storageService as _storageService } from "./storageService";
 import { createNotification } from "./notificationsService";
-
-/**
- * إرسال Push Notifications للمستخدمين المهتمين بطلب جديد
- * ملاحظة: الإشعارات داخل التطبيق للطلبات الجديدة تُنشأ من Edge Function
- */
-async function sendPushNotificationForNewRequest(params: {
-  requestId: string;
-  requestTitle: string;
-  requestDescription?: string;
-  categories?: string[];
-  city?: string;
-  authorId: string;
-}): Promise<void> {
-  try {
-    const { data, error } = await supabase.functions.invoke(
-      "send-push-notification",
-      {
-        body: { ...params, notificationType: "new_request" },
-      },
-    );
-
-    if (error) {
-      logger.warn("Edge Function error:", error);
-      return;
-    }
-
-    logger.log("📱 Push notifications sent for request:", data);
-  } catch (err) {
-    logger.warn("Failed to call send-push-notification:", err);
-  }
-}
+import { getProfile } from "./profileCacheService";
+import { subscribeToTable } from "./realtimeService";
 
 /**
  * إرسال Push Notification لصاحب الطلب عند وصول عرض جديد
@@ -189,6 +162,7 @@ export type RequestInsert = {
   delivery_to?: string;
   seriousness?: number;
   images?: string[]; // صور الطلب
+  image_variants?: Record<string, ImageVariants>; // srcset + blurhash لكل صورة
 };
 
 export type OfferInsert = {
@@ -360,20 +334,8 @@ export async function createRequestFromChat(
       }
     }
 
-    // إرسال Push Notifications للمستخدمين المهتمين
-    try {
-      await sendPushNotificationForNewRequest({
-        requestId: data.id,
-        requestTitle: payload.title,
-        requestDescription: payload.description,
-        categories: draftData.categories || [],
-        city: payload.location,
-        authorId: userId,
-      });
-    } catch (pushErr) {
-      logger.warn("Failed to send push notifications:", pushErr);
-      // لا نفشل إنشاء الطلب بسبب خطأ في الإشعارات
-    }
+    // Push للمهتمين لا يُرسل من هنا: الـ trigger يضيف مهمة في notification_jobs
+    // وnotification-worker يرسلها (مع إعادة المحاولة) - NOTIFICATION_JOBS_SCHEMA.sql
 
     return data;
   } catch (err) {
@@ -1489,6 +1451,7 @@ export async function fetchArchivedRequests(
     messages: [],
     offers: [],
     images: req.images || [],
+    imageVariants: req.image_variants || {},
     contactMethod: "both",
     seriousness: req.seriousness || 3,
   }));
@@ -1544,6 +1507,7 @@ function transformRequest(
     messages: [],
     offers: [],
     images: req.images || [],
+    imageVariants: req.image_variants || {},
     contactMethod: "both",
     seriousness,
     locationCoords: req.location_lat && req.location_lng
@@ -1610,12 +1574,18 @@ async function matchesUserInterests(
 
     // Check city match
     // إذا تم اختيار "كل المدن" أو لم يتم اختيار أي مدينة، نتخطى الفلترة
+    // المطابقة بالـ id الموحّد (cities) ثم بالمفتاح الموحّد للمدن خارج الجدول
     if (actualCities.length > 0 && request.location) {
-      const requestCity = request.location.split("،").pop()?.trim() ||
-        request.location;
-      const hasMatchingCity = actualCities.some((city: string) =>
-        requestCity.includes(city) || city.includes(requestCity)
+      const requestCityId: string | null = data.city_id ||
+        resolveCityId(data.location_city || request.location);
+      const requestCityKey = normalizeCityKey(
+        data.location_city || request.location,
       );
+      const hasMatchingCity = actualCities.some((city: string) => {
+        const cityId = resolveCityId(city);
+        if (requestCityId && cityId) return requestCityId === cityId;
+        return !!requestCityKey && normalizeCityKey(city) === requestCityKey;
+      });
       if (!hasMatchingCity) return false;
     }
 
@@ -1636,6 +1606,33 @@ async function matchesUserInterests(
   }
 }
 
+// Full request rows for realtime events. Several listeners react to the same
+// INSERT (interests + "All" feed), so concurrent reads of one id share a query.
+const realtimeRequestFetches = new Map<string, Promise<Request | null>>();
+
+function fetchRequestForRealtime(requestId: string): Promise<Request | null> {
+  const existing = realtimeRequestFetches.get(requestId);
+  if (existing) return existing;
+
+  const promise = (async () => {
+    const { data, error } = await supabase
+      .from("requests")
+      .select(`
+        *,
+        request_categories (
+          category_id,
+          categories (id, label)
+        )
+      `)
+      .eq("id", requestId)
+      .single();
+    return !error && data ? transformRequest(data) : null;
+  })().finally(() => realtimeRequestFetches.delete(requestId));
+
+  realtimeRequestFetches.set(requestId, promise);
+  return promise;
+}
+
 /**
  * Subscribe to new requests that match user interests
  */
@@ -1645,56 +1642,29 @@ export function subscribeToNewRequests(
   radarWords: string[],
   callback: (newRequest: Request) => void,
 ): () => void {
-  const channel = supabase
-    .channel("new-requests")
-    .on(
-      "postgres_changes",
-      {
-        event: "INSERT",
-        schema: "public",
-        table: "requests",
-        filter: "is_public=eq.true",
-      },
-      async (payload: any) => {
-        const newRequest = payload.new as Record<string, any>;
-
-        // Only process active requests
-        if (newRequest.status !== "active") return;
-
-        // Check if matches user interests
-        const matches = await matchesUserInterests(
-          newRequest.id,
-          interestedCategories,
-          interestedCities,
-          radarWords,
-        );
-
-        if (matches) {
-          // Fetch full request with categories
-          const { data, error } = await supabase
-            .from("requests")
-            .select(`
-              *,
-              request_categories (
-                category_id,
-                categories (id, label)
-              )
-            `)
-            .eq("id", newRequest.id)
-            .single();
-
-          if (!error && data) {
-            const transformedRequest = transformRequest(data);
-            callback(transformedRequest);
-          }
-        }
-      },
-    )
-    .subscribe();
+  return subscribeToTable(
+    { table: "requests", event: "INSERT", filter: "is_public=eq.true" },
+    async (payload) => {
+      const newRequest = payload.new as Record<string, any>;
+
+      // Only process active requests
+      if (newRequest.status !== "active") return;
+
+      // Check if matches user interests
+      const matches = await matchesUserInterests(
+        newRequest.id,
+        interestedCategories,
+        interestedCities,
+        radarWords,
+      );
 
-  return () => {
-    supabase.removeChannel(channel);
-  };
+      if (matches) {
+        // Fetch full request with categories
+        const transformedRequest = await fetchRequestForRealtime(newRequest.id);
+        if (transformedRequest) callback(transformedRequest);
+      }
+    },
+  );
 }
 
 /**
@@ -1703,46 +1673,19 @@ export function subscribeToNewRequests(
 export function subscribeToAllNewRequests(
   callback: (newRequest: Request) => void,
 ): () => void {
-  const channel = supabase
-    .channel("all-new-requests")
-    .on(
-      "postgres_changes",
-      {
-        event: "INSERT",
-        schema: "public",
-        table: "requests",
-        filter: "is_public=eq.true",
-      },
-      async (payload: any) => {
-        const newRequest = payload.new as Record<string, any>;
-
-        // Only process active requests
-        if (newRequest.status !== "active") return;
-
-        // Fetch full request with categories
-        const { data, error } = await supabase
-          .from("requests")
-          .select(`
-            *,
-            request_categories (
-              category_id,
-              categories (id, label)
-            )
-          `)
-          .eq("id", newRequest.id)
-          .single();
-
-        if (!error && data) {
-          const transformedRequest = transformRequest(data);
-          callback(transformedRequest);
-        }
-      },
-    )
-    .subscribe();
-
-  return () => {
-    supabase.removeChannel(channel);
-  };
+  return subscribeToTable(
+    { table: "requests", event: "INSERT", filter: "is_public=eq.true" },
+    async (payload) => {
+      const newRequest = payload.new as Record<string, any>;
+
+      // Only process active requests
+      if (newRequest.status !== "active") return;
+
+      // Fetch full request with categories
+      const transformedRequest = await fetchRequestForRealtime(newRequest.id);
+      if (transformedRequest) callback(transformedRequest);
+    },
+  );
 }
 
 /**
@@ -1753,58 +1696,33 @@ export function subscribeToRequestUpdates(
   onHide: (requestId: string) => void,
   onShow: (request: Request) => void,
 ): () => void {
-  const channel = supabase
-    .channel("request-visibility-updates")
-    .on(
-      "postgres_changes",
-      {
-        event: "UPDATE",
-        schema: "public",
-        table: "requests",
-      },
-      async (payload: any) => {
-        const oldRecord = payload.old as Record<string, any>;
-        const newRecord = payload.new as Record<string, any>;
-
-        // Skip if is_public didn't change
-        if (oldRecord.is_public === newRecord.is_public) return;
-
-        // Request was hidden (is_public: true -> false)
-        if (oldRecord.is_public === true && newRecord.is_public === false) {
-          onHide(newRecord.id);
-          return;
-        }
-
-        // Request was shown (is_public: false -> true) AND is active
-        if (
-          oldRecord.is_public === false &&
-          newRecord.is_public === true &&
-          newRecord.status === "active"
-        ) {
-          // Fetch full request data with categories
-          const { data, error } = await supabase
-            .from("requests")
-            .select(`
-              *,
-              request_categories (
-                category_id,
-                categories (id, label)
-              )
-            `)
-            .eq("id", newRecord.id)
-            .single();
-
-          if (!error && data) {
-            onShow(transformRequest(data));
-          }
-        }
-      },
-    )
-    .subscribe();
+  return subscribeToTable(
+    { table: "requests", event: "UPDATE" },
+    async (payload) => {
+      const oldRecord = payload.old as Record<string, any>;
+      const newRecord = payload.new as Record<string, any>;
+
+      // Skip if is_public didn't change
+      if (oldRecord.is_public === newRecord.is_public) return;
+
+      // Request was hidden (is_public: true -> false)
+      if (oldRecord.is_public === true && newRecord.is_public === false) {
+        onHide(newRecord.id);
+        return;
+      }
 
-  return () => {
-    supabase.removeChannel(channel);
-  };
+      // Request was shown (is_public: false -> true) AND is active
+      if (
+        oldRecord.is_public === false &&
+        newRecord.is_public === true &&
+        newRecord.status === "active"
+      ) {
+        // Fetch full request data with categories
+        const request = await fetchRequestForRealtime(newRecord.id);
+        if (request) onShow(request);
+      }
+    },
+  );
 }
 
 /**
@@ -2261,11 +2179,7 @@ export async function startNegotiation(
     // 5. إرسال إشعار للعارض (in-app + Push)
     try {
       // Get requester name for notification
-      const { data: requesterProfile } = await supabase
-        .from("profiles")
-        .select("display_name")
-        .eq("id", userId)
-        .single();
+      const requesterProfile = await getProfile(userId);
 
       const requesterName = requesterProfile?.display_name || "صاحب الطلب";
 
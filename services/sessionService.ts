@@ -0,0 +1,176 @@
+import type { Session } from "@supabase/supabase-js";
+import { supabase } from "./supabaseClient";
+import { logger } from "../utils/logger";
+
+// ==========================================
+// Session Identity (هوية المستخدم من الجلسة المحلية)
+// ==========================================
+// supabase.auth.getUser() يذهب للشبكة (/auth/v1/user) في كل استدعاء، وكانت
+// كل دالة خدمة تبدأ به: round trip إضافي متسلسل قبل كل جلب، وعند فتح الشاشة
+// عشرات الطلبات المتوازية لنفس الـ endpoint.
+//
+// هنا نقرأ الجلسة مرة واحدة من التخزين المحلي ونحدّثها من onAuthStateChange:
+// - الـ JWT يُفك محلياً (sub/exp) ويُرفض إذا انتهت صلاحيته
+// - التجديد يتولاه supabase-js (autoRefreshToken في supabaseClient) ويصلنا
+//   كحدث TOKEN_REFRESHED - لا مؤقتات تجديد هنا
+// - getCurrentUserId() متزامن، getSessionUserId() ينتظر فقط تحميل الجلسة الأول
+//
+// هذا للتوجيه في العميل فقط - RLS في الخادم تبقى المرجع للصلاحيات.
+
+export interface SessionIdentity {
+  id: string;
+  email?: string;
+  phone?: string;
+  role?: string;
+  /** JWT expiry (ms since epoch) */
+  expiresAt: number;
+}
+
+type SessionListener = (identity: SessionIdentity | null) => void;
+
+// Tolerate small clock differences between device and auth server
+const CLOCK_SKEW_MS = 30 * 1000;
+
+let identity: SessionIdentity | null = null;
+let ready: Promise<void> | null = null;
+let reloading: Promise<void> | null = null;
+const listeners = new Set<SessionListener>();
+
+// ==========================================
+// JWT
+// ==========================================
+
+const decodeJwtPayload = (token: string): Record<string, any> | null => {
+  try {
+    const part = token.split(".")[1];
+    if (!part) return null;
+    const base64 = part.replace(/-/g, "+").replace(/_/g, "/");
+    const padded = base64 + "=".repeat((4 - (base64.length % 4)) % 4);
+    const json = decodeURIComponent(
+      Array.from(atob(padded))
+        .map((c) => "%" + c.charCodeAt(0).toString(16).padStart(2, "0"))
+        .join(""),
+    );
+    return JSON.parse(json);
+  } catch {
+    return null;
+  }
+};
+
+const toIdentity = (session: Session | null): SessionIdentity | null => {
+  if (!session?.access_token) return null;
+  const claims = decodeJwtPayload(session.access_token);
+  const id = claims?.sub || session.user?.id;
+  const exp = Number(claims?.exp || session.expires_at);
+  if (!id || !Number.isFinite(exp)) return null;
+  return {
+    id,
+    email: claims?.email || session.user?.email || undefined,
+    phone: claims?.phone || session.user?.phone || undefined,
+    role: claims?.role,
+    expiresAt: exp * 1000,
+  };
+};
+
+const isValid = (value: SessionIdentity | null): value is SessionIdentity =>
+  !!value && value.expiresAt + CLOCK_SKEW_MS > Date.now();
+
+// ==========================================
+// State
+// ==========================================
+
+const applySession = (session: Session | null) => {
+  const next = toIdentity(session);
+  const changed = next?.id !== identity?.id;
+  identity = next;
+  if (changed) {
+    listeners.forEach((listener) => {
+      try {
+        listener(identity);
+      } catch (error) {
+        logger.error("Session listener failed:", error, "service");
+      }
+    });
+  }
+};
+
+// getSession() returns the stored session, or lets supabase-js refresh it
+// first when the access token has already expired
+const loadSession = async () => {
+  try {
+    const { data: { session } } = await supabase.auth.getSession();
+    applySession(session);
+  } catch (error) {
+    // Keep the current identity; an expired one is rejected by isValid()
+    // and supabase-js emits SIGNED_OUT if the refresh token is revoked
+    logger.warn("Failed to load session:", error);
+  }
+};
+
+const reloadSession = (): Promise<void> => {
+  if (!reloading) {
+    reloading = loadSession().finally(() => {
+      reloading = null;
+    });
+  }
+  return reloading;
+};
+
+const init = (): Promise<void> => {
+  if (!ready) {
+    ready = (async () => {
+      // SIGNED_IN / SIGNED_OUT / TOKEN_REFRESHED from supabase-js
+      supabase.auth.onAuthStateChange((_event, session) => {
+        applySession(session);
+      });
+
+      // Reads the persisted session (capacitorStorage) - no network call
+      // unless the stored token already expired
+      await loadSession();
+    })();
+  }
+  return ready;
+};
+
+// ==========================================
+// Public API
+// ==========================================
+
+/**
+ * Current user id, synchronously. null before the session has loaded,
+ * when signed out, or when the access token has expired.
+ */
+export function getCurrentUserId(): string | null {
+  init();
+  return isValid(identity) ? identity.id : null;
+}
+
+/**
+ * Current identity (id, email/phone, role, expiry) - see getCurrentUserId
+ */
+export function getSessionIdentity(): SessionIdentity | null {
+  init();
+  return isValid(identity) ? identity : null;
+}
+
+/**
+ * Current user id once the stored session has been read.
+ * After the first load this resolves immediately, without a network call.
+ * An expired token waits for supabase-js to refresh it.
+ */
+export async function getSessionUserId(): Promise<string | null> {
+  await init();
+  if (identity && !isValid(identity)) await reloadSession();
+  return isValid(identity) ? identity.id : null;
+}
+
+/**
+ * Listen for sign-in / sign-out / account switch (not token refreshes)
+ */
+export function onSessionChange(listener: SessionListener): () => void {
+  init();
+  listeners.add(listener);
+  return () => {
+    listeners.delete(listener);
+  };
+}
@@ -1,4 +1,6 @@
 import { supabase } from "./supabaseClient";
+import { UploadedFile, UploadProgress, uploadFiles } from "./uploadService";
+import { ImageVariants } from "../types";
 
 /**
  * Storage service for uploading files to Supabase Storage
@@ -59,44 +61,53 @@ export const uploadFile = async (
 
 /**
  * Uploads multiple files for an offer
+ * (compressed + parallel, see uploadService)
  */
 export const uploadOfferAttachments = async (
   files: File[],
   offerId: string,
+  onProgress?: (progress: UploadProgress) => void,
 ): Promise<string[]> => {
-  const uploadedUrls: string[] = [];
-
-  for (const file of files) {
-    const result = await uploadFile(file, OFFER_ATTACHMENTS_BUCKET, offerId);
-    if (result) {
-      uploadedUrls.push(result.url);
-    }
-  }
-
-  return uploadedUrls;
+  const results = await uploadFiles(files, {
+    bucket: OFFER_ATTACHMENTS_BUCKET,
+    prefix: offerId,
+    onProgress,
+  });
+  return results.filter(Boolean).map((r) => r!.url);
 };
 
+// Card thumbnails (~300px wide cards at 1x/2x); the full image covers detail view
+const REQUEST_IMAGE_VARIANT_WIDTHS = [320, 640];
+
 /**
  * Uploads multiple files for a request
+ * (compressed + parallel, see uploadService)
+ * Images also get thumbnails + blurhash, keyed by the full image url
+ * (stored in requests.image_variants)
  */
 export const uploadRequestAttachments = async (
   files: File[],
   requestId: string,
-): Promise<string[]> => {
-  const uploadedUrls: string[] = [];
-
-  for (const file of files) {
-    const result = await uploadFile(
-      file,
-      REQUEST_ATTACHMENTS_BUCKET,
-      requestId,
-    );
-    if (result) {
-      uploadedUrls.push(result.url);
-    }
-  }
-
-  return uploadedUrls;
+  onProgress?: (progress: UploadProgress) => void,
+): Promise<{ urls: string[]; variants: Record<string, ImageVariants> }> => {
+  const results = await uploadFiles(files, {
+    bucket: REQUEST_ATTACHMENTS_BUCKET,
+    prefix: requestId,
+    imageVariants: REQUEST_IMAGE_VARIANT_WIDTHS,
+    onProgress,
+  });
+  const uploaded = results.filter(Boolean) as UploadedFile[];
+  const variants: Record<string, ImageVariants> = {};
+  uploaded.forEach((r) => {
+    if (!r.variants?.length && !r.blurhash) return;
+    variants[r.url] = {
+      srcset: r.variants || [],
+      blurhash: r.blurhash,
+      width: r.width,
+      height: r.height,
+    };
+  });
+  return { urls: uploaded.map((r) => r.url), variants };
 };
 
 /**
@@ -0,0 +1,107 @@
+import { supabase } from "./supabaseClient";
+import { subscribeToTable } from "./realtimeService";
+import { getSessionUserId } from "./sessionService";
+import { logger } from "../utils/logger";
+
+// ==========================================
+// Unread Counters Service
+// ==========================================
+// الشارات (badges) تُقرأ من صف واحد لكل مستخدم تحدّثه triggers
+// (supabase/UNREAD_COUNTERS_SCHEMA.sql) وتصل التحديثات عبر Realtime بدل polling
+
+export interface UnreadCounters {
+  messages: number;
+  messagesForMyRequests: number;
+  messagesForMyOffers: number;
+  notifications: number;
+  interests: number;
+}
+
+export const EMPTY_UNREAD_COUNTERS: UnreadCounters = {
+  messages: 0,
+  messagesForMyRequests: 0,
+  messagesForMyOffers: 0,
+  notifications: 0,
+  interests: 0,
+};
+
+interface UnreadCountersRow {
+  user_id: string;
+  messages: number | null;
+  messages_my_requests: number | null;
+  messages_my_offers: number | null;
+  notifications: number | null;
+  interests: number | null;
+}
+
+const mapCountersRow = (
+  row: Partial<UnreadCountersRow> | null | undefined,
+): UnreadCounters => {
+  if (!row) return { ...EMPTY_UNREAD_COUNTERS };
+  return {
+    messages: row.messages || 0,
+    messagesForMyRequests: row.messages_my_requests || 0,
+    messagesForMyOffers: row.messages_my_offers || 0,
+    notifications: row.notifications || 0,
+    interests: row.interests || 0,
+  };
+};
+
+/**
+ * Get all unread counters for a user (single primary-key read)
+ */
+export async function getUnreadCounters(
+  userId?: string,
+): Promise<UnreadCounters> {
+  try {
+    const targetUserId = userId || (await getSessionUserId());
+    if (!targetUserId) return { ...EMPTY_UNREAD_COUNTERS };
+
+    const { data, error } = await supabase
+      .from("user_unread_counters")
+      .select(
+        "user_id, messages, messages_my_requests, messages_my_offers, notifications, interests",
+      )
+      .eq("user_id", targetUserId)
+      .maybeSingle();
+
+    if (error) throw error;
+    // No row yet = nothing unread
+    return mapCountersRow(data);
+  } catch (error) {
+    logger.error("Error getting unread counters:", error, "service");
+    return { ...EMPTY_UNREAD_COUNTERS };
+  }
+}
+
+/**
+ * Subscribe to the user's counter row.
+ * Fires once with the current values, then on every trigger update.
+ */
+export function subscribeToUnreadCounters(
+  userId: string,
+  callback: (counters: UnreadCounters) => void,
+) {
+  let isActive = true;
+
+  getUnreadCounters(userId).then((counters) => {
+    if (isActive) callback(counters);
+  });
+
+  const unsubscribe = subscribeToTable(
+    { table: "user_unread_counters", filter: `user_id=eq.${userId}` },
+    (payload) => {
+      if (!isActive) return;
+      if (payload.eventType === "DELETE") {
+        callback({ ...EMPTY_UNREAD_COUNTERS });
+        return;
+      }
+      callback(mapCountersRow(payload.new as UnreadCountersRow));
+    },
+  );
+
+  return () => {
+    isActive = false;
+    unsubscribe();
+  };
+}
@@ -0,0 +1,470 @@
+import { supabase } from "./supabaseClient";
+import { capacitorStorage } from "./capacitorStorage";
+import { compressImage } from "../utils/imageCompression";
+import { logger } from "../utils/logger";
+
+// ==========================================
+// Upload Pipeline
+// ==========================================
+// كل رفع للمرفقات (رسائل، عروض، طلبات) يمر من هنا:
+// - الصور تُصغَّر وتُحوَّل WebP في Worker قبل الرفع (utils/imageCompression.ts)
+// - عدة ملفات بالتوازي (concurrency محدود) بدل for...await
+// - الملفات الصغيرة: طلب واحد عبر XHR (لأن fetch لا يعطي تقدم الرفع)
+// - الملفات الكبيرة: TUS resumable على /storage/v1/upload/resumable بقطع 6MB؛
+//   انقطاع الشبكة يستأنف من آخر offset بدل البدء من الصفر، ورابط الرفع يُحفظ
+//   في capacitorStorage فإعادة اختيار نفس الملف تكمل من حيث توقف
+// - imageVariants: نسخ مصغرة بعروض ثابتة تُرفع بجانب الصورة (name_w320.webp)
+//   مع blurhash، لتعرض البطاقات srcset بدل الصورة الكاملة
+// - onProgress يعطي تقدم البايتات لكل الدفعة، وgetUploadStats() يعطي
+//   حجم البيانات والتوفير من الضغط وسرعة الرفع لآخر دفعة
+
+export interface UploadProgress {
+  loaded: number;
+  total: number;
+  percent: number;
+  completedFiles: number;
+  totalFiles: number;
+}
+
+export interface UploadedFile {
+  url: string;
+  path: string;
+  /** Original name chosen by the user */
+  name: string;
+  /** Content type actually stored (image/webp after compression) */
+  type: string;
+  size: number;
+  /** Images only: stored dimensions */
+  width?: number;
+  height?: number;
+  /** Images only, when `imageVariants` was requested */
+  variants?: Array<{ width: number; url: string }>;
+  blurhash?: string;
+}
+
+export interface UploadFilesOptions {
+  bucket: string;
+  prefix: string;
+  concurrency?: number;
+  compressImages?: boolean;
+  /** Derive and upload downscaled copies of images at these widths (px) */
+  imageVariants?: number[];
+  onProgress?: (progress: UploadProgress) => void;
+}
+
+export interface UploadStats {
+  files: number;
+  failed: number;
+  originalBytes: number;
+  uploadedBytes: number;
+  durationMs: number;
+  /** Uploaded megabytes per second for the batch */
+  throughputMBps: number;
+}
+
+const SUPABASE_URL = import.meta.env.VITE_SUPABASE_URL as string;
+const SUPABASE_ANON_KEY = import.meta.env.VITE_SUPABASE_ANON_KEY as string;
+
+const DEFAULT_CONCURRENCY = 3;
+// Supabase's TUS endpoint requires 6MB chunks
+const RESUMABLE_CHUNK_SIZE = 6 * 1024 * 1024;
+const RESUMABLE_THRESHOLD = RESUMABLE_CHUNK_SIZE;
+const CHUNK_MAX_RETRIES = 5;
+const CHUNK_RETRY_DELAY_MS = 1000;
+const RESUMABLE_STORE_KEY = "resumable_uploads_v1";
+// Supabase keeps unfinished TUS uploads for 24h
+const RESUMABLE_MAX_AGE_MS = 23 * 60 * 60 * 1000;
+
+let lastStats: UploadStats | null = null;
+
+// ==========================================
+// Helpers
+// ==========================================
+
+const generateFileName = (file: File, prefix: string): string => {
+  const timestamp = Date.now();
+  const randomString = Math.random().toString(36).substring(2, 8);
+  const extension = file.name.split(".").pop() || "file";
+  return `${prefix}/${timestamp}-${randomString}.${extension}`;
+};
+
+const encodePath = (path: string) =>
+  path.split("/").map(encodeURIComponent).join("/");
+
+const toBase64 = (value: string) =>
+  btoa(unescape(encodeURIComponent(value)));
+
+const sleep = (ms: number) => new Promise((r) => setTimeout(r, ms));
+
+const getAuthHeaders = async (): Promise<Record<string, string>> => {
+  // Local session read - refreshed by supabase-js autoRefreshToken
+  const { data: { session } } = await supabase.auth.getSession();
+  return {
+    authorization: `Bearer ${session?.access_token || SUPABASE_ANON_KEY}`,
+    apikey: SUPABASE_ANON_KEY,
+  };
+};
+
+interface XhrResponse {
+  status: number;
+  header: (name: string) => string | null;
+  body: string;
+}
+
+const xhrRequest = (
+  method: string,
+  url: string,
+  headers: Record<string, string>,
+  body?: Blob | null,
+  onUploadProgress?: (loaded: number) => void,
+): Promise<XhrResponse> =>
+  new Promise((resolve, reject) => {
+    const xhr = new XMLHttpRequest();
+    xhr.open(method, url);
+    Object.entries(headers).forEach(([k, v]) => xhr.setRequestHeader(k, v));
+    if (onUploadProgress) {
+      xhr.upload.onprogress = (e) => onUploadProgress(e.loaded);
+    }
+    xhr.onload = () =>
+      resolve({
+        status: xhr.status,
+        header: (name) => xhr.getResponseHeader(name),
+        body: xhr.responseText,
+      });
+    xhr.onerror = () => reject(new Error("network error"));
+    xhr.ontimeout = () => reject(new Error("timeout"));
+    xhr.send(body ?? null);
+  });
+
+// ==========================================
+// Single request upload (small files)
+// ==========================================
+
+const uploadSimple = async (
+  bucket: string,
+  path: string,
+  file: Blob,
+  onProgress: (loaded: number) => void,
+) => {
+  const res = await xhrRequest(
+    "POST",
+    `${SUPABASE_URL}/storage/v1/object/${bucket}/${encodePath(path)}`,
+    {
+      ...(await getAuthHeaders()),
+      "content-type": file.type || "application/octet-stream",
+      "cache-control": "max-age=3600",
+      "x-upsert": "false",
+    },
+    file,
+    onProgress,
+  );
+  if (res.status < 200 || res.status >= 300) {
+    throw new Error(`upload failed (${res.status}): ${res.body}`);
+  }
+  onProgress(file.size);
+};
+
+// ==========================================
+// Resumable upload (TUS, large files)
+// ==========================================
+
+interface StoredResumable {
+  uploadUrl: string;
+  path: string;
+  createdAt: number;
+}
+
+const readResumableStore = async (): Promise<Record<string, StoredResumable>> => {
+  try {
+    const raw = await capacitorStorage.getItem(RESUMABLE_STORE_KEY);
+    const store = raw ? JSON.parse(raw) as Record<string, StoredResumable> : {};
+    const cutoff = Date.now() - RESUMABLE_MAX_AGE_MS;
+    Object.keys(store).forEach((k) => {
+      if (store[k].createdAt < cutoff) delete store[k];
+    });
+    return store;
+  } catch {
+    return {};
+  }
+};
+
+const updateResumableStore = async (
+  fingerprint: string,
+  value: StoredResumable | null,
+) => {
+  const store = await readResumableStore();
+  if (value) store[fingerprint] = value;
+  else delete store[fingerprint];
+  await capacitorStorage.setItem(RESUMABLE_STORE_KEY, JSON.stringify(store));
+};
+
+const fileFingerprint = (bucket: string, prefix: string, file: File) =>
+  `${bucket}:${prefix}:${file.name}:${file.size}:${file.lastModified}`;
+
+const getServerOffset = async (uploadUrl: string): Promise<number | null> => {
+  const res = await xhrRequest("HEAD", uploadUrl, {
+    ...(await getAuthHeaders()),
+    "tus-resumable": "1.0.0",
+  });
+  if (res.status !== 200 && res.status !== 204) return null;
+  const offset = Number(res.header("upload-offset"));
+  return Number.isFinite(offset) ? offset : null;
+};
+
+const createResumable = async (
+  bucket: string,
+  path: string,
+  file: File,
+): Promise<string> => {
+  const metadata = [
+    `bucketName ${toBase64(bucket)}`,
+    `objectName ${toBase64(path)}`,
+    `contentType ${toBase64(file.type || "application/octet-stream")}`,
+    `cacheControl ${toBase64("3600")}`,
+  ].join(",");
+
+  const res = await xhrRequest(
+    "POST",
+    `${SUPABASE_URL}/storage/v1/upload/resumable`,
+    {
+      ...(await getAuthHeaders()),
+      "tus-resumable": "1.0.0",
+      "upload-length": String(file.size),
+      "upload-metadata": metadata,
+      "x-upsert": "false",
+    },
+  );
+  const location = res.header("location");
+  if (res.status !== 201 || !location) {
+    throw new Error(`resumable create failed (${res.status}): ${res.body}`);
+  }
+  return new URL(location, SUPABASE_URL).toString();
+};
+
+const uploadResumable = async (
+  bucket: string,
+  prefix: string,
+  file: File,
+  onProgress: (loaded: number) => void,
+): Promise<string> => {
+  const fingerprint = fileFingerprint(bucket, prefix, file);
+  const stored = (await readResumableStore())[fingerprint];
+
+  let path = stored?.path || generateFileName(file, prefix);
+  let uploadUrl = stored?.uploadUrl || null;
+  let offset = 0;
+
+  if (uploadUrl) {
+    const serverOffset = await getServerOffset(uploadUrl).catch(() => null);
+    if (serverOffset === null) {
+      uploadUrl = null;
+      path = generateFileName(file, prefix);
+    } else {
+      offset = serverOffset;
+      logger.log(`⏯️ Resuming upload ${file.name} at ${offset}/${file.size}`);
+    }
+  }
+
+  if (!uploadUrl) {
+    uploadUrl = await createResumable(bucket, path, file);
+    await updateResumableStore(fingerprint, {
+      uploadUrl,
+      path,
+      createdAt: Date.now(),
+    });
+  }
+
+  onProgress(offset);
+  let retries = 0;
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + RESUMABLE_CHUNK_SIZE);
+    try {
+      const res = await xhrRequest(
+        "PATCH",
+        uploadUrl,
+        {
+          ...(await getAuthHeaders()),
+          "tus-resumable": "1.0.0",
+          "upload-offset": String(offset),
+          "content-type": "application/offset+octet-stream",
+        },
+        chunk,
+        (loaded) => onProgress(offset + loaded),
+      );
+      if (res.status !== 204) {
+        throw new Error(`chunk failed (${res.status}): ${res.body}`);
+      }
+      offset = Number(res.header("upload-offset")) || offset + chunk.size;
+      retries = 0;
+      onProgress(offset);
+    } catch (error) {
+      if (++retries > CHUNK_MAX_RETRIES) throw error;
+      await sleep(CHUNK_RETRY_DELAY_MS * 2 ** (retries - 1));
+      // Ask the server how much it actually stored before re-sending
+      const serverOffset = await getServerOffset(uploadUrl).catch(() => null);
+      if (serverOffset !== null) offset = serverOffset;
+    }
+  }
+
+  await updateResumableStore(fingerprint, null).catch(() => {});
+  return path;
+};
+
+// ==========================================
+// Public API
+// ==========================================
+
+const runWithConcurrency = async <T, R>(
+  items: T[],
+  limit: number,
+  task: (item: T, index: number) => Promise<R>,
+): Promise<R[]> => {
+  const results = new Array<R>(items.length);
+  let next = 0;
+  const workers = Array.from(
+    { length: Math.min(limit, items.length) },
+    async () => {
+      while (next < items.length) {
+        const index = next++;
+        results[index] = await task(items[index], index);
+      }
+    },
+  );
+  await Promise.all(workers);
+  return results;
+};
+
+/**
+ * Compress (images) and upload files in parallel.
+ * Result order matches `files`; a failed file yields null.
+ */
+export async function uploadFiles(
+  files: File[],
+  {
+    bucket,
+    prefix,
+    concurrency = DEFAULT_CONCURRENCY,
+    compressImages = true,
+    imageVariants,
+    onProgress,
+  }: UploadFilesOptions,
+): Promise<Array<UploadedFile | null>> {
+  const startedAt = Date.now();
+  const loaded = files.map(() => 0);
+  const totals = files.map((f) => f.size);
+  let completedFiles = 0;
+
+  const emit = () => {
+    if (!onProgress) return;
+    const sumLoaded = loaded.reduce((a, b) => a + b, 0);
+    const sumTotal = totals.reduce((a, b) => a + b, 0);
+    onProgress({
+      loaded: sumLoaded,
+      total: sumTotal,
+      percent: sumTotal > 0 ? Math.min(100, Math.round((sumLoaded / sumTotal) * 100)) : 100,
+      completedFiles,
+      totalFiles: files.length,
+    });
+  };
+  emit();
+
+  const results = await runWithConcurrency(files, concurrency, async (original, i) => {
+    try {
+      const compressed = compressImages
+        ? await compressImage(original, {
+          variantWidths: imageVariants,
+          blurhash: !!imageVariants?.length,
+        })
+        : { file: original };
+      const { file } = compressed;
+      const variantFiles = "variants" in compressed
+        ? compressed.variants || []
+        : [];
+      const variantBytes = variantFiles.reduce((a, v) => a + v.file.size, 0);
+      totals[i] = file.size + variantBytes;
+      emit();
+
+      const onFileProgress = (bytes: number) => {
+        loaded[i] = Math.min(bytes, file.size);
+        emit();
+      };
+      const publicUrl = (path: string) =>
+        supabase.storage.from(bucket).getPublicUrl(path).data.publicUrl;
+
+      const path = file.size > RESUMABLE_THRESHOLD
+        ? await uploadResumable(bucket, prefix, file, onFileProgress)
+        : await (async () => {
+          const p = generateFileName(file, prefix);
+          await uploadSimple(bucket, p, file, onFileProgress);
+          return p;
+        })();
+
+      // Thumbnails are tiny - a failed one just drops out of the srcset
+      const base = path.includes(".") ? path.slice(0, path.lastIndexOf(".")) : path;
+      let variantsLoaded = 0;
+      const variants = (await Promise.all(
+        variantFiles.map(async (v) => {
+          const ext = v.file.name.split(".").pop() || "webp";
+          const variantPath = `${base}_w${v.width}.${ext}`;
+          try {
+            await uploadSimple(bucket, variantPath, v.file, () => {});
+            return { width: v.width, url: publicUrl(variantPath) };
+          } catch (error) {
+            logger.warn(`Variant upload failed: ${variantPath}`, error);
+            return null;
+          } finally {
+            variantsLoaded += v.file.size;
+            loaded[i] = file.size + variantsLoaded;
+            emit();
+          }
+        }),
+      )).filter(Boolean) as Array<{ width: number; url: string }>;
+
+      return {
+        url: publicUrl(path),
+        path,
+        name: original.name,
+        type: file.type,
+        size: file.size,
+        ...("width" in compressed && compressed.width
+          ? { width: compressed.width, height: compressed.height }
+          : {}),
+        ...(variants.length > 0 ? { variants } : {}),
+        ...("blurhash" in compressed && compressed.blurhash
+          ? { blurhash: compressed.blurhash }
+          : {}),
+      } as UploadedFile;
+    } catch (error) {
+      logger.error(`Upload failed: ${original.name}`, error, "service");
+      loaded[i] = totals[i];
+      return null;
+    } finally {
+      completedFiles++;
+      emit();
+    }
+  });
+
+  const durationMs = Date.now() - startedAt;
+  const uploaded = results.filter(Boolean) as UploadedFile[];
+  const uploadedBytes = uploaded.reduce((a, f) => a + f.size, 0);
+  lastStats = {
+    files: files.length,
+    failed: files.length - uploaded.length,
+    originalBytes: files.reduce((a, f) => a + f.size, 0),
+    uploadedBytes,
+    durationMs,
+    throughputMBps: durationMs > 0
+      ? uploadedBytes / 1024 / 1024 / (durationMs / 1000)
+      : 0,
+  };
+  logger.log("📤 Upload batch:", lastStats);
+
+  return results;
+}
+
+/**
+ * Stats of the last uploadFiles() batch (size saved by compression, MB/s)
+ */
+export function getUploadStats(): UploadStats | null {
+  return lastStats;
+}
@@ -0,0 +1,166 @@
+-- ==========================================
+-- مزامنة التصنيفات بالفروقات (delta sync)
+--
+-- قبل: التطبيق يبدأ كل تشغيل بكاش فارغ ويجلب جدول categories كاملاً،
+-- وكل حدث Realtime على الجدول يعيد جلبه كاملاً من جديد.
+--
+-- بعد: التطبيق يحفظ نسخة التصنيفات مع "إصدار" = أكبر updated_at رآه، ويعرضها
+-- فوراً عند التشغيل، ثم يستدعي get_categories_delta(version) ليجلب فقط:
+-- - الصفوف التي تغيّرت بعد الإصدار (بما فيها التي أصبحت is_active = FALSE)
+-- - معرفات التصنيفات المحذوفة فعلياً (category_deletions)
+--
+-- لكي يكون updated_at موثوقاً:
+-- - trigger يحدّثه مع كل UPDATE (لم يكن هناك trigger على categories)
+-- - الحذف يترك سجلاً في category_deletions، وإعادة الإضافة تزيله
+--
+-- updated_at = now() هو وقت بداية الـ transaction، فقد تظهر (commit) بعد أن
+-- يكون العميل قد رأى إصداراً أحدث. لذلك الـ delta يعيد أيضاً ما تغيّر خلال
+-- DELTA_OVERLAP قبل الإصدار - الصفوف المكررة تُدمج في العميل بلا أثر.
+-- ==========================================
+
+ALTER TABLE categories ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+UPDATE categories SET updated_at = COALESCE(created_at, NOW()) WHERE updated_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_categories_updated_at ON categories(updated_at);
+
+-- ==========================================
+-- updated_at trigger
+-- ==========================================
+
+CREATE OR REPLACE FUNCTION touch_category_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_touch_category_updated_at ON categories;
+CREATE TRIGGER trigger_touch_category_updated_at
+BEFORE UPDATE ON categories
+FOR EACH ROW
+EXECUTE FUNCTION touch_category_updated_at();
+
+-- ==========================================
+-- Tombstones for hard deletes
+-- ==========================================
+
+CREATE TABLE IF NOT EXISTS category_deletions (
+  id TEXT PRIMARY KEY,
+  deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_category_deletions_deleted_at
+ON category_deletions(deleted_at);
+
+-- Written by triggers only; read through get_categories_delta()
+ALTER TABLE category_deletions ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION track_category_deletion()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    INSERT INTO category_deletions (id, deleted_at)
+    VALUES (OLD.id, NOW())
+    ON CONFLICT (id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+  END IF;
+
+  -- Re-created under the same id: the new row (updated_at) supersedes the tombstone
+  DELETE FROM category_deletions WHERE id = NEW.id;
+  RETURN NEW;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION track_category_deletion() FROM PUBLIC, anon, authenticated;
+
+DROP TRIGGER IF EXISTS trigger_track_category_deletion ON categories;
+CREATE TRIGGER trigger_track_category_deletion
+AFTER INSERT OR DELETE ON categories
+FOR EACH ROW
+EXECUTE FUNCTION track_category_deletion();
+
+-- ==========================================
+-- Delta RPC
+-- ==========================================
+
+-- p_since = NULL -> full snapshot (active rows only)
+-- Returns:
+-- {
+--   "version": "<max updated_at / deleted_at>",
+--   "full": true|false,
+--   "changed": [{ id, label, label_en, label_ur, icon, emoji, description,
+--                 sort_order, is_active }],
+--   "deleted": ["id", ...]
+-- }
+CREATE OR REPLACE FUNCTION get_categories_delta(
+  p_since TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  -- DELTA_OVERLAP: see the header
+  v_from TIMESTAMPTZ := p_since - INTERVAL '2 minutes';
+  v_version TIMESTAMPTZ;
+  v_changed JSONB;
+  v_deleted JSONB;
+BEGIN
+  SELECT GREATEST(
+    (SELECT MAX(updated_at) FROM categories),
+    (SELECT MAX(deleted_at) FROM category_deletions)
+  )
+  INTO v_version;
+
+  SELECT COALESCE(
+    jsonb_agg(
+      jsonb_build_object(
+        'id', c.id,
+        'label', c.label,
+        'label_en', c.label_en,
+        'label_ur', c.label_ur,
+        'icon', c.icon,
+        'emoji', c.emoji,
+        'description', c.description,
+        'sort_order', c.sort_order,
+        'is_active', COALESCE(c.is_active, TRUE)
+      )
+      ORDER BY c.sort_order, c.id
+    ),
+    '[]'::JSONB
+  )
+  INTO v_changed
+  FROM categories c
+  WHERE (p_since IS NULL AND COALESCE(c.is_active, TRUE))
+     OR (p_since IS NOT NULL AND c.updated_at > v_from);
+
+  IF p_since IS NULL THEN
+    v_deleted := '[]'::JSONB;
+  ELSE
+    SELECT COALESCE(jsonb_agg(d.id), '[]'::JSONB)
+    INTO v_deleted
+    FROM category_deletions d
+    WHERE d.deleted_at > v_from;
+  END IF;
+
+  RETURN jsonb_build_object(
+    'version', v_version,
+    'full', p_since IS NULL,
+    'changed', v_changed,
+    'deleted', v_deleted
+  );
+END;
+$$;
+
+-- Categories are public (the app lists them before login)
+GRANT EXECUTE ON FUNCTION get_categories_delta(TIMESTAMPTZ) TO anon, authenticated;
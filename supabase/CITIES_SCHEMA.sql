@@ -0,0 +1,301 @@
+-- ==========================================
+-- جدول المدن الموحّد (cities)
+-- ==========================================
+-- هذا الملف يُنشئ:
+-- 1. جدول المدن (أسماء عربية/إنجليزية + أسماء بديلة + مفتاح موحّد + إحداثيات)
+-- 2. requests.city_id و profiles.interested_city_ids تُحسب مرة واحدة عند الكتابة
+-- 3. إعادة تعريف fanout_interest_notifications و find_interested_users
+--    لتصبح مطابقة المدن مساواة/تقاطع مصفوفات على أعمدة مفهرسة
+--
+-- المتطلبات: FIX_INTEREST_NOTIFICATIONS.sql (normalize_city_key / normalize_city_keys)
+-- البيانات الأولية مطابقة لـ SAUDI_CITY_CATALOG في services/placesService.ts
+-- ==========================================
+
+-- ==========================================
+-- الجزء 1: جدول المدن
+-- ==========================================
+CREATE TABLE IF NOT EXISTS cities (
+  id TEXT PRIMARY KEY,
+  name_ar TEXT NOT NULL,
+  name_en TEXT NOT NULL,
+  aliases TEXT[] DEFAULT '{}',
+  city_key TEXT GENERATED ALWAYS AS (normalize_city_key(name_ar)) STORED,
+  alias_keys TEXT[] GENERATED ALWAYS AS (
+    normalize_city_keys(ARRAY[name_ar, name_en] || COALESCE(aliases, '{}'))
+  ) STORED,
+  lat DOUBLE PRECISION,
+  lng DOUBLE PRECISION,
+  sort_order INTEGER DEFAULT 0,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cities_city_key ON cities(city_key);
+CREATE INDEX IF NOT EXISTS idx_cities_alias_keys ON cities USING GIN (alias_keys);
+
+INSERT INTO cities (id, name_ar, name_en, aliases, lat, lng, sort_order) VALUES
+  ('riyadh', 'الرياض', 'Riyadh', '{}', 24.7136, 46.6753, 1),
+  ('jeddah', 'جدة', 'Jeddah', '{"Jiddah"}', 21.4858, 39.1925, 2),
+  ('makkah', 'مكة المكرمة', 'Makkah', '{"مكة","Mecca"}', 21.3891, 39.8579, 3),
+  ('madinah', 'المدينة المنورة', 'Madinah', '{"المدينة","Medina"}', 24.5247, 39.5692, 4),
+  ('dammam', 'الدمام', 'Dammam', '{}', 26.4207, 50.0888, 5),
+  ('khobar', 'الخبر', 'Khobar', '{"Al Khobar"}', 26.2172, 50.1971, 6),
+  ('dhahran', 'الظهران', 'Dhahran', '{}', 26.2361, 50.0393, 7),
+  ('al-ahsa', 'الأحساء', 'Al Ahsa', '{"الهفوف","Hofuf"}', 25.3838, 49.5870, 8),
+  ('taif', 'الطائف', 'Taif', '{}', 21.2703, 40.4158, 9),
+  ('tabuk', 'تبوك', 'Tabuk', '{}', 28.3835, 36.5662, 10),
+  ('buraydah', 'بريدة', 'Buraydah', '{"Buraidah"}', 26.3260, 43.9750, 11),
+  ('khamis-mushait', 'خميس مشيط', 'Khamis Mushait', '{}', 18.3060, 42.7297, 12),
+  ('abha', 'أبها', 'Abha', '{}', 18.2164, 42.5053, 13),
+  ('hail', 'حائل', 'Hail', '{"Ha''il"}', 27.5114, 41.7208, 14),
+  ('najran', 'نجران', 'Najran', '{}', 17.5656, 44.2289, 15),
+  ('jazan', 'جازان', 'Jazan', '{"جيزان","Jizan"}', 16.8892, 42.5511, 16),
+  ('yanbu', 'ينبع', 'Yanbu', '{}', 24.0895, 38.0618, 17),
+  ('jubail', 'الجبيل', 'Jubail', '{}', 27.0046, 49.6460, 18),
+  ('qatif', 'القطيف', 'Qatif', '{}', 26.5654, 49.9964, 19),
+  ('al-kharj', 'الخرج', 'Al Kharj', '{}', 24.1556, 47.3120, 20),
+  ('unaizah', 'عنيزة', 'Unaizah', '{}', 26.0843, 43.9930, 21),
+  ('al-baha', 'الباحة', 'Al Baha', '{}', 20.0129, 41.4677, 22),
+  ('sakaka', 'سكاكا', 'Sakaka', '{}', 29.9697, 40.2064, 23),
+  ('arar', 'عرعر', 'Arar', '{}', 30.9753, 41.0381, 24),
+  ('qurayyat', 'القريات', 'Qurayyat', '{}', 31.3318, 37.3428, 25),
+  ('hafar-al-batin', 'حفر الباطن', 'Hafar Al Batin', '{}', 28.4328, 45.9708, 26),
+  ('rabigh', 'رابغ', 'Rabigh', '{}', 22.7986, 39.0349, 27),
+  ('majmaah', 'المجمعة', 'Majmaah', '{}', 25.9039, 45.3456, 28),
+  ('qunfudhah', 'القنفذة', 'Al Qunfudhah', '{}', 19.1264, 41.0789, 29),
+  ('bisha', 'بيشة', 'Bisha', '{}', 20.0005, 42.6052, 30)
+ON CONFLICT (id) DO UPDATE SET
+  name_ar = EXCLUDED.name_ar,
+  name_en = EXCLUDED.name_en,
+  aliases = EXCLUDED.aliases,
+  lat = EXCLUDED.lat,
+  lng = EXCLUDED.lng,
+  sort_order = EXCLUDED.sort_order,
+  updated_at = NOW();
+
+ALTER TABLE cities ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Anyone can view cities" ON cities;
+CREATE POLICY "Anyone can view cities" ON cities
+  FOR SELECT
+  USING (true);
+
+-- ==========================================
+-- الجزء 2: تحويل اسم مدينة إلى id (مرة واحدة عند الكتابة)
+-- ==========================================
+CREATE OR REPLACE FUNCTION resolve_city_id(p_city TEXT)
+RETURNS TEXT
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT c.id
+  FROM cities c
+  WHERE c.alias_keys @> ARRAY[normalize_city_key(p_city)]
+  ORDER BY c.sort_order
+  LIMIT 1;
+$$;
+
+CREATE OR REPLACE FUNCTION resolve_city_ids(p_cities TEXT[])
+RETURNS TEXT[]
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT COALESCE(ARRAY_AGG(DISTINCT c.id), ARRAY[]::TEXT[])
+  FROM cities c
+  WHERE c.alias_keys && normalize_city_keys(p_cities);
+$$;
+
+ALTER TABLE requests ADD COLUMN IF NOT EXISTS city_id TEXT REFERENCES cities(id) ON DELETE SET NULL;
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS interested_city_ids TEXT[] DEFAULT '{}';
+
+CREATE INDEX IF NOT EXISTS idx_requests_city_id ON requests(city_id);
+
+CREATE INDEX IF NOT EXISTS idx_profiles_interest_city_ids_notify
+ON profiles USING GIN (interested_city_ids) WHERE notify_on_interest = TRUE;
+
+CREATE OR REPLACE FUNCTION set_request_city_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+  NEW.city_id := resolve_city_id(COALESCE(NEW.location_city, NEW.location));
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_set_request_city_id ON requests;
+CREATE TRIGGER trigger_set_request_city_id
+BEFORE INSERT OR UPDATE OF location, location_city ON requests
+FOR EACH ROW
+EXECUTE FUNCTION set_request_city_id();
+
+CREATE OR REPLACE FUNCTION set_profile_interested_city_ids()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+  NEW.interested_city_ids := resolve_city_ids(NEW.interested_cities);
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_set_profile_interested_city_ids ON profiles;
+CREATE TRIGGER trigger_set_profile_interested_city_ids
+BEFORE INSERT OR UPDATE OF interested_cities ON profiles
+FOR EACH ROW
+EXECUTE FUNCTION set_profile_interested_city_ids();
+
+-- Backfill existing rows
+UPDATE requests
+SET city_id = resolve_city_id(COALESCE(location_city, location))
+WHERE city_id IS DISTINCT FROM resolve_city_id(COALESCE(location_city, location));
+
+UPDATE profiles
+SET interested_city_ids = resolve_city_ids(interested_cities)
+WHERE COALESCE(array_length(interested_cities, 1), 0) > 0;
+
+-- ==========================================
+-- الجزء 3: مطابقة المدن بالـ id في دوال الإشعارات
+-- city_key يبقى احتياطاً للمدن غير الموجودة في الجدول (أحياء/قرى من Google Places)
+-- ==========================================
+CREATE OR REPLACE FUNCTION fanout_interest_notifications(p_request_id UUID)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_request RECORD;
+  v_category_ids TEXT[];
+  v_payload JSONB;
+  v_inserted INTEGER;
+BEGIN
+  SELECT
+    r.author_id,
+    r.title,
+    r.city_id,
+    r.city_key,
+    p.display_name,
+    COALESCE(p.display_name, 'مستخدم') AS author_name
+  INTO v_request
+  FROM requests r
+  LEFT JOIN profiles p ON p.id = r.author_id
+  WHERE r.id = p_request_id
+    AND r.status = 'active'
+    AND r.is_public = TRUE;
+
+  IF NOT FOUND THEN
+    RETURN 0;
+  END IF;
+
+  -- Get request category IDs (not labels!)
+  SELECT COALESCE(ARRAY_AGG(rc.category_id), ARRAY[]::TEXT[])
+  INTO v_category_ids
+  FROM request_categories rc
+  WHERE rc.request_id = p_request_id;
+
+  -- Same shape as build_notification_payload() (NOTIFICATION_PAYLOAD.sql), built
+  -- once here: the BEFORE INSERT trigger skips rows that already carry a payload
+  v_payload := jsonb_strip_nulls(jsonb_build_object(
+    'request', jsonb_build_object(
+      'id', p_request_id,
+      'title', v_request.title,
+      'authorName', v_request.display_name
+    )
+  ));
+
+  INSERT INTO notifications (user_id, type, title, message, link_to, related_request_id, payload)
+  SELECT
+    p.id,
+    'interest',
+    'طلب جديد يطابق اهتماماتك',
+    'طلب جديد: ' || COALESCE(v_request.title, 'طلب') || ' من ' || v_request.author_name,
+    '/request/' || p_request_id,
+    p_request_id,
+    v_payload
+  FROM profiles p
+  WHERE p.notify_on_interest = TRUE
+    AND (
+      p.interested_categories && v_category_ids
+      OR (v_request.city_id IS NOT NULL
+          AND p.interested_city_ids @> ARRAY[v_request.city_id])
+      OR (v_request.city_id IS NULL AND v_request.city_key IS NOT NULL
+          AND p.interested_city_keys @> ARRAY[v_request.city_key])
+    )
+    -- Don't notify the request author
+    AND p.id IS DISTINCT FROM v_request.author_id
+    -- Safe to re-run (deferred queue retries)
+    AND NOT EXISTS (
+      SELECT 1 FROM notifications n
+      WHERE n.related_request_id = p_request_id
+        AND n.user_id = p.id
+        AND n.type = 'interest'
+    );
+
+  GET DIAGNOSTICS v_inserted = ROW_COUNT;
+  RETURN v_inserted;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION fanout_interest_notifications(UUID) FROM PUBLIC, anon, authenticated;
+
+CREATE OR REPLACE FUNCTION find_interested_users(
+  p_category TEXT DEFAULT NULL,
+  p_city TEXT DEFAULT NULL,
+  p_keywords TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (
+  user_id UUID,
+  display_name TEXT,
+  phone TEXT,
+  match_type TEXT
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_city_ids TEXT[];
+  v_city_key TEXT;
+BEGIN
+  IF COALESCE(auth.role(), '') <> 'service_role' THEN
+    RAISE EXCEPTION 'Forbidden';
+  END IF;
+
+  IF p_city IS NOT NULL THEN
+    v_city_ids := ARRAY[resolve_city_id(p_city)];
+    IF v_city_ids[1] IS NULL THEN
+      v_city_ids := NULL;
+      -- Not in the cities table: fall back to the city key, as in fanout_interest_notifications
+      v_city_key := normalize_city_key(p_city);
+    END IF;
+  END IF;
+
+  RETURN QUERY
+  SELECT DISTINCT
+    p.id,
+    p.display_name,
+    p.phone,
+    CASE
+      WHEN p_category IS NOT NULL AND p.interested_categories @> ARRAY[p_category] THEN 'category'
+      WHEN v_city_ids IS NOT NULL AND p.interested_city_ids @> v_city_ids THEN 'city'
+      WHEN v_city_key IS NOT NULL AND p.interested_city_keys @> ARRAY[v_city_key] THEN 'city'
+      WHEN p_keywords IS NOT NULL AND p.radar_words && p_keywords THEN 'radar_word'
+      ELSE 'unknown'
+    END as match_type
+  FROM public.profiles p
+  WHERE
+    p.notify_on_interest = true
+    AND p.role_mode = 'provider'
+    AND (
+      (p_category IS NOT NULL AND p.interested_categories @> ARRAY[p_category])
+      OR (v_city_ids IS NOT NULL AND p.interested_city_ids @> v_city_ids)
+      OR (v_city_key IS NOT NULL AND p.interested_city_keys @> ARRAY[v_city_key])
+      OR (p_keywords IS NOT NULL AND p.radar_words && p_keywords)
+    );
+END;
+$$;
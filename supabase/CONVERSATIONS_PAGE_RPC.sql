@@ -0,0 +1,122 @@
+-- ==========================================
+-- قائمة المحادثات في طلب واحد (RPC)
+--
+-- قبل: getConversations = محادثات + بروفايلات + COUNT(*) لكل محادثة (N+1)
+-- الآن: get_conversations_page يعيد المحادثة + بيانات الطرف الآخر + unread_count
+--       + آخر رسالة (last_message_preview) في round trip واحد، مع ترقيم بالمؤشر
+--       (cursor) على (last_message_at, id)
+--
+-- المتطلبات: UNREAD_COUNTERS_SCHEMA.sql (conversation_unread_counters)
+-- ==========================================
+
+-- idx_conversations_last_message (last_message_at DESC) يخدم الترتيب فقط؛
+-- الفلترة بالمستخدم تحتاج أن يكون participant أول عمود في الفهرس، فكل فرع من
+-- الاستعلام أدناه يقرأ أول p_limit صفاً مباشرة من الفهرس بدون sort.
+CREATE INDEX IF NOT EXISTS idx_conversations_p1_last_message
+ON conversations(participant1_id, last_message_at DESC NULLS LAST, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_conversations_p2_last_message
+ON conversations(participant2_id, last_message_at DESC NULLS LAST, id DESC);
+
+-- ==========================================
+-- Function: صفحة من محادثات المستخدم الحالي
+-- الترتيب: last_message_at DESC NULLS LAST, id DESC
+-- الصفحة التالية: مرّر last_message_at و id لآخر صف في الصفحة السابقة
+-- ==========================================
+CREATE OR REPLACE FUNCTION get_conversations_page(
+  p_limit INTEGER DEFAULT 50,
+  p_before_last_message_at TIMESTAMPTZ DEFAULT NULL,
+  p_before_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  participant1_id UUID,
+  participant2_id UUID,
+  request_id UUID,
+  offer_id UUID,
+  last_message_at TIMESTAMPTZ,
+  last_message_preview TEXT,
+  created_at TIMESTAMPTZ,
+  updated_at TIMESTAMPTZ,
+  is_closed BOOLEAN,
+  closed_reason TEXT,
+  other_user_id UUID,
+  other_display_name TEXT,
+  other_avatar_url TEXT,
+  unread_count INTEGER
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH params AS (
+    SELECT
+      auth.uid() AS user_id,
+      LEAST(GREATEST(COALESCE(p_limit, 50), 1), 200) AS page_size
+  ),
+  page AS (
+    (
+      SELECT c.*
+      FROM conversations c, params
+      WHERE c.participant1_id = params.user_id
+        AND (
+          p_before_id IS NULL
+          OR (p_before_last_message_at IS NOT NULL AND (
+                c.last_message_at < p_before_last_message_at
+                OR (c.last_message_at = p_before_last_message_at AND c.id < p_before_id)
+                OR c.last_message_at IS NULL))
+          OR (p_before_last_message_at IS NULL
+              AND c.last_message_at IS NULL AND c.id < p_before_id)
+        )
+      ORDER BY c.last_message_at DESC NULLS LAST, c.id DESC
+      LIMIT (SELECT page_size FROM params)
+    )
+    UNION ALL
+    (
+      SELECT c.*
+      FROM conversations c, params
+      WHERE c.participant2_id = params.user_id
+        AND c.participant1_id IS DISTINCT FROM params.user_id
+        AND (
+          p_before_id IS NULL
+          OR (p_before_last_message_at IS NOT NULL AND (
+                c.last_message_at < p_before_last_message_at
+                OR (c.last_message_at = p_before_last_message_at AND c.id < p_before_id)
+                OR c.last_message_at IS NULL))
+          OR (p_before_last_message_at IS NULL
+              AND c.last_message_at IS NULL AND c.id < p_before_id)
+        )
+      ORDER BY c.last_message_at DESC NULLS LAST, c.id DESC
+      LIMIT (SELECT page_size FROM params)
+    )
+  )
+  SELECT
+    c.id,
+    c.participant1_id,
+    c.participant2_id,
+    c.request_id,
+    c.offer_id,
+    c.last_message_at,
+    c.last_message_preview,
+    c.created_at,
+    c.updated_at,
+    COALESCE(c.is_closed, FALSE),
+    c.closed_reason,
+    other.id,
+    other.display_name,
+    other.avatar_url,
+    COALESCE(u.unread_count, 0)
+  FROM page c
+  CROSS JOIN params
+  LEFT JOIN profiles other
+    ON other.id = CASE WHEN c.participant1_id = params.user_id
+                       THEN c.participant2_id ELSE c.participant1_id END
+  LEFT JOIN conversation_unread_counters u
+    ON u.conversation_id = c.id AND u.user_id = params.user_id
+  ORDER BY c.last_message_at DESC NULLS LAST, c.id DESC
+  LIMIT (SELECT page_size FROM params);
+$$;
+
+REVOKE ALL ON FUNCTION get_conversations_page(INTEGER, TIMESTAMPTZ, UUID) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION get_conversations_page(INTEGER, TIMESTAMPTZ, UUID) TO authenticated;
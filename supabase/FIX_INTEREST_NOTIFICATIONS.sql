@@ -2,93 +2,170 @@
 -- إصلاح trigger الإشعارات للاهتمامات
 -- المشكلة: trigger كان يبحث عن تطابق بين label و interested_categories
 -- لكن interested_categories تحفظ id (مثل 'writing') وليس label (مثل 'كتابة ومحتوى')
+--
+-- الإصدار الحالي: استعلام واحد INSERT ... SELECT بدل حلقة FOR لكل مستخدم
+-- - مطابقة الفئات عبر && على interested_categories (GIN index)
+-- - مطابقة المدن عبر مفتاح مدينة موحّد (city key) بدل ILIKE '%city%'
+--
+-- الـ trigger نفسه (notify_on_new_interest_request) والتوزيع غير المتزامن
+-- انتقلا إلى NOTIFICATION_JOBS_SCHEMA.sql - هذا الملف لا يلمسهما، فإعادة
+-- تشغيله لا تستبدل trigger الطابور.
 -- ==========================================
 
--- Drop existing function and trigger
-DROP TRIGGER IF EXISTS trigger_notify_on_new_interest_request ON requests;
-DROP FUNCTION IF EXISTS notify_on_new_interest_request() CASCADE;
+-- ==========================================
+-- Function: توحيد اسم المدينة إلى مفتاح قابل للمقارنة
+-- "حي النرجس، الرياض" -> "الرياض" ، "إبها" -> "ابها" ، "جدة" -> "جده"
+-- ==========================================
+CREATE OR REPLACE FUNCTION normalize_city_key(p_city TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+SET search_path = public
+AS $$
+  SELECT NULLIF(
+    translate(
+      regexp_replace(
+        lower(btrim(regexp_replace(COALESCE(p_city, ''), '^.*[،,]', ''))),
+        '[ً-ٰٟـ[:space:]]', '', 'g'  -- تشكيل + تطويل + مسافات
+      ),
+      'أإآٱةى',
+      'ااااهي'
+    ),
+    ''
+  );
+$$;
+
+-- Array variant (used by the generated column on profiles).
+-- "كل المدن" is a UI placeholder, not an interest, so it never produces a key.
+CREATE OR REPLACE FUNCTION normalize_city_keys(p_cities TEXT[])
+RETURNS TEXT[]
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+SET search_path = public
+AS $$
+  SELECT COALESCE(ARRAY_AGG(DISTINCT k), ARRAY[]::TEXT[])
+  FROM (
+    SELECT normalize_city_key(c) AS k
+    FROM unnest(COALESCE(p_cities, ARRAY[]::TEXT[])) AS c
+    WHERE c IS DISTINCT FROM 'كل المدن'
+  ) keys
+  WHERE k IS NOT NULL;
+$$;
 
 -- ==========================================
--- Function: إشعار عند طلب جديد يطابق اهتمامات المستخدم (مُصلح)
+-- أعمدة المفاتيح + الفهارس
+-- ==========================================
+ALTER TABLE profiles
+ADD COLUMN IF NOT EXISTS interested_city_keys TEXT[]
+  GENERATED ALWAYS AS (normalize_city_keys(interested_cities)) STORED;
+
+ALTER TABLE requests
+ADD COLUMN IF NOT EXISTS city_key TEXT
+  GENERATED ALWAYS AS (normalize_city_key(COALESCE(location_city, location))) STORED;
+
+-- Only users who opted in are ever scanned, so keep the indexes partial.
+CREATE INDEX IF NOT EXISTS idx_profiles_interest_categories_notify
+ON profiles USING GIN (interested_categories) WHERE notify_on_interest = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_profiles_interest_city_keys_notify
+ON profiles USING GIN (interested_city_keys) WHERE notify_on_interest = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_requests_city_key ON requests(city_key);
+
+-- Used by the duplicate guard below
+CREATE INDEX IF NOT EXISTS idx_notifications_related_request_id
+ON notifications(related_request_id);
+
+-- payload يُملأ هنا مباشرة (انظر NOTIFICATION_PAYLOAD.sql)؛ العمود قد لا يكون
+-- موجوداً بعد لأن هذا الملف يسبق NOTIFICATION_PAYLOAD.sql في ترتيب التشغيل
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS payload JSONB;
+
 -- ==========================================
-CREATE OR REPLACE FUNCTION notify_on_new_interest_request()
-RETURNS TRIGGER AS $$
+-- Function: توزيع إشعارات الاهتمام لطلب واحد (set-based)
+-- Returns the number of notifications created.
+-- ==========================================
+CREATE OR REPLACE FUNCTION fanout_interest_notifications(p_request_id UUID)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
 DECLARE
-  request_category_ids TEXT[];
-  request_city TEXT;
-  request_title TEXT;
-  request_author_name TEXT;
-  matching_user_id UUID;
-  user_category_ids TEXT[];
-  user_cities TEXT[];
+  v_request RECORD;
+  v_category_ids TEXT[];
+  v_payload JSONB;
+  v_inserted INTEGER;
 BEGIN
-  -- Only process active, public requests
-  IF NEW.status != 'active' OR NEW.is_public != TRUE THEN
-    RETURN NEW;
-  END IF;
-
-  -- Get request details
-  SELECT 
+  SELECT
+    r.author_id,
     r.title,
-    COALESCE(p.display_name, 'مستخدم'),
-    COALESCE(r.location_city, r.location)
-  INTO request_title, request_author_name, request_city
+    r.city_key,
+    p.display_name,
+    COALESCE(p.display_name, 'مستخدم') AS author_name
+  INTO v_request
   FROM requests r
   LEFT JOIN profiles p ON p.id = r.author_id
-  WHERE r.id = NEW.id;
+  WHERE r.id = p_request_id
+    AND r.status = 'active'
+    AND r.is_public = TRUE;
+
+  IF NOT FOUND THEN
+    RETURN 0;
+  END IF;
 
   -- Get request category IDs (not labels!)
-  SELECT ARRAY_AGG(rc.category_id)
-  INTO request_category_ids
+  SELECT COALESCE(ARRAY_AGG(rc.category_id), ARRAY[]::TEXT[])
+  INTO v_category_ids
   FROM request_categories rc
-  WHERE rc.request_id = NEW.id;
-
-  -- Find users with matching interests
-  FOR matching_user_id, user_category_ids, user_cities IN
-    SELECT 
-      id,
-      COALESCE(interested_categories, ARRAY[]::TEXT[]),
-      COALESCE(interested_cities, ARRAY[]::TEXT[])
-    FROM profiles
-    WHERE notify_on_interest = TRUE
-      AND (
-        -- Match categories by ID (exact match or array overlap)
-        (array_length(interested_categories, 1) IS NOT NULL AND
-         array_length(COALESCE(request_category_ids, ARRAY[]::TEXT[]), 1) IS NOT NULL AND
-         interested_categories && request_category_ids)
-        OR
-        -- Match cities
-        (array_length(interested_cities, 1) IS NOT NULL AND
-         (request_city ILIKE ANY(SELECT '%' || city || '%' FROM unnest(interested_cities) AS city)
-          OR EXISTS (
-            SELECT 1 FROM unnest(interested_cities) AS city
-            WHERE request_city ILIKE '%' || city || '%'
-          )))
-      )
-      -- Don't notify the request author
-      AND id != NEW.author_id
-  LOOP
-    -- Create notification for matching user
-    INSERT INTO notifications (user_id, type, title, message, link_to, related_request_id)
-    VALUES (
-      matching_user_id,
-      'interest',
-      'طلب جديد يطابق اهتماماتك',
-      'طلب جديد: ' || COALESCE(request_title, 'طلب') || ' من ' || request_author_name,
-      '/request/' || NEW.id,
-      NEW.id
+  WHERE rc.request_id = p_request_id;
+
+  -- Same shape as build_notification_payload() (NOTIFICATION_PAYLOAD.sql), built
+  -- once here: the BEFORE INSERT trigger skips rows that already carry a payload
+  v_payload := jsonb_strip_nulls(jsonb_build_object(
+    'request', jsonb_build_object(
+      'id', p_request_id,
+      'title', v_request.title,
+      'authorName', v_request.display_name
+    )
+  ));
+
+  INSERT INTO notifications (user_id, type, title, message, link_to, related_request_id, payload)
+  SELECT
+    p.id,
+    'interest',
+    'طلب جديد يطابق اهتماماتك',
+    'طلب جديد: ' || COALESCE(v_request.title, 'طلب') || ' من ' || v_request.author_name,
+    '/request/' || p_request_id,
+    p_request_id,
+    v_payload
+  FROM profiles p
+  WHERE p.notify_on_interest = TRUE
+    AND (
+      p.interested_categories && v_category_ids
+      OR (v_request.city_key IS NOT NULL
+          AND p.interested_city_keys @> ARRAY[v_request.city_key])
+    )
+    -- Don't notify the request author
+    AND p.id IS DISTINCT FROM v_request.author_id
+    -- Safe to re-run (deferred queue retries)
+    AND NOT EXISTS (
+      SELECT 1 FROM notifications n
+      WHERE n.related_request_id = p_request_id
+        AND n.user_id = p.id
+        AND n.type = 'interest'
     );
-  END LOOP;
-  
-  RETURN NEW;
+
+  GET DIAGNOSTICS v_inserted = ROW_COUNT;
+  RETURN v_inserted;
 END;
-$$ LANGUAGE plpgsql;
+$$;
+
+REVOKE ALL ON FUNCTION fanout_interest_notifications(UUID) FROM PUBLIC, anon, authenticated;
 
 -- ==========================================
--- Create trigger for interest notifications
+-- التوزيع المؤجل (interest_fanout_queue / process_interest_fanout_queue) و
+-- notify_on_new_interest_request() + trigger_notify_on_new_interest_request:
+-- في NOTIFICATION_JOBS_SCHEMA.sql (طابور notification_jobs)
 -- ==========================================
-CREATE TRIGGER trigger_notify_on_new_interest_request
-AFTER INSERT ON requests
-FOR EACH ROW
-EXECUTE FUNCTION notify_on_new_interest_request();
-
@@ -0,0 +1,99 @@
+-- ==========================================
+-- نافذة الرسائل (Message Window) بمؤشر (created_at, id)
+--
+-- قبل: getMessages = تحقق من المحادثة + آخر 50 رسالة + بروفايلات المرسلين (3 طلبات)
+--      ولا توجد طريقة لتحميل الأقدم أو جلب الجديد فقط
+-- الآن: get_messages_window في طلب واحد:
+--   - بدون مؤشر: أحدث p_limit رسالة
+--   - p_before_*: رسائل أقدم من المؤشر (تمرير للأعلى)
+--   - p_after_*: رسائل أحدث من المؤشر (مزامنة "منذ آخر ما رأيت")
+-- النتيجة دائماً مرتبة من الأقدم للأحدث
+-- ==========================================
+
+-- (conversation_id, created_at, id): كل نافذة = range scan واحد على الفهرس
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_created
+ON messages(conversation_id, created_at, id);
+
+CREATE OR REPLACE FUNCTION get_messages_window(
+  p_conversation_id UUID,
+  p_limit INTEGER DEFAULT 50,
+  p_before_created_at TIMESTAMPTZ DEFAULT NULL,
+  p_before_id UUID DEFAULT NULL,
+  p_after_created_at TIMESTAMPTZ DEFAULT NULL,
+  p_after_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  conversation_id UUID,
+  sender_id UUID,
+  content TEXT,
+  is_read BOOLEAN,
+  read_at TIMESTAMPTZ,
+  created_at TIMESTAMPTZ,
+  updated_at TIMESTAMPTZ,
+  attachments JSONB,
+  audio_url TEXT,
+  audio_duration INTEGER,
+  message_type TEXT,
+  sender_display_name TEXT,
+  sender_avatar_url TEXT
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH params AS (
+    SELECT LEAST(GREATEST(COALESCE(p_limit, 50), 1), 200) AS page_size
+  ),
+  allowed AS (
+    -- Access check (replaces the separate conversations round trip)
+    SELECT c.id
+    FROM conversations c
+    WHERE c.id = p_conversation_id
+      AND (c.participant1_id = auth.uid() OR c.participant2_id = auth.uid())
+  ),
+  win AS (
+    (
+      SELECT m.*
+      FROM messages m
+      WHERE m.conversation_id = (SELECT id FROM allowed)
+        AND p_after_created_at IS NULL
+        AND (p_before_created_at IS NULL
+             OR (m.created_at, m.id) < (p_before_created_at, COALESCE(p_before_id, 'ffffffff-ffff-ffff-ffff-ffffffffffff'::UUID)))
+      ORDER BY m.created_at DESC, m.id DESC
+      LIMIT (SELECT page_size FROM params)
+    )
+    UNION ALL
+    (
+      SELECT m.*
+      FROM messages m
+      WHERE m.conversation_id = (SELECT id FROM allowed)
+        AND p_after_created_at IS NOT NULL
+        AND (m.created_at, m.id) > (p_after_created_at, COALESCE(p_after_id, '00000000-0000-0000-0000-000000000000'::UUID))
+      ORDER BY m.created_at ASC, m.id ASC
+      LIMIT (SELECT page_size FROM params)
+    )
+  )
+  SELECT
+    w.id,
+    w.conversation_id,
+    w.sender_id,
+    w.content,
+    w.is_read,
+    w.read_at,
+    w.created_at,
+    w.updated_at,
+    COALESCE(w.attachments, '[]'::JSONB),
+    w.audio_url,
+    w.audio_duration,
+    w.message_type,
+    p.display_name,
+    p.avatar_url
+  FROM win w
+  LEFT JOIN profiles p ON p.id = w.sender_id
+  ORDER BY w.created_at ASC, w.id ASC;
+$$;
+
+REVOKE ALL ON FUNCTION get_messages_window(UUID, INTEGER, TIMESTAMPTZ, UUID, TIMESTAMPTZ, UUID) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION get_messages_window(UUID, INTEGER, TIMESTAMPTZ, UUID, TIMESTAMPTZ, UUID) TO authenticated;
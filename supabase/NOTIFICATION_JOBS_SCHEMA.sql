@@ -0,0 +1,369 @@
+-- ==========================================
+-- طابور مهام الإشعارات (notification_jobs) + عامل المعالجة
+--
+-- قبل: trigger الإدراج على requests يوزّع إشعارات الاهتمام داخل نفس
+-- المعاملة (INSERT ... SELECT على كل المهتمين)، والعميل يستدعي
+-- send-push-notification وينتظره. طفرة طلبات جديدة = إدراج طلب أبطأ،
+-- وأي فشل في الإرسال يضيع بلا إعادة محاولة.
+--
+-- بعد:
+-- - الـ trigger يضيف سطراً واحداً في notification_jobs (interest_fanout) ويعود
+-- - run_interest_fanout_jobs() ينفذ التوزيع في SQL على دفعات، ثم يضيف
+--   مهمة push للطلب (FCM يحتاج HTTP فيتولاها الـ Edge Function notification-worker)
+-- - الاستلام عبر FOR UPDATE SKIP LOCKED: عدة عمّال بالتوازي بدون تكرار أو انتظار
+-- - الفشل: إعادة محاولة مع backoff أسّي، وبعد max_attempts تُعلَّم dead
+--   (dead-letter) للمراجعة وإعادة التشغيل يدوياً بـ retry_dead_notification_jobs()
+-- - dedupe_key يمنع تكرار نفس المهمة (نفس الطلب مرتين)
+--
+-- يحل محل interest_fanout_queue / process_interest_fanout_queue() و
+-- app.defer_interest_fanout (كانت في FIX_INTEREST_NOTIFICATIONS.sql): الصفوف
+-- المتبقية تُنقل إلى notification_jobs ثم يُحذف الجدول القديم. هذا الملف هو
+-- المصدر الوحيد لـ notify_on_new_interest_request() و trigger الإدراج.
+--
+-- الجدولة (pg_cron) - احذف جدولة الطابور القديم إن وُجدت:
+--   SELECT cron.unschedule('interest-fanout');
+--   SELECT cron.schedule('interest-fanout-jobs', '* * * * *',
+--     $$SELECT run_interest_fanout_jobs('pg_cron', 500)$$);
+--   SELECT cron.schedule('notification-worker', '* * * * *', $$
+--     SELECT net.http_post(
+--       url := '<SUPABASE_URL>/functions/v1/notification-worker',
+--       headers := jsonb_build_object('Authorization', 'Bearer <SERVICE_ROLE_KEY>')
+--     )$$);
+--
+-- القياس المحلي: scripts/bench_notification_jobs.py (jobs/sec)
+-- ==========================================
+
+CREATE TABLE IF NOT EXISTS notification_jobs (
+  id BIGSERIAL PRIMARY KEY,
+  kind TEXT NOT NULL,
+  payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+  dedupe_key TEXT UNIQUE,
+  status TEXT NOT NULL DEFAULT 'pending'
+    CHECK (status IN ('pending', 'running', 'done', 'dead')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 5,
+  run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  locked_at TIMESTAMPTZ,
+  locked_by TEXT,
+  last_error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  finished_at TIMESTAMPTZ
+);
+
+-- Production kinds only. scripts/bench_notification_jobs.py widens this for
+-- its run and restores it afterwards.
+DELETE FROM notification_jobs WHERE kind NOT IN ('interest_fanout', 'push');
+ALTER TABLE notification_jobs DROP CONSTRAINT IF EXISTS notification_jobs_kind_check;
+ALTER TABLE notification_jobs ADD CONSTRAINT notification_jobs_kind_check
+  CHECK (kind IN ('interest_fanout', 'push'));
+
+-- Claim path: only pending rows are ever scanned
+CREATE INDEX IF NOT EXISTS idx_notification_jobs_due
+ON notification_jobs (kind, run_at) WHERE status = 'pending';
+
+-- Stale-lock recovery
+CREATE INDEX IF NOT EXISTS idx_notification_jobs_running
+ON notification_jobs (locked_at) WHERE status = 'running';
+
+-- Purge of finished jobs
+CREATE INDEX IF NOT EXISTS idx_notification_jobs_finished
+ON notification_jobs (finished_at) WHERE status IN ('done', 'dead');
+
+ALTER TABLE notification_jobs ENABLE ROW LEVEL SECURITY;
+-- No policies: only SECURITY DEFINER functions and service_role touch the jobs.
+
+-- ==========================================
+-- Enqueue / claim / complete / fail
+-- ==========================================
+CREATE OR REPLACE FUNCTION enqueue_notification_job(
+  p_kind TEXT,
+  p_payload JSONB,
+  p_dedupe_key TEXT DEFAULT NULL,
+  p_delay_seconds INTEGER DEFAULT 0
+)
+RETURNS BIGINT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_id BIGINT;
+BEGIN
+  INSERT INTO notification_jobs (kind, payload, dedupe_key, run_at)
+  VALUES (
+    p_kind,
+    COALESCE(p_payload, '{}'::jsonb),
+    p_dedupe_key,
+    NOW() + make_interval(secs => GREATEST(p_delay_seconds, 0))
+  )
+  ON CONFLICT (dedupe_key) DO NOTHING
+  RETURNING id INTO v_id;
+
+  RETURN v_id; -- NULL when the job already exists
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION claim_notification_jobs(
+  p_worker TEXT,
+  p_kinds TEXT[],
+  p_limit INTEGER DEFAULT 50,
+  p_lock_timeout_seconds INTEGER DEFAULT 300
+)
+RETURNS SETOF notification_jobs
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  -- A worker that died mid-job leaves it 'running'; hand it out again
+  UPDATE notification_jobs
+  SET status = 'pending', locked_at = NULL, locked_by = NULL
+  WHERE status = 'running'
+    AND locked_at < NOW() - make_interval(secs => p_lock_timeout_seconds)
+    AND kind = ANY(p_kinds);
+
+  RETURN QUERY
+  UPDATE notification_jobs j
+  SET status = 'running',
+      attempts = j.attempts + 1,
+      locked_at = NOW(),
+      locked_by = p_worker
+  WHERE j.id IN (
+    SELECT q.id
+    FROM notification_jobs q
+    WHERE q.status = 'pending'
+      AND q.kind = ANY(p_kinds)
+      AND q.run_at <= NOW()
+    ORDER BY q.run_at
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING j.*;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION complete_notification_jobs(p_ids BIGINT[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_count INTEGER;
+BEGIN
+  UPDATE notification_jobs
+  SET status = 'done',
+      finished_at = NOW(),
+      locked_at = NULL,
+      last_error = NULL
+  WHERE id = ANY(p_ids) AND status = 'running';
+
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$;
+
+-- Returns the new status ('pending' = will retry, 'dead' = dead-lettered)
+CREATE OR REPLACE FUNCTION fail_notification_job(
+  p_id BIGINT,
+  p_error TEXT,
+  p_retry_after_seconds INTEGER DEFAULT NULL,
+  p_permanent BOOLEAN DEFAULT FALSE
+)
+RETURNS TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_status TEXT;
+BEGIN
+  UPDATE notification_jobs
+  SET status = CASE
+        WHEN p_permanent OR attempts >= max_attempts THEN 'dead'
+        ELSE 'pending'
+      END,
+      -- 10s, 20s, 40s ... capped at 1h, unless the caller knows better (Retry-After)
+      run_at = NOW() + make_interval(secs => COALESCE(
+        p_retry_after_seconds,
+        LEAST(3600, 10 * power(2, GREATEST(attempts - 1, 0)))::INTEGER
+      )),
+      finished_at = CASE
+        WHEN p_permanent OR attempts >= max_attempts THEN NOW()
+        ELSE NULL
+      END,
+      locked_at = NULL,
+      locked_by = NULL,
+      last_error = left(p_error, 2000)
+  WHERE id = p_id AND status = 'running'
+  RETURNING status INTO v_status;
+
+  RETURN v_status;
+END;
+$$;
+
+-- Dead-letter replay (after fixing whatever made them fail)
+CREATE OR REPLACE FUNCTION retry_dead_notification_jobs(p_kind TEXT DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_count INTEGER;
+BEGIN
+  UPDATE notification_jobs
+  SET status = 'pending', attempts = 0, run_at = NOW(), finished_at = NULL
+  WHERE status = 'dead' AND (p_kind IS NULL OR kind = p_kind);
+
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION purge_notification_jobs(p_keep_days INTEGER DEFAULT 7)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_count INTEGER;
+BEGIN
+  DELETE FROM notification_jobs
+  WHERE status IN ('done', 'dead')
+    AND finished_at < NOW() - make_interval(days => p_keep_days);
+
+  GET DIAGNOSTICS v_count = ROW_COUNT;
+  RETURN v_count;
+END;
+$$;
+
+-- ==========================================
+-- Interest fan-out runner (pure SQL, no HTTP)
+-- Each job runs in its own subtransaction: one failing request does not
+-- roll back the rest of the batch.
+-- ==========================================
+CREATE OR REPLACE FUNCTION run_interest_fanout_jobs(
+  p_worker TEXT DEFAULT 'sql',
+  p_limit INTEGER DEFAULT 100
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_job notification_jobs;
+  v_request_id UUID;
+  v_request RECORD;
+  v_done BIGINT[] := ARRAY[]::BIGINT[];
+  v_notified INTEGER := 0;
+BEGIN
+  FOR v_job IN
+    SELECT * FROM claim_notification_jobs(p_worker, ARRAY['interest_fanout'], p_limit)
+  LOOP
+    BEGIN
+      v_request_id := (v_job.payload->>'request_id')::UUID;
+      v_notified := v_notified + fanout_interest_notifications(v_request_id);
+
+      SELECT r.id, r.title, r.description, r.location, r.author_id
+      INTO v_request
+      FROM requests r
+      WHERE r.id = v_request_id AND r.status = 'active' AND r.is_public = TRUE;
+
+      IF FOUND THEN
+        -- Same payload the client used to send to send-push-notification
+        PERFORM enqueue_notification_job(
+          'push',
+          jsonb_build_object(
+            'notificationType', 'new_request',
+            'requestId', v_request.id,
+            'requestTitle', COALESCE(v_request.title, 'طلب جديد'),
+            'requestDescription', COALESCE(v_request.description, ''),
+            'city', v_request.location,
+            'authorId', v_request.author_id,
+            'categories', COALESCE((
+              SELECT jsonb_agg(rc.category_id)
+              FROM request_categories rc
+              WHERE rc.request_id = v_request.id
+            ), '[]'::jsonb)
+          ),
+          'push:new_request:' || v_request.id
+        );
+      END IF;
+
+      v_done := v_done || v_job.id;
+    EXCEPTION WHEN OTHERS THEN
+      PERFORM fail_notification_job(v_job.id, SQLERRM);
+    END;
+  END LOOP;
+
+  IF cardinality(v_done) > 0 THEN
+    PERFORM complete_notification_jobs(v_done);
+  END IF;
+
+  RETURN v_notified;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION enqueue_notification_job(TEXT, JSONB, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION claim_notification_jobs(TEXT, TEXT[], INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION complete_notification_jobs(BIGINT[]) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION fail_notification_job(BIGINT, TEXT, INTEGER, BOOLEAN) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION retry_dead_notification_jobs(TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION purge_notification_jobs(INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION run_interest_fanout_jobs(TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+
+-- ==========================================
+-- Trigger: enqueue only
+-- Also fires when a request becomes active+public after insert
+-- (createRequestFromChat's fallback inserts non-public, then publishes).
+-- ==========================================
+CREATE OR REPLACE FUNCTION notify_on_new_interest_request()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF NEW.status != 'active' OR NEW.is_public != TRUE THEN
+    RETURN NEW;
+  END IF;
+  IF TG_OP = 'UPDATE' AND OLD.status = 'active' AND OLD.is_public = TRUE THEN
+    RETURN NEW;
+  END IF;
+
+  -- Delay a few seconds so request_categories (inserted right after the
+  -- request by the client) are in place when the fan-out runs
+  PERFORM enqueue_notification_job(
+    'interest_fanout',
+    jsonb_build_object('request_id', NEW.id),
+    'interest:' || NEW.id,
+    5
+  );
+
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_notify_on_new_interest_request ON requests;
+CREATE TRIGGER trigger_notify_on_new_interest_request
+AFTER INSERT OR UPDATE OF status, is_public ON requests
+FOR EACH ROW
+EXECUTE FUNCTION notify_on_new_interest_request();
+
+-- Move anything still waiting in the old queue, then drop it
+DO $$
+BEGIN
+  IF to_regclass('public.interest_fanout_queue') IS NOT NULL THEN
+    INSERT INTO notification_jobs (kind, payload, dedupe_key, run_at)
+    SELECT 'interest_fanout', jsonb_build_object('request_id', q.request_id),
+           'interest:' || q.request_id, q.enqueued_at
+    FROM interest_fanout_queue q
+    ON CONFLICT (dedupe_key) DO NOTHING;
+  END IF;
+END $$;
+
+DROP FUNCTION IF EXISTS process_interest_fanout_queue(INTEGER);
+DROP TABLE IF EXISTS interest_fanout_queue;
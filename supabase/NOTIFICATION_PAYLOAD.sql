@@ -0,0 +1,156 @@
+-- ==========================================
+-- بيانات العرض المضمّنة في الإشعار (notifications.payload)
+--
+-- قبل: كل إشعار Realtime = حتى 4-5 استعلامات .single() متتالية في العميل
+--      (الإشعار نفسه، الطلب، صاحب الطلب، العرض/الرسالة، المرسل)
+-- الآن: trigger قبل الإدراج يكتب payload مرة واحدة:
+--   {
+--     "request": {"id", "title", "authorName"},
+--     "offer":   {"id", "title", "providerName", "status"},
+--     "message": {"id", "senderName", "preview"}
+--   }
+-- ويصل مع الصف في حدث Realtime مباشرة.
+--
+-- أي trigger/دالة تنشئ إشعارات يمكنها تمرير payload جاهز فيتم تخطي البناء.
+-- fanout_interest_notifications (CITIES_SCHEMA.sql) يبني payload مرة واحدة لكل
+-- طلب ويمرره لكل المستلمين، بدل إعادة البناء لكل صف في INSERT ... SELECT.
+-- ==========================================
+
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS payload JSONB;
+
+CREATE INDEX IF NOT EXISTS idx_notifications_related_offer_id
+ON notifications(related_offer_id) WHERE related_offer_id IS NOT NULL;
+
+-- ==========================================
+-- Function: بناء payload من المعرفات المرتبطة
+-- ==========================================
+CREATE OR REPLACE FUNCTION build_notification_payload(
+  p_request_id UUID,
+  p_offer_id UUID,
+  p_message_id UUID
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT jsonb_strip_nulls(jsonb_build_object(
+    'request', (
+      SELECT jsonb_build_object(
+        'id', r.id,
+        'title', r.title,
+        'authorName', p.display_name
+      )
+      FROM requests r
+      LEFT JOIN profiles p ON p.id = r.author_id
+      WHERE r.id = p_request_id
+    ),
+    'offer', (
+      SELECT jsonb_build_object(
+        'id', o.id,
+        'title', o.title,
+        'providerName', o.provider_name,
+        'status', o.status
+      )
+      FROM offers o
+      WHERE o.id = p_offer_id
+    ),
+    'message', (
+      SELECT jsonb_build_object(
+        'id', m.id,
+        'senderName', COALESCE(p.display_name, 'مستخدم'),
+        'preview', CASE WHEN length(m.content) > 50
+                        THEN left(m.content, 50) || '...'
+                        ELSE m.content END
+      )
+      FROM messages m
+      LEFT JOIN profiles p ON p.id = m.sender_id
+      WHERE m.id = p_message_id
+    )
+  ));
+$$;
+
+CREATE OR REPLACE FUNCTION set_notification_payload()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF NEW.payload IS NULL THEN
+    NEW.payload := build_notification_payload(
+      NEW.related_request_id,
+      NEW.related_offer_id,
+      NEW.related_message_id
+    );
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_set_notification_payload ON notifications;
+CREATE TRIGGER trigger_set_notification_payload
+BEFORE INSERT ON notifications
+FOR EACH ROW
+EXECUTE FUNCTION set_notification_payload();
+
+-- ==========================================
+-- إبقاء الحقول المتغيرة محدثة
+-- (أرشفة العرض تخفي إشعاره في العميل، وتعديل عنوان الطلب يظهر في الإشعار)
+-- ==========================================
+CREATE OR REPLACE FUNCTION sync_notification_payload_offer()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE notifications
+  SET payload = jsonb_set(
+    jsonb_set(COALESCE(payload, '{}'::JSONB), '{offer,status}', to_jsonb(NEW.status), TRUE),
+    '{offer,title}', to_jsonb(NEW.title), TRUE
+  )
+  WHERE related_offer_id = NEW.id
+    AND payload ? 'offer';
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_sync_notification_payload_offer ON offers;
+CREATE TRIGGER trigger_sync_notification_payload_offer
+AFTER UPDATE OF status, title ON offers
+FOR EACH ROW
+WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.title IS DISTINCT FROM NEW.title)
+EXECUTE FUNCTION sync_notification_payload_offer();
+
+CREATE OR REPLACE FUNCTION sync_notification_payload_request()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE notifications
+  SET payload = jsonb_set(payload, '{request,title}', to_jsonb(NEW.title), TRUE)
+  WHERE related_request_id = NEW.id
+    AND payload ? 'request';
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_sync_notification_payload_request ON requests;
+CREATE TRIGGER trigger_sync_notification_payload_request
+AFTER UPDATE OF title ON requests
+FOR EACH ROW
+WHEN (OLD.title IS DISTINCT FROM NEW.title)
+EXECUTE FUNCTION sync_notification_payload_request();
+
+REVOKE ALL ON FUNCTION build_notification_payload(UUID, UUID, UUID) FROM PUBLIC, anon, authenticated;
+
+-- ==========================================
+-- Backfill: الإشعارات الحالية
+-- ==========================================
+UPDATE notifications
+SET payload = build_notification_payload(related_request_id, related_offer_id, related_message_id)
+WHERE payload IS NULL;
@@ -0,0 +1,20 @@
+-- ==========================================
+-- Realtime لجدول profiles (إبطال كاش البروفايلات في العميل)
+--
+-- services/profileCacheService.ts يحتفظ بالاسم والصورة لكل مستخدم في LRU
+-- ويستمع لتحديثات UPDATE على profiles مع فلتر id=in.(...) لمعرفات الكاش فقط،
+-- فتغيير الاسم/الصورة يظهر فوراً بدون إعادة جلب.
+--
+-- RLS الحالية ("Users can view public profiles") تسمح للمستخدم المسجل بالقراءة،
+-- فلا توجد صلاحيات جديدة هنا.
+-- ==========================================
+
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_publication_tables
+    WHERE pubname = 'supabase_realtime' AND tablename = 'profiles'
+  ) THEN
+    ALTER PUBLICATION supabase_realtime ADD TABLE profiles;
+  END IF;
+END $$;
@@ -0,0 +1,112 @@
+-- ==========================================
+-- جمهور إشعارات Push للطلب الجديد في SQL
+--
+-- قبل: send-push-notification يجلب كل صفوف profiles (عدا صاحب الطلب) إلى
+-- الـ Edge Function، ثم يمررها لنموذج AI لاختيار المهتمين أو يطابقها بحلقات
+-- includes متداخلة، ثم يجلب الـ tokens في استعلام ثانٍ. الذاكرة والزمن
+-- يكبران مع عدد المستخدمين كله، لا مع عدد المهتمين.
+--
+-- بعد: get_new_request_push_audience() تعيد (user_id, token) للمطابقين فقط
+-- في استعلام واحد:
+-- - التصنيفات: interested_categories && تصنيفات الطلب (ids من request_categories،
+--   أو تحويل الأسماء القادمة في الـ payload عبر جدول categories)
+-- - كلمات الرادار: radar_words && كلمات عنوان/وصف الطلب
+-- - المدينة: قيد إضافي - المستخدم بلا مدن، أو "كل المدن"، أو مدينته تطابق
+--   (city_id، ثم city_key للمدن غير الموجودة في جدول cities)
+-- - فقط من فعّل notify_on_interest، والفهارس جزئية على هذا الشرط (GIN)
+--
+-- الـ AI في الـ Edge Function أصبح لصياغة نص الإشعار فقط.
+-- تعتمد على CITIES_SCHEMA.sql (resolve_city_id, interested_city_ids)
+-- وFIX_INTEREST_NOTIFICATIONS.sql (normalize_city_key, interested_city_keys).
+-- ==========================================
+
+CREATE INDEX IF NOT EXISTS idx_profiles_radar_words_notify
+ON profiles USING GIN (radar_words) WHERE notify_on_interest = TRUE;
+
+CREATE OR REPLACE FUNCTION get_new_request_push_audience(
+  p_request_id UUID,
+  p_author_id UUID,
+  p_categories TEXT[] DEFAULT NULL,
+  p_city TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+  user_id UUID,
+  token TEXT
+)
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_category_ids TEXT[];
+  v_city_id TEXT;
+  v_city_key TEXT;
+  v_words TEXT[];
+BEGIN
+  -- Category ids (not labels!) - linked before the push is sent
+  SELECT COALESCE(ARRAY_AGG(rc.category_id), ARRAY[]::TEXT[])
+  INTO v_category_ids
+  FROM request_categories rc
+  WHERE rc.request_id = p_request_id;
+
+  IF cardinality(v_category_ids) = 0 AND p_categories IS NOT NULL THEN
+    SELECT COALESCE(ARRAY_AGG(DISTINCT c.id), ARRAY[]::TEXT[])
+    INTO v_category_ids
+    FROM categories c
+    WHERE c.id = ANY(p_categories) OR c.label = ANY(p_categories);
+  END IF;
+
+  SELECT
+    r.city_id,
+    r.city_key,
+    -- Title/description words for radar matching (array overlap uses the GIN index)
+    ARRAY(
+      SELECT DISTINCT w
+      FROM unnest(
+        regexp_split_to_array(
+          lower(COALESCE(r.title, '') || ' ' || COALESCE(r.description, '')),
+          '[[:space:][:punct:]،؛؟]+'
+        )
+      ) AS w
+      WHERE length(w) > 1
+    )
+  INTO v_city_id, v_city_key, v_words
+  FROM requests r
+  WHERE r.id = p_request_id;
+
+  IF v_city_id IS NULL AND p_city IS NOT NULL THEN
+    v_city_id := resolve_city_id(p_city);
+    v_city_key := COALESCE(v_city_key, normalize_city_key(p_city));
+  END IF;
+
+  RETURN QUERY
+  WITH candidates AS (
+    SELECT p.id
+    FROM profiles p
+    WHERE p.notify_on_interest = TRUE
+      AND p.interested_categories && v_category_ids
+    UNION
+    SELECT p.id
+    FROM profiles p
+    WHERE p.notify_on_interest = TRUE
+      AND p.radar_words && v_words
+  )
+  SELECT t.user_id, t.token
+  FROM candidates c
+  JOIN profiles p ON p.id = c.id
+  JOIN fcm_tokens t ON t.user_id = c.id
+  WHERE c.id IS DISTINCT FROM p_author_id
+    AND (
+      (v_city_id IS NULL AND v_city_key IS NULL)
+      OR COALESCE(cardinality(p.interested_cities), 0) = 0
+      OR 'كل المدن' = ANY(p.interested_cities)
+      OR (v_city_id IS NOT NULL AND p.interested_city_ids @> ARRAY[v_city_id])
+      OR (v_city_key IS NOT NULL AND p.interested_city_keys @> ARRAY[v_city_key])
+    );
+END;
+$$;
+
+-- Called only by the send-push-notification Edge Function (service_role)
+REVOKE ALL ON FUNCTION get_new_request_push_audience(UUID, UUID, TEXT[], TEXT)
+FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,20 @@
+-- ==========================================
+-- نسخ مصغرة لصور الطلبات (srcset + blurhash)
+--
+-- قبل: بطاقات السوق وServiceCard تعرض requests.images بالدقة الكاملة
+-- (صورة 1920px لبطاقة عرضها ~300px)، فأول شاشة تنزّل عدة ميغابايت.
+--
+-- بعد: services/uploadService.ts يشتق عند الرفع نسخاً بعروض 320/640
+-- (name_w320.webp ...) مع blurhash وأبعاد الصورة، ويحفظها هنا بمفتاح رابط
+-- الصورة الأصلية:
+--   { "<image url>": { "srcset": [{ "width": 320, "url": "..." }, ...],
+--                      "blurhash": "LEHV6nWB2yk8...", "width": 1920, "height": 1080 } }
+-- components/ui/ResponsiveImage.tsx يستخدمها لـ srcset/sizes + loading="lazy"
+-- وخلفية blurhash حتى تصل الصورة.
+--
+-- كائن (بدل مصفوفة موازية لـ images) حتى لا يختل الربط عند حذف/ترتيب الصور؛
+-- الطلبات القديمة تبقى '{}' وتُعرض الصورة الأصلية كما كانت.
+-- ==========================================
+
+ALTER TABLE requests
+ADD COLUMN IF NOT EXISTS image_variants JSONB NOT NULL DEFAULT '{}'::jsonb;
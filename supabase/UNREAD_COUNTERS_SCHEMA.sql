@@ -0,0 +1,774 @@
+-- ==========================================
+-- عدادات غير المقروء (Unread Counters) تُحدَّث عبر triggers
+--
+-- بدلاً من COUNT(*) عند كل قراءة (و polling كل 5 ثوانٍ في App.tsx):
+-- 1. user_unread_counters: صف واحد لكل مستخدم (رسائل / رسائل طلباتي / رسائل عروضي /
+--    إشعارات / اهتمامات) - قراءة الشارة = SELECT بالمفتاح الأساسي
+-- 2. conversation_unread_counters: عدد غير المقروء لكل (محادثة، مستخدم)
+-- 3. interest_unread_requests: الطلبات المطابقة للاهتمامات التي لم يشاهدها المستخدم
+--
+-- triggers على messages و notifications تعمل على مستوى الجملة (FOR EACH STATEMENT)
+-- مع transition tables، فتحديث 500 رسالة كمقروءة = تحديث عداد واحد.
+-- التغييرات تصل للعميل عبر Realtime على صف المستخدم (بدون polling).
+--
+-- المتطلبات: CHAT_CONVERSATIONS_SCHEMA.sql, FIX_INTEREST_NOTIFICATIONS.sql, CITIES_SCHEMA.sql
+-- الملف يستدعي recompute_unread_counters() في نهايته لملء العدادات من البيانات الحالية
+-- ==========================================
+
+-- ==========================================
+-- الجزء 1: الجداول
+-- ==========================================
+CREATE TABLE IF NOT EXISTS user_unread_counters (
+  user_id UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+  messages INTEGER NOT NULL DEFAULT 0,
+  messages_my_requests INTEGER NOT NULL DEFAULT 0,
+  messages_my_offers INTEGER NOT NULL DEFAULT 0,
+  notifications INTEGER NOT NULL DEFAULT 0,
+  interests INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS conversation_unread_counters (
+  conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  unread_count INTEGER NOT NULL DEFAULT 0,
+  -- نسخة من conversations.request_id/offer_id لتجنب join عند تجميع الشارات
+  request_id UUID,
+  offer_id UUID,
+  is_my_request BOOLEAN NOT NULL DEFAULT FALSE,
+  is_my_offer BOOLEAN NOT NULL DEFAULT FALSE,
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (conversation_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_conversation_unread_counters_user
+ON conversation_unread_counters(user_id) WHERE unread_count > 0;
+
+CREATE TABLE IF NOT EXISTS interest_unread_requests (
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  request_id UUID NOT NULL REFERENCES requests(id) ON DELETE CASCADE,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (user_id, request_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_interest_unread_requests_request
+ON interest_unread_requests(request_id);
+
+-- The interests badge is shown regardless of notify_on_interest, so the partial
+-- indexes from FIX_INTEREST_NOTIFICATIONS.sql / CITIES_SCHEMA.sql are not enough here.
+CREATE INDEX IF NOT EXISTS idx_profiles_interested_categories
+ON profiles USING GIN (interested_categories);
+
+CREATE INDEX IF NOT EXISTS idx_profiles_interested_city_ids
+ON profiles USING GIN (interested_city_ids);
+
+-- ==========================================
+-- RLS: قراءة فقط للمالك، الكتابة عبر triggers (SECURITY DEFINER)
+-- ==========================================
+ALTER TABLE user_unread_counters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE conversation_unread_counters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE interest_unread_requests ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own unread counters" ON user_unread_counters;
+CREATE POLICY "Users can view own unread counters" ON user_unread_counters
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Users can view own conversation unread counters" ON conversation_unread_counters;
+CREATE POLICY "Users can view own conversation unread counters" ON conversation_unread_counters
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Users can view own unread interests" ON interest_unread_requests;
+CREATE POLICY "Users can view own unread interests" ON interest_unread_requests
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+-- ==========================================
+-- الجزء 2: دالة تعديل عدادات المستخدم
+-- ==========================================
+CREATE OR REPLACE FUNCTION bump_user_unread_counters(
+  p_user_id UUID,
+  p_messages INTEGER DEFAULT 0,
+  p_my_requests INTEGER DEFAULT 0,
+  p_my_offers INTEGER DEFAULT 0,
+  p_notifications INTEGER DEFAULT 0,
+  p_interests INTEGER DEFAULT 0
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF p_user_id IS NULL
+     OR (p_messages = 0 AND p_my_requests = 0 AND p_my_offers = 0
+         AND p_notifications = 0 AND p_interests = 0) THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO user_unread_counters AS u (
+    user_id, messages, messages_my_requests, messages_my_offers, notifications, interests
+  )
+  SELECT
+    p_user_id,
+    GREATEST(p_messages, 0),
+    GREATEST(p_my_requests, 0),
+    GREATEST(p_my_offers, 0),
+    GREATEST(p_notifications, 0),
+    GREATEST(p_interests, 0)
+  -- The user may be mid-deletion (cascades fire these triggers too)
+  WHERE EXISTS (SELECT 1 FROM auth.users WHERE id = p_user_id)
+  ON CONFLICT (user_id) DO UPDATE SET
+    messages = GREATEST(0, u.messages + p_messages),
+    messages_my_requests = GREATEST(0, u.messages_my_requests + p_my_requests),
+    messages_my_offers = GREATEST(0, u.messages_my_offers + p_my_offers),
+    notifications = GREATEST(0, u.notifications + p_notifications),
+    interests = GREATEST(0, u.interests + p_interests),
+    updated_at = NOW();
+END;
+$$;
+
+-- ==========================================
+-- الجزء 3: الرسائل
+-- ==========================================
+CREATE OR REPLACE FUNCTION bump_conversation_unread(
+  p_conversation_id UUID,
+  p_recipient_id UUID,
+  p_delta INTEGER
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_conv RECORD;
+BEGIN
+  IF p_delta = 0 OR p_recipient_id IS NULL THEN
+    RETURN;
+  END IF;
+
+  SELECT
+    c.request_id,
+    c.offer_id,
+    COALESCE(r.author_id = p_recipient_id, FALSE) AS is_my_request,
+    COALESCE(o.provider_id = p_recipient_id, FALSE) AS is_my_offer
+  INTO v_conv
+  FROM conversations c
+  LEFT JOIN requests r ON r.id = c.request_id
+  LEFT JOIN offers o ON o.id = c.offer_id
+  WHERE c.id = p_conversation_id;
+
+  -- Conversation is being deleted: its counters were already subtracted
+  -- by trigger_unread_counters_conversation_delete
+  IF NOT FOUND THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO conversation_unread_counters AS cu (
+    conversation_id, user_id, unread_count, request_id, offer_id, is_my_request, is_my_offer
+  )
+  SELECT
+    p_conversation_id,
+    p_recipient_id,
+    GREATEST(p_delta, 0),
+    v_conv.request_id,
+    v_conv.offer_id,
+    v_conv.is_my_request,
+    v_conv.is_my_offer
+  WHERE EXISTS (SELECT 1 FROM auth.users WHERE id = p_recipient_id)
+  ON CONFLICT (conversation_id, user_id) DO UPDATE SET
+    unread_count = GREATEST(0, cu.unread_count + p_delta),
+    request_id = EXCLUDED.request_id,
+    offer_id = EXCLUDED.offer_id,
+    is_my_request = EXCLUDED.is_my_request,
+    is_my_offer = EXCLUDED.is_my_offer,
+    updated_at = NOW();
+
+  PERFORM bump_user_unread_counters(
+    p_recipient_id,
+    p_messages => p_delta,
+    p_my_requests => CASE WHEN v_conv.is_my_request THEN p_delta ELSE 0 END,
+    p_my_offers => CASE WHEN v_conv.is_my_offer THEN p_delta ELSE 0 END
+  );
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION unread_counters_on_messages_insert()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  r RECORD;
+BEGIN
+  FOR r IN
+    SELECT
+      n.conversation_id,
+      CASE WHEN c.participant1_id = n.sender_id
+        THEN c.participant2_id ELSE c.participant1_id END AS recipient_id,
+      COUNT(*)::INTEGER AS delta
+    FROM new_rows n
+    JOIN conversations c ON c.id = n.conversation_id
+    WHERE n.is_read IS NOT TRUE
+    GROUP BY 1, 2
+  LOOP
+    PERFORM bump_conversation_unread(r.conversation_id, r.recipient_id, r.delta);
+  END LOOP;
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION unread_counters_on_messages_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  r RECORD;
+BEGIN
+  FOR r IN
+    SELECT
+      n.conversation_id,
+      CASE WHEN c.participant1_id = n.sender_id
+        THEN c.participant2_id ELSE c.participant1_id END AS recipient_id,
+      SUM((n.is_read IS NOT TRUE)::INTEGER - (o.is_read IS NOT TRUE)::INTEGER)::INTEGER AS delta
+    FROM new_rows n
+    JOIN old_rows o ON o.id = n.id
+    JOIN conversations c ON c.id = n.conversation_id
+    WHERE n.is_read IS DISTINCT FROM o.is_read
+    GROUP BY 1, 2
+  LOOP
+    PERFORM bump_conversation_unread(r.conversation_id, r.recipient_id, r.delta);
+  END LOOP;
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION unread_counters_on_messages_delete()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  r RECORD;
+BEGIN
+  FOR r IN
+    SELECT
+      o.conversation_id,
+      CASE WHEN c.participant1_id = o.sender_id
+        THEN c.participant2_id ELSE c.participant1_id END AS recipient_id,
+      -COUNT(*)::INTEGER AS delta
+    FROM old_rows o
+    JOIN conversations c ON c.id = o.conversation_id
+    WHERE o.is_read IS NOT TRUE
+    GROUP BY 1, 2
+  LOOP
+    PERFORM bump_conversation_unread(r.conversation_id, r.recipient_id, r.delta);
+  END LOOP;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_unread_counters_messages_insert ON messages;
+CREATE TRIGGER trigger_unread_counters_messages_insert
+AFTER INSERT ON messages
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION unread_counters_on_messages_insert();
+
+DROP TRIGGER IF EXISTS trigger_unread_counters_messages_update ON messages;
+CREATE TRIGGER trigger_unread_counters_messages_update
+AFTER UPDATE ON messages
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION unread_counters_on_messages_update();
+
+DROP TRIGGER IF EXISTS trigger_unread_counters_messages_delete ON messages;
+CREATE TRIGGER trigger_unread_counters_messages_delete
+AFTER DELETE ON messages
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION unread_counters_on_messages_delete();
+
+-- حذف محادثة: نطرح عداداتها من المجموع قبل أن تُحذف رسائلها بالـ CASCADE
+CREATE OR REPLACE FUNCTION unread_counters_on_conversation_delete()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  r RECORD;
+BEGIN
+  FOR r IN
+    SELECT user_id, unread_count, is_my_request, is_my_offer
+    FROM conversation_unread_counters
+    WHERE conversation_id = OLD.id AND unread_count > 0
+  LOOP
+    PERFORM bump_user_unread_counters(
+      r.user_id,
+      p_messages => -r.unread_count,
+      p_my_requests => CASE WHEN r.is_my_request THEN -r.unread_count ELSE 0 END,
+      p_my_offers => CASE WHEN r.is_my_offer THEN -r.unread_count ELSE 0 END
+    );
+  END LOOP;
+  RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_unread_counters_conversation_delete ON conversations;
+CREATE TRIGGER trigger_unread_counters_conversation_delete
+BEFORE DELETE ON conversations
+FOR EACH ROW
+EXECUTE FUNCTION unread_counters_on_conversation_delete();
+
+-- ==========================================
+-- الجزء 4: الإشعارات
+-- ==========================================
+CREATE OR REPLACE FUNCTION unread_counters_on_notifications_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  r RECORD;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    FOR r IN
+      SELECT user_id, COUNT(*)::INTEGER AS delta
+      FROM new_rows WHERE is_read IS NOT TRUE
+      GROUP BY user_id
+    LOOP
+      PERFORM bump_user_unread_counters(r.user_id, p_notifications => r.delta);
+    END LOOP;
+  ELSIF TG_OP = 'UPDATE' THEN
+    FOR r IN
+      SELECT n.user_id,
+        SUM((n.is_read IS NOT TRUE)::INTEGER - (o.is_read IS NOT TRUE)::INTEGER)::INTEGER AS delta
+      FROM new_rows n
+      JOIN old_rows o ON o.id = n.id
+      WHERE n.is_read IS DISTINCT FROM o.is_read
+      GROUP BY n.user_id
+    LOOP
+      PERFORM bump_user_unread_counters(r.user_id, p_notifications => r.delta);
+    END LOOP;
+  ELSIF TG_OP = 'DELETE' THEN
+    FOR r IN
+      SELECT user_id, -COUNT(*)::INTEGER AS delta
+      FROM old_rows WHERE is_read IS NOT TRUE
+      GROUP BY user_id
+    LOOP
+      PERFORM bump_user_unread_counters(r.user_id, p_notifications => r.delta);
+    END LOOP;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_unread_counters_notifications_insert ON notifications;
+CREATE TRIGGER trigger_unread_counters_notifications_insert
+AFTER INSERT ON notifications
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION unread_counters_on_notifications_change();
+
+DROP TRIGGER IF EXISTS trigger_unread_counters_notifications_update ON notifications;
+CREATE TRIGGER trigger_unread_counters_notifications_update
+AFTER UPDATE ON notifications
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION unread_counters_on_notifications_change();
+
+DROP TRIGGER IF EXISTS trigger_unread_counters_notifications_delete ON notifications;
+CREATE TRIGGER trigger_unread_counters_notifications_delete
+AFTER DELETE ON notifications
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION unread_counters_on_notifications_change();
+
+-- ==========================================
+-- الجزء 5: الاهتمامات (طلبات مطابقة لم يشاهدها المستخدم)
+-- نفس شروط get_unread_interests_count السابقة:
+-- ليس طلبي + نشط وعام + لم أشاهده (is_viewed) + لا يوجد لي عرض غير مرفوض
+-- ==========================================
+CREATE OR REPLACE FUNCTION unread_counters_on_interest_rows_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  r RECORD;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    FOR r IN SELECT user_id, COUNT(*)::INTEGER AS delta FROM new_rows GROUP BY user_id LOOP
+      PERFORM bump_user_unread_counters(r.user_id, p_interests => r.delta);
+    END LOOP;
+  ELSE
+    FOR r IN SELECT user_id, -COUNT(*)::INTEGER AS delta FROM old_rows GROUP BY user_id LOOP
+      PERFORM bump_user_unread_counters(r.user_id, p_interests => r.delta);
+    END LOOP;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_unread_counters_interest_insert ON interest_unread_requests;
+CREATE TRIGGER trigger_unread_counters_interest_insert
+AFTER INSERT ON interest_unread_requests
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION unread_counters_on_interest_rows_change();
+
+DROP TRIGGER IF EXISTS trigger_unread_counters_interest_delete ON interest_unread_requests;
+CREATE TRIGGER trigger_unread_counters_interest_delete
+AFTER DELETE ON interest_unread_requests
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION unread_counters_on_interest_rows_change();
+
+-- إضافة المستخدمين المطابقين لطلب واحد (idempotent)
+CREATE OR REPLACE FUNCTION sync_interest_unread_for_request(p_request_id UUID)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_request RECORD;
+  v_category_ids TEXT[];
+BEGIN
+  SELECT r.author_id, r.city_id, r.city_key
+  INTO v_request
+  FROM requests r
+  WHERE r.id = p_request_id
+    AND r.status = 'active'
+    AND r.is_public = TRUE;
+
+  IF NOT FOUND THEN
+    DELETE FROM interest_unread_requests WHERE request_id = p_request_id;
+    RETURN;
+  END IF;
+
+  SELECT COALESCE(ARRAY_AGG(rc.category_id), ARRAY[]::TEXT[])
+  INTO v_category_ids
+  FROM request_categories rc
+  WHERE rc.request_id = p_request_id;
+
+  INSERT INTO interest_unread_requests (user_id, request_id)
+  SELECT p.id, p_request_id
+  FROM profiles p
+  WHERE (
+      p.interested_categories && v_category_ids
+      OR (v_request.city_id IS NOT NULL
+          AND p.interested_city_ids @> ARRAY[v_request.city_id])
+      OR (v_request.city_id IS NULL AND v_request.city_key IS NOT NULL
+          AND p.interested_city_keys @> ARRAY[v_request.city_key])
+    )
+    AND p.id IS DISTINCT FROM v_request.author_id
+    AND NOT EXISTS (
+      SELECT 1 FROM request_views rv
+      WHERE rv.request_id = p_request_id
+        AND rv.user_id = p.id
+        AND rv.is_viewed = TRUE
+    )
+    AND NOT EXISTS (
+      SELECT 1 FROM offers o
+      WHERE o.request_id = p_request_id
+        AND o.provider_id = p.id
+        AND o.status != 'rejected'
+    )
+  ON CONFLICT (user_id, request_id) DO NOTHING;
+END;
+$$;
+
+-- إعادة بناء قائمة المستخدم بالكامل (عند تعديل اهتماماته)
+CREATE OR REPLACE FUNCTION rebuild_interest_unread_for_user(p_user_id UUID)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  DELETE FROM interest_unread_requests WHERE user_id = p_user_id;
+
+  INSERT INTO interest_unread_requests (user_id, request_id)
+  SELECT p.id, r.id
+  FROM profiles p
+  JOIN requests r
+    ON r.status = 'active'
+   AND r.is_public = TRUE
+   AND r.author_id IS DISTINCT FROM p.id
+  WHERE p.id = p_user_id
+    AND (
+      EXISTS (
+        SELECT 1 FROM request_categories rc
+        WHERE rc.request_id = r.id
+          AND rc.category_id = ANY(p.interested_categories)
+      )
+      OR r.city_id = ANY(p.interested_city_ids)
+      OR (r.city_id IS NULL AND r.city_key = ANY(p.interested_city_keys))
+    )
+    AND NOT EXISTS (
+      SELECT 1 FROM request_views rv
+      WHERE rv.request_id = r.id
+        AND rv.user_id = p.id
+        AND rv.is_viewed = TRUE
+    )
+    AND NOT EXISTS (
+      SELECT 1 FROM offers o
+      WHERE o.request_id = r.id
+        AND o.provider_id = p.id
+        AND o.status != 'rejected'
+    )
+  ON CONFLICT (user_id, request_id) DO NOTHING;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION unread_interests_on_request_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  PERFORM sync_interest_unread_for_request(NEW.id);
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_unread_interests_request_insert ON requests;
+CREATE TRIGGER trigger_unread_interests_request_insert
+AFTER INSERT ON requests
+FOR EACH ROW
+EXECUTE FUNCTION unread_interests_on_request_change();
+
+DROP TRIGGER IF EXISTS trigger_unread_interests_request_update ON requests;
+CREATE TRIGGER trigger_unread_interests_request_update
+AFTER UPDATE OF status, is_public, city_id ON requests
+FOR EACH ROW
+EXECUTE FUNCTION unread_interests_on_request_change();
+
+-- request_categories تُدرج بعد الطلب نفسه، فنعيد المطابقة عند إدراجها
+CREATE OR REPLACE FUNCTION unread_interests_on_request_categories_insert()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_request_id UUID;
+BEGIN
+  FOR v_request_id IN SELECT DISTINCT request_id FROM new_rows LOOP
+    PERFORM sync_interest_unread_for_request(v_request_id);
+  END LOOP;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_unread_interests_request_categories ON request_categories;
+CREATE TRIGGER trigger_unread_interests_request_categories
+AFTER INSERT ON request_categories
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION unread_interests_on_request_categories_insert();
+
+CREATE OR REPLACE FUNCTION unread_interests_on_request_viewed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  DELETE FROM interest_unread_requests
+  WHERE user_id = NEW.user_id AND request_id = NEW.request_id;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_unread_interests_request_viewed ON request_views;
+CREATE TRIGGER trigger_unread_interests_request_viewed
+AFTER INSERT OR UPDATE OF is_viewed ON request_views
+FOR EACH ROW
+WHEN (NEW.is_viewed = TRUE)
+EXECUTE FUNCTION unread_interests_on_request_viewed();
+
+CREATE OR REPLACE FUNCTION unread_interests_on_offer_insert()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  DELETE FROM interest_unread_requests
+  WHERE user_id = NEW.provider_id AND request_id = NEW.request_id;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trigger_unread_interests_offer_insert ON offers;
+CREATE TRIGGER trigger_unread_interests_offer_insert
+AFTER INSERT ON offers
+FOR EACH ROW
+WHEN (NEW.status IS DISTINCT FROM 'rejected')
+EXECUTE FUNCTION unread_interests_on_offer_insert();
+
+CREATE OR REPLACE FUNCTION unread_interests_on_profile_interests_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF NEW.interested_categories IS DISTINCT FROM OLD.interested_categories
+     OR NEW.interested_city_ids IS DISTINCT FROM OLD.interested_city_ids THEN
+    PERFORM rebuild_interest_unread_for_user(NEW.id);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+-- interested_city_ids is filled by a BEFORE trigger from interested_cities (CITIES_SCHEMA.sql)
+DROP TRIGGER IF EXISTS trigger_unread_interests_profile_change ON profiles;
+CREATE TRIGGER trigger_unread_interests_profile_change
+AFTER UPDATE OF interested_categories, interested_cities ON profiles
+FOR EACH ROW
+EXECUTE FUNCTION unread_interests_on_profile_interests_change();
+
+-- ==========================================
+-- الجزء 6: القراءة + إعادة الحساب الكاملة
+-- ==========================================
+
+-- نفس الاسم والتوقيع السابق (services/requestViewsService.ts) لكن القراءة O(1)
+CREATE OR REPLACE FUNCTION get_unread_interests_count()
+RETURNS INTEGER
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT COALESCE(
+    (SELECT interests FROM user_unread_counters WHERE user_id = auth.uid()),
+    0
+  );
+$$;
+
+-- Rebuilds every counter from the source tables.
+-- Run once after installing this file, and any time drift is suspected.
+CREATE OR REPLACE FUNCTION recompute_unread_counters()
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_user_id UUID;
+BEGIN
+  DELETE FROM conversation_unread_counters;
+  INSERT INTO conversation_unread_counters (
+    conversation_id, user_id, unread_count, request_id, offer_id, is_my_request, is_my_offer
+  )
+  SELECT
+    c.id,
+    t.recipient_id,
+    t.unread,
+    c.request_id,
+    c.offer_id,
+    COALESCE(r.author_id = t.recipient_id, FALSE),
+    COALESCE(o.provider_id = t.recipient_id, FALSE)
+  FROM (
+    SELECT
+      m.conversation_id,
+      CASE WHEN c2.participant1_id = m.sender_id
+        THEN c2.participant2_id ELSE c2.participant1_id END AS recipient_id,
+      COUNT(*)::INTEGER AS unread
+    FROM messages m
+    JOIN conversations c2 ON c2.id = m.conversation_id
+    WHERE m.is_read IS NOT TRUE
+    GROUP BY 1, 2
+  ) t
+  JOIN conversations c ON c.id = t.conversation_id
+  LEFT JOIN requests r ON r.id = c.request_id
+  LEFT JOIN offers o ON o.id = c.offer_id;
+
+  FOR v_user_id IN
+    SELECT id FROM profiles
+    WHERE COALESCE(array_length(interested_categories, 1), 0) > 0
+       OR COALESCE(array_length(interested_city_ids, 1), 0) > 0
+       OR COALESCE(array_length(interested_city_keys, 1), 0) > 0
+  LOOP
+    PERFORM rebuild_interest_unread_for_user(v_user_id);
+  END LOOP;
+
+  -- Overwrite totals with exact values (the per-row triggers above also fired)
+  DELETE FROM user_unread_counters;
+  INSERT INTO user_unread_counters (
+    user_id, messages, messages_my_requests, messages_my_offers, notifications, interests
+  )
+  SELECT
+    u.id,
+    COALESCE(cm.messages, 0),
+    COALESCE(cm.my_requests, 0),
+    COALESCE(cm.my_offers, 0),
+    COALESCE(n.unread, 0),
+    COALESCE(i.unread, 0)
+  FROM auth.users u
+  LEFT JOIN (
+    SELECT
+      user_id,
+      SUM(unread_count)::INTEGER AS messages,
+      SUM(unread_count) FILTER (WHERE is_my_request)::INTEGER AS my_requests,
+      SUM(unread_count) FILTER (WHERE is_my_offer)::INTEGER AS my_offers
+    FROM conversation_unread_counters
+    GROUP BY user_id
+  ) cm ON cm.user_id = u.id
+  LEFT JOIN (
+    SELECT user_id, COUNT(*)::INTEGER AS unread
+    FROM notifications WHERE is_read IS NOT TRUE
+    GROUP BY user_id
+  ) n ON n.user_id = u.id
+  LEFT JOIN (
+    SELECT user_id, COUNT(*)::INTEGER AS unread
+    FROM interest_unread_requests
+    GROUP BY user_id
+  ) i ON i.user_id = u.id;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION bump_user_unread_counters(UUID, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION bump_conversation_unread(UUID, UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION sync_interest_unread_for_request(UUID) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION rebuild_interest_unread_for_user(UUID) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION recompute_unread_counters() FROM PUBLIC, anon, authenticated;
+
+-- ==========================================
+-- الجزء 7: Realtime (الشارات تُدفع للعميل بدل polling)
+-- ==========================================
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_publication_tables
+    WHERE pubname = 'supabase_realtime' AND tablename = 'user_unread_counters'
+  ) THEN
+    ALTER PUBLICATION supabase_realtime ADD TABLE user_unread_counters;
+  END IF;
+END $$;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_publication_tables
+    WHERE pubname = 'supabase_realtime' AND tablename = 'conversation_unread_counters'
+  ) THEN
+    ALTER PUBLICATION supabase_realtime ADD TABLE conversation_unread_counters;
+  END IF;
+END $$;
+
+-- Initial fill (safe to re-run)
+SELECT recompute_unread_counters();
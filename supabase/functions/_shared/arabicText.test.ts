@@ -0,0 +1,35 @@
+// deno test supabase/functions/_shared/arabicText.test.ts
+import { assertEquals } from "jsr:@std/assert@1";
+import { normalizeArabicText } from "./arabicText.ts";
+import {
+  normalizeArabic,
+  normalizeCityKey,
+} from "../../../utils/arabicNormalize.ts";
+
+const SAMPLES = [
+  "مَكَّة  المكرّمة",
+  "حي النرجس، الرياض",
+  "إبها",
+  "الطائف",
+  "خميس-مشيط",
+  "مؤسسة، رئيسية!",
+  "صيانة  السيّارات؟",
+  "Al Khobar",
+  "  ",
+  "",
+];
+
+Deno.test("app and Edge Functions normalize text the same way", () => {
+  for (const text of SAMPLES) {
+    assertEquals(normalizeArabic(text), normalizeArabicText(text), text);
+  }
+});
+
+Deno.test("normalizeCityKey keeps the normalize_city_key() folds", () => {
+  assertEquals(normalizeCityKey("حي النرجس، الرياض"), "الرياض");
+  assertEquals(normalizeCityKey("إبها"), "ابها");
+  assertEquals(normalizeCityKey("مَكَّة المكرّمة"), "مكهالمكرمه");
+  // SQL does not fold hamza carriers - neither may the client key
+  assertEquals(normalizeCityKey("الطائف"), "الطائف");
+  assertEquals(normalizeCityKey(" "), null);
+});
@@ -0,0 +1,35 @@
+// ============================================
+// Arabic text normalization (shared: app + Edge Functions)
+// ============================================
+// تطبيع واحد لكل ما يقارن نصاً عربياً في ai-chat والتطبيق: فهرس التصنيفات
+// (categoryIndex.ts)، المصنّف المحلي (ai-chat/localClassifier.ts) ومفتاح الكاش،
+// وفي التطبيق normalizeArabic (utils/arabicNormalize.ts: بحث المدن وكاش الأماكن).
+// بدون imports ولا APIs خاصة ببيئة معينة - يُستورد كما هو من Vite ومن Deno.
+
+// تشكيل + تطويل
+const DIACRITICS_REGEX = /[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]/g;
+const LETTER_FOLDS: Record<string, string> = {
+  "أ": "ا",
+  "إ": "ا",
+  "آ": "ا",
+  "ٱ": "ا",
+  "ة": "ه",
+  "ى": "ي",
+  "ؤ": "و",
+  "ئ": "ي",
+};
+const LETTER_FOLDS_REGEX = /[أإآٱةىؤئ]/g;
+
+/**
+ * "صيانة  السيّارات؟" -> "صيانه السيارات"
+ * Lowercase, no diacritics, folded letter forms, punctuation -> single spaces
+ */
+export function normalizeArabicText(text: string | null | undefined): string {
+  if (!text) return "";
+  return text
+    .toLowerCase()
+    .replace(DIACRITICS_REGEX, "")
+    .replace(LETTER_FOLDS_REGEX, (ch) => LETTER_FOLDS[ch] || ch)
+    .replace(/[^\p{L}\p{N}]+/gu, " ")
+    .trim();
+}
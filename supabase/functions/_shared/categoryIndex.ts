@@ -0,0 +1,235 @@
+// ============================================
+// Category index (shared: app + Edge Functions)
+// ============================================
+// فهرس للتصنيفات يُبنى مرة واحدة لكل قائمة، بدلاً من المرور على كل التصنيفات
+// مع toLowerCase/includes في الاتجاهين لكل label:
+// - exact: خريطة مباشرة لكل لغة (label / label_en / label_ur / id)
+// - trigrams: المرشحون لـ "اسم التصنيف يحتوي النص" ثم تحقق نهائي
+// - trie على الأحرف: "النص يحتوي اسم تصنيف" في مرور واحد على النص
+// - tokens: تطابق الكلمات (للبحث بالكلمات المفتاحية والمطابقة المرنة)
+//
+// بدون APIs خاصة ببيئة معينة: يستورده categoriesService (Vite) و ai-chat (Deno)
+// كما هو. التطبيع من arabicText.ts (نفسه في المصنّف المحلي ومفتاح الكاش).
+
+import { normalizeArabicText } from "./arabicText.ts";
+
+export interface IndexableCategory {
+  id: string;
+  label: string;
+  label_en?: string;
+  label_ur?: string;
+  description?: string;
+  keywords?: string[];
+}
+
+export interface ResolveOptions {
+  /** Also accept the category sharing the most words (AI-suggested labels) */
+  fuzzy?: boolean;
+}
+
+export interface CategoryIndex<T extends IndexableCategory> {
+  readonly categories: readonly T[];
+  /** Best category for a label in any language, or an id */
+  resolve(label: string, options?: ResolveOptions): T | null;
+  /** Categories whose label (any language) or id contains the query */
+  search(query: string): T[];
+  /** Categories ranked by how many keywords appear in their text */
+  searchByKeywords(keywords: string[]): T[];
+}
+
+/** Words worth matching on their own, without the definite article */
+function contentTokens(normalized: string): string[] {
+  return normalized
+    .split(" ")
+    .map((w) => (w.startsWith("ال") && w.length > 4 ? w.slice(2) : w))
+    .filter((w) => w.length > 2);
+}
+
+function trigrams(text: string): string[] {
+  const grams = new Set<string>();
+  for (let i = 0; i + 3 <= text.length; i++) grams.add(text.slice(i, i + 3));
+  return [...grams];
+}
+
+/**
+ * Substring lookup over texts[i] (one or more strings per category):
+ * trigram postings narrow the candidates, includes() confirms them
+ */
+function substringFinder(texts: string[][]): (query: string) => number[] {
+  const postings = new Map<string, Set<number>>();
+  texts.forEach((list, i) => {
+    for (const text of list) {
+      for (const gram of trigrams(text)) {
+        let set = postings.get(gram);
+        if (!set) postings.set(gram, set = new Set());
+        set.add(i);
+      }
+    }
+  });
+
+  return (query: string) => {
+    if (query.length < 3) {
+      // Too short for trigrams - the list is small, scan the prepared texts
+      return texts.flatMap((list, i) =>
+        list.some((t) => t.includes(query)) ? [i] : []
+      );
+    }
+    let candidates: number[] | null = null;
+    for (const gram of trigrams(query)) {
+      const hits = postings.get(gram);
+      if (!hits) return [];
+      candidates = candidates
+        ? candidates.filter((i) => hits.has(i))
+        : [...hits];
+      if (candidates.length === 0) return [];
+    }
+    return (candidates || []).filter((i) =>
+      texts[i].some((t) => t.includes(query))
+    );
+  };
+}
+
+interface TrieNode {
+  children: Map<string, TrieNode>;
+  /** Categories whose full (normalized) name ends at this node */
+  terminal: number[];
+}
+
+const newNode = (): TrieNode => ({ children: new Map(), terminal: [] });
+
+function addToMultiMap<K>(map: Map<K, number[]>, key: K, value: number) {
+  const list = map.get(key);
+  if (!list) map.set(key, [value]);
+  else if (list[list.length - 1] !== value) list.push(value);
+}
+
+export function buildCategoryIndex<T extends IndexableCategory>(
+  categories: readonly T[],
+): CategoryIndex<T> {
+  const exact = new Map<string, number>();
+  const tokenIndex = new Map<string, number[]>();
+  const trie = newNode();
+  // Normalized names per category (labels in every language + id)
+  const names: string[][] = [];
+  // Everything searchable per category, for keyword scoring
+  const haystacks: string[] = [];
+
+  categories.forEach((cat, i) => {
+    const catNames = [cat.label, cat.label_en, cat.label_ur, cat.id]
+      .map(normalizeArabicText)
+      .filter(Boolean);
+    names.push(catNames);
+
+    for (const name of catNames) {
+      // First category wins on duplicates, like the old find()
+      if (!exact.has(name)) exact.set(name, i);
+
+      let node = trie;
+      for (const ch of name) {
+        let next = node.children.get(ch);
+        if (!next) {
+          next = newNode();
+          node.children.set(ch, next);
+        }
+        node = next;
+      }
+      node.terminal.push(i);
+    }
+
+    const haystack = [
+      ...catNames,
+      normalizeArabicText(cat.description),
+      ...(cat.keywords || []).map(normalizeArabicText),
+    ].filter(Boolean).join(" ");
+    haystacks.push(haystack);
+    for (const token of contentTokens(haystack)) {
+      addToMultiMap(tokenIndex, token, i);
+    }
+  });
+
+  /** Categories with a name containing the query */
+  const containing = substringFinder(names);
+  /** Categories whose name, description or keywords contain the query */
+  const mentioning = substringFinder(haystacks.map((h) => [h]));
+
+  /** Categories whose full name appears inside `text`, longest first */
+  const containedIn = (text: string): number[] => {
+    const found = new Map<number, number>();
+    for (let start = 0; start < text.length; start++) {
+      let node: TrieNode | undefined = trie;
+      for (let j = start; j < text.length && node; j++) {
+        node = node.children.get(text[j]);
+        for (const i of node?.terminal || []) {
+          found.set(i, Math.max(found.get(i) || 0, j - start + 1));
+        }
+      }
+    }
+    return [...found.entries()]
+      .sort((a, b) => b[1] - a[1] || a[0] - b[0])
+      .map(([i]) => i);
+  };
+
+  const shortestName = (i: number) =>
+    Math.min(...names[i].map((n) => n.length));
+
+  const resolve = (label: string, options: ResolveOptions = {}): T | null => {
+    const query = normalizeArabicText(label);
+    if (!query) return null;
+
+    // 1. Exact label (any language) or id
+    const exactHit = exact.get(query);
+    if (exactHit !== undefined) return categories[exactHit];
+
+    // 2. A category name contains the label ("سيارات" → "صيانة سيارات");
+    //    the tightest name wins
+    const wider = containing(query);
+    if (wider.length > 0) {
+      wider.sort((a, b) => shortestName(a) - shortestName(b) || a - b);
+      return categories[wider[0]];
+    }
+
+    // 3. The label contains a category name ("خدمة تنظيف منازل")
+    const narrower = containedIn(query);
+    if (narrower.length > 0) return categories[narrower[0]];
+
+    // 4. Most shared words
+    if (options.fuzzy) {
+      const scores = new Map<number, number>();
+      for (const token of contentTokens(query)) {
+        for (const i of tokenIndex.get(token) || []) {
+          scores.set(i, (scores.get(i) || 0) + 1);
+        }
+      }
+      const best = [...scores.entries()].sort((a, b) =>
+        b[1] - a[1] || a[0] - b[0]
+      )[0];
+      if (best) return categories[best[0]];
+    }
+
+    return null;
+  };
+
+  const search = (query: string): T[] => {
+    const normalized = normalizeArabicText(query);
+    if (!normalized) return [...categories];
+    return containing(normalized)
+      .sort((a, b) => a - b)
+      .map((i) => categories[i]);
+  };
+
+  const searchByKeywords = (keywords: string[]): T[] => {
+    const scores = new Map<number, number>();
+    for (const keyword of keywords) {
+      const normalized = normalizeArabicText(keyword);
+      if (!normalized) continue;
+      for (const i of mentioning(normalized)) {
+        scores.set(i, (scores.get(i) || 0) + 1);
+      }
+    }
+    return [...scores.entries()]
+      .sort((a, b) => b[1] - a[1] || a[0] - b[0])
+      .map(([i]) => categories[i]);
+  };
+
+  return { categories, resolve, search, searchByKeywords };
+}
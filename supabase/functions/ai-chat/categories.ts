@@ -0,0 +1,612 @@
+// ============================================
+// Fixed categories (ai-chat)
+// ============================================
+// القائمة التي يختار منها الـ AI، مع كلماتها المفتاحية للتصنيف المحلي
+// (localClassifier.ts) ولمطابقة التصنيفات المقترحة (CATEGORY_INDEX)
+
+// التصنيفات الشاملة مع كلماتها المفتاحية (70+ تصنيف)
+export const FIXED_CATEGORIES = [
+  // تقنية
+  {
+    id: "software-dev",
+    label: "تطوير برمجيات",
+    keywords: ["برمجة", "سوفتوير", "نظام", "أتمتة", "كود", "برنامج", "تطوير"],
+  },
+  {
+    id: "web-dev",
+    label: "تطوير مواقع",
+    keywords: [
+      "موقع",
+      "ويب",
+      "صفحة",
+      "منصة",
+      "HTML",
+      "CSS",
+      "React",
+      "WordPress",
+    ],
+  },
+  {
+    id: "mobile-apps",
+    label: "تطبيقات جوال",
+    keywords: ["تطبيق", "جوال", "موبايل", "آيفون", "أندرويد", "iOS", "Flutter"],
+  },
+  {
+    id: "it-support",
+    label: "دعم تقني",
+    keywords: ["دعم تقني", "مشكلة تقنية", "IT", "صيانة كمبيوتر", "لاب توب"],
+  },
+  {
+    id: "data-analysis",
+    label: "تحليل بيانات",
+    keywords: ["تحليل", "بيانات", "داتا", "إحصائيات", "Excel", "تقارير"],
+  },
+  {
+    id: "ai-services",
+    label: "خدمات ذكاء اصطناعي",
+    keywords: ["ذكاء اصطناعي", "AI", "تعلم آلي", "ChatGPT", "بوت"],
+  },
+
+  // تصميم
+  {
+    id: "graphic-design",
+    label: "تصميم جرافيك",
+    keywords: ["تصميم", "جرافيك", "صور", "فوتوشوب", "اليستريتور", "بوستر"],
+  },
+  {
+    id: "ui-ux",
+    label: "تصميم واجهات",
+    keywords: ["UI", "UX", "واجهة", "تجربة مستخدم", "فيجما", "Figma"],
+  },
+  {
+    id: "logo-branding",
+    label: "شعارات وهوية",
+    keywords: ["شعار", "لوقو", "هوية", "بصرية", "براند", "علامة تجارية"],
+  },
+  {
+    id: "interior-design",
+    label: "تصميم داخلي",
+    keywords: ["تصميم داخلي", "ديكور", "أثاث", "غرفة", "صالة"],
+  },
+  {
+    id: "architectural",
+    label: "تصميم معماري",
+    keywords: ["معماري", "هندسة معمارية", "مخطط", "فيلا", "مبنى"],
+  },
+
+  // محتوى
+  {
+    id: "content-writing",
+    label: "كتابة محتوى",
+    keywords: ["كتابة", "محتوى", "مقال", "مدونة", "نصوص"],
+  },
+  {
+    id: "copywriting",
+    label: "كتابة إعلانية",
+    keywords: ["إعلانية", "سلوقان", "نص إعلاني", "كوبي"],
+  },
+  {
+    id: "translation",
+    label: "ترجمة",
+    keywords: ["ترجمة", "لغة", "إنجليزي", "عربي", "فرنسي", "ألماني"],
+  },
+  {
+    id: "voice-over",
+    label: "تعليق صوتي",
+    keywords: ["صوتي", "تعليق", "راوي", "voice over", "دوبلاج"],
+  },
+  {
+    id: "proofreading",
+    label: "تدقيق لغوي",
+    keywords: ["تدقيق", "إملائي", "نحوي", "تصحيح", "مراجعة"],
+  },
+
+  // تسويق
+  {
+    id: "digital-marketing",
+    label: "تسويق رقمي",
+    keywords: ["تسويق", "رقمي", "إعلان", "حملة", "ترويج"],
+  },
+  {
+    id: "social-media",
+    label: "سوشيال ميديا",
+    keywords: ["سوشيال", "ميديا", "انستقرام", "تويتر", "سناب", "تيك توك"],
+  },
+  {
+    id: "seo",
+    label: "تحسين محركات البحث",
+    keywords: ["SEO", "قوقل", "بحث", "ظهور", "ترتيب"],
+  },
+  {
+    id: "advertising",
+    label: "إعلانات",
+    keywords: ["إعلان", "ممول", "قوقل أدز", "فيسبوك أدز"],
+  },
+
+  // خدمات مهنية
+  {
+    id: "legal-services",
+    label: "خدمات قانونية",
+    keywords: ["قانون", "محامي", "عقد", "قضية", "محكمة", "توثيق"],
+  },
+  {
+    id: "accounting",
+    label: "محاسبة",
+    keywords: ["محاسبة", "ضرائب", "ميزانية", "مالية", "تدقيق"],
+  },
+  {
+    id: "consulting",
+    label: "استشارات",
+    keywords: ["استشارة", "نصيحة", "خبرة", "إدارية"],
+  },
+  {
+    id: "hr-services",
+    label: "موارد بشرية",
+    keywords: ["توظيف", "موارد بشرية", "HR", "موظفين", "رواتب"],
+  },
+
+  // تعليم
+  {
+    id: "tutoring",
+    label: "دروس خصوصية",
+    keywords: ["درس", "خصوصي", "معلم", "مدرس", "شرح", "تقوية"],
+  },
+  {
+    id: "online-courses",
+    label: "دورات أونلاين",
+    keywords: ["دورة", "كورس", "أونلاين", "تعلم"],
+  },
+  {
+    id: "language-learning",
+    label: "تعليم لغات",
+    keywords: ["تعليم لغة", "إنجليزي", "فرنسي", "لغة"],
+  },
+  {
+    id: "skills-training",
+    label: "تدريب مهارات",
+    keywords: ["تدريب", "مهارة", "ورشة عمل", "تطوير ذات"],
+  },
+
+  // صحة
+  {
+    id: "medical-consult",
+    label: "استشارات طبية",
+    keywords: ["طبيب", "دكتور", "استشارة طبية", "صحة"],
+  },
+  {
+    id: "nutrition",
+    label: "تغذية",
+    keywords: ["تغذية", "دايت", "حمية", "أكل صحي", "نظام غذائي"],
+  },
+  {
+    id: "fitness",
+    label: "لياقة بدنية",
+    keywords: ["لياقة", "رياضة", "جيم", "مدرب شخصي", "تمارين"],
+  },
+  {
+    id: "mental-health",
+    label: "صحة نفسية",
+    keywords: ["نفسي", "علاج نفسي", "استشارة نفسية", "قلق"],
+  },
+
+  // صيانة ومنزل
+  {
+    id: "plumbing",
+    label: "سباكة",
+    keywords: ["سباكة", "سباك", "مياه", "حنفية", "مجاري", "تسريب"],
+  },
+  {
+    id: "electrical",
+    label: "كهرباء",
+    keywords: ["كهرباء", "كهربائي", "أسلاك", "فيش", "إضاءة"],
+  },
+  {
+    id: "ac-services",
+    label: "تكييف",
+    keywords: ["تكييف", "مكيف", "فريون", "تبريد", "سبليت"],
+  },
+  {
+    id: "home-repair",
+    label: "إصلاحات منزلية",
+    keywords: ["إصلاح", "صيانة منزل", "تصليح"],
+  },
+  {
+    id: "appliance-repair",
+    label: "صيانة أجهزة",
+    keywords: ["غسالة", "ثلاجة", "فرن", "جهاز", "صيانة أجهزة"],
+  },
+  {
+    id: "painting",
+    label: "دهانات",
+    keywords: ["دهان", "طلاء", "صبغ", "حائط", "لون"],
+  },
+  {
+    id: "carpentry",
+    label: "نجارة",
+    keywords: ["نجار", "خشب", "أثاث", "باب", "نافذة"],
+  },
+
+  // نقل
+  {
+    id: "moving",
+    label: "نقل عفش",
+    keywords: ["نقل", "عفش", "أثاث", "ترحيل", "انتقال"],
+  },
+  { id: "shipping", label: "شحن", keywords: ["شحن", "بضاعة", "طرد", "تغليف"] },
+  {
+    id: "delivery",
+    label: "توصيل",
+    keywords: ["توصيل", "ديليفري", "طلب", "مندوب"],
+  },
+
+  // سيارات
+  {
+    id: "car-repair",
+    label: "صيانة سيارات",
+    keywords: [
+      "سيارة",
+      "ميكانيكي",
+      "ورشة",
+      "صيانة سيارة",
+      "موتر",
+      "جيب",
+      "لكزس",
+      "تويوتا",
+      "هونداي",
+      "نيسان",
+      "مرسيدس",
+      "بي إم دبليو",
+      "أودي",
+      "فورد",
+      "شيفروليه",
+      "جمس",
+      "دودج",
+      "كيا",
+      "هوندا",
+      "مازدا",
+      "سوزوكي",
+      "قطع غيار",
+      "صدام",
+      "مكينة",
+      "جير",
+      "فرامل",
+      "إطارات",
+      "بطارية",
+    ],
+  },
+  {
+    id: "car-wash",
+    label: "غسيل سيارات",
+    keywords: ["غسيل", "تنظيف سيارة", "بوليش"],
+  },
+  {
+    id: "car-rental",
+    label: "تأجير سيارات",
+    keywords: ["إيجار سيارة", "تأجير", "رنت"],
+  },
+  {
+    id: "driver-services",
+    label: "خدمات سائق",
+    keywords: ["سائق", "درايفر", "توصيل"],
+  },
+
+  // مناسبات
+  {
+    id: "event-planning",
+    label: "تنظيم مناسبات",
+    keywords: ["حفلة", "مناسبة", "تنظيم", "فعالية", "حدث"],
+  },
+  {
+    id: "catering",
+    label: "تموين",
+    keywords: ["تموين", "ضيافة", "بوفيه", "كيترنج"],
+  },
+  {
+    id: "photography",
+    label: "تصوير",
+    keywords: ["تصوير", "مصور", "كاميرا", "صور"],
+  },
+  {
+    id: "videography",
+    label: "تصوير فيديو",
+    keywords: ["فيديو", "مونتاج", "فيديوغرافر"],
+  },
+  {
+    id: "entertainment",
+    label: "ترفيه",
+    keywords: ["ترفيه", "موسيقى", "دي جي", "منشط"],
+  },
+  {
+    id: "flowers-decor",
+    label: "زهور وتزيين",
+    keywords: ["زهور", "ورد", "تزيين", "ديكور حفلة"],
+  },
+
+  // جمال وعناية
+  {
+    id: "hair-styling",
+    label: "تصفيف شعر",
+    keywords: ["شعر", "قص", "صبغة", "تسريحة", "حلاق"],
+  },
+  {
+    id: "makeup",
+    label: "مكياج",
+    keywords: ["مكياج", "ميكب", "تجميل", "عروس"],
+  },
+  {
+    id: "spa-massage",
+    label: "سبا ومساج",
+    keywords: ["سبا", "مساج", "استرخاء", "عناية"],
+  },
+  {
+    id: "nails",
+    label: "أظافر",
+    keywords: ["أظافر", "مانيكير", "بديكير", "طلاء"],
+  },
+
+  // تنظيف
+  {
+    id: "home-cleaning",
+    label: "تنظيف منازل",
+    keywords: ["تنظيف منزل", "شغالة", "نظافة منزلية"],
+  },
+  {
+    id: "office-cleaning",
+    label: "تنظيف مكاتب",
+    keywords: ["تنظيف مكتب", "نظافة مكاتب", "شركة"],
+  },
+  {
+    id: "laundry",
+    label: "غسيل وكي",
+    keywords: ["غسيل", "كي", "ملابس", "مغسلة"],
+  },
+  {
+    id: "pest-control",
+    label: "مكافحة حشرات",
+    keywords: ["حشرات", "صراصير", "فئران", "مكافحة", "رش"],
+  },
+
+  // طعام
+  {
+    id: "cooking",
+    label: "طبخ منزلي",
+    keywords: [
+      "طبخ",
+      "أكل",
+      "وجبة",
+      "طباخ",
+      "معصوب",
+      "مندي",
+      "كبسة",
+      "مطبق",
+      "حنيذ",
+      "مظبي",
+      "شاورما",
+      "فلافل",
+      "سمبوسة",
+      "سندويش",
+      "برجر",
+      "بيتزا",
+      "باستا",
+      "رز",
+      "لحم",
+      "دجاج",
+      "سمك",
+      "لحم بقري",
+      "لحم خروف",
+      "مشاوي",
+      "مشكل",
+      "مقبلات",
+      "سلطة",
+      "شوربة",
+      "حساء",
+      "يخني",
+      "مقلوبة",
+      "مجبوس",
+      "مشاكيك",
+      "مشكل مشاوي",
+      "مشكل لحم",
+      "مشكل دجاج",
+      "مشكل سمك",
+      "أرز بخاري",
+      "أرز كباب",
+      "أرز دجاج",
+      "أرز لحم",
+      "أرز سمك",
+      "مشكل يمني",
+      "مشكل سعودي",
+      "مشكل خليجي",
+      "مشكل عربي",
+      "طعام يمني",
+      "طعام سعودي",
+      "طعام خليجي",
+      "طعام عربي",
+      "أطباق عربية",
+      "أطباق يمنية",
+      "أطباق خليجية",
+      "أطباق شعبية",
+      "أكل بيتي",
+      "أكل منزلي",
+      "أكل طازج",
+      "أكل جاهز",
+      "توصيل طعام",
+      "طلب طعام",
+      "وجبة جاهزة",
+      "وجبة ساخنة",
+      "وجبة باردة",
+    ],
+  },
+  {
+    id: "restaurants",
+    label: "مطاعم",
+    keywords: [
+      "مطعم",
+      "مطاعم",
+      "مطعم يمني",
+      "مطعم سعودي",
+      "مطعم خليجي",
+      "مطعم عربي",
+      "مطعم آسيوي",
+      "مطعم إيطالي",
+      "مطعم صيني",
+      "مطعم ياباني",
+      "مطعم هندي",
+      "مطعم تركي",
+      "مطعم لبناني",
+      "مطعم شامي",
+      "مطعم مصري",
+      "مطعم مغربي",
+      "مطعم بحري",
+      "مطعم مشاوي",
+      "مطعم بيتزا",
+      "مطعم برجر",
+      "مطعم فطور",
+      "مطعم غداء",
+      "مطعم عشاء",
+      "مطعم سريع",
+      "مطعم فاخر",
+      "مطعم شعبي",
+      "مطعم عائلي",
+      "مطعم للعزائم",
+      "مطعم للولائم",
+      "مطعم للمناسبات",
+      "مطعم للحفلات",
+      "مطعم للأعراس",
+      "مطعم للعزائم",
+      "مطعم للولائم",
+      "مطعم للمناسبات",
+      "مطعم للحفلات",
+      "مطعم للأعراس",
+      "مطعم للعزائم",
+      "مطعم للولائم",
+      "مطعم للمناسبات",
+      "مطعم للحفلات",
+      "مطعم للأعراس",
+      "مطعم للعزائم",
+      "مطعم للولائم",
+      "مطعم للمناسبات",
+      "مطعم للحفلات",
+      "مطعم للأعراس",
+    ],
+  },
+  {
+    id: "baking",
+    label: "حلويات ومخبوزات",
+    keywords: [
+      "حلويات",
+      "كيك",
+      "مخبوزات",
+      "خبز",
+      "تورتة",
+      "كنافة",
+      "بقلاوة",
+      "لقيمات",
+      "زلابيا",
+      "عصيدة",
+      "مهلبية",
+      "أم علي",
+      "قطايف",
+      "معمول",
+      "كعك",
+      "بسكويت",
+      "كوكيز",
+      "دونات",
+      "وافل",
+      "بان كيك",
+      "كريب",
+      "كرواسان",
+      "خبز عربي",
+      "خبز تنور",
+      "خبز صاج",
+      "خبز أسمر",
+      "خبز أبيض",
+      "خبز بر",
+      "خبز توست",
+      "خبز فرنسي",
+      "خبز إيطالي",
+      "خبز محلي",
+      "خبز طازج",
+      "معجنات",
+      "فطائر",
+      "بيتزا",
+      "بيتزا عربية",
+    ],
+  },
+  {
+    id: "catering-food",
+    label: "تموين طعام",
+    keywords: [
+      "تموين طعام",
+      "ولائم",
+      "بوفيه أكل",
+      "تموين مناسبات",
+      "تموين حفلات",
+      "تموين أعراس",
+      "تموين عزائم",
+      "تموين مناسبات",
+      "بوفيه",
+      "كيترنج",
+      "خدمات طعام",
+      "تجهيز طعام",
+      "تحضير طعام",
+      "طبخ جماعي",
+      "طبخ مناسبات",
+      "طبخ حفلات",
+      "طبخ أعراس",
+      "طبخ عزائم",
+      "طبخ ولائم",
+      "طبخ جماعي",
+      "طبخ للمناسبات",
+      "طبخ للحفلات",
+      "طبخ للأعراس",
+      "طبخ للعزائم",
+      "طبخ للولائم",
+      "خدمات التموين",
+      "خدمات الكيترنج",
+      "خدمات البوفيه",
+    ],
+  },
+
+  // عقارات
+  {
+    id: "real-estate",
+    label: "عقارات",
+    keywords: ["عقار", "شقة", "فيلا", "أرض", "بيت", "إيجار", "بيع"],
+  },
+  {
+    id: "property-mgmt",
+    label: "إدارة عقارات",
+    keywords: ["إدارة عقار", "تحصيل", "مستأجرين"],
+  },
+
+  // حيوانات
+  {
+    id: "pet-care",
+    label: "رعاية حيوانات",
+    keywords: ["حيوان", "قط", "كلب", "رعاية", "فندقة"],
+  },
+  {
+    id: "pet-grooming",
+    label: "تجميل حيوانات",
+    keywords: ["تجميل حيوانات", "قص شعر", "حمام"],
+  },
+
+  // أمن
+  {
+    id: "security",
+    label: "خدمات أمنية",
+    keywords: ["أمن", "حراسة", "حارس", "أمان"],
+  },
+  {
+    id: "cctv",
+    label: "كاميرات مراقبة",
+    keywords: ["كاميرا", "مراقبة", "CCTV", "تركيب كاميرات"],
+  },
+
+  // أخرى
+  {
+    id: "other",
+    label: "أخرى",
+    keywords: ["أخرى", "متنوع", "عام", "غير محدد"],
+  },
+];
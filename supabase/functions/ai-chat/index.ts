@@ -1,9 +1,13 @@
 // @ts-ignore - Supabase Edge Runtime types
 import "jsr:@supabase/functions-js/edge-runtime.d.ts";
 import { createClient } from "https://esm.sh/@supabase/supabase-js@2.39.3";
+import { buildCategoryIndex } from "../_shared/categoryIndex.ts";
+import { FIXED_CATEGORIES } from "./categories.ts";
+import { normalizeArabicText } from "../_shared/arabicText.ts";
+import { createLocalClassifier, LocalDraft } from "./localClassifier.ts";
 
 // ============================================
-// Configuration - Using Anthropic Claude and OpenAI GPT (round-robin)
+// Configuration - Using Anthropic Claude and OpenAI GPT (latency-aware routing)
 // ============================================
 const ANTHROPIC_API_KEY = Deno.env.get("ANTHROPIC_API_KEY") ||
   Deno.env.get("VITE_ANTHROPIC_API_KEY") || "";
@@ -12,7 +16,7 @@ const OPENAI_API_KEY = Deno.env.get("OPENAI_API_KEY") ||
 const ANTHROPIC_MODEL = "claude-sonnet-4-20250514";
 const OPENAI_MODEL = "gpt-4o";
 
-// Counter for round-robin selection
+// Alternates between equally-scored providers (see routeProviders)
 let requestCounter = 0;
 
 // Supabase client للتحقق من التصنيفات
@@ -20,757 +24,519 @@ const supabaseUrl = Deno.env.get("SUPABASE_URL") || "";
 const supabaseServiceKey = Deno.env.get("SUPABASE_SERVICE_ROLE_KEY") || "";
 const _supabase = createClient(supabaseUrl, supabaseServiceKey);
 
-// التصنيفات الشاملة مع كلماتها المفتاحية (70+ تصنيف)
-const FIXED_CATEGORIES = [
-  // تقنية
-  {
-    id: "software-dev",
-    label: "تطوير برمجيات",
-    keywords: ["برمجة", "سوفتوير", "نظام", "أتمتة", "كود", "برنامج", "تطوير"],
-  },
-  {
-    id: "web-dev",
-    label: "تطوير مواقع",
-    keywords: [
-      "موقع",
-      "ويب",
-      "صفحة",
-      "منصة",
-      "HTML",
-      "CSS",
-      "React",
-      "WordPress",
-    ],
-  },
-  {
-    id: "mobile-apps",
-    label: "تطبيقات جوال",
-    keywords: ["تطبيق", "جوال", "موبايل", "آيفون", "أندرويد", "iOS", "Flutter"],
-  },
-  {
-    id: "it-support",
-    label: "دعم تقني",
-    keywords: ["دعم تقني", "مشكلة تقنية", "IT", "صيانة كمبيوتر", "لاب توب"],
-  },
-  {
-    id: "data-analysis",
-    label: "تحليل بيانات",
-    keywords: ["تحليل", "بيانات", "داتا", "إحصائيات", "Excel", "تقارير"],
-  },
-  {
-    id: "ai-services",
-    label: "خدمات ذكاء اصطناعي",
-    keywords: ["ذكاء اصطناعي", "AI", "تعلم آلي", "ChatGPT", "بوت"],
-  },
-
-  // تصميم
-  {
-    id: "graphic-design",
-    label: "تصميم جرافيك",
-    keywords: ["تصميم", "جرافيك", "صور", "فوتوشوب", "اليستريتور", "بوستر"],
-  },
-  {
-    id: "ui-ux",
-    label: "تصميم واجهات",
-    keywords: ["UI", "UX", "واجهة", "تجربة مستخدم", "فيجما", "Figma"],
-  },
-  {
-    id: "logo-branding",
-    label: "شعارات وهوية",
-    keywords: ["شعار", "لوقو", "هوية", "بصرية", "براند", "علامة تجارية"],
-  },
-  {
-    id: "interior-design",
-    label: "تصميم داخلي",
-    keywords: ["تصميم داخلي", "ديكور", "أثاث", "غرفة", "صالة"],
-  },
-  {
-    id: "architectural",
-    label: "تصميم معماري",
-    keywords: ["معماري", "هندسة معمارية", "مخطط", "فيلا", "مبنى"],
-  },
-
-  // محتوى
-  {
-    id: "content-writing",
-    label: "كتابة محتوى",
-    keywords: ["كتابة", "محتوى", "مقال", "مدونة", "نصوص"],
-  },
-  {
-    id: "copywriting",
-    label: "كتابة إعلانية",
-    keywords: ["إعلانية", "سلوقان", "نص إعلاني", "كوبي"],
-  },
-  {
-    id: "translation",
-    label: "ترجمة",
-    keywords: ["ترجمة", "لغة", "إنجليزي", "عربي", "فرنسي", "ألماني"],
-  },
-  {
-    id: "voice-over",
-    label: "تعليق صوتي",
-    keywords: ["صوتي", "تعليق", "راوي", "voice over", "دوبلاج"],
-  },
-  {
-    id: "proofreading",
-    label: "تدقيق لغوي",
-    keywords: ["تدقيق", "إملائي", "نحوي", "تصحيح", "مراجعة"],
-  },
-
-  // تسويق
-  {
-    id: "digital-marketing",
-    label: "تسويق رقمي",
-    keywords: ["تسويق", "رقمي", "إعلان", "حملة", "ترويج"],
-  },
-  {
-    id: "social-media",
-    label: "سوشيال ميديا",
-    keywords: ["سوشيال", "ميديا", "انستقرام", "تويتر", "سناب", "تيك توك"],
-  },
-  {
-    id: "seo",
-    label: "تحسين محركات البحث",
-    keywords: ["SEO", "قوقل", "بحث", "ظهور", "ترتيب"],
-  },
-  {
-    id: "advertising",
-    label: "إعلانات",
-    keywords: ["إعلان", "ممول", "قوقل أدز", "فيسبوك أدز"],
-  },
-
-  // خدمات مهنية
-  {
-    id: "legal-services",
-    label: "خدمات قانونية",
-    keywords: ["قانون", "محامي", "عقد", "قضية", "محكمة", "توثيق"],
-  },
-  {
-    id: "accounting",
-    label: "محاسبة",
-    keywords: ["محاسبة", "ضرائب", "ميزانية", "مالية", "تدقيق"],
-  },
-  {
-    id: "consulting",
-    label: "استشارات",
-    keywords: ["استشارة", "نصيحة", "خبرة", "إدارية"],
-  },
-  {
-    id: "hr-services",
-    label: "موارد بشرية",
-    keywords: ["توظيف", "موارد بشرية", "HR", "موظفين", "رواتب"],
-  },
-
-  // تعليم
-  {
-    id: "tutoring",
-    label: "دروس خصوصية",
-    keywords: ["درس", "خصوصي", "معلم", "مدرس", "شرح", "تقوية"],
-  },
-  {
-    id: "online-courses",
-    label: "دورات أونلاين",
-    keywords: ["دورة", "كورس", "أونلاين", "تعلم"],
-  },
-  {
-    id: "language-learning",
-    label: "تعليم لغات",
-    keywords: ["تعليم لغة", "إنجليزي", "فرنسي", "لغة"],
-  },
-  {
-    id: "skills-training",
-    label: "تدريب مهارات",
-    keywords: ["تدريب", "مهارة", "ورشة عمل", "تطوير ذات"],
-  },
-
-  // صحة
-  {
-    id: "medical-consult",
-    label: "استشارات طبية",
-    keywords: ["طبيب", "دكتور", "استشارة طبية", "صحة"],
-  },
-  {
-    id: "nutrition",
-    label: "تغذية",
-    keywords: ["تغذية", "دايت", "حمية", "أكل صحي", "نظام غذائي"],
-  },
-  {
-    id: "fitness",
-    label: "لياقة بدنية",
-    keywords: ["لياقة", "رياضة", "جيم", "مدرب شخصي", "تمارين"],
-  },
-  {
-    id: "mental-health",
-    label: "صحة نفسية",
-    keywords: ["نفسي", "علاج نفسي", "استشارة نفسية", "قلق"],
-  },
-
-  // صيانة ومنزل
-  {
-    id: "plumbing",
-    label: "سباكة",
-    keywords: ["سباكة", "سباك", "مياه", "حنفية", "مجاري", "تسريب"],
-  },
-  {
-    id: "electrical",
-    label: "كهرباء",
-    keywords: ["كهرباء", "كهربائي", "أسلاك", "فيش", "إضاءة"],
-  },
-  {
-    id: "ac-services",
-    label: "تكييف",
-    keywords: ["تكييف", "مكيف", "فريون", "تبريد", "سبليت"],
-  },
-  {
-    id: "home-repair",
-    label: "إصلاحات منزلية",
-    keywords: ["إصلاح", "صيانة منزل", "تصليح"],
-  },
-  {
-    id: "appliance-repair",
-    label: "صيانة أجهزة",
-    keywords: ["غسالة", "ثلاجة", "فرن", "جهاز", "صيانة أجهزة"],
-  },
-  {
-    id: "painting",
-    label: "دهانات",
-    keywords: ["دهان", "طلاء", "صبغ", "حائط", "لون"],
-  },
-  {
-    id: "carpentry",
-    label: "نجارة",
-    keywords: ["نجار", "خشب", "أثاث", "باب", "نافذة"],
-  },
-
-  // نقل
-  {
-    id: "moving",
-    label: "نقل عفش",
-    keywords: ["نقل", "عفش", "أثاث", "ترحيل", "انتقال"],
-  },
-  { id: "shipping", label: "شحن", keywords: ["شحن", "بضاعة", "طرد", "تغليف"] },
-  {
-    id: "delivery",
-    label: "توصيل",
-    keywords: ["توصيل", "ديليفري", "طلب", "مندوب"],
-  },
+const LOCAL_CLASSIFIER_ENABLED = Deno.env.get("AI_LOCAL_CLASSIFIER") !== "off";
+const LOCAL_CLASSIFIER = createLocalClassifier(FIXED_CATEGORIES);
 
-  // سيارات
-  {
-    id: "car-repair",
-    label: "صيانة سيارات",
-    keywords: [
-      "سيارة",
-      "ميكانيكي",
-      "ورشة",
-      "صيانة سيارة",
-      "موتر",
-      "جيب",
-      "لكزس",
-      "تويوتا",
-      "هونداي",
-      "نيسان",
-      "مرسيدس",
-      "بي إم دبليو",
-      "أودي",
-      "فورد",
-      "شيفروليه",
-      "جمس",
-      "دودج",
-      "كيا",
-      "هوندا",
-      "مازدا",
-      "سوزوكي",
-      "قطع غيار",
-      "صدام",
-      "مكينة",
-      "جير",
-      "فرامل",
-      "إطارات",
-      "بطارية",
-    ],
-  },
-  {
-    id: "car-wash",
-    label: "غسيل سيارات",
-    keywords: ["غسيل", "تنظيف سيارة", "بوليش"],
-  },
-  {
-    id: "car-rental",
-    label: "تأجير سيارات",
-    keywords: ["إيجار سيارة", "تأجير", "رنت"],
-  },
-  {
-    id: "driver-services",
-    label: "خدمات سائق",
-    keywords: ["سائق", "درايفر", "توصيل"],
-  },
+/**
+ * مسودة أول رسالة بدون AI (localClassifier.ts) - null = اترك القرار للـ AI
+ */
+function buildLocalDraft(prompt: string): LocalDraft | null {
+  if (!LOCAL_CLASSIFIER_ENABLED) return null;
+  return LOCAL_CLASSIFIER.buildDraft(prompt);
+}
 
-  // مناسبات
-  {
-    id: "event-planning",
-    label: "تنظيم مناسبات",
-    keywords: ["حفلة", "مناسبة", "تنظيم", "فعالية", "حدث"],
-  },
-  {
-    id: "catering",
-    label: "تموين",
-    keywords: ["تموين", "ضيافة", "بوفيه", "كيترنج"],
-  },
-  {
-    id: "photography",
-    label: "تصوير",
-    keywords: ["تصوير", "مصور", "كاميرا", "صور"],
-  },
-  {
-    id: "videography",
-    label: "تصوير فيديو",
-    keywords: ["فيديو", "مونتاج", "فيديوغرافر"],
-  },
-  {
-    id: "entertainment",
-    label: "ترفيه",
-    keywords: ["ترفيه", "موسيقى", "دي جي", "منشط"],
-  },
-  {
-    id: "flowers-decor",
-    label: "زهور وتزيين",
-    keywords: ["زهور", "ورد", "تزيين", "ديكور حفلة"],
-  },
+// دالة للتحقق من تطابق التصنيف مع الكلمات المفتاحية (عبر الفهرس)
+// ترجع أفضل 5 تصنيفات لتشجيع اختيار تصنيفات متعددة
+function findMatchingCategories(text: string): string[] {
+  return LOCAL_CLASSIFIER.classify(text).categories;
+}
 
-  // جمال وعناية
-  {
-    id: "hair-styling",
-    label: "تصفيف شعر",
-    keywords: ["شعر", "قص", "صبغة", "تسريحة", "حلاق"],
-  },
-  {
-    id: "makeup",
-    label: "مكياج",
-    keywords: ["مكياج", "ميكب", "تجميل", "عروس"],
-  },
-  {
-    id: "spa-massage",
-    label: "سبا ومساج",
-    keywords: ["سبا", "مساج", "استرخاء", "عناية"],
-  },
-  {
-    id: "nails",
-    label: "أظافر",
-    keywords: ["أظافر", "مانيكير", "بديكير", "طلاء"],
-  },
+// مطابقة التصنيفات التي يقترحها الـ AI مع القائمة الثابتة عبر فهرس مشترك
+// (exact → يحتوي/محتوى → كلمات مشتركة) بدل المرور على كل التصنيفات لكل label
+const CATEGORY_INDEX = buildCategoryIndex(FIXED_CATEGORIES);
 
-  // تنظيف
-  {
-    id: "home-cleaning",
-    label: "تنظيف منازل",
-    keywords: ["تنظيف منزل", "شغالة", "نظافة منزلية"],
-  },
-  {
-    id: "office-cleaning",
-    label: "تنظيف مكاتب",
-    keywords: ["تنظيف مكتب", "نظافة مكاتب", "شركة"],
-  },
-  {
-    id: "laundry",
-    label: "غسيل وكي",
-    keywords: ["غسيل", "كي", "ملابس", "مغسلة"],
-  },
-  {
-    id: "pest-control",
-    label: "مكافحة حشرات",
-    keywords: ["حشرات", "صراصير", "فئران", "مكافحة", "رش"],
-  },
+const corsHeaders = {
+  "Access-Control-Allow-Origin": "*",
+  "Access-Control-Allow-Headers":
+    "authorization, x-client-info, apikey, content-type",
+  "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+};
 
-  // طعام
-  {
-    id: "cooking",
-    label: "طبخ منزلي",
-    keywords: [
-      "طبخ",
-      "أكل",
-      "وجبة",
-      "طباخ",
-      "معصوب",
-      "مندي",
-      "كبسة",
-      "مطبق",
-      "حنيذ",
-      "مظبي",
-      "شاورما",
-      "فلافل",
-      "سمبوسة",
-      "سندويش",
-      "برجر",
-      "بيتزا",
-      "باستا",
-      "رز",
-      "لحم",
-      "دجاج",
-      "سمك",
-      "لحم بقري",
-      "لحم خروف",
-      "مشاوي",
-      "مشكل",
-      "مقبلات",
-      "سلطة",
-      "شوربة",
-      "حساء",
-      "يخني",
-      "مقلوبة",
-      "مجبوس",
-      "مشاكيك",
-      "مشكل مشاوي",
-      "مشكل لحم",
-      "مشكل دجاج",
-      "مشكل سمك",
-      "أرز بخاري",
-      "أرز كباب",
-      "أرز دجاج",
-      "أرز لحم",
-      "أرز سمك",
-      "مشكل يمني",
-      "مشكل سعودي",
-      "مشكل خليجي",
-      "مشكل عربي",
-      "طعام يمني",
-      "طعام سعودي",
-      "طعام خليجي",
-      "طعام عربي",
-      "أطباق عربية",
-      "أطباق يمنية",
-      "أطباق خليجية",
-      "أطباق شعبية",
-      "أكل بيتي",
-      "أكل منزلي",
-      "أكل طازج",
-      "أكل جاهز",
-      "توصيل طعام",
-      "طلب طعام",
-      "وجبة جاهزة",
-      "وجبة ساخنة",
-      "وجبة باردة",
-    ],
-  },
-  {
-    id: "restaurants",
-    label: "مطاعم",
-    keywords: [
-      "مطعم",
-      "مطاعم",
-      "مطعم يمني",
-      "مطعم سعودي",
-      "مطعم خليجي",
-      "مطعم عربي",
-      "مطعم آسيوي",
-      "مطعم إيطالي",
-      "مطعم صيني",
-      "مطعم ياباني",
-      "مطعم هندي",
-      "مطعم تركي",
-      "مطعم لبناني",
-      "مطعم شامي",
-      "مطعم مصري",
-      "مطعم مغربي",
-      "مطعم بحري",
-      "مطعم مشاوي",
-      "مطعم بيتزا",
-      "مطعم برجر",
-      "مطعم فطور",
-      "مطعم غداء",
-      "مطعم عشاء",
-      "مطعم سريع",
-      "مطعم فاخر",
-      "مطعم شعبي",
-      "مطعم عائلي",
-      "مطعم للعزائم",
-      "مطعم للولائم",
-      "مطعم للمناسبات",
-      "مطعم للحفلات",
-      "مطعم للأعراس",
-      "مطعم للعزائم",
-      "مطعم للولائم",
-      "مطعم للمناسبات",
-      "مطعم للحفلات",
-      "مطعم للأعراس",
-      "مطعم للعزائم",
-      "مطعم للولائم",
-      "مطعم للمناسبات",
-      "مطعم للحفلات",
-      "مطعم للأعراس",
-      "مطعم للعزائم",
-      "مطعم للولائم",
-      "مطعم للمناسبات",
-      "مطعم للحفلات",
-      "مطعم للأعراس",
-    ],
-  },
-  {
-    id: "baking",
-    label: "حلويات ومخبوزات",
-    keywords: [
-      "حلويات",
-      "كيك",
-      "مخبوزات",
-      "خبز",
-      "تورتة",
-      "كنافة",
-      "بقلاوة",
-      "لقيمات",
-      "زلابيا",
-      "عصيدة",
-      "مهلبية",
-      "أم علي",
-      "قطايف",
-      "معمول",
-      "كعك",
-      "بسكويت",
-      "كوكيز",
-      "دونات",
-      "وافل",
-      "بان كيك",
-      "كريب",
-      "كرواسان",
-      "خبز عربي",
-      "خبز تنور",
-      "خبز صاج",
-      "خبز أسمر",
-      "خبز أبيض",
-      "خبز بر",
-      "خبز توست",
-      "خبز فرنسي",
-      "خبز إيطالي",
-      "خبز محلي",
-      "خبز طازج",
-      "معجنات",
-      "فطائر",
-      "بيتزا",
-      "بيتزا عربية",
-    ],
-  },
-  {
-    id: "catering-food",
-    label: "تموين طعام",
-    keywords: [
-      "تموين طعام",
-      "ولائم",
-      "بوفيه أكل",
-      "تموين مناسبات",
-      "تموين حفلات",
-      "تموين أعراس",
-      "تموين عزائم",
-      "تموين مناسبات",
-      "بوفيه",
-      "كيترنج",
-      "خدمات طعام",
-      "تجهيز طعام",
-      "تحضير طعام",
-      "طبخ جماعي",
-      "طبخ مناسبات",
-      "طبخ حفلات",
-      "طبخ أعراس",
-      "طبخ عزائم",
-      "طبخ ولائم",
-      "طبخ جماعي",
-      "طبخ للمناسبات",
-      "طبخ للحفلات",
-      "طبخ للأعراس",
-      "طبخ للعزائم",
-      "طبخ للولائم",
-      "خدمات التموين",
-      "خدمات الكيترنج",
-      "خدمات البوفيه",
-    ],
-  },
+function res(data: unknown, status = 200) {
+  return new Response(JSON.stringify(data), {
+    status,
+    headers: {
+      "Content-Type": "application/json",
+      ...corsHeaders,
+    },
+  });
+}
 
-  // عقارات
-  {
-    id: "real-estate",
-    label: "عقارات",
-    keywords: ["عقار", "شقة", "فيلا", "أرض", "بيت", "إيجار", "بيع"],
-  },
-  {
-    id: "property-mgmt",
-    label: "إدارة عقارات",
-    keywords: ["إدارة عقار", "تحصيل", "مستأجرين"],
-  },
+// ============================================
+// Unified AI Provider (Anthropic or OpenAI)
+// ============================================
+interface ChatMessage {
+  role: string;
+  content: string;
+}
 
-  // حيوانات
-  {
-    id: "pet-care",
-    label: "رعاية حيوانات",
-    keywords: ["حيوان", "قط", "كلب", "رعاية", "فندقة"],
-  },
-  {
-    id: "pet-grooming",
-    label: "تجميل حيوانات",
-    keywords: ["تجميل حيوانات", "قص شعر", "حمام"],
-  },
+async function callAnthropic(
+  systemPrompt: string,
+  messages: ChatMessage[],
+  signal?: AbortSignal,
+): Promise<string> {
+  const response = await fetch("https://api.anthropic.com/v1/messages", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "x-api-key": ANTHROPIC_API_KEY,
+      "anthropic-version": "2023-06-01",
+    },
+    body: JSON.stringify({
+      model: ANTHROPIC_MODEL,
+      max_tokens: 4096,
+      system: systemPrompt,
+      messages: messages,
+    }),
+    signal,
+  });
 
-  // أمن
-  {
-    id: "security",
-    label: "خدمات أمنية",
-    keywords: ["أمن", "حراسة", "حارس", "أمان"],
-  },
-  {
-    id: "cctv",
-    label: "كاميرات مراقبة",
-    keywords: ["كاميرا", "مراقبة", "CCTV", "تركيب كاميرات"],
-  },
+  if (!response.ok) {
+    const error = await response.json();
+    console.error("Anthropic API Error:", error);
+    throw new Error(error?.error?.message || "Anthropic API call failed");
+  }
 
-  // أخرى
-  {
-    id: "other",
-    label: "أخرى",
-    keywords: ["أخرى", "متنوع", "عام", "غير محدد"],
-  },
-];
+  const result = await response.json();
+  return result.content?.[0]?.text || "";
+}
 
-// دالة للتحقق من تطابق التصنيف مع الكلمات المفتاحية
-function findMatchingCategories(text: string): string[] {
-  const lowerText = text.toLowerCase();
-  const matches: { id: string; label: string; score: number }[] = [];
+async function callOpenAI(
+  systemPrompt: string,
+  messages: ChatMessage[],
+  signal?: AbortSignal,
+): Promise<string> {
+  // Convert messages to OpenAI format (include system in messages array)
+  const openAIMessages: ChatMessage[] = [
+    { role: "system", content: systemPrompt },
+    ...messages.map((msg) => ({
+      role: msg.role === "assistant" ? "assistant" : "user",
+      content: msg.content,
+    })),
+  ];
 
-  for (const cat of FIXED_CATEGORIES) {
-    // تخطي "أخرى" من الاقتراحات
-    if (cat.id === "other") continue;
+  const response = await fetch("https://api.openai.com/v1/chat/completions", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "Authorization": `Bearer ${OPENAI_API_KEY}`,
+    },
+    body: JSON.stringify({
+      model: OPENAI_MODEL,
+      messages: openAIMessages,
+      max_tokens: 4096,
+      temperature: 0.7,
+    }),
+    signal,
+  });
 
-    let score = 0;
-    for (const keyword of cat.keywords) {
-      if (lowerText.includes(keyword.toLowerCase())) {
-        score += 1;
-      }
-    }
-    if (score > 0) {
-      matches.push({ id: cat.id, label: cat.label, score });
-    }
+  if (!response.ok) {
+    const error = await response.json();
+    console.error("OpenAI API Error:", error);
+    throw new Error(error?.error?.message || "OpenAI API call failed");
   }
 
-  // ترتيب حسب الأكثر تطابقاً
-  matches.sort((a, b) => b.score - a.score);
+  const result = await response.json();
+  return result.choices?.[0]?.message?.content || "";
+}
 
-  // إرجاع أفضل 5 تصنيفات (بدلاً من 3) لتشجيع اختيار تصنيفات متعددة
-  return matches.slice(0, 5).map((m) => m.label);
+// ============================================
+// Provider routing (latency-aware + hedging + circuit breaker)
+// ============================================
+// بدلاً من التناوب الأعمى (requestCounter % 2) والانتظار حتى يفشل المزود:
+// - نتتبع آخر ROUTER_WINDOW نتيجة لكل مزود (زمن الاستجابة + النجاح/الفشل)
+// - نوجّه للأسرع بين السليمين: الزمن المتوقع، والفشل يُحسب كأنه PROVIDER_TIMEOUT_MS
+// - hedging: إذا تجاوز الأول p95 الخاص به نطلق نفس الطلب للثاني، وأول رد يفوز
+// - circuit breaker: بعد BREAKER_FAILURES فشل متتالٍ يُستبعد المزود لفترة
+//   ثم يُجرّب من جديد (half-open) - فشل واحد آخر يعيد فتحه
+
+type Provider = "anthropic" | "openai";
+
+const PROVIDER_MODELS: Record<Provider, string> = {
+  anthropic: ANTHROPIC_MODEL,
+  openai: OPENAI_MODEL,
+};
+
+const ROUTER_WINDOW = 50;
+// Below this many samples a provider counts as unmeasured and gets tried
+const ROUTER_MIN_SAMPLES = 5;
+const BREAKER_FAILURES = 3;
+const BREAKER_COOLDOWN_MS = 30_000;
+const PROVIDER_TIMEOUT_MS = 45_000;
+const HEDGING_ENABLED = Deno.env.get("AI_HEDGING") !== "off";
+// Hedge delay when the primary has no latency history yet
+const HEDGE_DEFAULT_DELAY_MS = 8_000;
+const HEDGE_MIN_DELAY_MS = 1_000;
+
+interface ProviderHealth {
+  /** Latencies (ms) of recent successful calls */
+  latencies: number[];
+  /** Recent outcomes, true = success */
+  outcomes: boolean[];
+  consecutiveFailures: number;
+  /** Circuit is open (provider skipped) until this time */
+  openUntil: number;
+  calls: number;
+  failures: number;
+  hedgeWins: number;
 }
 
-// دالة للتحقق مما إذا كان التصنيف موجوداً (مطابقة مرنة)
-function isKnownCategory(label: string): boolean {
-  if (!label) return false;
-  const lowerLabel = label.toLowerCase().trim();
+const providerHealth: Record<Provider, ProviderHealth> = {
+  anthropic: {
+    latencies: [],
+    outcomes: [],
+    consecutiveFailures: 0,
+    openUntil: 0,
+    calls: 0,
+    failures: 0,
+    hedgeWins: 0,
+  },
+  openai: {
+    latencies: [],
+    outcomes: [],
+    consecutiveFailures: 0,
+    openUntil: 0,
+    calls: 0,
+    failures: 0,
+    hedgeWins: 0,
+  },
+};
+
+function isConfigured(provider: Provider): boolean {
+  return provider === "anthropic" ? !!ANTHROPIC_API_KEY : !!OPENAI_API_KEY;
+}
 
-  // إزالة علامات الترقيم والمسافات الزائدة
-  const normalizedLabel = lowerLabel.replace(/[؟?؟،,.\s]+/g, " ").trim();
+function percentile(values: number[], pct: number): number {
+  if (values.length === 0) return 0;
+  const sorted = [...values].sort((a, b) => a - b);
+  return sorted[Math.min(sorted.length - 1, Math.floor((pct / 100) * sorted.length))];
+}
 
-  return FIXED_CATEGORIES.some((cat) => {
-    const catLabel = cat.label.toLowerCase().trim();
-    const normalizedCatLabel = catLabel.replace(/[؟?؟،,.\s]+/g, " ").trim();
+function errorRate(health: ProviderHealth): number {
+  if (health.outcomes.length === 0) return 0;
+  return health.outcomes.filter((ok) => !ok).length / health.outcomes.length;
+}
 
-    // مطابقة دقيقة
-    if (normalizedLabel === normalizedCatLabel) return true;
+/**
+ * Expected latency (lower is better). A failure costs about as much as a
+ * timeout before the fallback starts, so it counts as PROVIDER_TIMEOUT_MS -
+ * a provider that always fails scores worst, not best.
+ */
+function providerScore(provider: Provider): number {
+  const health = providerHealth[provider];
+  if (health.outcomes.length < ROUTER_MIN_SAMPLES) return 0;
+  const failureRate = errorRate(health);
+  return (1 - failureRate) * percentile(health.latencies, 50) +
+    failureRate * PROVIDER_TIMEOUT_MS;
+}
 
-    // مطابقة جزئية (يحتوي على)
-    if (
-      normalizedLabel.includes(normalizedCatLabel) ||
-      normalizedCatLabel.includes(normalizedLabel)
-    ) return true;
+function recordProviderResult(
+  provider: Provider,
+  ok: boolean,
+  latencyMs: number,
+) {
+  const health = providerHealth[provider];
+  health.calls++;
+  health.outcomes.push(ok);
+  if (health.outcomes.length > ROUTER_WINDOW) health.outcomes.shift();
+
+  if (ok) {
+    health.latencies.push(latencyMs);
+    if (health.latencies.length > ROUTER_WINDOW) health.latencies.shift();
+    health.consecutiveFailures = 0;
+    health.openUntil = 0;
+    return;
+  }
 
-    // مطابقة كلمات (إذا تطابقت 70% من الكلمات)
-    const labelWords = normalizedLabel.split(/\s+/).filter((w) => w.length > 2);
-    const catWords = normalizedCatLabel.split(/\s+/).filter((w) =>
-      w.length > 2
+  health.failures++;
+  health.consecutiveFailures++;
+  if (health.consecutiveFailures >= BREAKER_FAILURES) {
+    health.openUntil = Date.now() + BREAKER_COOLDOWN_MS;
+    console.warn(
+      `🔌 ${provider} circuit open for ${BREAKER_COOLDOWN_MS}ms after ${health.consecutiveFailures} failures`,
     );
-
-    if (labelWords.length > 0 && catWords.length > 0) {
-      const matchingWords = labelWords.filter((w) =>
-        catWords.some((cw) => cw.includes(w) || w.includes(cw))
-      );
-      const matchRatio = matchingWords.length /
-        Math.max(labelWords.length, catWords.length);
-      if (matchRatio >= 0.7) return true;
-    }
-
-    return false;
-  });
+  }
 }
 
-// دالة لإيجاد أفضل تصنيف مطابق (حتى لو لم يكن مطابقاً تماماً)
-function findBestMatchingCategory(
-  label: string,
-): { id: string; label: string } | null {
-  if (!label) return null;
-  const lowerLabel = label.toLowerCase().trim();
-  const normalizedLabel = lowerLabel.replace(/[؟?؟،,.\s]+/g, " ").trim();
+/**
+ * Configured providers, best first. Open circuits are skipped; if every
+ * circuit is open, the one closest to closing is tried rather than failing.
+ */
+function routeProviders(): Provider[] {
+  requestCounter++;
+  const now = Date.now();
+  const configured = (["anthropic", "openai"] as Provider[]).filter(
+    isConfigured,
+  );
+  const closed = configured.filter((p) => providerHealth[p].openUntil <= now);
+  const candidates = closed.length > 0 ? closed : [...configured]
+    .sort((a, b) => providerHealth[a].openUntil - providerHealth[b].openUntil)
+    .slice(0, 1);
+
+  // Equal scores (cold start, or both unmeasured) keep the old alternation
+  if (requestCounter % 2 === 0) candidates.reverse();
+  return candidates.sort((a, b) => providerScore(a) - providerScore(b));
+}
 
-  let bestMatch: { id: string; label: string; score: number } | null = null;
+function hedgeDelayMs(provider: Provider): number {
+  const { latencies } = providerHealth[provider];
+  if (latencies.length < ROUTER_MIN_SAMPLES) return HEDGE_DEFAULT_DELAY_MS;
+  return Math.max(HEDGE_MIN_DELAY_MS, percentile(latencies, 95));
+}
 
-  for (const cat of FIXED_CATEGORIES) {
-    const catLabel = cat.label.toLowerCase().trim();
-    const normalizedCatLabel = catLabel.replace(/[؟?؟،,.\s]+/g, " ").trim();
-    let score = 0;
+function routingSnapshot() {
+  const now = Date.now();
+  return Object.fromEntries(
+    (["anthropic", "openai"] as Provider[])
+      .filter(isConfigured)
+      .map((provider) => {
+        const health = providerHealth[provider];
+        return [provider, {
+          state: health.openUntil > now
+            ? "open"
+            : health.consecutiveFailures > 0
+            ? "degraded"
+            : "closed",
+          p50Ms: Math.round(percentile(health.latencies, 50)),
+          p95Ms: Math.round(percentile(health.latencies, 95)),
+          errorRatePct: Math.round(errorRate(health) * 1000) / 10,
+          calls: health.calls,
+          failures: health.failures,
+          hedgeWins: health.hedgeWins,
+        }];
+      }),
+  );
+}
 
-    // مطابقة دقيقة = 100 نقطة
-    if (normalizedLabel === normalizedCatLabel) {
-      return { id: cat.id, label: cat.label };
-    }
+interface RoutingInfo {
+  primary: Provider;
+  servedBy: Provider;
+  hedged: boolean;
+  fallback: boolean;
+  latencyMs: number;
+  providers: ReturnType<typeof routingSnapshot>;
+}
 
-    // مطابقة جزئية = 50 نقطة
-    if (
-      normalizedLabel.includes(normalizedCatLabel) ||
-      normalizedCatLabel.includes(normalizedLabel)
-    ) {
-      score = 50;
-    }
+async function callProvider(
+  provider: Provider,
+  systemPrompt: string,
+  messages: ChatMessage[],
+  signal: AbortSignal,
+): Promise<string> {
+  return provider === "anthropic"
+    ? await callAnthropic(systemPrompt, messages, signal)
+    : await callOpenAI(systemPrompt, messages, signal);
+}
 
-    // مطابقة كلمات = 30 نقطة لكل كلمة متطابقة
-    const labelWords = normalizedLabel.split(/\s+/).filter((w) => w.length > 2);
-    const catWords = normalizedCatLabel.split(/\s+/).filter((w) =>
-      w.length > 2
+async function callAI(
+  systemPrompt: string,
+  messages: ChatMessage[],
+  signal?: AbortSignal,
+): Promise<
+  { text: string; provider: string; model: string; routing: RoutingInfo }
+> {
+  const order = routeProviders();
+  if (order.length === 0) {
+    throw new Error(
+      "No AI provider configured. Please set ANTHROPIC_API_KEY or OPENAI_API_KEY",
     );
-
-    if (labelWords.length > 0 && catWords.length > 0) {
-      const matchingWords = labelWords.filter((w) =>
-        catWords.some((cw) => cw.includes(w) || w.includes(cw))
-      );
-      score += matchingWords.length * 30;
-    }
-
-    if (score > 0 && (!bestMatch || score > bestMatch.score)) {
-      bestMatch = { id: cat.id, label: cat.label, score };
-    }
   }
 
-  // إرجاع أفضل تطابق إذا كان النقاط >= 30
-  return bestMatch && bestMatch.score >= 30
-    ? { id: bestMatch.id, label: bestMatch.label }
-    : null;
+  const startedAt = Date.now();
+
+  return await new Promise((resolve, reject) => {
+    const controllers = new Map<Provider, AbortController>();
+    let nextIndex = 0;
+    let running = 0;
+    let settled = false;
+    let hedged = false;
+    let fallback = false;
+    let lastError: unknown = null;
+    let hedgeTimer: ReturnType<typeof setTimeout> | undefined;
+
+    const finish = () => {
+      settled = true;
+      clearTimeout(hedgeTimer);
+      for (const controller of controllers.values()) controller.abort();
+    };
+
+    const launch = (): boolean => {
+      if (settled || nextIndex >= order.length) return false;
+      const provider = order[nextIndex++];
+      const controller = new AbortController();
+      const timeout = setTimeout(() => controller.abort(), PROVIDER_TIMEOUT_MS);
+      const onAbort = () => controller.abort();
+      signal?.addEventListener("abort", onAbort, { once: true });
+      controllers.set(provider, controller);
+      running++;
+      const launchedAt = Date.now();
+
+      callProvider(provider, systemPrompt, messages, controller.signal)
+        .then((text) => {
+          recordProviderResult(provider, true, Date.now() - launchedAt);
+          if (settled) return;
+          if (hedged && provider !== order[0]) {
+            providerHealth[provider].hedgeWins++;
+          }
+          controllers.delete(provider);
+          finish();
+          resolve({
+            text,
+            provider,
+            model: PROVIDER_MODELS[provider],
+            routing: {
+              primary: order[0],
+              servedBy: provider,
+              hedged,
+              fallback,
+              latencyMs: Date.now() - startedAt,
+              providers: routingSnapshot(),
+            },
+          });
+        })
+        .catch((error) => {
+          running--;
+          // The losing side of a hedge is aborted on purpose - not a failure
+          if (settled) return;
+          // Client disconnected - says nothing about the provider
+          if (signal?.aborted) {
+            finish();
+            reject(error);
+            return;
+          }
+          recordProviderResult(provider, false, Date.now() - launchedAt);
+          console.warn(`⚠️ ${provider} failed, trying fallback...`, error);
+          lastError = error;
+          clearTimeout(hedgeTimer);
+          if (launch()) {
+            fallback = true;
+          } else if (running === 0) {
+            finish();
+            const errorMessage = lastError instanceof Error
+              ? lastError.message
+              : String(lastError);
+            reject(
+              new Error(
+                order.length > 1
+                  ? `Both providers failed. Last error: ${errorMessage}`
+                  : errorMessage,
+              ),
+            );
+          }
+        })
+        .finally(() => {
+          clearTimeout(timeout);
+          signal?.removeEventListener("abort", onAbort);
+        });
+      return true;
+    };
+
+    launch();
+    if (HEDGING_ENABLED && order.length > 1) {
+      hedgeTimer = setTimeout(() => {
+        if (launch()) {
+          hedged = true;
+          console.log(
+            `🏁 ${order[0]} slower than ${hedgeDelayMs(order[0])}ms, hedging to ${order[1]}`,
+          );
+        }
+      }, hedgeDelayMs(order[0]));
+    }
+  });
 }
 
-function res(data: unknown, status = 200) {
-  return new Response(JSON.stringify(data), {
-    status,
+// ============================================
+// Streaming (SSE)
+// ============================================
+// stream: true → يُرسل نص الرد (aiResponse / response_to_user) جزءاً جزءاً
+// فور وصوله من المزود، ثم حدث draft واحد بالحقول النهائية بعد التحقق:
+//   event: delta  data: {"text": "..."}
+//   event: draft  data: {...نفس رد الـ JSON العادي}
+//   event: error  data: {"error": "..."}
+
+type SendEvent = (event: string, data: unknown) => void;
+
+// The user-facing field of each mode's JSON, streamed as it is generated
+const STREAM_TEXT_FIELD: Record<string, string> = {
+  draft: "aiResponse",
+  chat: "response_to_user",
+};
+
+function sse(run: (send: SendEvent) => Promise<void>): Response {
+  const encoder = new TextEncoder();
+  let closed = false;
+  const stream = new ReadableStream<Uint8Array>({
+    async start(controller) {
+      const send: SendEvent = (event, data) => {
+        if (closed) return;
+        controller.enqueue(
+          encoder.encode(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`),
+        );
+      };
+      try {
+        await run(send);
+      } catch (e) {
+        console.error("Error in ai-chat stream:", e);
+        send("error", { error: String(e) });
+      } finally {
+        if (!closed) {
+          closed = true;
+          controller.close();
+        }
+      }
+    },
+    cancel() {
+      // Client went away - stop writing; the provider fetch is aborted via req.signal
+      closed = true;
+    },
+  });
+
+  return new Response(stream, {
     headers: {
-      "Content-Type": "application/json",
-      "Access-Control-Allow-Origin": "*",
-      "Access-Control-Allow-Headers":
-        "authorization, x-client-info, apikey, content-type",
-      "Access-Control-Allow-Methods": "POST, OPTIONS",
+      ...corsHeaders,
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-cache",
+      "Connection": "keep-alive",
     },
   });
 }
 
-// ============================================
-// Unified AI Provider (Anthropic or OpenAI)
-// ============================================
-interface ChatMessage {
-  role: string;
-  content: string;
+/** Parse an SSE byte stream (provider side) into {event, data} records */
+async function* readSSE(
+  body: ReadableStream<Uint8Array>,
+): AsyncGenerator<{ event: string; data: string }> {
+  const reader = body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  try {
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) return;
+      buffer += value.replace(/\r\n/g, "\n");
+      let boundary: number;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = "message";
+        const data: string[] = [];
+        for (const line of block.split("\n")) {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) {
+            data.push(line.slice(5).replace(/^ /, ""));
+          }
+        }
+        if (data.length > 0) yield { event, data: data.join("\n") };
+      }
+    }
+  } finally {
+    reader.releaseLock();
+  }
 }
 
-async function callAnthropic(
+async function* streamAnthropic(
   systemPrompt: string,
   messages: ChatMessage[],
-): Promise<string> {
+  signal?: AbortSignal,
+): AsyncGenerator<string> {
   const response = await fetch("https://api.anthropic.com/v1/messages", {
     method: "POST",
     headers: {
@@ -783,24 +549,33 @@ async function callAnthropic(
       max_tokens: 4096,
       system: systemPrompt,
       messages: messages,
+      stream: true,
     }),
+    signal,
   });
 
-  if (!response.ok) {
-    const error = await response.json();
+  if (!response.ok || !response.body) {
+    const error = await response.json().catch(() => null);
     console.error("Anthropic API Error:", error);
     throw new Error(error?.error?.message || "Anthropic API call failed");
   }
 
-  const result = await response.json();
-  return result.content?.[0]?.text || "";
+  for await (const { event, data } of readSSE(response.body)) {
+    if (event === "content_block_delta") {
+      const payload = JSON.parse(data);
+      if (payload.delta?.type === "text_delta") yield payload.delta.text;
+    } else if (event === "error") {
+      const payload = JSON.parse(data);
+      throw new Error(payload?.error?.message || "Anthropic stream failed");
+    }
+  }
 }
 
-async function callOpenAI(
+async function* streamOpenAI(
   systemPrompt: string,
   messages: ChatMessage[],
-): Promise<string> {
-  // Convert messages to OpenAI format (include system in messages array)
+  signal?: AbortSignal,
+): AsyncGenerator<string> {
   const openAIMessages: ChatMessage[] = [
     { role: "system", content: systemPrompt },
     ...messages.map((msg) => ({
@@ -820,93 +595,401 @@ async function callOpenAI(
       messages: openAIMessages,
       max_tokens: 4096,
       temperature: 0.7,
+      stream: true,
     }),
+    signal,
   });
 
-  if (!response.ok) {
-    const error = await response.json();
+  if (!response.ok || !response.body) {
+    const error = await response.json().catch(() => null);
     console.error("OpenAI API Error:", error);
     throw new Error(error?.error?.message || "OpenAI API call failed");
   }
 
-  const result = await response.json();
-  return result.choices?.[0]?.message?.content || "";
+  for await (const { data } of readSSE(response.body)) {
+    if (data === "[DONE]") return;
+    const delta = JSON.parse(data).choices?.[0]?.delta?.content;
+    if (delta) yield delta;
+  }
 }
 
-async function callAI(
+/**
+ * Like callAI, but relays text chunks to onText as they arrive.
+ * Same routing and circuit breakers; no hedging (the client would see two
+ * replies), and fallback only if nothing was streamed yet.
+ * PROVIDER_TIMEOUT_MS applies between chunks, so a stalled upstream fails
+ * (and falls over to the next provider) instead of hanging the stream.
+ */
+async function streamAI(
   systemPrompt: string,
   messages: ChatMessage[],
-): Promise<{ text: string; provider: string; model: string }> {
-  // Round-robin: alternate between providers
-  requestCounter++;
-  const hasAnthropic = !!ANTHROPIC_API_KEY;
-  const hasOpenAI = !!OPENAI_API_KEY;
-
-  if (!hasAnthropic && !hasOpenAI) {
+  onText: (chunk: string) => void,
+  signal?: AbortSignal,
+): Promise<
+  { text: string; provider: string; model: string; routing: RoutingInfo }
+> {
+  const order = routeProviders();
+  if (order.length === 0) {
     throw new Error(
       "No AI provider configured. Please set ANTHROPIC_API_KEY or OPENAI_API_KEY",
     );
   }
 
-  let targetProvider: "anthropic" | "openai";
-  if (!hasAnthropic) {
-    targetProvider = "openai";
-  } else if (!hasOpenAI) {
-    targetProvider = "anthropic";
-  } else {
-    // Both available - use round-robin
-    targetProvider = (requestCounter % 2 === 0) ? "openai" : "anthropic";
+  const startedAt = Date.now();
+  let lastError: unknown = null;
+  for (const provider of order) {
+    let text = "";
+    const launchedAt = Date.now();
+    const controller = new AbortController();
+    let timeout = setTimeout(() => controller.abort(), PROVIDER_TIMEOUT_MS);
+    const onAbort = () => controller.abort();
+    signal?.addEventListener("abort", onAbort, { once: true });
+    try {
+      const chunks = provider === "anthropic"
+        ? streamAnthropic(systemPrompt, messages, controller.signal)
+        : streamOpenAI(systemPrompt, messages, controller.signal);
+      for await (const chunk of chunks) {
+        clearTimeout(timeout);
+        timeout = setTimeout(() => controller.abort(), PROVIDER_TIMEOUT_MS);
+        text += chunk;
+        onText(chunk);
+      }
+      recordProviderResult(provider, true, Date.now() - launchedAt);
+      return {
+        text,
+        provider,
+        model: PROVIDER_MODELS[provider],
+        routing: {
+          primary: order[0],
+          servedBy: provider,
+          hedged: false,
+          fallback: provider !== order[0],
+          latencyMs: Date.now() - startedAt,
+          providers: routingSnapshot(),
+        },
+      };
+    } catch (error) {
+      if (signal?.aborted) throw error;
+      recordProviderResult(provider, false, Date.now() - launchedAt);
+      // Half a response can't be retried elsewhere without the client seeing it twice
+      if (text) throw error;
+      console.warn(`⚠️ ${provider} stream failed, trying fallback...`, error);
+      lastError = error;
+    } finally {
+      clearTimeout(timeout);
+      signal?.removeEventListener("abort", onAbort);
+    }
   }
 
-  // Try the target provider, fallback to the other if it fails
+  const errorMessage = lastError instanceof Error
+    ? lastError.message
+    : String(lastError);
+  throw new Error(`Both providers failed. Last error: ${errorMessage}`);
+}
+
+/**
+ * Current value of a top-level string field in JSON that is still arriving:
+ * '{"aiResponse": "أبشر، جاري تج' → 'أبشر، جاري تج'
+ */
+function partialJsonStringField(raw: string, field: string): string | null {
+  const match = new RegExp(`"${field}"\\s*:\\s*"`).exec(raw);
+  if (!match) return null;
+
+  let value = "";
+  for (let i = match.index + match[0].length; i < raw.length; i++) {
+    const ch = raw[i];
+    if (ch === '"') return value;
+    if (ch !== "\\") {
+      value += ch;
+      continue;
+    }
+    // Escape sequence, possibly cut off at the end of the current chunk
+    const next = raw[i + 1];
+    if (next === undefined) return value;
+    if (next === "u") {
+      const hex = raw.slice(i + 2, i + 6);
+      if (hex.length < 4) return value;
+      value += String.fromCharCode(parseInt(hex, 16));
+      i += 5;
+      continue;
+    }
+    const escapes: Record<string, string> = {
+      n: "\n",
+      t: "\t",
+      r: "\r",
+      b: "\b",
+      f: "\f",
+    };
+    value += escapes[next] ?? next;
+    i++;
+  }
+  return value;
+}
+
+// ============================================
+// Output post-processing (JSON + category validation)
+// ============================================
+function finalizeOutput(
+  rawOutput: string,
+  mode: string,
+  prompt: string,
+): Record<string, unknown> {
+  // محاولة استخراج JSON
+  let parsed: Record<string, unknown>;
   try {
-    if (targetProvider === "anthropic") {
-      const text = await callAnthropic(systemPrompt, messages);
-      return { text, provider: "anthropic", model: ANTHROPIC_MODEL };
-    } else {
-      const text = await callOpenAI(systemPrompt, messages);
-      return { text, provider: "openai", model: OPENAI_MODEL };
+    // Try to extract JSON from response
+    const jsonMatch = rawOutput.match(/\{[\s\S]*\}/) ||
+      rawOutput.match(/```json\s*([\s\S]*?)```/);
+    const jsonStr = jsonMatch ? (jsonMatch[1] || jsonMatch[0]) : rawOutput;
+    parsed = JSON.parse(jsonStr.trim());
+  } catch (_e) {
+    console.warn("Failed to parse JSON, using raw output");
+    parsed = {
+      aiResponse: rawOutput,
+      isClarification: true,
+    };
+  }
+
+  // معالجة التصنيفات في وضع draft
+  if (mode === "draft") {
+    const validCategories: string[] = [];
+    let hasOtherCategory = false;
+
+    // دالة لتنظيف التصنيف من علامات الاستفهام والنصوص الغريبة
+    const cleanCategory = (cat: string): string => {
+      if (!cat) return cat;
+      let cleaned = cat.replace(/[؟?؟]/g, "").trim();
+      cleaned = cleaned.split(/[؟?؟]/)[0].trim();
+      cleaned = cleaned.replace(/\s+/g, " ").trim();
+      return cleaned;
+    };
+
+    // معالجة التصنيفات من الـ AI
+    if (parsed.categories && Array.isArray(parsed.categories)) {
+      for (const cat of parsed.categories) {
+        const cleanedCat = cleanCategory(cat);
+        if (!cleanedCat) continue;
+
+        // تسجيل إذا كان التصنيف "أخرى" (سنضيفه لاحقاً إذا لزم)
+        if (
+          cleanedCat.toLowerCase() === "أخرى" ||
+          cleanedCat.toLowerCase() === "other"
+        ) {
+          hasOtherCategory = true;
+          continue;
+        }
+
+        // محاولة إيجاد أفضل تطابق
+        const bestMatch = CATEGORY_INDEX.resolve(cleanedCat, { fuzzy: true });
+        if (bestMatch && !validCategories.includes(bestMatch.label)) {
+          validCategories.push(bestMatch.label);
+        }
+        // إذا لم نجد تطابقاً، نتجاهل التصنيف (لن نضيف تصنيفات غير معروفة)
+      }
     }
-  } catch (error) {
-    console.warn(`⚠️ ${targetProvider} failed, trying fallback...`, error);
 
-    // Fallback to the other provider
-    const fallbackProvider = targetProvider === "anthropic"
-      ? "openai"
-      : "anthropic";
+    // إذا لم يكن هناك تصنيفات صحيحة، نحاول استخراج تصنيفات من النص مباشرة
+    if (validCategories.length === 0) {
+      console.log(
+        "⚠️ لم يتم العثور على تصنيفات من الـ AI، محاولة استخراج من النص...",
+      );
 
-    if (fallbackProvider === "anthropic" && ANTHROPIC_API_KEY) {
-      try {
-        const text = await callAnthropic(systemPrompt, messages);
-        return { text, provider: "anthropic", model: ANTHROPIC_MODEL };
-      } catch (fallbackError: unknown) {
-        const errorMessage = fallbackError instanceof Error
-          ? fallbackError.message
-          : String(fallbackError);
-        throw new Error(
-          `Both providers failed. Last error: ${errorMessage}`,
+      // استخدام دالة findMatchingCategories للبحث في النص الأصلي
+      const extractedCategories = findMatchingCategories(prompt);
+
+      if (extractedCategories.length > 0) {
+        console.log(
+          `✅ تم استخراج ${extractedCategories.length} تصنيف(ات) من النص: ${
+            extractedCategories.join(", ")
+          }`,
         );
+        validCategories.push(...extractedCategories.slice(0, 5)); // أقصى 5 تصنيفات
       }
-    } else if (fallbackProvider === "openai" && OPENAI_API_KEY) {
-      try {
-        const text = await callOpenAI(systemPrompt, messages);
-        return { text, provider: "openai", model: OPENAI_MODEL };
-      } catch (fallbackError: unknown) {
-        const errorMessage = fallbackError instanceof Error
-          ? fallbackError.message
-          : String(fallbackError);
-        throw new Error(
-          `Both providers failed. Last error: ${errorMessage}`,
+    }
+
+    // إذا لا زلنا بدون تصنيفات، نضيف "أخرى" كحل أخير
+    if (validCategories.length === 0) {
+      console.log("⚠️ لم يتم العثور على أي تصنيفات، إضافة 'أخرى' كحل أخير");
+      validCategories.push("أخرى");
+    } else {
+      // إضافة "أخرى" كتصنيف إضافي فقط إذا أرسلها الـ AI وكان هناك تصنيفات أخرى
+      if (hasOtherCategory && validCategories.length < 5) {
+        validCategories.push("أخرى");
+        console.log(
+          `✅ تم العثور على ${validCategories.length} تصنيف(ات) مع إضافة 'أخرى' كاحتياط: ${
+            validCategories.join(", ")
+          }`,
+        );
+      } else {
+        console.log(
+          `✅ تم العثور على ${validCategories.length} تصنيف(ات): ${
+            validCategories.join(", ")
+          }`,
         );
       }
     }
 
-    throw error;
+    parsed.categories = [...new Set(validCategories)]; // إزالة التكرار
+
+    // إزالة الحقول غير المطلوبة
+    delete parsed.uncertainCategories;
+    delete parsed.suggestedCategory;
+    delete parsed.description;
+    delete parsed.budgetMin;
+    delete parsed.budgetMax;
+    delete parsed.deliveryTime;
+    delete parsed.location;
+  }
+
+  return parsed;
+}
+
+// ============================================
+// Response cache + stats
+// ============================================
+// نفس المسودة تُطلب مراراً (إعادة المحاولة، الرجوع للخطوة السابقة، ping الصحة)
+// المفتاح: الوضع + النص المطبّع + hash لتاريخ المحادثة. الذاكرة لكل isolate.
+
+const RESPONSE_CACHE_TTL_MS = Number(Deno.env.get("AI_CACHE_TTL_MS") ?? "") ||
+  10 * 60 * 1000;
+const RESPONSE_CACHE_MAX_ENTRIES = 500;
+
+// Map keeps insertion order: re-inserting on hit makes the first key the LRU one
+const responseCache = new Map<
+  string,
+  { value: Record<string, unknown>; expiresAt: number }
+>();
+
+type ResponseSource = "local" | "cache" | "ai";
+
+const stats = {
+  startedAt: new Date().toISOString(),
+  requests: 0,
+  local: 0,
+  cache: 0,
+  ai: 0,
+  aiLatencyMsTotal: 0,
+  savedMs: 0,
+};
+
+async function sha256Hex(value: string): Promise<string> {
+  const digest = await crypto.subtle.digest(
+    "SHA-256",
+    new TextEncoder().encode(value),
+  );
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+async function responseCacheKey(
+  mode: string,
+  prompt: string,
+  history: ChatMessage[],
+): Promise<string> {
+  const historyHash = history.length > 0
+    ? await sha256Hex(
+      JSON.stringify(history.map((m) => [m.role, normalizeArabicText(m.content)])),
+    )
+    : "";
+  return sha256Hex(`${mode}\n${normalizeArabicText(prompt)}\n${historyHash}`);
+}
+
+function getCachedResponse(key: string): Record<string, unknown> | null {
+  const entry = responseCache.get(key);
+  if (!entry) return null;
+  responseCache.delete(key);
+  if (entry.expiresAt <= Date.now()) return null;
+  responseCache.set(key, entry);
+  return entry.value;
+}
+
+function setCachedResponse(key: string, value: Record<string, unknown>) {
+  responseCache.delete(key);
+  responseCache.set(key, {
+    value,
+    expiresAt: Date.now() + RESPONSE_CACHE_TTL_MS,
+  });
+  while (responseCache.size > RESPONSE_CACHE_MAX_ENTRIES) {
+    responseCache.delete(responseCache.keys().next().value as string);
   }
 }
 
+function averageAiLatencyMs(): number {
+  return stats.ai > 0 ? stats.aiLatencyMsTotal / stats.ai : 0;
+}
+
+function recordResponse(source: ResponseSource, latencyMs: number) {
+  stats.requests++;
+  stats[source]++;
+  if (source === "ai") {
+    stats.aiLatencyMsTotal += latencyMs;
+  } else {
+    stats.savedMs += Math.max(0, averageAiLatencyMs() - latencyMs);
+  }
+}
+
+function extractBearerToken(authHeader: string | null): string | null {
+  if (!authHeader) return null;
+  const parts = authHeader.trim().split(" ");
+  if (parts.length === 2 && parts[0].toLowerCase() === "bearer") {
+    return parts[1];
+  }
+  return authHeader.trim();
+}
+
+function getRoleFromJwt(token: string): string | null {
+  const parts = token.split(".");
+  if (parts.length < 2) return null;
+  try {
+    const payload = JSON.parse(
+      atob(parts[1].replace(/-/g, "+").replace(/_/g, "/")),
+    );
+    return payload?.role ??
+      payload?.["https://supabase.io/jwt/claims"]?.role ?? null;
+  } catch {
+    return null;
+  }
+}
+
+// verify_jwt = true (config.toml): the gateway has already verified the JWT
+function isServiceRole(authHeader: string | null): boolean {
+  const token = extractBearerToken(authHeader);
+  if (!token) return false;
+  if (supabaseServiceKey && token === supabaseServiceKey) return true;
+  return getRoleFromJwt(token) === "service_role";
+}
+
+function statsSnapshot() {
+  const rate = (n: number) =>
+    stats.requests > 0 ? Math.round((n / stats.requests) * 1000) / 10 : 0;
+  return {
+    startedAt: stats.startedAt,
+    requests: stats.requests,
+    localHits: stats.local,
+    cacheHits: stats.cache,
+    aiCalls: stats.ai,
+    localHitRatePct: rate(stats.local),
+    cacheHitRatePct: rate(stats.cache),
+    avgAiLatencyMs: Math.round(averageAiLatencyMs()),
+    latencySavedMs: Math.round(stats.savedMs),
+    cacheEntries: responseCache.size,
+    providers: routingSnapshot(),
+  };
+}
+
 Deno.serve(async (req) => {
   if (req.method === "OPTIONS") return res({ ok: true });
+  // إحصائيات الكاش والمصنف المحلي لهذا الـ isolate
+  // Stats (cache / classifier / router) - service_role only
+  if (req.method === "GET") {
+    if (!isServiceRole(req.headers.get("Authorization"))) {
+      return res({ error: "Forbidden" }, 403);
+    }
+    return res(statsSnapshot());
+  }
+
+  const startedAt = Date.now();
 
   try {
     let body;
@@ -919,12 +1002,71 @@ Deno.serve(async (req) => {
       );
     }
 
-    const { prompt, mode = "chat", history = [], chatHistory = [] } = body;
+    const {
+      prompt,
+      mode = "chat",
+      history = [],
+      chatHistory = [],
+      stream = false,
+    } = body;
     if (!prompt) return res({ error: "prompt required" }, 400);
 
+    // رد جاهز (كاش / محلي): JSON عادي، أو delta + draft في وضع البث
+    const reply = (payload: Record<string, unknown>) => {
+      if (!stream) return res(payload);
+      return sse(async (send) => {
+        const text = payload[STREAM_TEXT_FIELD[mode] || "aiResponse"];
+        if (typeof text === "string" && text) send("delta", { text });
+        send("draft", payload);
+      });
+    };
+
     // استخدام chatHistory إذا كان متوفراً، وإلا history (للتوافق مع الكود القديم)
     const conversationHistory = chatHistory.length > 0 ? chatHistory : history;
 
+    // تحويل chatHistory إلى تنسيق Claude
+    interface HistoryMessage {
+      role: string;
+      text?: string;
+      parts?: { text?: string }[];
+    }
+    const claudeMessages: ChatMessage[] = conversationHistory.map((
+      msg: HistoryMessage,
+    ) => ({
+      role: msg.role === "ai" ? "assistant" : "user",
+      content: msg.text || msg.parts?.[0]?.text || "",
+    }));
+
+    // 1. نفس الطلب خلال الـ TTL → من الكاش
+    const cacheKey = await responseCacheKey(mode, prompt, claudeMessages);
+    const cached = getCachedResponse(cacheKey);
+    if (cached) {
+      recordResponse("cache", Date.now() - startedAt);
+      return reply({
+        ...cached,
+        source: "cache",
+        timestamp: new Date().toISOString(),
+      });
+    }
+
+    // 2. مسودة أول رسالة قصيرة وواضحة → تصنيف محلي بدون AI
+    if (mode === "draft" && claudeMessages.length === 0) {
+      const localDraft = buildLocalDraft(prompt);
+      if (localDraft) {
+        setCachedResponse(cacheKey, localDraft);
+        recordResponse("local", Date.now() - startedAt);
+        console.log(
+          `⚡ local draft: ${localDraft.categories.join(", ")}`,
+          statsSnapshot(),
+        );
+        return reply({
+          ...localDraft,
+          source: "local",
+          timestamp: new Date().toISOString(),
+        });
+      }
+    }
+
     if (!ANTHROPIC_API_KEY && !OPENAI_API_KEY) {
       console.error("❌ No AI provider configured!");
       console.error(
@@ -1042,11 +1184,13 @@ Deno.serve(async (req) => {
 
 أجب بـ JSON فقط بهذا التنسيق (بدون أي نص آخر):
 {
+  "aiResponse": "جملة واحدة قصيرة وودودة للعميل تؤكد فهمك لطلبه",
   "title": "عنوان مختصر يبدأ بـ 'مطلوب' أو 'أبغى' - لا تنسخ النص المدخل حرفياً!",
   "categories": ["فئة1", "فئة2", "فئة3", ...]
 }
 
 ملاحظات مهمة:
+- **"aiResponse"**: اكتبه أولاً - يظهر للعميل أثناء تجهيز المسودة
 - **"title"**: عنوان مختصر (5-10 كلمات) يبدأ بكلمة طلبية - لا تنسخ النص المدخل حرفياً!
 - **"categories"**: قائمة التصنيفات (2-5 تصنيفات في معظم الحالات) من القائمة أعلاه
   ⚠️ **مهم جداً**: اختر تصنيفات متعددة! لا تكتفي بتصنيف واحد إلا إذا كان الطلب بسيط جداً
@@ -1056,7 +1200,7 @@ Deno.serve(async (req) => {
   - "موقع إلكتروني مع تطبيق" → ["تطوير مواقع", "تطبيقات جوال"]
   - "تنظيف مكتب" → ["تنظيف مكاتب"] (تصنيف واحد كافٍ)
 - لا تستخرج ميزانية، موقع، أو مدة تنفيذ - هذه الحقول غير مطلوبة
-- لا تعيد صياغة الوصف - فقط العنوان والتصنيفات`;
+- لا تعيد صياغة الوصف - فقط الرد القصير والعنوان والتصنيفات`;
     } else {
       // Default Chat Mode (original behavior)
       systemInstruction = `أنت مساعد ذكي لمنصة "أبيلي" (منصة طلبات خدمات).
@@ -1066,163 +1210,85 @@ Deno.serve(async (req) => {
 
 أجب بـ JSON فقط:
 {
+  "response_to_user": "ردك للمستخدم",
   "title": "عنوان الطلب",
   "city": "المدينة",
   "description_brief": "وصف مختصر",
-  "response_to_user": "ردك للمستخدم",
   "is_ready_to_send": boolean
 }`;
     }
 
-    // تحويل chatHistory إلى تنسيق Claude
-    interface HistoryMessage {
-      role: string;
-      text?: string;
-      parts?: { text?: string }[];
-    }
-    const claudeMessages: ChatMessage[] = conversationHistory.map((
-      msg: HistoryMessage,
-    ) => ({
-      role: msg.role === "ai" ? "assistant" : "user",
-      content: msg.text || msg.parts?.[0]?.text || "",
-    }));
-
     // إضافة الرسالة الحالية
     claudeMessages.push({
       role: "user",
       content: prompt,
     });
 
-    // استدعاء AI (Anthropic أو OpenAI)
-    const { text: rawOutput, provider, model } = await callAI(
-      systemInstruction,
-      claudeMessages,
-    );
-    console.log(`✅ ${provider} (${model}) response received`);
-
-    // محاولة استخراج JSON
-    let parsed;
-    try {
-      // Try to extract JSON from response
-      const jsonMatch = rawOutput.match(/\{[\s\S]*\}/) ||
-        rawOutput.match(/```json\s*([\s\S]*?)```/);
-      const jsonStr = jsonMatch ? (jsonMatch[1] || jsonMatch[0]) : rawOutput;
-      parsed = JSON.parse(jsonStr.trim());
-    } catch (_e) {
-      console.warn("Failed to parse JSON, using raw output");
-      parsed = {
-        aiResponse: rawOutput,
-        isClarification: true,
-      };
-    }
-
-    // معالجة التصنيفات في وضع draft
-    if (mode === "draft") {
-      const validCategories: string[] = [];
-      let hasOtherCategory = false;
-
-      // دالة لتنظيف التصنيف من علامات الاستفهام والنصوص الغريبة
-      const cleanCategory = (cat: string): string => {
-        if (!cat) return cat;
-        let cleaned = cat.replace(/[؟?؟]/g, "").trim();
-        cleaned = cleaned.split(/[؟?؟]/)[0].trim();
-        cleaned = cleaned.replace(/\s+/g, " ").trim();
-        return cleaned;
-      };
-
-      // معالجة التصنيفات من الـ AI
-      if (parsed.categories && Array.isArray(parsed.categories)) {
-        for (const cat of parsed.categories) {
-          const cleanedCat = cleanCategory(cat);
-          if (!cleanedCat) continue;
-
-          // تسجيل إذا كان التصنيف "أخرى" (سنضيفه لاحقاً إذا لزم)
-          if (
-            cleanedCat.toLowerCase() === "أخرى" ||
-            cleanedCat.toLowerCase() === "other"
-          ) {
-            hasOtherCategory = true;
-            continue;
-          }
-
-          // محاولة إيجاد أفضل تطابق
-          const bestMatch = findBestMatchingCategory(cleanedCat);
-
-          if (bestMatch) {
-            // إضافة التصنيف المطابق
-            if (!validCategories.includes(bestMatch.label)) {
-              validCategories.push(bestMatch.label);
+    // 3a. بث: نرسل نص الرد أثناء توليده، والحقول المنظمة بعد اكتمالها
+    if (stream) {
+      const textField = STREAM_TEXT_FIELD[mode] || "aiResponse";
+      return sse(async (send) => {
+        const aiStartedAt = Date.now();
+        let raw = "";
+        let sentLength = 0;
+        let firstTokenMs = 0;
+
+        const { provider, model, text: rawOutput, routing } = await streamAI(
+          systemInstruction,
+          claudeMessages,
+          (chunk) => {
+            if (!firstTokenMs) firstTokenMs = Date.now() - aiStartedAt;
+            raw += chunk;
+            const partial = partialJsonStringField(raw, textField);
+            if (partial && partial.length > sentLength) {
+              send("delta", { text: partial.slice(sentLength) });
+              sentLength = partial.length;
             }
-          } else if (isKnownCategory(cleanedCat)) {
-            // إذا لم نجد تطابقاً جيداً، نتحقق من التصنيفات المعروفة
-            const matchedCat = FIXED_CATEGORIES.find((fc) =>
-              fc.label.toLowerCase() === cleanedCat.toLowerCase() ||
-              fc.label.toLowerCase().includes(cleanedCat.toLowerCase()) ||
-              cleanedCat.toLowerCase().includes(fc.label.toLowerCase())
-            );
-            if (matchedCat && !validCategories.includes(matchedCat.label)) {
-              validCategories.push(matchedCat.label);
-            }
-          }
-          // إذا لم نجد تطابقاً، نتجاهل التصنيف (لن نضيف تصنيفات غير معروفة)
-        }
-      }
-
-      // إذا لم يكن هناك تصنيفات صحيحة، نحاول استخراج تصنيفات من النص مباشرة
-      if (validCategories.length === 0) {
+          },
+          req.signal,
+        );
+        const aiLatencyMs = Date.now() - aiStartedAt;
         console.log(
-          "⚠️ لم يتم العثور على تصنيفات من الـ AI، محاولة استخراج من النص...",
+          `✅ ${provider} (${model}) streamed: first token ${firstTokenMs}ms, total ${aiLatencyMs}ms`,
         );
 
-        // استخدام دالة findMatchingCategories للبحث في النص الأصلي
-        const extractedCategories = findMatchingCategories(prompt);
-
-        if (extractedCategories.length > 0) {
-          console.log(
-            `✅ تم استخراج ${extractedCategories.length} تصنيف(ات) من النص: ${
-              extractedCategories.join(", ")
-            }`,
-          );
-          validCategories.push(...extractedCategories.slice(0, 5)); // أقصى 5 تصنيفات
+        const parsed = finalizeOutput(rawOutput, mode, prompt);
+        // لم يكن JSON: النص الخام هو الرد - نرسل ما لم يُبث منه بعد
+        if (parsed.isClarification && sentLength === 0 && rawOutput) {
+          send("delta", { text: rawOutput });
         }
-      }
+        if (!parsed.isClarification) setCachedResponse(cacheKey, parsed);
+        recordResponse("ai", aiLatencyMs);
+
+        send("draft", {
+          ...parsed,
+          source: "ai",
+          routing,
+          timestamp: new Date().toISOString(),
+        });
+      });
+    }
 
-      // إذا لا زلنا بدون تصنيفات، نضيف "أخرى" كحل أخير
-      if (validCategories.length === 0) {
-        console.log("⚠️ لم يتم العثور على أي تصنيفات، إضافة 'أخرى' كحل أخير");
-        validCategories.push("أخرى");
-      } else {
-        // إضافة "أخرى" كتصنيف إضافي فقط إذا أرسلها الـ AI وكان هناك تصنيفات أخرى
-        if (hasOtherCategory && validCategories.length < 5) {
-          validCategories.push("أخرى");
-          console.log(
-            `✅ تم العثور على ${validCategories.length} تصنيف(ات) مع إضافة 'أخرى' كاحتياط: ${
-              validCategories.join(", ")
-            }`,
-          );
-        } else {
-          console.log(
-            `✅ تم العثور على ${validCategories.length} تصنيف(ات): ${
-              validCategories.join(", ")
-            }`,
-          );
-        }
-      }
+    // 3b. استدعاء AI (Anthropic أو OpenAI)
+    const aiStartedAt = Date.now();
+    const { text: rawOutput, provider, model, routing } = await callAI(
+      systemInstruction,
+      claudeMessages,
+      req.signal,
+    );
+    const aiLatencyMs = Date.now() - aiStartedAt;
+    console.log(`✅ ${provider} (${model}) response received in ${aiLatencyMs}ms`);
 
-      parsed.categories = [...new Set(validCategories)]; // إزالة التكرار
+    const parsed = finalizeOutput(rawOutput, mode, prompt);
 
-      // إزالة الحقول غير المطلوبة
-      delete parsed.uncertainCategories;
-      delete parsed.suggestedCategory;
-      delete parsed.description;
-      delete parsed.budgetMin;
-      delete parsed.budgetMax;
-      delete parsed.deliveryTime;
-      delete parsed.location;
-    }
+    // ردود غير قابلة للتحليل لا تُخزّن - المحاولة التالية قد تنجح
+    if (!parsed.isClarification) setCachedResponse(cacheKey, parsed);
+    recordResponse("ai", aiLatencyMs);
 
     return res({
       ...parsed,
+      source: "ai",
+      routing,
       timestamp: new Date().toISOString(),
     });
   } catch (e) {
@@ -0,0 +1,65 @@
+// deno test supabase/functions/ai-chat/localClassifier.test.ts
+import { assert, assertEquals } from "jsr:@std/assert@1";
+import { FIXED_CATEGORIES } from "./categories.ts";
+import { normalizeArabicText } from "../_shared/arabicText.ts";
+import { createLocalClassifier } from "./localClassifier.ts";
+
+const classifier = createLocalClassifier(FIXED_CATEGORIES);
+
+Deno.test("single keywords are not confident enough to skip the model", () => {
+  for (
+    const prompt of [
+      "ابي احد يصلح جوالي",
+      "شراء ايفون",
+      "ابي سيارة",
+      "تطوير",
+    ]
+  ) {
+    assertEquals(classifier.buildDraft(prompt), null, prompt);
+  }
+});
+
+Deno.test("negated requests go to the model", () => {
+  for (
+    const prompt of [
+      "لا ابي صيانة مكيف",
+      "مو صيانة سيارات",
+      "ما ابي تصميم جرافيك",
+    ]
+  ) {
+    assertEquals(classifier.buildDraft(prompt), null, prompt);
+  }
+});
+
+Deno.test("a category label is enough for a local draft", () => {
+  const draft = classifier.buildDraft("ابي تصميم جرافيك");
+  assert(draft);
+  assertEquals(draft.categories[0], "تصميم جرافيك");
+  assert(draft.aiResponse.length > 0);
+});
+
+Deno.test("local titles are built from the category, not copied", () => {
+  const prompt = "صيانة سيارات";
+  const draft = classifier.buildDraft(prompt);
+  assert(draft);
+  assert(draft.title.startsWith("مطلوب"));
+  assert(draft.title !== prompt && draft.title !== `مطلوب ${prompt}`);
+});
+
+Deno.test("long prompts are left to the model", () => {
+  assertEquals(
+    classifier.buildDraft(
+      "ابي تصميم جرافيك لشعار شركتي الجديدة مع هوية كاملة وألوان مناسبة",
+    ),
+    null,
+  );
+});
+
+Deno.test("normalizeArabicText folds diacritics and letter forms", () => {
+  assertEquals(normalizeArabicText("مَكّة المُكرّمة؟"), "مكه المكرمه");
+  assertEquals(normalizeArabicText("إضاءة"), "اضاءه");
+});
+
+Deno.test("normalizeArabicText folds hamza carriers and punctuation", () => {
+  assertEquals(normalizeArabicText("مؤسسة، رئيسية!"), "موسسه ريسيه");
+});
@@ -0,0 +1,196 @@
+// ============================================
+// Local classifier (فهرس كلمات مفتاحية مع تطبيع عربي)
+// ============================================
+// طلب قصير مثل "صيانة مكيف" أو "تصميم شعار" لا يحتاج رحلة كاملة للـ AI:
+// الكلمات المفتاحية في FIXED_CATEGORIES تكفي. نبني فهرساً معكوساً مرة واحدة
+// (كلمة مطبّعة → تصنيفات) ونصنّف محلياً عندما تكون الثقة عالية فقط:
+// - تطابق اسم التصنيف أو عبارة من كلمتين فأكثر، أو مجموع نقاط >= LOCAL_MIN_SCORE
+//   (كلمة واحدة مثل "جوال" أو "سيارة" لا تكفي - "يصلح جوالي" ليس تطبيقات جوال)
+// - لا نفي في الطلب ("لا ابي صيانة مكيف")
+// غير ذلك يذهب للـ AI.
+
+import { normalizeArabicText } from "../_shared/arabicText.ts";
+
+export interface KeywordCategory {
+  id: string;
+  label: string;
+  keywords: string[];
+}
+
+export interface LocalClassification {
+  categories: string[];
+  confident: boolean;
+  topScore: number;
+}
+
+export interface LocalDraft {
+  aiResponse: string;
+  title: string;
+  categories: string[];
+}
+
+export interface LocalClassifier {
+  classify(text: string): LocalClassification;
+  /** Draft without the model, or null when the prompt is not clear-cut */
+  buildDraft(prompt: string): LocalDraft | null;
+}
+
+// ال التعريف وحروف العطف/الجر الملتصقة
+const ARABIC_PREFIXES = ["وال", "بال", "فال", "كال", "لل", "ال", "و", "ب", "ل"];
+// جمع / تأنيث / نسبة (كاميرات ↔ كاميرا، تطبيقات ↔ تطبيق)
+const ARABIC_SUFFIXES = ["ات", "ين", "ون", "ه", "ي", "ا"];
+// نفي: المعنى عكس الكلمات المفتاحية
+const NEGATIONS = new Set(["لا", "مو", "ما", "مب", "مش", "ليس", "بدون", "غير"]);
+
+// Without a label/phrase match, single keywords must add up to this
+const LOCAL_MIN_SCORE = 2;
+// Top category must beat the runner-up by this factor
+const LOCAL_MIN_MARGIN = 2;
+// Longer prompts carry nuance the keywords miss - leave them to the AI
+const LOCAL_MAX_WORDS = 8;
+
+function tokenize(text: string): string[] {
+  const normalized = normalizeArabicText(text);
+  return normalized ? normalized.split(" ") : [];
+}
+
+/** The token and its stems without plural/feminine suffixes */
+function suffixVariants(token: string): string[] {
+  const variants = [token];
+  for (const suffix of ARABIC_SUFFIXES) {
+    if (token.endsWith(suffix) && token.length - suffix.length >= 3) {
+      variants.push(token.slice(0, -suffix.length));
+    }
+  }
+  return variants;
+}
+
+/** Forms a prompt word may stand for: itself, without prefixes, without suffixes */
+function textVariants(token: string): string[] {
+  const bases = [token];
+  for (const prefix of ARABIC_PREFIXES) {
+    if (token.startsWith(prefix) && token.length - prefix.length >= 3) {
+      bases.push(token.slice(prefix.length));
+    }
+  }
+  return [...new Set(bases.flatMap(suffixVariants))];
+}
+
+interface KeywordEntry {
+  categoryIndex: number;
+  /** Normalized keyword, counted once per category */
+  key: string;
+  /** Remaining words of a multi-word keyword ("صيانة كمبيوتر") */
+  rest: string[][];
+  weight: number;
+  /** Category label or a multi-word phrase - enough on its own */
+  strong: boolean;
+}
+
+export function createLocalClassifier(
+  categories: readonly KeywordCategory[],
+): LocalClassifier {
+  // stem of a keyword's first word → entries
+  const index = new Map<string, KeywordEntry[]>();
+  const documentFrequency = new Map<string, Set<number>>();
+  const labelKeys = new Set<string>();
+
+  categories.forEach((cat, categoryIndex) => {
+    // The label itself is the strongest keyword ("تصميم جرافيك")
+    labelKeys.add(tokenize(cat.label).join(" "));
+    for (const keyword of [cat.label, ...cat.keywords]) {
+      const key = tokenize(keyword).join(" ");
+      if (!key) continue;
+      if (!documentFrequency.has(key)) documentFrequency.set(key, new Set());
+      documentFrequency.get(key)!.add(categoryIndex);
+    }
+  });
+
+  for (const [key, matches] of documentFrequency) {
+    const [head, ...rest] = key.split(" ");
+    // Keywords shared by many categories ("رعاية", "تصميم") weigh less;
+    // phrases weigh more than single words
+    const weight = (1 + rest.length) / matches.size;
+    for (const categoryIndex of matches) {
+      const entry: KeywordEntry = {
+        categoryIndex,
+        key,
+        rest: rest.map(suffixVariants),
+        weight,
+        strong: rest.length > 0 || labelKeys.has(key),
+      };
+      for (const variant of suffixVariants(head)) {
+        const entries = index.get(variant) || [];
+        entries.push(entry);
+        index.set(variant, entries);
+      }
+    }
+  }
+
+  const classify = (text: string): LocalClassification => {
+    const variants = tokenize(text).map(textVariants);
+    const scores = new Map<number, number>();
+    const strong = new Set<number>();
+    const counted = new Set<string>();
+
+    variants.forEach((forms, position) => {
+      for (const form of forms) {
+        for (const entry of index.get(form) || []) {
+          // Count each keyword once per category, however often it repeats
+          const countedKey = `${entry.categoryIndex}:${entry.key}`;
+          if (counted.has(countedKey)) continue;
+          const matched = entry.rest.every((stems, offset) =>
+            (variants[position + 1 + offset] || []).some((f) =>
+              stems.includes(f)
+            )
+          );
+          if (!matched) continue;
+          counted.add(countedKey);
+          if (entry.strong) strong.add(entry.categoryIndex);
+          scores.set(
+            entry.categoryIndex,
+            (scores.get(entry.categoryIndex) || 0) + entry.weight,
+          );
+        }
+      }
+    });
+
+    const ranked = [...scores.entries()]
+      .filter(([categoryIndex]) => categories[categoryIndex].id !== "other")
+      .sort((a, b) => b[1] - a[1]);
+    const [topIndex, topScore] = ranked[0] || [-1, 0];
+    const secondScore = ranked[1]?.[1] || 0;
+
+    return {
+      categories: ranked
+        .filter(([, score]) => score >= topScore / 2)
+        .slice(0, 5)
+        .map(([categoryIndex]) => categories[categoryIndex].label),
+      confident: topScore > 0 &&
+        (strong.has(topIndex) || topScore >= LOCAL_MIN_SCORE) &&
+        topScore >= secondScore * LOCAL_MIN_MARGIN,
+      topScore,
+    };
+  };
+
+  /**
+   * مسودة بدون AI: للطلبات القصيرة الواضحة فقط (أول رسالة، ثقة عالية).
+   * العنوان مبني من التصنيف لا من نص العميل (قاعدة "لا تنسخ النص المدخل")
+   */
+  const buildDraft = (prompt: string): LocalDraft | null => {
+    const words = tokenize(prompt);
+    if (words.length === 0 || words.length > LOCAL_MAX_WORDS) return null;
+    if (words.some((word) => NEGATIONS.has(word))) return null;
+
+    const { categories: matched, confident } = classify(prompt);
+    if (!confident || matched.length === 0) return null;
+
+    return {
+      aiResponse: `أبشر، جهزت لك مسودة طلب في ${matched[0]}`,
+      title: `مطلوب خدمة ${matched[0]}`,
+      categories: matched,
+    };
+  };
+
+  return { classify, buildDraft };
+}
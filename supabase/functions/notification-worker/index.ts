@@ -0,0 +1,305 @@
+// @ts-ignore - Supabase Edge Runtime types
+import "jsr:@supabase/functions-js/edge-runtime.d.ts";
+import { createClient } from "https://esm.sh/@supabase/supabase-js@2.39.3";
+
+// ==========================================
+// notification-worker
+// يفرّغ طابور notification_jobs (NOTIFICATION_JOBS_SCHEMA.sql):
+// 1. interest_fanout: توزيع إشعارات الاهتمام داخل SQL (run_interest_fanout_jobs)
+// 2. push: إرسال FCM عبر send-push-notification بحد أقصى JOBS_PER_SECOND
+//    وJOB_CONCURRENCY بالتوازي، مع إعادة المحاولة وdead-letter في SQL
+// يُستدعى من pg_cron (أو يدوياً) بمفتاح service_role فقط.
+// ==========================================
+
+const SUPABASE_URL = Deno.env.get("SUPABASE_URL") ?? "";
+const SUPABASE_SERVICE_ROLE_KEY = Deno.env.get("SUPABASE_SERVICE_ROLE_KEY") ??
+  "";
+
+// Limits (overridable per deployment)
+const JOB_BATCH_SIZE = Number(Deno.env.get("NOTIFICATION_JOB_BATCH_SIZE") ?? "") ||
+  50;
+const JOB_CONCURRENCY = Number(Deno.env.get("NOTIFICATION_JOB_CONCURRENCY") ?? "") ||
+  5;
+// send-push-notification itself fans out to FCM - keep the job rate modest
+const JOBS_PER_SECOND = Number(Deno.env.get("NOTIFICATION_JOBS_PER_SECOND") ?? "") ||
+  10;
+// Stop claiming new work before the edge function wall-clock limit
+const TIME_BUDGET_MS = Number(Deno.env.get("NOTIFICATION_WORKER_BUDGET_MS") ?? "") ||
+  50_000;
+const PUSH_TIMEOUT_MS = 30_000;
+
+const corsHeaders = {
+  "Access-Control-Allow-Origin": "*",
+  "Access-Control-Allow-Headers":
+    "authorization, x-client-info, apikey, content-type",
+};
+
+const supabaseAdmin = createClient(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, {
+  auth: { persistSession: false },
+});
+
+function jsonResponse(payload: unknown, status = 200) {
+  return new Response(JSON.stringify(payload), {
+    status,
+    headers: {
+      ...corsHeaders,
+      "Content-Type": "application/json",
+    },
+  });
+}
+
+function extractBearerToken(authHeader: string | null): string | null {
+  if (!authHeader) return null;
+  const parts = authHeader.trim().split(" ");
+  if (parts.length === 2 && parts[0].toLowerCase() === "bearer") {
+    return parts[1];
+  }
+  return authHeader.trim();
+}
+
+function getRoleFromJwt(token: string): string | null {
+  const parts = token.split(".");
+  if (parts.length < 2) return null;
+  try {
+    const payload = JSON.parse(
+      atob(parts[1].replace(/-/g, "+").replace(/_/g, "/")),
+    );
+    return payload?.role ??
+      payload?.["https://supabase.io/jwt/claims"]?.role ?? null;
+  } catch {
+    return null;
+  }
+}
+
+function isServiceRole(authHeader: string | null): boolean {
+  const token = extractBearerToken(authHeader);
+  if (!token) return false;
+  if (token === SUPABASE_SERVICE_ROLE_KEY) return true;
+  return getRoleFromJwt(token) === "service_role";
+}
+
+const sleep = (ms: number) => new Promise((r) => setTimeout(r, ms));
+
+// ==========================================
+// Rate limit (token bucket shared by all in-flight jobs)
+// ==========================================
+
+function createRateLimiter(perSecond: number) {
+  let tokens = perSecond;
+  let last = Date.now();
+  return async function take(): Promise<void> {
+    for (;;) {
+      const now = Date.now();
+      tokens = Math.min(perSecond, tokens + ((now - last) / 1000) * perSecond);
+      last = now;
+      if (tokens >= 1) {
+        tokens -= 1;
+        return;
+      }
+      await sleep(Math.ceil(((1 - tokens) / perSecond) * 1000));
+    }
+  };
+}
+
+// ==========================================
+// Jobs
+// ==========================================
+
+interface NotificationJob {
+  id: number;
+  kind: string;
+  payload: Record<string, unknown>;
+  attempts: number;
+  max_attempts: number;
+}
+
+type JobOutcome =
+  | { ok: true }
+  | { ok: false; error: string; permanent: boolean; retryAfter?: number };
+
+interface WorkerReport {
+  processed: number;
+  succeeded: number;
+  retried: number;
+  dead: number;
+  interestNotifications: number;
+  durationMs: number;
+  jobsPerSecond: number;
+}
+
+/**
+ * Run one push job through send-push-notification (audience, copy and FCM
+ * fan-out stay there). 4xx = bad payload, never retried; 429/5xx/network
+ * and "nothing delivered" are retried with backoff.
+ */
+async function runPushJob(job: NotificationJob): Promise<JobOutcome> {
+  const controller = new AbortController();
+  const timer = setTimeout(() => controller.abort(), PUSH_TIMEOUT_MS);
+  try {
+    const response = await fetch(
+      `${SUPABASE_URL}/functions/v1/send-push-notification`,
+      {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${SUPABASE_SERVICE_ROLE_KEY}`,
+        },
+        body: JSON.stringify(job.payload),
+        signal: controller.signal,
+      },
+    );
+    const text = await response.text();
+
+    if (!response.ok) {
+      const retryAfter = Number(response.headers.get("retry-after"));
+      return {
+        ok: false,
+        error: `HTTP ${response.status}: ${text.slice(0, 500)}`,
+        permanent: response.status < 500 && response.status !== 429,
+        retryAfter: Number.isFinite(retryAfter) && retryAfter > 0
+          ? retryAfter
+          : undefined,
+      };
+    }
+
+    let result: { sent?: number; failed?: number } = {};
+    try {
+      result = JSON.parse(text);
+    } catch {
+      // Non-JSON 2xx - treat as delivered
+    }
+    if ((result.failed ?? 0) > 0 && (result.sent ?? 0) === 0) {
+      return {
+        ok: false,
+        error: `All ${result.failed} FCM sends failed`,
+        permanent: false,
+      };
+    }
+    return { ok: true };
+  } catch (error) {
+    return { ok: false, error: String(error), permanent: false };
+  } finally {
+    clearTimeout(timer);
+  }
+}
+
+async function processPushJobs(
+  workerId: string,
+  deadline: number,
+  report: WorkerReport,
+): Promise<void> {
+  const takeRateToken = createRateLimiter(JOBS_PER_SECOND);
+
+  while (Date.now() < deadline) {
+    const { data, error } = await supabaseAdmin.rpc("claim_notification_jobs", {
+      p_worker: workerId,
+      p_kinds: ["push"],
+      p_limit: JOB_BATCH_SIZE,
+    });
+    if (error) {
+      console.error("Error claiming push jobs:", error);
+      return;
+    }
+    const jobs = (data || []) as NotificationJob[];
+    if (jobs.length === 0) return;
+
+    const completed: number[] = [];
+    let next = 0;
+    const workers = Array.from(
+      { length: Math.min(JOB_CONCURRENCY, jobs.length) },
+      async () => {
+        while (next < jobs.length) {
+          const job = jobs[next++];
+          await takeRateToken();
+          const outcome = await runPushJob(job);
+          report.processed++;
+
+          if (outcome.ok) {
+            completed.push(job.id);
+            report.succeeded++;
+            continue;
+          }
+
+          const { data: status, error: failError } = await supabaseAdmin.rpc(
+            "fail_notification_job",
+            {
+              p_id: job.id,
+              p_error: outcome.error,
+              p_retry_after_seconds: outcome.retryAfter ?? null,
+              p_permanent: outcome.permanent,
+            },
+          );
+          if (failError) {
+            // The stale-lock sweep in claim_notification_jobs picks it up later
+            console.error(`Error failing job ${job.id}:`, failError);
+          } else if (status === "dead") {
+            report.dead++;
+            console.warn(`☠️ Push job ${job.id} dead-lettered:`, outcome.error);
+          } else {
+            report.retried++;
+          }
+        }
+      },
+    );
+    await Promise.all(workers);
+
+    if (completed.length > 0) {
+      const { error: completeError } = await supabaseAdmin.rpc(
+        "complete_notification_jobs",
+        { p_ids: completed },
+      );
+      if (completeError) {
+        console.error("Error completing push jobs:", completeError);
+      }
+    }
+  }
+}
+
+Deno.serve(async (req) => {
+  if (req.method === "OPTIONS") {
+    return new Response(null, { headers: corsHeaders });
+  }
+
+  if (!SUPABASE_URL || !SUPABASE_SERVICE_ROLE_KEY) {
+    return jsonResponse({ error: "Missing Supabase environment variables" }, 500);
+  }
+
+  if (!isServiceRole(req.headers.get("Authorization"))) {
+    return jsonResponse({ error: "Forbidden" }, 403);
+  }
+
+  const startedAt = Date.now();
+  const deadline = startedAt + TIME_BUDGET_MS;
+  const workerId = `edge:${crypto.randomUUID()}`;
+  const report: WorkerReport = {
+    processed: 0,
+    succeeded: 0,
+    retried: 0,
+    dead: 0,
+    interestNotifications: 0,
+    durationMs: 0,
+    jobsPerSecond: 0,
+  };
+
+  // 1. Interest fan-out in SQL - also enqueues the matching push jobs
+  const { data: notified, error: fanoutError } = await supabaseAdmin.rpc(
+    "run_interest_fanout_jobs",
+    { p_worker: workerId, p_limit: 500 },
+  );
+  if (fanoutError) {
+    console.error("Error running interest fan-out jobs:", fanoutError);
+  } else {
+    report.interestNotifications = Number(notified) || 0;
+  }
+
+  // 2. Push jobs until the queue is empty or the time budget runs out
+  await processPushJobs(workerId, deadline, report);
+
+  report.durationMs = Date.now() - startedAt;
+  report.jobsPerSecond = report.durationMs > 0
+    ? Math.round((report.processed / report.durationMs) * 1000 * 10) / 10
+    : 0;
+
+  console.log("📬 notification-worker:", report);
+  return jsonResponse({ success: true, ...report });
+});
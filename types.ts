@@ -21,6 +21,7 @@ export interface Request {
   deliveryTimeTo?: string;
   seriousness?: number; // 1 منخفض - 5 مرتفع جداً
   images?: string[]; // Changed from single image to array
+  imageVariants?: Record<string, ImageVariants>; // مفتاحها رابط الصورة في images
   // Contact method preferences
   contactMethod?: "whatsapp" | "chat" | "both";
   whatsappNumber?: string;
@@ -43,6 +44,14 @@ export interface Request {
   offersCount?: number;
 }
 
+// نسخ مصغرة لصورة طلب (REQUEST_IMAGE_VARIANTS.sql)
+export interface ImageVariants {
+  srcset: Array<{ width: number; url: string }>; // أصغر عرض أولاً
+  blurhash?: string;
+  width?: number;
+  height?: number;
+}
+
 export interface Offer {
   id: string;
   requestId: string;
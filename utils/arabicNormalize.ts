@@ -0,0 +1,47 @@
+/**
+ * Arabic text normalization
+ * توحيد النص العربي للمقارنة: إزالة التشكيل والتطويل وتوحيد أشكال الحروف
+ *
+ * normalizeArabic is the shared normalizer of the Edge Functions
+ * (supabase/functions/_shared/arabicText.ts), so a query matches the same way
+ * in the app and in ai-chat.
+ * normalizeCityKey must stay in sync with normalize_city_key() in
+ * supabase/FIX_INTEREST_NOTIFICATIONS.sql (stored in generated columns).
+ */
+import { normalizeArabicText } from "../supabase/functions/_shared/arabicText.ts";
+
+// City keys only - the same folds as normalize_city_key() in SQL:
+// تشكيل (U+064B..U+065F) + ألف خنجرية (U+0670) + تطويل (U+0640)
+const CITY_KEY_DIACRITICS_REGEX = /[ً-ٰٟـ]/g;
+
+const CITY_KEY_FOLDS: Record<string, string> = {
+  "أ": "ا",
+  "إ": "ا",
+  "آ": "ا",
+  "ٱ": "ا",
+  "ة": "ه",
+  "ى": "ي",
+};
+
+const CITY_KEY_FOLDS_REGEX = /[أإآٱةى]/g;
+
+/**
+ * Normalize Arabic/English text for comparison
+ * "مَكَّة  المكرّمة؟" -> "مكه المكرمه"
+ */
+export const normalizeArabic = (text: string): string => normalizeArabicText(text);
+
+/**
+ * Normalize a city name or a full location to a comparable key
+ * "حي النرجس، الرياض" -> "الرياض" ، "إبها" -> "ابها"
+ */
+export const normalizeCityKey = (city: string | null | undefined): string | null => {
+  if (!city) return null;
+  const lastSegment = city.split(/[،,]/).pop() || "";
+  const key = lastSegment
+    .toLowerCase()
+    .replace(CITY_KEY_DIACRITICS_REGEX, "")
+    .replace(CITY_KEY_FOLDS_REGEX, (ch) => CITY_KEY_FOLDS[ch] || ch)
+    .replace(/\s/g, "");
+  return key || null;
+};
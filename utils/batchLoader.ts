@@ -0,0 +1,81 @@
+/**
+ * Micro-batched loader
+ * يجمع الطلبات المتزامنة على نفس الجدول في استعلام واحد `.in("id", [...])`
+ *
+ * load("a"); load("b"); load("a")  ->  batchFn(["a", "b"]) مرة واحدة
+ *
+ * - المفاتيح المكررة داخل نفس الدفعة (أو أثناء تنفيذ طلب) تشترك في نفس الـ Promise
+ * - لا يوجد كاش طويل المدى: بعد انتهاء الدفعة تُنسى النتائج
+ */
+
+export interface BatchLoader<K extends string, V> {
+  load: (key: K) => Promise<V | undefined>;
+  loadMany: (keys: K[]) => Promise<Array<V | undefined>>;
+}
+
+export interface BatchLoaderOptions {
+  /** How long to wait for more keys before flushing (ms) */
+  delayMs?: number;
+  /** Split very large batches (URL length limits on `.in()`) */
+  maxBatchSize?: number;
+}
+
+export function createBatchLoader<K extends string, V>(
+  batchFn: (keys: K[]) => Promise<Map<K, V>>,
+  { delayMs = 10, maxBatchSize = 100 }: BatchLoaderOptions = {},
+): BatchLoader<K, V> {
+  let queue = new Map<K, Promise<V | undefined>>();
+  let resolvers = new Map<K, Array<(value: V | undefined) => void>>();
+  let timer: ReturnType<typeof setTimeout> | null = null;
+  // Keys whose batch is already on the wire
+  const inFlight = new Map<K, Promise<V | undefined>>();
+
+  const runBatch = async (keys: K[], pending: Map<K, Array<(value: V | undefined) => void>>) => {
+    let results = new Map<K, V>();
+    try {
+      results = await batchFn(keys);
+    } catch (error) {
+      console.error('Batch loader error:', error);
+    }
+    keys.forEach((key) => {
+      const value = results.get(key);
+      (pending.get(key) || []).forEach((resolve) => resolve(value));
+      inFlight.delete(key);
+    });
+  };
+
+  const flush = () => {
+    timer = null;
+    const keys = Array.from(queue.keys());
+    const pending = resolvers;
+    keys.forEach((key) => inFlight.set(key, queue.get(key)!));
+    queue = new Map();
+    resolvers = new Map();
+
+    for (let i = 0; i < keys.length; i += maxBatchSize) {
+      runBatch(keys.slice(i, i + maxBatchSize), pending);
+    }
+  };
+
+  const load = (key: K): Promise<V | undefined> => {
+    const existing = queue.get(key) || inFlight.get(key);
+    if (existing) return existing;
+
+    const promise = new Promise<V | undefined>((resolve) => {
+      const list = resolvers.get(key) || [];
+      list.push(resolve);
+      resolvers.set(key, list);
+    });
+    queue.set(key, promise);
+
+    if (timer === null) {
+      timer = setTimeout(flush, delayMs);
+    }
+    return promise;
+  };
+
+  return {
+    load,
+    loadMany: (keys: K[]) => Promise.all(keys.map(load)),
+  };
+}
@@ -0,0 +1,197 @@
+/**
+ * BlurHash (https://blurha.sh) - encode/decode
+ * سلسلة قصيرة (~20-30 حرف) تُحفظ مع الصورة وتُرسم كخلفية ضبابية
+ * قبل وصول الصورة الحقيقية، بدل مربع رمادي فارغ
+ */
+
+const DIGITS =
+  "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~";
+
+const encode83 = (value: number, length: number): string => {
+  let result = "";
+  for (let i = 1; i <= length; i++) {
+    const digit = Math.floor(value / Math.pow(83, length - i)) % 83;
+    result += DIGITS[digit];
+  }
+  return result;
+};
+
+const decode83 = (str: string): number => {
+  let value = 0;
+  for (const c of str) {
+    const digit = DIGITS.indexOf(c);
+    if (digit < 0) throw new Error("invalid blurhash");
+    value = value * 83 + digit;
+  }
+  return value;
+};
+
+const sRGBToLinear = (value: number) => {
+  const v = value / 255;
+  return v <= 0.04045 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4);
+};
+
+const linearTosRGB = (value: number) => {
+  const v = Math.max(0, Math.min(1, value));
+  return v <= 0.0031308
+    ? Math.round(v * 12.92 * 255 + 0.5)
+    : Math.round((1.055 * Math.pow(v, 1 / 2.4) - 0.055) * 255 + 0.5);
+};
+
+const signPow = (value: number, exp: number) =>
+  Math.sign(value) * Math.pow(Math.abs(value), exp);
+
+/**
+ * Encode RGBA pixels. Keep the input small (e.g. 32x32) - cost is
+ * O(width * height * componentX * componentY).
+ */
+export function encodeBlurhash(
+  pixels: Uint8ClampedArray,
+  width: number,
+  height: number,
+  componentX = 4,
+  componentY = 3,
+): string {
+  const factors: Array<[number, number, number]> = [];
+  for (let y = 0; y < componentY; y++) {
+    for (let x = 0; x < componentX; x++) {
+      const normalisation = x === 0 && y === 0 ? 1 : 2;
+      let r = 0, g = 0, b = 0;
+      for (let j = 0; j < height; j++) {
+        const basisY = Math.cos((Math.PI * y * j) / height);
+        for (let i = 0; i < width; i++) {
+          const basis = Math.cos((Math.PI * x * i) / width) * basisY;
+          const p = 4 * (i + j * width);
+          r += basis * sRGBToLinear(pixels[p]);
+          g += basis * sRGBToLinear(pixels[p + 1]);
+          b += basis * sRGBToLinear(pixels[p + 2]);
+        }
+      }
+      const scale = normalisation / (width * height);
+      factors.push([r * scale, g * scale, b * scale]);
+    }
+  }
+
+  const [dc, ...ac] = factors;
+  let hash = encode83((componentX - 1) + (componentY - 1) * 9, 1);
+
+  let maximumValue = 1;
+  if (ac.length > 0) {
+    const actualMax = Math.max(...ac.map((f) => Math.max(...f.map(Math.abs))));
+    const quantisedMax = Math.max(
+      0,
+      Math.min(82, Math.floor(actualMax * 166 - 0.5)),
+    );
+    maximumValue = (quantisedMax + 1) / 166;
+    hash += encode83(quantisedMax, 1);
+  } else {
+    hash += encode83(0, 1);
+  }
+
+  hash += encode83(
+    (linearTosRGB(dc[0]) << 16) + (linearTosRGB(dc[1]) << 8) +
+      linearTosRGB(dc[2]),
+    4,
+  );
+
+  ac.forEach((f) => {
+    const [r, g, b] = f.map((v) =>
+      Math.max(
+        0,
+        Math.min(18, Math.floor(signPow(v / maximumValue, 0.5) * 9 + 9.5)),
+      )
+    );
+    hash += encode83(r * 19 * 19 + g * 19 + b, 2);
+  });
+
+  return hash;
+}
+
+/**
+ * Decode to RGBA pixels
+ */
+export function decodeBlurhash(
+  hash: string,
+  width: number,
+  height: number,
+  punch = 1,
+): Uint8ClampedArray {
+  const sizeFlag = decode83(hash[0]);
+  const numY = Math.floor(sizeFlag / 9) + 1;
+  const numX = (sizeFlag % 9) + 1;
+  if (hash.length !== 4 + 2 * numX * numY) throw new Error("invalid blurhash");
+
+  const maximumValue = (decode83(hash[1]) + 1) / 166;
+  const colors: Array<[number, number, number]> = [];
+  for (let i = 0; i < numX * numY; i++) {
+    if (i === 0) {
+      const value = decode83(hash.substring(2, 6));
+      colors.push([
+        sRGBToLinear(value >> 16),
+        sRGBToLinear((value >> 8) & 255),
+        sRGBToLinear(value & 255),
+      ]);
+    } else {
+      const value = decode83(hash.substring(4 + i * 2, 6 + i * 2));
+      const max = maximumValue * punch;
+      colors.push([
+        signPow((Math.floor(value / 361) - 9) / 9, 2) * max,
+        signPow(((Math.floor(value / 19) % 19) - 9) / 9, 2) * max,
+        signPow(((value % 19) - 9) / 9, 2) * max,
+      ]);
+    }
+  }
+
+  const pixels = new Uint8ClampedArray(width * height * 4);
+  for (let y = 0; y < height; y++) {
+    for (let x = 0; x < width; x++) {
+      let r = 0, g = 0, b = 0;
+      for (let j = 0; j < numY; j++) {
+        const basisY = Math.cos((Math.PI * y * j) / height);
+        for (let i = 0; i < numX; i++) {
+          const basis = Math.cos((Math.PI * x * i) / width) * basisY;
+          const color = colors[i + j * numX];
+          r += color[0] * basis;
+          g += color[1] * basis;
+          b += color[2] * basis;
+        }
+      }
+      const p = 4 * (x + y * width);
+      pixels[p] = linearTosRGB(r);
+      pixels[p + 1] = linearTosRGB(g);
+      pixels[p + 2] = linearTosRGB(b);
+      pixels[p + 3] = 255;
+    }
+  }
+  return pixels;
+}
+
+const dataUrlCache = new Map<string, string | null>();
+const DATA_URL_SIZE = 32;
+
+/**
+ * Blurhash → small PNG data URL (for a CSS background). Cached per hash,
+ * so a list of cards sharing placeholders decodes each hash once.
+ */
+export function blurhashToDataURL(hash: string | null | undefined): string | null {
+  if (!hash || typeof document === "undefined") return null;
+  if (dataUrlCache.has(hash)) return dataUrlCache.get(hash)!;
+
+  let url: string | null = null;
+  try {
+    const canvas = document.createElement("canvas");
+    canvas.width = DATA_URL_SIZE;
+    canvas.height = DATA_URL_SIZE;
+    const ctx = canvas.getContext("2d");
+    if (ctx) {
+      const imageData = ctx.createImageData(DATA_URL_SIZE, DATA_URL_SIZE);
+      imageData.data.set(decodeBlurhash(hash, DATA_URL_SIZE, DATA_URL_SIZE));
+      ctx.putImageData(imageData, 0, 0);
+      url = canvas.toDataURL("image/png");
+    }
+  } catch {
+    url = null;
+  }
+  dataUrlCache.set(hash, url);
+  return url;
+}
@@ -0,0 +1,250 @@
+/**
+ * Client-side image compression before upload
+ * - في Worker (OffscreenCanvas) عند توفره، وإلا canvas عادي في الـ main thread
+ * - GIF/SVG والصور الصغيرة تُرفع كما هي
+ * - إذا كانت النتيجة أكبر من الأصل نُبقي الأصل
+ * - variantWidths/blurhash: نسخ مصغرة للـ srcset + placeholder (صور الطلبات)
+ */
+
+import { encodeBlurhash } from "./blurhash";
+import { logger } from "./logger";
+
+export interface CompressImageOptions {
+  /** Longest side in px */
+  maxDimension?: number;
+  /** 0..1 encoder quality */
+  quality?: number;
+  /** Files smaller than this are left untouched (ignored when deriving variants) */
+  minBytes?: number;
+  /** Also produce downscaled copies at these widths (px) */
+  variantWidths?: number[];
+  /** Also compute a blurhash placeholder */
+  blurhash?: boolean;
+}
+
+export interface ImageVariantFile {
+  width: number;
+  file: File;
+}
+
+export interface CompressedImage {
+  file: File;
+  compressed: boolean;
+  width?: number;
+  height?: number;
+  variants?: ImageVariantFile[];
+  blurhash?: string;
+}
+
+interface EncodeResult {
+  blob: Blob;
+  width: number;
+  height: number;
+  variants?: Array<{ width: number; blob: Blob }>;
+  blurhash?: string;
+}
+
+interface EncodeOptions {
+  maxDimension: number;
+  quality: number;
+  variantWidths?: number[];
+  blurhash?: boolean;
+}
+
+const DEFAULT_MAX_DIMENSION = 1920;
+const DEFAULT_QUALITY = 0.8;
+const DEFAULT_MIN_BYTES = 150 * 1024;
+
+const SKIP_TYPES = ["image/gif", "image/svg+xml"];
+const BLURHASH_SIZE = 32;
+
+let worker: Worker | null = null;
+let workerFailed = false;
+let nextTaskId = 1;
+const pendingTasks = new Map<
+  number,
+  {
+    resolve: (value: EncodeResult) => void;
+    reject: (error: Error) => void;
+  }
+>();
+
+const getWorker = (): Worker | null => {
+  if (worker || workerFailed) return worker;
+  if (typeof Worker === "undefined" || typeof OffscreenCanvas === "undefined") {
+    workerFailed = true;
+    return null;
+  }
+  try {
+    worker = new Worker(
+      new URL("./imageCompression.worker.ts", import.meta.url),
+      { type: "module" },
+    );
+    worker.onmessage = (event) => {
+      const { id, blob, width, height, variants, blurhash, error } =
+        event.data || {};
+      const task = pendingTasks.get(id);
+      if (!task) return;
+      pendingTasks.delete(id);
+      if (error || !blob) task.reject(new Error(error || "compression failed"));
+      else task.resolve({ blob, width, height, variants, blurhash });
+    };
+    worker.onerror = () => {
+      // Worker could not start (CSP, old WebView) - fall back for good
+      workerFailed = true;
+      worker?.terminate();
+      worker = null;
+      pendingTasks.forEach((task) => task.reject(new Error("worker failed")));
+      pendingTasks.clear();
+    };
+  } catch {
+    workerFailed = true;
+    worker = null;
+  }
+  return worker;
+};
+
+const compressInWorker = (file: Blob, options: EncodeOptions) =>
+  new Promise<EncodeResult>((resolve, reject) => {
+    const w = getWorker();
+    if (!w) {
+      reject(new Error("worker unavailable"));
+      return;
+    }
+    const id = nextTaskId++;
+    pendingTasks.set(id, { resolve, reject });
+    w.postMessage({ id, file, ...options });
+  });
+
+const compressOnMainThread = async (
+  file: Blob,
+  { maxDimension, quality, variantWidths, blurhash }: EncodeOptions,
+): Promise<EncodeResult> => {
+  const url = URL.createObjectURL(file);
+  try {
+    const img = await new Promise<HTMLImageElement>((resolve, reject) => {
+      const el = new Image();
+      el.onload = () => resolve(el);
+      el.onerror = () => reject(new Error("image decode failed"));
+      el.src = url;
+    });
+    const scale = Math.min(
+      1,
+      maxDimension / Math.max(img.naturalWidth, img.naturalHeight),
+    );
+    const width = Math.max(1, Math.round(img.naturalWidth * scale));
+    const height = Math.max(1, Math.round(img.naturalHeight * scale));
+
+    const encode = async (w: number, h: number) => {
+      const canvas = document.createElement("canvas");
+      canvas.width = w;
+      canvas.height = h;
+      canvas.getContext("2d")?.drawImage(img, 0, 0, w, h);
+
+      const toBlob = (type: string) =>
+        new Promise<Blob | null>((resolve) =>
+          canvas.toBlob(resolve, type, quality)
+        );
+      let blob = await toBlob("image/webp");
+      if (!blob || blob.type !== "image/webp") blob = await toBlob("image/jpeg");
+      if (!blob) throw new Error("canvas encode failed");
+      return blob;
+    };
+
+    const blob = await encode(width, height);
+
+    const variants: Array<{ width: number; blob: Blob }> = [];
+    for (const target of variantWidths || []) {
+      if (target >= width) continue;
+      const h = Math.max(1, Math.round((height * target) / width));
+      variants.push({ width: target, blob: await encode(target, h) });
+    }
+
+    let hash: string | undefined;
+    if (blurhash) {
+      const canvas = document.createElement("canvas");
+      canvas.width = BLURHASH_SIZE;
+      canvas.height = BLURHASH_SIZE;
+      const context = canvas.getContext("2d");
+      if (context) {
+        context.drawImage(img, 0, 0, BLURHASH_SIZE, BLURHASH_SIZE);
+        const { data } = context.getImageData(0, 0, BLURHASH_SIZE, BLURHASH_SIZE);
+        hash = encodeBlurhash(data, BLURHASH_SIZE, BLURHASH_SIZE);
+      }
+    }
+
+    return { blob, width, height, variants, blurhash: hash };
+  } finally {
+    URL.revokeObjectURL(url);
+  }
+};
+
+const replaceExtension = (name: string, type: string, suffix = "") => {
+  const ext = type === "image/webp" ? "webp" : "jpg";
+  const base = name.includes(".") ? name.slice(0, name.lastIndexOf(".")) : name;
+  return `${base}${suffix}.${ext}`;
+};
+
+/**
+ * Downscale + re-encode an image file. Non-images are returned unchanged.
+ */
+export async function compressImage(
+  file: File,
+  {
+    maxDimension = DEFAULT_MAX_DIMENSION,
+    quality = DEFAULT_QUALITY,
+    minBytes = DEFAULT_MIN_BYTES,
+    variantWidths,
+    blurhash,
+  }: CompressImageOptions = {},
+): Promise<CompressedImage> {
+  const derive = (variantWidths?.length ?? 0) > 0 || !!blurhash;
+  if (
+    !file.type.startsWith("image/") ||
+    SKIP_TYPES.includes(file.type) ||
+    (file.size < minBytes && !derive)
+  ) {
+    return { file, compressed: false };
+  }
+
+  try {
+    const options = { maxDimension, quality, variantWidths, blurhash };
+    let result: EncodeResult;
+    try {
+      result = await compressInWorker(file, options);
+    } catch {
+      result = await compressOnMainThread(file, options);
+    }
+
+    const variants = (result.variants || []).map(({ width, blob }) => ({
+      width,
+      file: new File(
+        [blob],
+        replaceExtension(file.name, blob.type, `_w${width}`),
+        { type: blob.type, lastModified: file.lastModified },
+      ),
+    }));
+    const derived = {
+      width: result.width,
+      height: result.height,
+      variants,
+      blurhash: result.blurhash,
+    };
+
+    if (result.blob.size >= file.size) {
+      return { file, compressed: false, ...derived };
+    }
+
+    return {
+      file: new File([result.blob], replaceExtension(file.name, result.blob.type), {
+        type: result.blob.type,
+        lastModified: file.lastModified,
+      }),
+      compressed: true,
+      ...derived,
+    };
+  } catch (error) {
+    logger.warn("Image compression skipped:", error);
+    return { file, compressed: false };
+  }
+}
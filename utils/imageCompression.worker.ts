@@ -0,0 +1,83 @@
+/**
+ * Image compression worker
+ * يصغّر الصورة (أطول ضلع maxDimension) ويعيد ترميزها WebP خارج الـ main thread
+ * حتى لا يتجمد الـ UI أثناء فك ترميز صور الكاميرا (12MP+)
+ * ويشتق منها عند الطلب نسخاً مصغرة بعروض variantWidths + blurhash
+ *
+ * in:  { id, file: Blob, maxDimension, quality, variantWidths?, blurhash? }
+ * out: { id, blob?: Blob, width?, height?, variants?, blurhash?, error? }
+ */
+
+import { encodeBlurhash } from "./blurhash";
+
+interface CompressRequest {
+  id: number;
+  file: Blob;
+  maxDimension: number;
+  quality: number;
+  variantWidths?: number[];
+  blurhash?: boolean;
+}
+
+const BLURHASH_SIZE = 32;
+
+const ctx = self as unknown as {
+  onmessage: ((event: MessageEvent<CompressRequest>) => void) | null;
+  postMessage: (message: unknown) => void;
+};
+
+const encode = async (
+  source: ImageBitmap,
+  width: number,
+  height: number,
+  quality: number,
+) => {
+  const canvas = new OffscreenCanvas(width, height);
+  const context = canvas.getContext("2d");
+  if (!context) throw new Error("2d context unavailable");
+  context.drawImage(source, 0, 0, width, height);
+
+  let blob = await canvas.convertToBlob({ type: "image/webp", quality });
+  // Engines without a WebP encoder silently return PNG - JPEG is smaller
+  if (blob.type !== "image/webp") {
+    blob = await canvas.convertToBlob({ type: "image/jpeg", quality });
+  }
+  return blob;
+};
+
+ctx.onmessage = async (event) => {
+  const { id, file, maxDimension, quality, variantWidths, blurhash } =
+    event.data;
+  try {
+    const bitmap = await createImageBitmap(file);
+    const scale = Math.min(1, maxDimension / Math.max(bitmap.width, bitmap.height));
+    const width = Math.max(1, Math.round(bitmap.width * scale));
+    const height = Math.max(1, Math.round(bitmap.height * scale));
+
+    const blob = await encode(bitmap, width, height, quality);
+
+    // Only widths smaller than the main image are worth a separate file
+    const variants: Array<{ width: number; blob: Blob }> = [];
+    for (const target of variantWidths || []) {
+      if (target >= width) continue;
+      const h = Math.max(1, Math.round((height * target) / width));
+      variants.push({ width: target, blob: await encode(bitmap, target, h, quality) });
+    }
+
+    let hash: string | undefined;
+    if (blurhash) {
+      const canvas = new OffscreenCanvas(BLURHASH_SIZE, BLURHASH_SIZE);
+      const context = canvas.getContext("2d");
+      if (context) {
+        context.drawImage(bitmap, 0, 0, BLURHASH_SIZE, BLURHASH_SIZE);
+        const { data } = context.getImageData(0, 0, BLURHASH_SIZE, BLURHASH_SIZE);
+        hash = encodeBlurhash(data, BLURHASH_SIZE, BLURHASH_SIZE);
+      }
+    }
+    bitmap.close();
+
+    ctx.postMessage({ id, blob, width, height, variants, blurhash: hash });
+  } catch (error) {
+    ctx.postMessage({ id, error: (error as Error)?.message || String(error) });
+  }
+};